@@ -1,72 +1,213 @@
 import os
 import json
 import logging
-from typing import Optional, Dict, Any, List, Union
-from dotenv import load_dotenv
+import threading
+from typing import Optional, Dict, Any, List, Tuple, Union
 
-# Import providers
-try:
-    from groq import Groq
-except ImportError:
-    Groq = None
+from .cache import ResponseCache, make_key, default_cache_path, is_cacheable_request, is_cacheable_response
+from .tracing import span, record_llm_call, record_cache_lookup
+from .dispatch import Dispatcher, DispatchPolicy
 
-try:
-    import google.generativeai as genai
-except ImportError:
-    genai = None
-
-load_dotenv()
+# Provider SDKs, dotenv and the client singleton are all deferred to first use:
+# importing the groq and google.generativeai SDKs alone takes most of a second.
 logger = logging.getLogger(__name__)
 
+_dotenv_loaded = False
+
+def _load_dotenv() -> None:
+    global _dotenv_loaded
+    if not _dotenv_loaded:
+        _dotenv_loaded = True
+        try:
+            from dotenv import load_dotenv
+            load_dotenv()
+        except ImportError:
+            pass
+
+def _import_groq():
+    """Returns the Groq client class, or None if the SDK is not installed."""
+    try:
+        from groq import Groq
+        return Groq
+    except ImportError:
+        return None
+
+def _import_genai():
+    """Returns the google.generativeai module, or None if the SDK is not installed."""
+    try:
+        import google.generativeai as genai
+        return genai
+    except ImportError:
+        return None
+
+def load_api_keys() -> Tuple[Optional[str], Optional[str]]:
+    """
+    Returns (groq_key, gemini_key) from the environment, falling back to Streamlit secrets.
+    """
+    _load_dotenv()
+    # Try loading from environment variables first
+    groq_key = os.getenv("GROQ_API_KEY")
+    gemini_key = os.getenv("GEMINI_API_KEY")
+
+    print(f"DEBUG: Env Keys -> Groq: {bool(groq_key)}, Gemini: {bool(gemini_key)}")
+
+    # Fallback to Streamlit secrets if available (Deployment)
+    if not groq_key or not gemini_key:
+        try:
+            import streamlit as st
+            # Accessing secrets can throw FileNotFoundError if no secrets.toml exists locally
+            if "GROQ_API_KEY" in st.secrets:
+                groq_key = st.secrets["GROQ_API_KEY"]
+            if "GEMINI_API_KEY" in st.secrets:
+                gemini_key = st.secrets["GEMINI_API_KEY"]
+
+            print(f"DEBUG: Secrets Keys -> Groq: {bool(groq_key)}, Gemini: {bool(gemini_key)}")
+        except Exception as e:
+            print(f"DEBUG: Failed to load Streamlit secrets: {e}")
+
+    return groq_key, gemini_key
+
 class LLMClient:
-    def __init__(self):
-        # Try loading from environment variables first
-        self.groq_key = os.getenv("GROQ_API_KEY")
-        self.gemini_key = os.getenv("GEMINI_API_KEY")
-        
-        print(f"DEBUG: Env Keys -> Groq: {bool(self.groq_key)}, Gemini: {bool(self.gemini_key)}")
-
-        # Fallback to Streamlit secrets if available (Deployment)
-        if not self.groq_key or not self.gemini_key:
-            try:
-                import streamlit as st
-                # Accessing secrets can throw FileNotFoundError if no secrets.toml exists locally
-                if "GROQ_API_KEY" in st.secrets:
-                    self.groq_key = st.secrets["GROQ_API_KEY"]
-                if "GEMINI_API_KEY" in st.secrets:
-                    self.gemini_key = st.secrets["GEMINI_API_KEY"]
-                
-                print(f"DEBUG: Secrets Keys -> Groq: {bool(self.groq_key)}, Gemini: {bool(self.gemini_key)}")
-            except Exception as e:
-                print(f"DEBUG: Failed to load Streamlit secrets: {e}")
-
-        self.groq_client = None
-        if self.groq_key and Groq:
+    GROQ_MODEL = "llama-3.3-70b-versatile"
+    GEMINI_MODEL = "gemini-1.5-flash"
+    EMBEDDING_MODEL = "models/text-embedding-004"
+    # Inputs per batched embedding request (Gemini's batch limit)
+    EMBEDDING_BATCH_SIZE = 100
+    # Set once Gemini rejects the key for embeddings; retrying cannot help after that
+    _embeddings_rejected = False
 
-            try:
-                self.groq_client = Groq(api_key=self.groq_key)
-            except Exception as e:
-                logger.error(f"Failed to init Groq client: {e}")
+    def __init__(self, cache: Optional[ResponseCache] = None, policy: Optional[DispatchPolicy] = None,
+                 embedding_cache=None):
+        self.groq_key, self.gemini_key = load_api_keys()
 
-        if self.gemini_key and genai:
-            try:
-                genai.configure(api_key=self.gemini_key)
-            except Exception as e:
-                logger.error(f"Failed to verify Gemini key: {e}")
+        # Provider SDK clients are built on first use (see groq_client / genai)
+        self._groq_client = None
+        self._genai = None
+        self._providers_lock = threading.Lock()
+        self._groq_ready = False
+        self._genai_ready = False
+
+        # Response cache (CODEALIGN_LLM_CACHE=0 disables it)
+        if cache is None:
+            cache = ResponseCache(
+                path=default_cache_path("llm_responses.sqlite"),
+                namespace="llm",
+                max_memory_entries=int(os.getenv("CODEALIGN_LLM_CACHE_MEMORY_ENTRIES", "512")),
+                max_disk_entries=int(os.getenv("CODEALIGN_LLM_CACHE_MAX_ENTRIES", "10000")),
+                ttl_seconds=float(os.getenv("CODEALIGN_LLM_CACHE_TTL", str(7 * 24 * 3600))),
+                enabled=os.getenv("CODEALIGN_LLM_CACHE", "1") != "0",
+            )
+        self.cache = cache
+
+        # Embeddings by normalized-code hash, shared process-wide (CODEALIGN_EMBEDDING_CACHE=0 disables it)
+        if embedding_cache is None:
+            from .embedding_cache import get_embedding_cache
+            embedding_cache = get_embedding_cache()
+        self.embedding_cache = embedding_cache
+
+        # Deadlines, hedging/racing and circuit breakers across providers (CODEALIGN_LLM_DISPATCH etc.)
+        self.dispatcher = Dispatcher(policy)
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache hit rates plus per-provider dispatch counters, latencies and breaker states."""
+        return {"cache": self.cache.stats(), "embedding_cache": self.embedding_cache.stats(),
+                "dispatch": self.dispatcher.stats()}
+
+    @property
+    def groq_client(self):
+        """Groq SDK client, imported and constructed on first access (None if unavailable)."""
+        if not self._groq_ready:
+            with self._providers_lock:
+                if not self._groq_ready:
+                    Groq = _import_groq() if self.groq_key else None
+                    if Groq:
+                        try:
+                            self._groq_client = Groq(api_key=self.groq_key)
+                        except Exception as e:
+                            logger.error(f"Failed to init Groq client: {e}")
+                    self._groq_ready = True
+        return self._groq_client
+
+    @property
+    def genai(self):
+        """Configured google.generativeai module, imported on first access (None if unavailable)."""
+        if not self._genai_ready:
+            with self._providers_lock:
+                if not self._genai_ready:
+                    genai = _import_genai() if self.gemini_key else None
+                    if genai:
+                        try:
+                            genai.configure(api_key=self.gemini_key)
+                        except Exception as e:
+                            logger.error(f"Failed to verify Gemini key: {e}")
+                    self._genai = genai
+                    self._genai_ready = True
+        return self._genai
+
+    @property
+    def embeddings_available(self) -> bool:
+        """False when embedding requests cannot succeed (no Gemini key or SDK, or the key was rejected)."""
+        return self.genai is not None and not self._embeddings_rejected
 
     def generate_text(self, 
                       system_prompt: str, 
                       user_prompt: str, 
                       json_mode: bool = False,
-                      temperature: float = 0.0) -> Optional[str]:
+                      temperature: float = 0.0,
+                      use_cache: bool = True) -> Optional[str]:
         """
         Tries to generate text using Groq (Primary). Falls back to Gemini (Backup).
+        Temperature 0 responses are cached by content hash; pass use_cache=False to bypass.
         """
-        # 1. Try Groq
+        with span("llm.generate", kind="llm") as llm_span:
+            cache_key = None
+            if use_cache and self.cache.enabled and is_cacheable_request(temperature):
+                cache_key = self.cache_key(system_prompt, user_prompt, json_mode, temperature)
+                cached = self.cache.get(cache_key)
+                record_cache_lookup(cached is not None)
+                llm_span.set(cache_hit=cached is not None)
+                if cached is not None:
+                    return cached
+
+            response = self._generate_uncached(system_prompt, user_prompt, json_mode, temperature)
+
+            if cache_key and response is not None and is_cacheable_response(response, json_mode):
+                self.cache.set(cache_key, response)
+            return response
+
+    @classmethod
+    def cache_key(cls, system_prompt: str, user_prompt: str, json_mode: bool, temperature: float) -> str:
+        """Content hash of a generation request (shared with AsyncLLMClient)."""
+        return make_key(system_prompt, user_prompt, json_mode, temperature, cls.GROQ_MODEL, cls.GEMINI_MODEL)
+
+    def _provider_calls(self,
+                        system_prompt: str,
+                        user_prompt: str,
+                        json_mode: bool,
+                        temperature: float) -> List[Tuple[str, Any]]:
+        """Configured providers in priority order: Groq (Primary), Gemini (Backup)."""
+        calls = []
         if self.groq_client:
+            calls.append(("groq", lambda: self._call_groq(system_prompt, user_prompt, json_mode, temperature)))
+        if self.genai:
+            calls.append(("gemini", lambda: self._call_gemini(system_prompt, user_prompt, temperature)))
+        return calls
+
+    def _generate_uncached(self,
+                           system_prompt: str,
+                           user_prompt: str,
+                           json_mode: bool,
+                           temperature: float) -> Optional[str]:
+        calls = self._provider_calls(system_prompt, user_prompt, json_mode, temperature)
+        response = self.dispatcher.run(calls, json_mode=json_mode) if calls else None
+        if response is None:
+            logger.error("All LLM providers failed or keys missing.")
+        return response
+
+    def _call_groq(self, system_prompt: str, user_prompt: str, json_mode: bool, temperature: float) -> str:
+        with span("llm.groq", kind="llm_call") as call:
             try:
-                # Updated to a supported model
-                model = "llama-3.3-70b-versatile" 
+                model = self.GROQ_MODEL
                 kwargs = {
                     "messages": [
                         {"role": "system", "content": system_prompt},
@@ -77,53 +218,111 @@ class LLMClient:
                 }
                 if json_mode:
                     kwargs["response_format"] = {"type": "json_object"}
-                
+
                 chat_completion = self.groq_client.chat.completions.create(**kwargs)
-                return chat_completion.choices[0].message.content
-            except Exception as e:
-                logger.warning(f"Groq generation failed: {e}. Switching to backup.")
-        
-        # 2. Try Gemini
-        if self.gemini_key and genai:
+            except Exception:
+                record_llm_call(call, "groq", self.GROQ_MODEL, "generate", "error")
+                raise
+            usage = getattr(chat_completion, "usage", None)
+            record_llm_call(call, "groq", model, "generate", "success",
+                            prompt_tokens=getattr(usage, "prompt_tokens", None),
+                            completion_tokens=getattr(usage, "completion_tokens", None))
+            return chat_completion.choices[0].message.content
+
+    def _call_gemini(self, system_prompt: str, user_prompt: str, temperature: float) -> str:
+        genai = self.genai
+        with span("llm.gemini", kind="llm_call") as call:
             try:
-                # Updated to gemini-1.5-flash
-                model_name = "gemini-1.5-flash"
+                model_name = self.GEMINI_MODEL
                 generation_config = genai.types.GenerationConfig(
                     temperature=temperature
                 )
                 model = genai.GenerativeModel(model_name)
                 full_prompt = f"System: {system_prompt}\n\nUser: {user_prompt}"
-                
+
                 response = model.generate_content(
                     full_prompt,
                     generation_config=generation_config
                 )
-                return response.text
-            except Exception as e:
-                logger.error(f"Gemini generation failed: {e}")
-        
-        logger.error("All LLM providers failed or keys missing.")
-        return None
+                text = response.text
+            except Exception:
+                record_llm_call(call, "gemini", self.GEMINI_MODEL, "generate", "error")
+                raise
+            usage = getattr(response, "usage_metadata", None)
+            record_llm_call(call, "gemini", model_name, "generate", "success",
+                            prompt_tokens=getattr(usage, "prompt_token_count", None),
+                            completion_tokens=getattr(usage, "candidates_token_count", None))
+            return text
 
-    def get_embedding(self, text: str) -> List[float]:
+    def get_embedding(self, text: str, language: str = "Python") -> List[float]:
         """
         Generates embeddings using Gemini.
         """
-        if not self.gemini_key or not genai:
+        return self.get_embedding_many([text], language)[0]
+
+    def get_embedding_many(self, texts: List[str], language: str = "Python") -> List[List[float]]:
+        """
+        One embedding per text. Texts whose normalized code is already in the
+        embedding cache cost no request; the distinct misses are sent
+        EMBEDDING_BATCH_SIZE inputs per request. Failed inputs get an empty list.
+        """
+        from .embedding_cache import lookup
+
+        texts = list(texts)
+        if not self.embedding_cache.enabled:
+            return self._embed_uncached(texts)
+        keys, found, missing = lookup(self.embedding_cache, texts, self.EMBEDDING_MODEL, language)
+        computed: Dict[str, List[float]] = {}
+        if missing:
+            computed = dict(zip(missing, self._embed_uncached(list(missing.values()))))
+            self.embedding_cache.set_many(list(computed.items()))
+        return [vector if vector is not None else computed.get(key, []) for key, vector in zip(keys, found)]
+
+    def _embed_uncached(self, texts: List[str]) -> List[List[float]]:
+        """Batched Gemini embedding requests (a failed request fails its whole batch)."""
+        genai = self.genai
+        if not genai:
             logger.warning("Gemini key missing for embeddings.")
-            return []
-            
-        try:
-            result = genai.embed_content(
-                model="models/text-embedding-004",
-                content=text,
-                task_type="retrieval_document",
-                title="Code Submission"
-            )
-            return result['embedding']
-        except Exception as e:
-            logger.error(f"Gemini embedding failed: {e}")
-            return []
+            return [[] for _ in texts]
+
+        embeddings: List[List[float]] = []
+        for start in range(0, len(texts), self.EMBEDDING_BATCH_SIZE):
+            batch = texts[start:start + self.EMBEDDING_BATCH_SIZE]
+            with span("llm.embedding", kind="llm_call", inputs=len(batch)) as call:
+                try:
+                    result = genai.embed_content(
+                        model=self.EMBEDDING_MODEL,
+                        content=batch,
+                        task_type="retrieval_document",
+                        title="Code Submission"
+                    )
+                    vectors = result['embedding']
+                    if len(vectors) != len(batch):
+                        raise ValueError(f"expected {len(batch)} embeddings, got {len(vectors)}")
+                    record_llm_call(call, "gemini", self.EMBEDDING_MODEL, "embed", "success")
+                    embeddings.extend(list(v) for v in vectors)
+                except Exception as e:
+                    record_llm_call(call, "gemini", self.EMBEDDING_MODEL, "embed", "error")
+                    logger.error(f"Gemini embedding failed: {e}")
+                    if getattr(e, "code", None) in (401, 403):
+                        self._embeddings_rejected = True
+                    embeddings.extend([] for _ in batch)
+        return embeddings
+
+_client: Optional[LLMClient] = None
+_client_lock = threading.Lock()
+
+def get_client() -> LLMClient:
+    """The process-wide LLMClient, constructed on first access."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = LLMClient()
+    return _client
 
-# Singleton instance exposed as codealign.client
-client = LLMClient()
+def __getattr__(name: str):
+    # Singleton instance exposed as codealign.client (built lazily, PEP 562)
+    if name == "client":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
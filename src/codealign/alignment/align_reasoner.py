@@ -1,13 +1,15 @@
+import sys
 import json
-from typing import List, Dict, Any
-from codealign import client
+import textwrap
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+from codealign import get_client
+from codealign.prompt_budget import compact_prompt, compact_json, count_tokens
 
-def align_spec_code(requirements: List[Dict[str, str]], code: str, analysis: Dict[str, Any], language: str = "Python") -> Dict[str, Any]:
-    """
-    Checks if the code fulfills requirements using an LLM.
-    """
-    
-    prompt = f"""
+SYSTEM_PROMPT = "You are a senior technical interviewer evaluating code quality and correctness."
+
+ALIGNMENT_TEMPLATE = textwrap.dedent("""\
     You are an expert AI Coding Assignment Evaluator.
     Evaluate the user's {language} code based on the following dimensions:
 
@@ -15,7 +17,7 @@ def align_spec_code(requirements: List[Dict[str, str]], code: str, analysis: Dic
        - Does the code meet all the listed requirements?
        - Does it handle edge cases (empty input, negatives, etc.)?
        - Assign a score (0-100).
-    
+
     2. Time Efficiency:
        - Detect the time complexity (e.g., O(n), O(n^2)).
        - Is it optimal for this problem?
@@ -28,17 +30,18 @@ def align_spec_code(requirements: List[Dict[str, str]], code: str, analysis: Dic
     4. Readability & Code Quality:
        - Check variable naming, comments, docstrings, modularity.
        - NOTE: Lack of comments should be a MINOR weakness (e.g., -5 points) if code is clean and self-explanatory. Do not heavily penalize readable code.
+       - If the analysis reports comment_lines, comments were removed from the code below to save space; they existed.
        - Assign a score (0-100).
-
+    {part_note}
     Requirements to Check:
-    {json.dumps(requirements, indent=2)}
-    
+    {requirements}
+
     Code Analysis Info:
-    {json.dumps(analysis, indent=2)}
-    
+    {analysis}
+
     Code:
     {code}
-    
+
     Output JSON format:
     {{
         "alignment": [
@@ -57,17 +60,92 @@ def align_spec_code(requirements: List[Dict[str, str]], code: str, analysis: Dic
             "better_approach": "A more optimal approach would be to use dynamic programming with binary search to achieve O(n log n) time complexity."
         }}
     }}
+    """)
+
+PART_NOTE = """
+    This is part {index} of {total} of a larger submission, split per function to fit the model's context.
+    Judge only what this part shows; mark a requirement "missing" only if this part does not address it,
+    the other parts are evaluated separately and merged.
+"""
+
+# Merged per requirement: the best status seen in any part wins
+STATUS_RANK = {"missing": 0, "partial": 1, "fulfilled": 2}
+# Efficiency is bounded by the slowest part; correctness/readability are size-weighted means
+BOTTLENECK_SCORES = ("time_efficiency", "space_efficiency")
+
+def _render_alignment_prompt(requirements: List[Dict[str, str]], language: str):
+    requirements_json = compact_json(requirements)
+
+    def render(code: str, analysis_json: str, part: Optional[Tuple[int, int]]) -> str:
+        part_note = textwrap.dedent(PART_NOTE.format(index=part[0], total=part[1])) if part else ""
+        return ALIGNMENT_TEMPLATE.format(language=language, part_note=part_note, requirements=requirements_json,
+                                         analysis=analysis_json, code=code)
+    return render
+
+def build_alignment_prompts(requirements: List[Dict[str, str]], code: str, analysis: Dict[str, Any], language: str = "Python",
+                            budget: Optional[int] = None) -> List[str]:
     """
-    
-    system_prompt = "You are a senior technical interviewer evaluating code quality and correctness."
+    Builds the user prompt(s) for spec <-> code alignment, compacted to the token
+    budget (CODEALIGN_PROMPT_TOKEN_BUDGET). More than one prompt means the code
+    was chunked per function; merge the parsed results with merge_alignment_results.
+    """
+    return compact_prompt(_render_alignment_prompt(requirements, language), code, analysis, language,
+                          budget=budget, name="alignment")
 
-    try:
-        response_text = client.generate_text(
-            system_prompt=system_prompt,
-            user_prompt=prompt,
-            json_mode=True
-        )
+def build_alignment_prompt(requirements: List[Dict[str, str]], code: str, analysis: Dict[str, Any], language: str = "Python") -> str:
+    """Builds a single (never chunked) user prompt for spec <-> code alignment."""
+    return build_alignment_prompts(requirements, code, analysis, language, budget=sys.maxsize)[0]
+
+def merge_alignment_results(results: List[Dict[str, Any]], weights: Optional[List[float]] = None) -> Dict[str, Any]:
+    """
+    Merges the evaluations of a chunked submission into one result.
+    Parts whose LLM call failed (no scores) are ignored unless every part failed.
+    """
+    weights = weights or [1.0] * len(results)
+    parts = [(r, w) for r, w in zip(results, weights) if r.get("scores")]
+    if not parts:
+        return results[0] if results else parse_alignment_response(None)
+    if len(parts) == 1:
+        return parts[0][0]
 
+    alignment: Dict[str, Dict[str, Any]] = {}
+    for result, _ in parts:
+        for item in result.get("alignment") or []:
+            key = str(item.get("requirement", "")).strip().lower()
+            best = alignment.get(key)
+            if best is None or STATUS_RANK.get(item.get("status"), 0) > STATUS_RANK.get(best.get("status"), 0):
+                alignment[key] = item
+
+    scores: Dict[str, Dict[str, Any]] = {}
+    for dim in dict.fromkeys(d for result, _ in parts for d in result["scores"]):
+        entries = [(result["scores"][dim], w) for result, w in parts
+                   if isinstance(result["scores"].get(dim), dict) and isinstance(result["scores"][dim].get("score"), (int, float))]
+        if not entries:
+            continue
+        if dim in BOTTLENECK_SCORES:
+            merged = dict(min(entries, key=lambda e: e[0]["score"])[0])
+        else:
+            merged = dict(max(entries, key=lambda e: e[1])[0])
+            total = sum(w for _, w in entries)
+            merged["score"] = round(sum(e["score"] * w for e, w in entries) / total)
+        scores[dim] = merged
+
+    feedback: Dict[str, Any] = {}
+    for result, _ in parts:
+        for key, value in (result.get("feedback") or {}).items():
+            if isinstance(value, list):
+                feedback.setdefault(key, [])
+                feedback[key].extend(v for v in value if v not in feedback[key])
+            elif value and not feedback.get(key):
+                feedback[key] = value
+
+    return {"alignment": list(alignment.values()), "scores": scores, "feedback": feedback}
+
+def parse_alignment_response(response_text: Optional[str]) -> Dict[str, Any]:
+    """
+    Parses the LLM JSON response, returning zeroed scores if the LLM failed.
+    """
+    try:
         if not response_text:
              # Failover/Mock
             return {
@@ -85,3 +163,56 @@ def align_spec_code(requirements: List[Dict[str, str]], code: str, analysis: Dic
     except Exception as e:
         print(f"Error calling LLM: {e}")
         return {"alignment": [], "scores": {}}
+
+def align_spec_code(requirements: List[Dict[str, str]], code: str, analysis: Dict[str, Any], language: str = "Python") -> Dict[str, Any]:
+    """
+    Checks if the code fulfills requirements using an LLM.
+    Submissions over the token budget are evaluated per chunk (concurrently) and merged.
+    """
+    prompts = build_alignment_prompts(requirements, code, analysis, language)
+
+    def evaluate(prompt: str) -> Dict[str, Any]:
+        try:
+            response_text = get_client().generate_text(
+                system_prompt=SYSTEM_PROMPT,
+                user_prompt=prompt,
+                json_mode=True
+            )
+        except Exception as e:
+            print(f"Error calling LLM: {e}")
+            return {"alignment": [], "scores": {}}
+        return parse_alignment_response(response_text)
+
+    if len(prompts) == 1:
+        return evaluate(prompts[0])
+    with ThreadPoolExecutor(max_workers=len(prompts)) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, evaluate, p) for p in prompts]
+        results = [f.result() for f in futures]
+    return merge_alignment_results(results, [count_tokens(p) for p in prompts])
+
+async def align_spec_code_async(requirements: List[Dict[str, str]], code: str, analysis: Dict[str, Any], language: str = "Python", llm=None) -> Dict[str, Any]:
+    """
+    Async variant of align_spec_code using the pooled AsyncLLMClient.
+    """
+    import asyncio
+    from codealign.async_client import get_async_client
+
+    llm = llm or get_async_client()
+    prompts = build_alignment_prompts(requirements, code, analysis, language)
+
+    async def evaluate(prompt: str) -> Dict[str, Any]:
+        try:
+            response_text = await llm.generate_text(
+                system_prompt=SYSTEM_PROMPT,
+                user_prompt=prompt,
+                json_mode=True
+            )
+        except Exception as e:
+            print(f"Error calling LLM: {e}")
+            return {"alignment": [], "scores": {}}
+        return parse_alignment_response(response_text)
+
+    if len(prompts) == 1:
+        return await evaluate(prompts[0])
+    results = await asyncio.gather(*(evaluate(p) for p in prompts))
+    return merge_alignment_results(list(results), [count_tokens(p) for p in prompts])
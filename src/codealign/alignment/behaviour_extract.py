@@ -1,14 +1,23 @@
 import json
-from typing import List, Dict, Any
-from codealign import client
+from typing import List, Dict, Any, Optional
+from codealign import get_client
 
-def extract_requirements(problem_text: str) -> List[Dict[str, str]]:
-    """
-    Extracts key requirements from the problem text using an LLM (Groq/Gemini).
-    Returns a list of dicts with keys: 'description', 'type'.
-    """
-    
-    prompt = f"""
+SYSTEM_PROMPT = "You are a senior technical interviewer extracting requirements from coding problems."
+
+# Bump whenever the prompt or parser changes so stored requirements are re-extracted
+REQUIREMENTS_VERSION = 1
+
+# Returned when the LLM is unavailable; never persisted as a problem's real requirements
+FALLBACK_REQUIREMENTS = [
+    {"description": "Return 0 for empty input/list", "type": "edge_case"},
+    {"description": "Handle negative integers if applicable", "type": "functional"},
+    {"description": "Time complexity should be efficient (e.g., O(n log n))", "type": "constraint"},
+    {"description": "Return the length of the longest increasing subsequence", "type": "functional"},
+]
+
+def build_requirements_prompt(problem_text: str) -> str:
+    """Builds the user prompt for requirement extraction."""
+    return f"""
     Analyze the following coding problem text and extract a list of specific requirements.
     Classify each as 'functional', 'edge_case', or 'constraint'.
     
@@ -23,26 +32,52 @@ def extract_requirements(problem_text: str) -> List[Dict[str, str]]:
     }}
     """
 
-    system_prompt = "You are a senior technical interviewer extracting requirements from coding problems."
-
+def parse_requirements_response(response_text: Optional[str]) -> List[Dict[str, str]]:
+    """
+    Parses the LLM JSON response, falling back to mock requirements if the LLM failed.
+    """
     try:
-        response_text = client.generate_text(
-            system_prompt=system_prompt,
-            user_prompt=prompt,
-            json_mode=True
-        )
         if not response_text:
             # Fallback mock if LLM fails completely
             print("Warning: LLM generation failed. Using mock requirements.")
-            return [
-                {"description": "Return 0 for empty input/list", "type": "edge_case"},
-                {"description": "Handle negative integers if applicable", "type": "functional"},
-                {"description": "Time complexity should be efficient (e.g., O(n log n))", "type": "constraint"},
-                {"description": "Return the length of the longest increasing subsequence", "type": "functional"},
-            ]
+            return [dict(r) for r in FALLBACK_REQUIREMENTS]
             
         data = json.loads(response_text)
         return data.get("requirements", [])
     except Exception as e:
         print(f"Error parsing LLM response: {e}")
         return []
+
+def extract_requirements(problem_text: str) -> List[Dict[str, str]]:
+    """
+    Extracts key requirements from the problem text using an LLM (Groq/Gemini).
+    Returns a list of dicts with keys: 'description', 'type'.
+    """
+    try:
+        response_text = get_client().generate_text(
+            system_prompt=SYSTEM_PROMPT,
+            user_prompt=build_requirements_prompt(problem_text),
+            json_mode=True
+        )
+    except Exception as e:
+        print(f"Error calling LLM: {e}")
+        return []
+    return parse_requirements_response(response_text)
+
+async def extract_requirements_async(problem_text: str, llm=None) -> List[Dict[str, str]]:
+    """
+    Async variant of extract_requirements using the pooled AsyncLLMClient.
+    """
+    from codealign.async_client import get_async_client
+
+    llm = llm or get_async_client()
+    try:
+        response_text = await llm.generate_text(
+            system_prompt=SYSTEM_PROMPT,
+            user_prompt=build_requirements_prompt(problem_text),
+            json_mode=True
+        )
+    except Exception as e:
+        print(f"Error calling LLM: {e}")
+        return []
+    return parse_requirements_response(response_text)
@@ -0,0 +1,535 @@
+"""
+Pure-Python static analysis for the brace languages we grade (C, C++, Java,
+JavaScript/TypeScript).
+
+A small lexer turns the source into tokens; comments, string, character,
+template and regex literals and preprocessor lines are recognized, so braces
+or keywords inside them never count. One pass over the tokens with a brace
+stack then fills the same schema as the Python AST visitor in code_analysis:
+functions (name, args, doc comment), imports, loops, conditionals, returns
+and direct recursion. No compiler and no network; code the lexer does not
+understand degrades to partial counts rather than an error.
+"""
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# (kind, text, line); kind is "ident", "number", "string", "regex", "punct" or "directive"
+Token = Tuple[str, str, int]
+# (start offset, end offset, is_doc_comment)
+Comment = Tuple[int, int, bool]
+
+_IDENT_RE = re.compile(r"[A-Za-z_$][\w$]*")
+_NUMBER_RE = re.compile(r"\.?\d(?:[\w.]|'(?=\w))*")
+_PUNCT_RE = re.compile(r"=>|->|::|\.\.\.|[^\s\w]")
+_INCLUDE_RE = re.compile(r"#\s*(?:include|import)\s*[<\"]([^>\"]+)[>\"]")
+
+LOOP_KEYWORDS = ("for", "while", "do")
+# Names followed by "(" that never start a function definition
+_NOT_FUNCTIONS = {
+    "if", "for", "while", "switch", "catch", "return", "sizeof", "alignof", "decltype", "typeof", "new",
+    "delete", "throw", "do", "else", "case", "synchronized", "using", "static_assert", "defined", "function",
+    "await", "yield", "super", "this", "with", "import", "require", "foreach",
+}
+_CLASS_KEYWORDS = {"class", "struct", "interface", "enum", "union", "record"}
+# Tokens allowed between ")" and "{" of a definition (qualifiers, throws clauses, return types)
+_QUALIFIER_PUNCT = {"::", "&", "*", "<", ">", ",", ".", "->", "?", "|"}
+# After these a "/" starts a regex literal (JavaScript)
+_REGEX_KEYWORDS = {"return", "typeof", "case", "in", "of", "delete", "void", "throw", "new", "else", "do", "yield", "await"}
+_OBJECT_PRECEDERS = {"=", "(", ",", ":", "return", "[", "?", "|", "&", "!", "=>"}
+
+
+class LanguageSpec:
+    """Lexing and grammar switches of one language."""
+
+    def __init__(self, name: str, preprocessor: bool = False, js: bool = False):
+        self.name = name
+        self.preprocessor = preprocessor  # "#" lines are directives (C, C++)
+        self.js = js  # template/regex literals, function/arrow syntax, import/require
+
+
+C = LanguageSpec("C", preprocessor=True)
+CPP = LanguageSpec("C++", preprocessor=True)
+JAVA = LanguageSpec("Java")
+JAVASCRIPT = LanguageSpec("JavaScript", js=True)
+TYPESCRIPT = LanguageSpec("TypeScript", js=True)
+
+SPECS: Dict[str, LanguageSpec] = {spec.name: spec for spec in (C, CPP, JAVA, JAVASCRIPT, TYPESCRIPT)}
+
+
+def get_spec(language: str) -> Optional[LanguageSpec]:
+    return SPECS.get(language)
+
+
+# ----------------------------------------------------------------------
+# Lexer
+# ----------------------------------------------------------------------
+
+def _string_end(code: str, i: int, quote: str, multiline: bool) -> int:
+    j, n = i + 1, len(code)
+    while j < n:
+        ch = code[j]
+        if ch == "\\":
+            j += 2
+            continue
+        if ch == quote:
+            return j + 1
+        if ch == "\n" and not multiline:
+            return j
+        j += 1
+    return n
+
+
+def _regex_end(code: str, i: int) -> Optional[int]:
+    """End of a /regex/flags literal starting at i, or None if this "/" is division."""
+    j, n, in_class = i + 1, len(code), False
+    while j < n:
+        ch = code[j]
+        if ch == "\\":
+            j += 2
+            continue
+        if ch == "\n":
+            return None
+        if ch == "[":
+            in_class = True
+        elif ch == "]":
+            in_class = False
+        elif ch == "/" and not in_class:
+            j += 1
+            while j < n and (code[j].isalnum() or code[j] == "_"):
+                j += 1
+            return j
+        j += 1
+    return None
+
+
+def _regex_allowed(tokens: List[Token]) -> bool:
+    if not tokens:
+        return True
+    kind, text, _ = tokens[-1]
+    if kind == "punct":
+        return text not in (")", "]", "}")
+    return kind == "ident" and text in _REGEX_KEYWORDS
+
+
+def _doc_text(raw: str) -> Optional[str]:
+    lines = [line.strip().lstrip("*").strip() for line in raw[3:-2].split("\n")]
+    text = "\n".join(lines).strip()
+    return text or None
+
+
+def lex(code: str, spec: LanguageSpec) -> Tuple[List[Token], List[Comment], Dict[int, str]]:
+    """
+    Tokens (comments excluded), comment spans, and doc comments (/** ... */)
+    keyed by the index of the token that follows them.
+    """
+    tokens: List[Token] = []
+    comments: List[Comment] = []
+    docs: Dict[int, str] = {}
+    i, n, line, line_start = 0, len(code), 1, True
+    while i < n:
+        c = code[i]
+        if c == "\n":
+            line += 1
+            line_start = True
+            i += 1
+            continue
+        if c.isspace():
+            i += 1
+            continue
+        if code.startswith("//", i):
+            end = code.find("\n", i)
+            end = n if end < 0 else end
+            comments.append((i, end, False))
+            i = end
+            continue
+        if code.startswith("/*", i):
+            end = code.find("*/", i + 2)
+            end = n if end < 0 else end + 2
+            is_doc = code.startswith("/**", i) and end - i > 4
+            comments.append((i, end, is_doc))
+            if is_doc:
+                docs[len(tokens)] = _doc_text(code[i:end])
+            line += code.count("\n", i, end)
+            i = end
+            continue
+
+        if c == "#" and spec.preprocessor and line_start:
+            end = i
+            while True:
+                nl = code.find("\n", end)
+                if nl < 0:
+                    end = n
+                    break
+                if code[i:nl].rstrip("\r").endswith("\\"):
+                    end = nl + 1
+                    continue
+                end = nl
+                break
+            tokens.append(("directive", code[i:end], line))
+            line += code.count("\n", i, end)
+        elif c in "\"'" or (c == "`" and spec.js):
+            end = _string_end(code, i, c, multiline=c == "`")
+            tokens.append(("string", code[i:end], line))
+            line += code.count("\n", i, end)
+        elif c == "/" and spec.js and _regex_allowed(tokens) and _regex_end(code, i) is not None:
+            end = _regex_end(code, i)
+            tokens.append(("regex", code[i:end], line))
+        elif c.isdigit() or (c == "." and i + 1 < n and code[i + 1].isdigit()):
+            end = _NUMBER_RE.match(code, i).end()
+            tokens.append(("number", code[i:end], line))
+        elif c.isalpha() or c in "_$":
+            end = _IDENT_RE.match(code, i).end()
+            tokens.append(("ident", code[i:end], line))
+        else:
+            end = _PUNCT_RE.match(code, i).end()
+            tokens.append(("punct", code[i:end], line))
+        i = end
+        line_start = False
+    return tokens, comments, docs
+
+
+def strip_comments(code: str, language: str, keep_docs: bool = True) -> Tuple[str, int]:
+    """
+    Removes line, block and trailing comments (doc comments are kept, like Python
+    docstrings) and blank lines. Returns (code, removed comment count).
+    """
+    spec = get_spec(language) or C
+    _, comments, _ = lex(code, spec)
+    removed = [(s, e) for s, e, is_doc in comments if not (keep_docs and is_doc)]
+    parts, last = [], 0
+    for start, end in removed:
+        parts.append(code[last:start])
+        last = end
+    parts.append(code[last:])
+    lines = [l.rstrip() for l in "".join(parts).split("\n")]
+    return "\n".join(l for l in lines if l.strip()), len(removed)
+
+
+# ----------------------------------------------------------------------
+# Analyzer
+# ----------------------------------------------------------------------
+
+def _match_brackets(tokens: List[Token]) -> Dict[int, int]:
+    """Opener index -> closer index and back, for (), [] and {}. Mismatched closers are ignored."""
+    pairs = {")": "(", "]": "[", "}": "{"}
+    match: Dict[int, int] = {}
+    stack: List[int] = []
+    for i, (kind, text, _) in enumerate(tokens):
+        if kind != "punct":
+            continue
+        if text in "([{":
+            stack.append(i)
+        elif text in pairs and stack and tokens[stack[-1]][1] == pairs[text]:
+            opener = stack.pop()
+            match[opener], match[i] = i, opener
+    return match
+
+
+def _split_params(tokens: List[Token], match: Dict[int, int], start: int, end: int) -> List[List[Token]]:
+    """Top-level comma-separated parameter token lists of tokens[start:end]."""
+    params, current, depth, i = [], [], 0, start
+    while i < end:
+        text = tokens[i][1]
+        if text in ("(", "[", "{") and i in match:
+            current.extend(tokens[i:match[i] + 1])
+            i = match[i] + 1
+            continue
+        if text == "<":
+            depth += 1
+        elif text == ">" and depth:
+            depth -= 1
+        elif text == "," and depth == 0:
+            params.append(current)
+            current = []
+            i += 1
+            continue
+        current.append(tokens[i])
+        i += 1
+    if current:
+        params.append(current)
+    return params
+
+
+def _param_name(param: List[Token], spec: LanguageSpec) -> Optional[str]:
+    # Default values are not part of the name
+    depth = 0
+    for k, (_, text, _) in enumerate(param):
+        if text in ("(", "[", "{"):
+            depth += 1
+        elif text in (")", "]", "}"):
+            depth -= 1
+        elif text == "=" and depth == 0:
+            param = param[:k]
+            break
+    param = [t for t in param if t[1] != "..."]
+    if not param:
+        return None
+    if spec.js:
+        # name, name = default, name: Type (TypeScript), or a destructuring pattern
+        if param[0][0] == "ident":
+            return param[0][1]
+        pattern = []
+        for _, text, _ in param:
+            if text == ":" and pattern and pattern[-1] in ("}", "]"):
+                break
+            pattern.append(text)
+        return "".join(pattern)
+    idents = [text for kind, text, _ in param if kind == "ident"]
+    if not idents or (len(param) == 1 and idents[0] == "void"):
+        return None
+    return idents[-1]
+
+
+def _after_initializers(tokens: List[Token], match: Dict[int, int], j: int) -> Optional[int]:
+    """Skips a C++ constructor initializer list (": a(x), b{y}"); returns the body "{" index."""
+    n = len(tokens)
+    j += 1
+    while j < n:
+        kind, text, _ = tokens[j]
+        if text in ("(", "{") and j in match and (tokens[j - 1][0] == "ident" or tokens[j - 1][1] == ">"):
+            j = match[j] + 1
+            if j < n and tokens[j][1] == ",":
+                j += 1
+                continue
+            return j if j < n and tokens[j][1] == "{" else None
+        if kind == "ident" or text in ("::", "<", ">", ","):
+            j += 1
+            continue
+        return None
+    return None
+
+
+def _body_start(tokens: List[Token], match: Dict[int, int], j: int, spec: LanguageSpec) -> Optional[int]:
+    """Index of the body "{" after a parameter list ending before j, or None if this is not a definition."""
+    n = len(tokens)
+    while j < n:
+        kind, text, _ = tokens[j]
+        if text == "{":
+            return j
+        if text == ":":
+            if not spec.js:
+                return _after_initializers(tokens, match, j)
+            j += 1  # TypeScript return type
+            continue
+        if text in ("(", "[") and j in match:
+            # noexcept(...), throw(...), __attribute__((...)), array return types
+            j = match[j] + 1
+            continue
+        if kind == "ident" or text in _QUALIFIER_PUNCT:
+            j += 1
+            continue
+        return None
+    return None
+
+
+def _declaration_doc(tokens: List[Token], docs: Dict[int, str], name_index: int) -> Optional[str]:
+    """Doc comment right before the declaration (modifiers, annotations, return type) of a function."""
+    j = name_index
+    while j > 0 and tokens[j - 1][1] not in (";", "{", "}") and tokens[j - 1][0] != "directive" and j not in docs:
+        j -= 1
+    return docs.get(j)
+
+
+def _assigned_name(tokens: List[Token], i: int) -> Optional[str]:
+    """Name of `name = ...`, `name: ...` or `this.name = ...` ending just before tokens[i]."""
+    j = i - 1
+    if j >= 0 and tokens[j][1] == "async":
+        j -= 1
+    if j >= 1 and tokens[j][1] in ("=", ":") and tokens[j - 1][0] in ("ident", "string"):
+        return tokens[j - 1][1].strip("\"'")
+    return None
+
+
+def _expression_end(tokens: List[Token], match: Dict[int, int], j: int) -> int:
+    """End (exclusive) of an arrow function's expression body starting at j."""
+    n = len(tokens)
+    while j < n:
+        text = tokens[j][1]
+        if text in ("(", "[", "{") and j in match:
+            j = match[j] + 1
+            continue
+        if text in (";", ",", ")", "]", "}"):
+            return j
+        j += 1
+    return n
+
+
+def _is_recursive(tokens: List[Token], name: str, start: int, end: int) -> bool:
+    for t in range(start + 1, min(end, len(tokens) - 1)):
+        if tokens[t][1] != name or tokens[t + 1][1] != "(":
+            continue
+        prev = tokens[t - 1][1]
+        if prev in (".", "->"):
+            if tokens[t - 2][1] == "this":
+                return True
+            continue
+        if prev not in ("function", "new"):
+            return True
+    return False
+
+
+def analyze(code: str, analysis: Dict[str, Any], spec: LanguageSpec) -> Dict[str, Any]:
+    """Fills the code_analysis schema of `analysis` for a brace language."""
+    tokens, _, docs = lex(code, spec)
+    match = _match_brackets(tokens)
+    n = len(tokens)
+    functions: List[Dict[str, Any]] = []
+    spans: List[Tuple[str, int, int]] = []  # (name, body start, body end) for recursion
+    bodies = set()
+    do_braces, skip_while = set(), set()
+    stack = ["global"]
+
+    def text_at(j: int) -> str:
+        return tokens[j][1] if 0 <= j < n else ""
+
+    def add_function(name: str, name_index: int, params_start: int, params_end: int,
+                     body: Optional[int], body_end: Optional[int] = None) -> None:
+        names = [_param_name(p, spec) for p in _split_params(tokens, match, params_start, params_end)]
+        functions.append({
+            "name": name,
+            "args": [a for a in names if a],
+            "docstring": _declaration_doc(tokens, docs, name_index),
+        })
+        if body is not None:
+            bodies.add(body)
+            spans.append((name, body, match.get(body, n) if body_end is None else body_end))
+
+    for i, (kind, text, _) in enumerate(tokens):
+        prev = text_at(i - 1)
+        if kind == "directive":
+            found = _INCLUDE_RE.match(text)
+            if found:
+                analysis["imports"].append(found.group(1))
+            continue
+
+        if kind == "ident":
+            if prev in (".", "->"):
+                continue  # member names are never keywords
+            if text in LOOP_KEYWORDS and i not in skip_while:
+                analysis["loops"] += 1
+                if text == "do" and text_at(i + 1) == "{":
+                    do_braces.add(i + 1)
+            elif text == "if":
+                analysis["conditionals"] += 1
+            elif text == "return":
+                analysis["returns"] += 1
+            elif text == "import" and len(stack) == 1 and not spec.preprocessor:
+                if spec.js:
+                    if text_at(i + 1) == "(":
+                        if i + 2 < n and tokens[i + 2][0] == "string":
+                            analysis["imports"].append(tokens[i + 2][1][1:-1])
+                        continue
+                    for j in range(i + 1, min(n, i + 200)):
+                        if tokens[j][1] == ";":
+                            break
+                        if tokens[j][0] == "string":
+                            analysis["imports"].append(tokens[j][1][1:-1])
+                            break
+                else:
+                    parts = []
+                    for j in range(i + 1, min(n, i + 100)):
+                        if tokens[j][1] == ";":
+                            break
+                        if tokens[j][1] != "static":
+                            parts.append(tokens[j][1])
+                    if parts:
+                        analysis["imports"].append("".join(parts))
+            elif text == "export" and spec.js:
+                j = i + 1
+                if text_at(j) == "{" and j in match:
+                    j = match[j] + 1
+                elif text_at(j) == "*":
+                    j += 3 if text_at(j + 1) == "as" else 1
+                if text_at(j) == "from" and j + 1 < n and tokens[j + 1][0] == "string":
+                    analysis["imports"].append(tokens[j + 1][1][1:-1])
+            elif text == "require" and spec.js and text_at(i + 1) == "(" and i + 2 < n and tokens[i + 2][0] == "string":
+                analysis["imports"].append(tokens[i + 2][1][1:-1])
+            elif text == "function" and spec.js:
+                j = i + 1
+                if text_at(j) == "*":
+                    j += 1
+                name = None
+                if j < n and tokens[j][0] == "ident" and text_at(j + 1) == "(":
+                    name, name_index = tokens[j][1], j
+                    j += 1
+                else:
+                    name, name_index = _assigned_name(tokens, i), i
+                if text_at(j) != "(" or j not in match:
+                    continue
+                body = _body_start(tokens, match, match[j] + 1, spec)
+                if name:
+                    add_function(name, name_index, j + 1, match[j], body)
+                elif body is not None:
+                    bodies.add(body)
+            continue
+
+        if kind != "punct":
+            continue
+        if text == "(" and i in match and i > 0:
+            name_kind, name, _ = tokens[i - 1]
+            name_index = i - 1
+            if name_kind == "punct" and name not in ("(", ")", "[", "]", "{", "}", ";", ","):
+                # C++ operator overloads: operator<, operator(), operator[] ...
+                j = i - 1
+                while j > 0 and tokens[j][0] == "punct" and i - j <= 3:
+                    j -= 1
+                if tokens[j][1] == "operator":
+                    name_kind, name, name_index = "ident", "operator" + "".join(t[1] for t in tokens[j + 1:i]), j
+            if name_kind != "ident" or name in _NOT_FUNCTIONS or text_at(name_index - 1) in ("new", ".", "function"):
+                continue
+            if not spec.js and (text_at(name_index - 1) == "," or (text_at(name_index - 1) == ":" and text_at(name_index - 2) == ")")):
+                continue  # a member of a constructor initializer list
+            scopes = ("class", "object") if spec.js else ("global", "namespace", "class")
+            if stack[-1] not in scopes:
+                continue
+            body = _body_start(tokens, match, match[i] + 1, spec)
+            if body is not None:
+                if text_at(name_index - 1) == "~":
+                    name = "~" + name
+                add_function(name, name_index, i + 1, match[i], body)
+        elif text == "=>" and spec.js:
+            k = i - 1
+            if text_at(k) == ")" and k in match:
+                start = match[k]
+                params = (start + 1, k)
+            elif k >= 0 and tokens[k][0] == "ident":
+                start = k
+                params = (k, k + 1)
+            else:
+                continue
+            name = _assigned_name(tokens, start)
+            body = i + 1 if text_at(i + 1) == "{" else None
+            if name:
+                end = match.get(body, n) if body is not None else _expression_end(tokens, match, i + 1)
+                add_function(name, start, params[0], params[1], body if body is not None else i, end)
+                if body is None:
+                    bodies.discard(i)
+            elif body is not None:
+                bodies.add(body)
+        elif text == "{":
+            if i in bodies:
+                stack.append("function")
+            elif i in do_braces:
+                stack.append("do")
+            elif spec.js and prev in _OBJECT_PRECEDERS:
+                stack.append("object")
+            else:
+                scope = "block"
+                j = i - 1
+                while j >= 0 and i - j < 60 and tokens[j][1] not in (";", "{", "}") and tokens[j][0] != "directive":
+                    if tokens[j][1] in _CLASS_KEYWORDS or (tokens[j][1] == "new" and not spec.js):
+                        scope = "class"
+                        break
+                    if tokens[j][1] in ("namespace", "extern"):
+                        scope = "namespace"
+                        break
+                    j -= 1
+                stack.append(scope)
+        elif text == "}":
+            scope = stack.pop() if len(stack) > 1 else "global"
+            if scope == "do" and text_at(i + 1) == "while":
+                skip_while.add(i + 1)
+
+    analysis["functions"].extend(functions)
+    analysis["has_recursion"] = any(_is_recursive(tokens, name, start, end) for name, start, end in spans)
+    return analysis
@@ -3,9 +3,9 @@ from typing import List, Optional, Dict, Any
 
 class AlignmentItem(BaseModel):
     requirement: str
-    type: str
+    type: str = "Functional"
     status: str
-    evidence: str
+    evidence: str = ""
 
 class DimensionScore(BaseModel):
     score: int
@@ -23,3 +23,15 @@ class AlignmentReport(BaseModel):
     readability: DimensionScore
     
     overall_score: float
+
+class Feedback(BaseModel):
+    strengths: List[str] = []
+    weaknesses: List[str] = []
+    improvement_suggestions: List[str] = []
+    better_approach: str = ""
+
+class AlignmentResult(BaseModel):
+    # the LLM's alignment JSON as returned by align_spec_code
+    alignment: List[AlignmentItem]
+    scores: Dict[str, DimensionScore]
+    feedback: Feedback = Feedback()
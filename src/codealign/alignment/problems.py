@@ -0,0 +1,263 @@
+"""
+Problem registry: extracted requirements memoized per problem statement.
+
+Problem text is normalized (line endings, trailing whitespace, blank-line runs)
+and hashed, so every submission to the same problem reuses one extraction
+instead of re-asking the LLM. Rows carry REQUIREMENTS_VERSION; a version bump,
+a changed statement, or an explicit invalidate() triggers re-extraction.
+"""
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from .behaviour_extract import REQUIREMENTS_VERSION, FALLBACK_REQUIREMENTS
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS problems (
+    problem_id TEXT PRIMARY KEY,
+    text_hash TEXT NOT NULL,
+    problem_text TEXT NOT NULL,
+    requirements TEXT,
+    version INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_problems_text_hash ON problems (text_hash);
+"""
+
+Requirements = List[Dict[str, str]]
+
+
+def normalize_problem_text(problem_text: str) -> str:
+    """Canonical form used for hashing; cosmetic whitespace edits map to the same problem."""
+    lines = [line.rstrip() for line in problem_text.replace("\r\n", "\n").replace("\r", "\n").split("\n")]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def problem_hash(problem_text: str) -> str:
+    return hashlib.sha256(normalize_problem_text(problem_text).encode("utf-8")).hexdigest()
+
+
+class ProblemNotFound(KeyError):
+    """Raised when a problem_id is referenced before it has been registered."""
+
+
+class ProblemRegistry:
+    """
+    SQLite-backed requirement store. `path` may be ":memory:" for tests.
+    Concurrent first requests for the same problem share a single extraction.
+    """
+
+    COLUMNS = ("problem_id", "text_hash", "problem_text", "requirements", "version", "created_at", "updated_at")
+
+    def __init__(self, path: str, version: int = REQUIREMENTS_VERSION):
+        self.path = path
+        self.version = version
+        self._lock = threading.RLock()
+        # text_hash -> [extraction lock, threads using it]; removed when the last one leaves
+        self._inflight: Dict[str, List[Any]] = {}
+        if path != ":memory:":
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    # ------------------------------------------------------------------
+    # Rows
+    # ------------------------------------------------------------------
+    def _row_to_dict(self, row) -> Dict[str, Any]:
+        record = dict(zip(self.COLUMNS, row))
+        record["requirements"] = json.loads(record["requirements"]) if record["requirements"] else None
+        return record
+
+    def _fetch(self, where: str, params: tuple) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM problems {where} ORDER BY updated_at DESC LIMIT 1", params
+            ).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def _is_current(self, record: Optional[Dict[str, Any]]) -> bool:
+        return bool(record) and record["version"] == self.version and record["requirements"] is not None
+
+    def _reusable(self, problem_id: str, text_hash: str) -> Optional[Dict[str, Any]]:
+        """Current requirements for this exact text, under this id or any other."""
+        record = self._fetch("WHERE problem_id = ?", (problem_id,))
+        if self._is_current(record) and record["text_hash"] == text_hash:
+            return record
+        return self._fetch("WHERE text_hash = ? AND version = ? AND requirements IS NOT NULL", (text_hash, self.version))
+
+    def _save(self, problem_id: str, text_hash: str, problem_text: str, requirements: Requirements) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO problems (problem_id, text_hash, problem_text, requirements, version, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(problem_id) DO UPDATE SET
+                    text_hash = excluded.text_hash,
+                    problem_text = excluded.problem_text,
+                    requirements = excluded.requirements,
+                    version = excluded.version,
+                    updated_at = excluded.updated_at
+                """,
+                (problem_id, text_hash, problem_text, json.dumps(requirements), self.version, now, now),
+            )
+            self._conn.commit()
+        return self.get(problem_id)
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def get(self, problem_id: str) -> Optional[Dict[str, Any]]:
+        """The stored record (possibly stale), or None."""
+        return self._fetch("WHERE problem_id = ?", (problem_id,))
+
+    def register(self,
+                 problem_text: str,
+                 problem_id: Optional[str] = None,
+                 extract: Optional[Callable[[str], Requirements]] = None,
+                 refresh: bool = False) -> Dict[str, Any]:
+        """
+        Returns the problem's record, extracting requirements only if none are stored
+        for this normalized text at the current version (or `refresh` is set).
+        `problem_id` defaults to a prefix of the text hash.
+        """
+        text_hash = problem_hash(problem_text)
+        problem_id = problem_id or text_hash[:16]
+
+        if not refresh:
+            record = self._reuse(problem_id, text_hash, problem_text)
+            if record is not None:
+                return record
+
+        with self._lock:
+            inflight = self._inflight.setdefault(text_hash, [threading.Lock(), 0])
+            inflight[1] += 1
+        try:
+            with inflight[0]:
+                # Another thread may have finished the extraction while we waited
+                if not refresh:
+                    record = self._reuse(problem_id, text_hash, problem_text)
+                    if record is not None:
+                        return record
+
+                if extract is None:
+                    from .behaviour_extract import extract_requirements as extract
+                return self.remember(problem_text, extract(problem_text), problem_id=problem_id)
+        finally:
+            with self._lock:
+                inflight[1] -= 1
+                if not inflight[1]:
+                    del self._inflight[text_hash]
+
+    def _reuse(self, problem_id: str, text_hash: str, problem_text: str) -> Optional[Dict[str, Any]]:
+        record = self._reusable(problem_id, text_hash)
+        if record is not None and record["problem_id"] != problem_id:
+            # Same statement registered under another id: copy, don't re-extract
+            return self._save(problem_id, text_hash, problem_text, record["requirements"])
+        return record
+
+    def remember(self, problem_text: str, requirements: Requirements,
+                 problem_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Stores freshly extracted requirements. Empty or fallback results (LLM unavailable)
+        are returned but not persisted, so the next request tries the LLM again.
+        """
+        text_hash = problem_hash(problem_text)
+        problem_id = problem_id or text_hash[:16]
+        if not requirements or requirements == FALLBACK_REQUIREMENTS:
+            logger.warning(f"Requirement extraction failed for problem '{problem_id}'; not memoizing")
+            return {"problem_id": problem_id, "text_hash": text_hash, "problem_text": problem_text,
+                    "requirements": requirements, "version": self.version, "created_at": None, "updated_at": None}
+        return self._save(problem_id, text_hash, problem_text, requirements)
+
+    def store_requirements(self, problem_text: str, requirements: Requirements,
+                           problem_id: Optional[str] = None) -> Dict[str, Any]:
+        """Registers a problem with requirements supplied by the caller (e.g. instructor-edited)."""
+        text_hash = problem_hash(problem_text)
+        return self._save(problem_id or text_hash[:16], text_hash, problem_text, requirements)
+
+    def requirements_for(self,
+                         problem_text: Optional[str] = None,
+                         problem_id: Optional[str] = None,
+                         extract: Optional[Callable[[str], Requirements]] = None) -> Requirements:
+        """
+        Memoized requirements. With only a `problem_id`, the stored text is reused
+        (and re-extracted if stale); raises ProblemNotFound for unknown ids.
+        """
+        if problem_text is None:
+            if problem_id is None:
+                raise ValueError("Either problem_text or problem_id is required")
+            record = self.get(problem_id)
+            if record is None:
+                raise ProblemNotFound(problem_id)
+            if self._is_current(record):
+                return record["requirements"]
+            problem_text = record["problem_text"]
+        return self.register(problem_text, problem_id=problem_id, extract=extract)["requirements"]
+
+    def cached_requirements(self, problem_text: str) -> Optional[Requirements]:
+        """Current stored requirements for this text, without extracting."""
+        text_hash = problem_hash(problem_text)
+        record = self._fetch("WHERE text_hash = ? AND version = ? AND requirements IS NOT NULL", (text_hash, self.version))
+        return record["requirements"] if record else None
+
+    def invalidate(self, problem_id: Optional[str] = None) -> int:
+        """Marks one problem (or all) stale so the next request re-extracts. Returns rows affected."""
+        with self._lock:
+            if problem_id is None:
+                cur = self._conn.execute("UPDATE problems SET requirements = NULL")
+            else:
+                cur = self._conn.execute("UPDATE problems SET requirements = NULL WHERE problem_id = ?", (problem_id,))
+            self._conn.commit()
+            return cur.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# Registered problems persist here alongside the submission store
+DB_FILE = os.getenv("CODEALIGN_PROBLEMS_DB", "problems.db")
+
+_registry: Optional[ProblemRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ProblemRegistry:
+    """Opens the process-wide registry on first use."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ProblemRegistry(DB_FILE)
+    return _registry
+
+
+def set_registry(registry: Optional[ProblemRegistry]) -> Optional[ProblemRegistry]:
+    """Swaps the process-wide registry without closing it. Returns the previous one."""
+    global _registry
+    with _registry_lock:
+        previous, _registry = _registry, registry
+    return previous
+
+
+def reset() -> None:
+    """Closes the process-wide registry (reopened on next use)."""
+    global _registry
+    with _registry_lock:
+        if _registry is not None:
+            _registry.close()
+        _registry = None
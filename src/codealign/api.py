@@ -1,96 +1,238 @@
+import json
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, Literal
 
-from .alignment.behaviour_extract import extract_requirements
-from .alignment.code_analysis import analyze_code
-from .alignment.align_reasoner import align_spec_code
-from .cohort_stats import calculate_score
-from .authenticity.ingest import ingest_submission, get_all_submissions
-from .authenticity.similarity import calculate_similarity
-from .authenticity.ai_signals import detect_ai_signals
+from .pipeline import evaluate_submission_async, AnalysisError
+from .alignment.problems import get_registry, ProblemNotFound
+from .batch import evaluate_batch, DEFAULT_BATCH_WORKERS
+from .async_client import get_async_client, close_async_client
+from .tracing import start_trace
+from . import metrics
+from .cohort_analytics import get_cohort, record_result
+from .evaluation_cache import get_evaluation_cache
+from .authenticity import dedup
+from .authenticity.ingest import ingest_submission, get_store
+from .authenticity.embedding_queue import flush_embedding_queue
+from .authenticity.search import search_similar, identical_match
+from .authenticity.ai_signals import detect_ai_signals_async, heuristic_ai_signals
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Write embeddings still queued for ingested submissions before the daemon worker dies
+    await asyncio.to_thread(flush_embedding_queue)
+    # Release pooled keep-alive connections
+    await close_async_client()
 
 app = FastAPI(
     title="CodeAlign API",
     description="AI-powered backend for evaluating coding assignments.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 class EvaluationRequest(BaseModel):
     """Request model for code evaluation."""
-    problem_text: str = Field(..., description="The full text of the problem statement.")
+    problem_text: Optional[str] = Field(None, description="The full text of the problem statement.")
     code: str = Field(..., description="The candidate's source code.")
     student_id: Optional[str] = Field("anonymous", description="ID of the student submission.")
+    problem_id: Optional[str] = Field(None, description="ID of a registered problem; reuses its pre-extracted requirements.")
+    include_timings: bool = Field(False, description="Add per-stage and per-LLM-call spans to the response under 'timings'.")
+    mode: Optional[Literal["two_call", "fused"]] = Field(None, description="'fused' gets alignment and AI signals from one LLM call; defaults to CODEALIGN_EVALUATION_MODE.")
+
+class ProblemRequest(BaseModel):
+    """Request model for registering a problem statement."""
+    problem_text: str = Field(..., description="The full text of the problem statement.")
+    problem_id: Optional[str] = Field(None, description="Defaults to a hash of the normalized text.")
+    refresh: bool = Field(False, description="Re-extract requirements even if they are already stored.")
 
 class AuthenticityRequest(BaseModel):
     """Request model for authenticity checks."""
     code: str = Field(..., description="The candidate's source code.")
     student_id: Optional[str] = "anonymous"
     problem_id: Optional[str] = "default"
+    language: str = Field("Python", description="Selects the comment rules of duplicate detection.")
+
+class BatchSubmission(BaseModel):
+    """One submission within a batch."""
+    id: str = Field(..., description="Submission identifier, echoed back in the result.")
+    code: str = Field(..., description="The candidate's source code.")
+    student_id: Optional[str] = None
+    language: Optional[str] = None
+
+class BatchEvaluationRequest(BaseModel):
+    """Request model for evaluating a whole cohort against one problem."""
+    problem_text: str = Field(..., description="The full text of the problem statement.")
+    submissions: List[BatchSubmission]
+    problem_id: Optional[str] = "default"
+    language: Optional[str] = "Python"
+    max_workers: int = Field(DEFAULT_BATCH_WORKERS, ge=1, le=64, description="Submissions evaluated concurrently.")
+    check_authenticity: bool = True
+    mode: Optional[Literal["two_call", "fused"]] = None
 
 @app.post("/evaluate", summary="Evaluate a submission")
-def evaluate(request: EvaluationRequest) -> Dict[str, Any]:
+async def evaluate(request: EvaluationRequest) -> Dict[str, Any]:
     """
     Performs a full evaluation of the submission:
     1. Alignment with Problem Statement
     2. Code Quality & Correctness
     3. Authenticity Risk
+
+    Requirement extraction, code analysis and AI-signal detection run in parallel,
+    with LLM calls awaited on the shared async connection pool. Requirements are
+    memoized per problem; pass `problem_id` of a registered problem to skip
+    sending (and re-hashing) the statement. Once a problem's requirements are
+    memoized, re-evaluating the same code against them is served from the
+    evaluation cache without LLM calls (see DELETE /evaluation_cache); the
+    cache is never consulted at the cost of an extraction. Set `include_timings` to get the
+    per-stage and per-LLM-call spans back under `timings`.
     """
-    # 1. Extract Requirements
-    requirements = extract_requirements(request.problem_text)
-    
-    # 2. Analyze Code
-    analysis_result = analyze_code(request.code)
-    if "error" in analysis_result:
-        raise HTTPException(status_code=400, detail=analysis_result["error"])
-        
-    # 3. Align Spec <-> Code (Returns dict with 'alignment' and 'scores')
-    alignment_data = align_spec_code(requirements, request.code, analysis_result)
-    
-    # 4. Check Authenticity
-    ai_signals = detect_ai_signals(request.code)
-    
-    # 5. Score
-    risk_score = ai_signals['confidence'] * 100
-    score_data = calculate_score(alignment_data, risk_score=risk_score)
-    
-    return {
-        "overall_score": score_data["final_score"],
-        "breakdown": score_data["breakdown"],
-        "detailed_scores": alignment_data.get("scores", {}),
-        "alignment_details": alignment_data.get("alignment", []),
-        "authenticity_risk": risk_score,
-        "authenticity_signals": ai_signals,
-        "feedback": alignment_data.get("feedback", {})
-    }
+    if request.problem_text is None and request.problem_id is None:
+        raise HTTPException(status_code=422, detail="Either problem_text or problem_id is required.")
+
+    with start_trace() as trace:
+        requirements = None
+        if request.problem_id is not None:
+            try:
+                requirements = await asyncio.to_thread(
+                    get_registry().requirements_for, request.problem_text, request.problem_id
+                )
+            except ProblemNotFound:
+                raise HTTPException(status_code=404, detail=f"Unknown problem_id '{request.problem_id}'.")
+
+        try:
+            result = await evaluate_submission_async(
+                request.problem_text or "",
+                request.code,
+                student_id=request.student_id,
+                problem_id=request.problem_id or "default",
+                requirements=requirements,
+                mode=request.mode,
+            )
+        except AnalysisError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    # Latest submission per student feeds the problem's cohort statistics
+    student_key = request.student_id if request.student_id not in (None, "anonymous") else None
+    record_result(request.problem_id or "default", result, key=student_key)
+    if request.include_timings:
+        result["timings"] = trace.summary()
+    return result
+
+@app.delete("/evaluation_cache", summary="Drop cached evaluations")
+async def clear_evaluation_cache() -> Dict[str, Any]:
+    """
+    Forces the next /evaluate of every submission to run in full (e.g. after a
+    grading change that prompt versioning does not capture).
+    """
+    cache = get_evaluation_cache()
+    await asyncio.to_thread(cache.invalidate)
+    return {"cleared": True, "stats": cache.stats()}
+
+@app.post("/problems", summary="Register a problem statement")
+async def register_problem(request: ProblemRequest) -> Dict[str, Any]:
+    """
+    Extracts and stores the problem's requirements once. Later /evaluate calls can
+    reference it by `problem_id`. Set `refresh` to force re-extraction.
+    """
+    return await asyncio.to_thread(
+        get_registry().register, request.problem_text, request.problem_id, None, request.refresh
+    )
+
+@app.get("/problems/{problem_id}", summary="Get a registered problem")
+async def get_problem(problem_id: str) -> Dict[str, Any]:
+    record = await asyncio.to_thread(get_registry().get, problem_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Unknown problem_id '{problem_id}'.")
+    return record
+
+@app.get("/cohort_stats/{problem_id}", summary="Score analytics for a problem's cohort")
+async def cohort_stats(problem_id: str) -> Dict[str, Any]:
+    """
+    Per-dimension distributions and percentiles, requirement fulfillment rates and
+    z-score outliers over the results evaluated so far for `problem_id`.
+    """
+    return await asyncio.to_thread(get_cohort(problem_id).summary)
+
+@app.post("/evaluate_batch", summary="Evaluate a cohort of submissions")
+def evaluate_batch_endpoint(request: BatchEvaluationRequest) -> StreamingResponse:
+    """
+    Extracts requirements once, then evaluates every submission on a bounded worker
+    pool. Results are streamed as JSON lines in completion order; failed submissions
+    produce a line with an "error" field instead of aborting the batch.
+    """
+    results = evaluate_batch(
+        request.problem_text,
+        (s.model_dump() for s in request.submissions),
+        problem_id=request.problem_id,
+        language=request.language,
+        max_workers=request.max_workers,
+        check_authenticity=request.check_authenticity,
+        mode=request.mode,
+    )
+    return StreamingResponse((json.dumps(r) + "\n" for r in results), media_type="application/x-ndjson")
+
+def _identical_submission(code: str, student_id: str, problem_id: str,
+                          language: str = "Python") -> Optional[Dict[str, Any]]:
+    """Another student's stored submission with the same normalized code (dedup hash index)."""
+    if not dedup.DEDUP_ENABLED:
+        return None
+    duplicate_id = dedup.find_other_student(problem_id, dedup.code_hash(code, language=language), student_id)
+    return get_store().get(duplicate_id) if duplicate_id else None
 
 @app.post("/check_authenticity", summary="Check specific authenticity risk")
-def check_authenticity(request: AuthenticityRequest) -> Dict[str, Any]:
+async def check_authenticity(request: AuthenticityRequest) -> Dict[str, Any]:
     """
     Checks for plagiarism (similarity) and AI generation patterns.
+    If another student already submitted the same normalized code, returns a
+    1.0 match immediately (no embedding request, LLM call or similarity search).
     """
-    # 1. Ingest/Store
-    current_sub = ingest_submission(request.code, request.student_id, request.problem_id)
-    
-    # 2. Compare against others
-    others = get_all_submissions(request.problem_id)
-    max_similarity = 0.0
-    most_similar_id = None
-    
-    for other in others:
-        if other['id'] == current_sub['id']:
-            continue
-        sim = calculate_similarity(request.code, other.get('code', ''))
-        if sim > max_similarity:
-            max_similarity = sim
-            most_similar_id = other['id']
-            
-    # 3. AI Signals
-    ai_signals = detect_ai_signals(request.code)
-    
+    duplicate = await asyncio.to_thread(_identical_submission, request.code, request.student_id, request.problem_id,
+                                        request.language)
+    if duplicate is not None:
+        current_sub = await asyncio.to_thread(
+            ingest_submission, request.code, request.student_id, request.problem_id, None, request.language
+        )
+        similarity = identical_match(current_sub, duplicate)
+        ai_signals = heuristic_ai_signals(request.code, language=request.language)
+    else:
+        llm = get_async_client()
+
+        # Embedding and AI signals only need the code, so fetch them concurrently
+        embedding, ai_signals = await asyncio.gather(
+            llm.get_embedding(request.code, request.language),
+            detect_ai_signals_async(request.code, llm=llm, language=request.language),
+        )
+
+        # 1. Ingest/Store
+        current_sub = await asyncio.to_thread(
+            ingest_submission, request.code, request.student_id, request.problem_id, embedding, request.language
+        )
+
+        # 2. Compare against others (lexical LSH candidates + embedding neighbours)
+        similarity = await asyncio.to_thread(search_similar, current_sub, request.problem_id)
+
     return {
-        "max_similarity": max_similarity,
-        "most_similar_submission_id": most_similar_id,
+        "max_similarity": similarity["max_similarity"],
+        "most_similar_submission_id": similarity["most_similar_submission_id"],
+        "semantic_similarity": similarity["semantic_similarity"],
+        "most_similar_semantic_id": similarity["most_similar_semantic_id"],
+        "combined_similarity": similarity["combined_similarity"],
+        "matched_lines": similarity["matched_lines"],
+        "structural_similarity": similarity["structural_similarity"],
+        "duplicate_of": similarity["duplicate_of"],
         "ai_signals": ai_signals,
-        "risk_score": max(max_similarity * 100, ai_signals['confidence'] * 100)
+        "risk_score": max(similarity["combined_similarity"] * 100, ai_signals['confidence'] * 100)
     }
+
+@app.get("/metrics", summary="Prometheus metrics", response_class=PlainTextResponse)
+def prometheus_metrics() -> PlainTextResponse:
+    """
+    Stage, similarity and LLM-call latency histograms plus LLM request, token,
+    cache and fallback counters, in the Prometheus text exposition format.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
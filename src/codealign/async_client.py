@@ -0,0 +1,302 @@
+"""
+Async LLM client backed by a shared, keep-alive httpx connection pool.
+
+Talks to the Groq (OpenAI-compatible) and Gemini REST APIs directly so that
+FastAPI handlers can await LLM calls without pinning a threadpool worker.
+Shares the response cache and model configuration with the sync LLMClient.
+"""
+import os
+import asyncio
+import logging
+import weakref
+from typing import Optional, List, Dict, Any
+
+import httpx
+
+from . import LLMClient
+from .cache import ResponseCache, is_cacheable_request, is_cacheable_response
+from .embedding_cache import EmbeddingCache, get_embedding_cache, lookup
+from .tracing import span, record_llm_call, record_cache_lookup
+from .dispatch import Dispatcher, DispatchPolicy
+
+logger = logging.getLogger(__name__)
+
+GROQ_CHAT_URL = "https://api.groq.com/openai/v1/chat/completions"
+GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
+
+
+class AsyncLLMClient:
+    """
+    Async counterpart of LLMClient: Groq primary, Gemini backup, Gemini embeddings.
+    """
+
+    def __init__(self,
+                 groq_key: Optional[str] = None,
+                 gemini_key: Optional[str] = None,
+                 cache: Optional[ResponseCache] = None,
+                 max_connections: Optional[int] = None,
+                 max_keepalive_connections: Optional[int] = None,
+                 max_concurrency: Optional[int] = None,
+                 timeout: Optional[float] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None,
+                 policy: Optional[DispatchPolicy] = None,
+                 embedding_cache: Optional[EmbeddingCache] = None):
+        if (groq_key is None and gemini_key is None) or cache is None:
+            from . import get_client
+            sync_client = get_client()
+            if groq_key is None and gemini_key is None:
+                # Keys are resolved once per process, by the sync client
+                groq_key, gemini_key = sync_client.groq_key, sync_client.gemini_key
+            if cache is None:
+                # Share the sync client's cache so both paths hit the same entries
+                cache = sync_client.cache
+        self.groq_key = groq_key
+        self.gemini_key = gemini_key
+        self.cache = cache
+        # Same process-wide embedding cache as the sync client
+        self.embedding_cache = embedding_cache or get_embedding_cache()
+
+        self.max_connections = max_connections or int(os.getenv("CODEALIGN_HTTP_MAX_CONNECTIONS", "100"))
+        self.max_keepalive_connections = max_keepalive_connections or int(os.getenv("CODEALIGN_HTTP_MAX_KEEPALIVE", "20"))
+        self.max_concurrency = max_concurrency or int(os.getenv("CODEALIGN_LLM_MAX_CONCURRENCY", "64"))
+        self.timeout = timeout or float(os.getenv("CODEALIGN_LLM_TIMEOUT", "60"))
+
+        self.transport = transport
+        # The pool and the semaphore bind to the loop that first uses them, and the batch
+        # CLI and tests run several loops (asyncio.run) in one process: keep one per loop
+        self._http: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+        self.dispatcher = Dispatcher(policy)
+
+    # ------------------------------------------------------------------
+    # Connection pool
+    # ------------------------------------------------------------------
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """The running loop's pooled HTTP client, created on first use."""
+        loop = asyncio.get_running_loop()
+        client = self._http.get(loop)
+        if client is None or client.is_closed:
+            client = self._http[loop] = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                ),
+                timeout=httpx.Timeout(self.timeout),
+                transport=self.transport,
+            )
+        return client
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        """Caps the number of in-flight provider calls on the running loop."""
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    async def aclose(self) -> None:
+        """Closes the running loop's pool; pools of loops that are already closed are dropped."""
+        loop = asyncio.get_running_loop()
+        client = self._http.pop(loop, None)
+        if client is not None:
+            await client.aclose()
+        for other in [l for l in self._http if l.is_closed()]:
+            del self._http[other]
+
+    async def _post(self, url: str, payload: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, Any]:
+        async with self.semaphore:
+            response = await self.http.post(url, json=payload, headers=headers)
+        response.raise_for_status()
+        return response.json()
+
+    # ------------------------------------------------------------------
+    # Public API (mirrors LLMClient)
+    # ------------------------------------------------------------------
+    async def generate_text(self,
+                            system_prompt: str,
+                            user_prompt: str,
+                            json_mode: bool = False,
+                            temperature: float = 0.0,
+                            use_cache: bool = True) -> Optional[str]:
+        """
+        Tries to generate text using Groq (Primary). Falls back to Gemini (Backup).
+        Temperature 0 responses are cached by content hash; pass use_cache=False to bypass.
+        """
+        with span("llm.generate", kind="llm") as llm_span:
+            cache_key = None
+            if use_cache and self.cache.enabled and is_cacheable_request(temperature):
+                cache_key = LLMClient.cache_key(system_prompt, user_prompt, json_mode, temperature)
+                cached = self.cache.get(cache_key)
+                record_cache_lookup(cached is not None)
+                llm_span.set(cache_hit=cached is not None)
+                if cached is not None:
+                    return cached
+
+            response = await self._generate_uncached(system_prompt, user_prompt, json_mode, temperature)
+
+            if cache_key and response is not None and is_cacheable_response(response, json_mode):
+                self.cache.set(cache_key, response)
+            return response
+
+    def stats(self) -> Dict[str, Any]:
+        return {"cache": self.cache.stats(), "embedding_cache": self.embedding_cache.stats(),
+                "dispatch": self.dispatcher.stats()}
+
+    async def _generate_uncached(self,
+                                 system_prompt: str,
+                                 user_prompt: str,
+                                 json_mode: bool,
+                                 temperature: float) -> Optional[str]:
+        calls = []
+        if self.groq_key:
+            calls.append(("groq", lambda: self._call_groq(system_prompt, user_prompt, json_mode, temperature)))
+        if self.gemini_key:
+            calls.append(("gemini", lambda: self._call_gemini(system_prompt, user_prompt, temperature)))
+
+        response = await self.dispatcher.run_async(calls, json_mode=json_mode) if calls else None
+        if response is None:
+            logger.error("All LLM providers failed or keys missing.")
+        return response
+
+    async def _call_groq(self, system_prompt: str, user_prompt: str, json_mode: bool, temperature: float) -> str:
+        with span("llm.groq", kind="llm_call") as call:
+            try:
+                payload = {
+                    "messages": [
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt}
+                    ],
+                    "model": LLMClient.GROQ_MODEL,
+                    "temperature": temperature,
+                }
+                if json_mode:
+                    payload["response_format"] = {"type": "json_object"}
+                data = await self._post(GROQ_CHAT_URL, payload, {"Authorization": f"Bearer {self.groq_key}"})
+                text = data["choices"][0]["message"]["content"]
+            except Exception:
+                record_llm_call(call, "groq", LLMClient.GROQ_MODEL, "generate", "error")
+                raise
+            usage = data.get("usage") or {}
+            record_llm_call(call, "groq", LLMClient.GROQ_MODEL, "generate", "success",
+                            prompt_tokens=usage.get("prompt_tokens"),
+                            completion_tokens=usage.get("completion_tokens"))
+            return text
+
+    async def _call_gemini(self, system_prompt: str, user_prompt: str, temperature: float) -> str:
+        with span("llm.gemini", kind="llm_call") as call:
+            try:
+                payload = {
+                    "contents": [{"parts": [{"text": f"System: {system_prompt}\n\nUser: {user_prompt}"}]}],
+                    "generationConfig": {"temperature": temperature},
+                }
+                url = f"{GEMINI_BASE_URL}/models/{LLMClient.GEMINI_MODEL}:generateContent"
+                data = await self._post(url, payload, {"x-goog-api-key": self.gemini_key})
+                text = data["candidates"][0]["content"]["parts"][0]["text"]
+            except Exception:
+                record_llm_call(call, "gemini", LLMClient.GEMINI_MODEL, "generate", "error")
+                raise
+            usage = data.get("usageMetadata") or {}
+            record_llm_call(call, "gemini", LLMClient.GEMINI_MODEL, "generate", "success",
+                            prompt_tokens=usage.get("promptTokenCount"),
+                            completion_tokens=usage.get("candidatesTokenCount"))
+            return text
+
+    async def get_embedding(self, text: str, language: str = "Python") -> List[float]:
+        """
+        Generates embeddings using Gemini (served from the embedding cache when the
+        normalized code was embedded before).
+        """
+        if self.embedding_cache.enabled:
+            key = self.embedding_cache.key(text, LLMClient.EMBEDDING_MODEL, language)
+            cached = self.embedding_cache.get_many([key])[0]
+            if cached is not None:
+                return cached
+            embedding = await self._embed_one_uncached(text)
+            self.embedding_cache.set_many([(key, embedding)])
+            return embedding
+        return await self._embed_one_uncached(text)
+
+    async def _embed_one_uncached(self, text: str) -> List[float]:
+        if not self.gemini_key:
+            logger.warning("Gemini key missing for embeddings.")
+            return []
+
+        with span("llm.embedding", kind="llm_call") as call:
+            try:
+                payload = {
+                    "model": LLMClient.EMBEDDING_MODEL,
+                    "content": {"parts": [{"text": text}]},
+                    "taskType": "RETRIEVAL_DOCUMENT",
+                    "title": "Code Submission",
+                }
+                data = await self._post(f"{GEMINI_BASE_URL}/{LLMClient.EMBEDDING_MODEL}:embedContent", payload, {"x-goog-api-key": self.gemini_key})
+                record_llm_call(call, "gemini", LLMClient.EMBEDDING_MODEL, "embed", "success")
+                return data["embedding"]["values"]
+            except Exception as e:
+                record_llm_call(call, "gemini", LLMClient.EMBEDDING_MODEL, "embed", "error")
+                logger.error(f"Gemini embedding failed: {e}")
+                return []
+
+    async def get_embedding_many(self, texts: List[str], language: str = "Python") -> List[List[float]]:
+        """
+        One embedding per text via batchEmbedContents, LLMClient.EMBEDDING_BATCH_SIZE
+        inputs per request; cached and duplicate codes are not sent. Failed inputs
+        get an empty list.
+        """
+        texts = list(texts)
+        if not self.embedding_cache.enabled:
+            return await self._embed_uncached(texts)
+        keys, found, missing = lookup(self.embedding_cache, texts, LLMClient.EMBEDDING_MODEL, language)
+        computed: Dict[str, List[float]] = {}
+        if missing:
+            computed = dict(zip(missing, await self._embed_uncached(list(missing.values()))))
+            self.embedding_cache.set_many(list(computed.items()))
+        return [vector if vector is not None else computed.get(key, []) for key, vector in zip(keys, found)]
+
+    async def _embed_uncached(self, texts: List[str]) -> List[List[float]]:
+        if not self.gemini_key:
+            logger.warning("Gemini key missing for embeddings.")
+            return [[] for _ in texts]
+
+        embeddings: List[List[float]] = []
+        for start in range(0, len(texts), LLMClient.EMBEDDING_BATCH_SIZE):
+            batch = texts[start:start + LLMClient.EMBEDDING_BATCH_SIZE]
+            with span("llm.embedding", kind="llm_call", inputs=len(batch)) as call:
+                try:
+                    payload = {"requests": [{
+                        "model": LLMClient.EMBEDDING_MODEL,
+                        "content": {"parts": [{"text": text}]},
+                        "taskType": "RETRIEVAL_DOCUMENT",
+                        "title": "Code Submission",
+                    } for text in batch]}
+                    data = await self._post(f"{GEMINI_BASE_URL}/{LLMClient.EMBEDDING_MODEL}:batchEmbedContents", payload, {"x-goog-api-key": self.gemini_key})
+                    vectors = [e["values"] for e in data["embeddings"]]
+                    if len(vectors) != len(batch):
+                        raise ValueError(f"expected {len(batch)} embeddings, got {len(vectors)}")
+                    record_llm_call(call, "gemini", LLMClient.EMBEDDING_MODEL, "embed", "success")
+                    embeddings.extend(vectors)
+                except Exception as e:
+                    record_llm_call(call, "gemini", LLMClient.EMBEDDING_MODEL, "embed", "error")
+                    logger.error(f"Gemini embedding failed: {e}")
+                    embeddings.extend([] for _ in batch)
+        return embeddings
+
+
+_async_client: Optional[AsyncLLMClient] = None
+
+
+def get_async_client() -> AsyncLLMClient:
+    """Process-wide AsyncLLMClient, created on first use."""
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncLLMClient()
+    return _async_client
+
+
+async def close_async_client() -> None:
+    """Closes the shared connection pool (call on application shutdown)."""
+    if _async_client is not None:
+        await _async_client.aclose()
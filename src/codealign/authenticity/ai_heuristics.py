@@ -0,0 +1,218 @@
+"""
+Local, LLM-free AI-authorship scorer.
+
+Scores a submission from stylometric features that LLM-written code tends to
+share: dense, narrating comments, templated docstrings (Args:/Returns:),
+long descriptive identifiers, machine-regular formatting, type annotations on
+everything, and conversational leftovers ("Sure, here is..."). Runs in
+milliseconds, so detect_ai_signals uses it as a first pass and only sends
+ambiguous submissions to the LLM.
+"""
+import io
+import os
+import re
+import ast
+import keyword
+import builtins
+import tokenize
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..alignment.code_analysis import analyze_code
+from ..alignment.language_analysis import LanguageSpec, get_spec, lex
+
+# Below LOW the submission is treated as clearly human, at or above HIGH as clearly
+# AI-written; only scores in between are escalated to the LLM.
+LOW_RISK_THRESHOLD = float(os.getenv("CODEALIGN_AI_HEURISTIC_LOW", "0.3"))
+HIGH_RISK_THRESHOLD = float(os.getenv("CODEALIGN_AI_HEURISTIC_HIGH", "0.85"))
+
+# Leftovers of a chat transcript: near-conclusive on their own
+CONVERSATIONAL_PHRASES = (
+    "here is the", "here's the", "sure, here", "certainly", "as an ai", "i hope this helps",
+    "feel free to", "let me know", "this code defines", "below is", "explanation:",
+)
+# Stock tutorial phrasing: weak evidence, only counted together with other signals
+TEXTBOOK_PHRASES = (
+    "# driver code", "# example usage", "# test the function", "# test cases", "step 1",
+    "time complexity:", "space complexity:", "edge case",
+)
+# Comments that narrate the next line ("# Initialize the result list")
+_NARRATION_RE = re.compile(
+    r"^(initialize|iterate|loop|check if|check whether|return the|create|calculate|compute|update|define|"
+    r"increment|append|store|get the|set the|if the|otherwise|base case|helper function)\b", re.I)
+_DOCSTRING_SECTION_RE = re.compile(r"^\s*(Args|Arguments|Parameters|Returns|Return|Raises|Yields|Examples?)\s*:|:param |:return|@param\b|@returns?\b", re.M)
+_C_COMMENT_RE = re.compile(r"^\s*(//|/\*|\*)")
+
+WEIGHTS = {
+    "comment_density": 0.25,
+    "narrating_comments": 0.2,
+    "docstring_templates": 0.2,
+    "descriptive_identifiers": 0.15,
+    "formatting_regularity": 0.1,
+    "type_annotations": 0.1,
+}
+CONVERSATIONAL_BOOST = 0.45
+TEXTBOOK_BOOST = 0.08
+# Submissions shorter than this carry too little style to judge; their score is damped
+MIN_CODE_LINES = 8
+
+_IGNORED_NAMES = set(keyword.kwlist) | set(dir(builtins)) | {"self", "cls"}
+
+
+def _clip(value: float) -> float:
+    return max(0.0, min(1.0, value))
+
+
+def _brace_comments(code: str, spec: LanguageSpec) -> Tuple[List[str], int]:
+    """
+    Comment texts (one per line of a block comment) and the number of lines
+    holding nothing but comments, from the lexer's comment spans: "*p = x;" and
+    "#include" lines are code.
+    """
+    tokens, spans, _ = lex(code, spec)
+    code_lines = {line for _, _, line in tokens}
+    texts, lines = [], set()
+    for start, end, _ in spans:
+        first = code.count("\n", 0, start) + 1
+        body = code[start:end]
+        body = body[2:] if body.startswith("//") else body[2:-2] if body.endswith("*/") else body[2:]
+        for offset, text in enumerate(body.split("\n")):
+            lines.add(first + offset)
+            text = text.strip().strip("*").strip()
+            if text:
+                texts.append(text)
+    return texts, len(lines - code_lines)
+
+
+def _comments(code: str, language: str) -> List[str]:
+    """Comment texts without their markers."""
+    if language == "Python":
+        try:
+            return [t.string.lstrip("#").strip() for t in tokenize.generate_tokens(io.StringIO(code).readline)
+                    if t.type == tokenize.COMMENT]
+        except (tokenize.TokenError, IndentationError, SyntaxError):
+            return [line.strip().lstrip("#").strip() for line in code.splitlines() if line.strip().startswith("#")]
+    return [_C_COMMENT_RE.sub("", line).strip(" */") for line in code.splitlines() if _C_COMMENT_RE.match(line)]
+
+
+def _identifiers(code: str) -> List[str]:
+    return [t for t in re.findall(r"[A-Za-z_]\w*", code) if t not in _IGNORED_NAMES]
+
+
+def _formatting_regularity(lines: List[str]) -> float:
+    """Fraction of style checks passed: 4-space indents, no tabs, no trailing spaces, spaced operators, short lines."""
+    code_lines = [l for l in lines if l.strip()]
+    if not code_lines:
+        return 0.0
+    indents = [len(l) - len(l.lstrip(" ")) for l in code_lines]
+    assignments = re.findall(r"\w(\s*)(?:[+\-*/%]?=)(?!=)(\s*)", "\n".join(code_lines))
+    checks = [
+        all(i % 4 == 0 for i in indents),
+        not any("\t" in l for l in lines),
+        not any(l != l.rstrip() for l in lines),
+        bool(assignments) and all(a == " " and b == " " for a, b in assignments),
+        all(len(l) <= 100 for l in lines),
+    ]
+    return sum(checks) / len(checks)
+
+
+def extract_style_features(code: str, language: str = "Python") -> Dict[str, Any]:
+    """Raw stylometric measurements (see score_ai_likelihood for how they are combined)."""
+    lines = code.splitlines()
+    spec = get_spec(language)
+    if spec is not None:
+        comments, comment_lines = _brace_comments(code, spec)
+    else:
+        comments = _comments(code, language)
+        comment_lines = sum(1 for l in lines if l.strip().startswith(("#", "//", "/*", "*")))
+    code_lines = max(1, sum(1 for l in lines if l.strip()) - comment_lines)
+    identifiers = _identifiers(code)
+    distinct = set(identifiers)
+    lowered = code.lower()
+
+    functions, documented, templated, annotated = 0, 0, 0, 0
+    if language == "Python":
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            tree = None
+        for node in ast.walk(tree) if tree is not None else ():
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                functions += 1
+                docstring = ast.get_docstring(node)
+                documented += bool(docstring)
+                templated += bool(docstring and _DOCSTRING_SECTION_RE.search(docstring))
+                annotated += node.returns is not None and all(a.annotation is not None for a in node.args.args
+                                                              if a.arg not in ("self", "cls"))
+    elif spec is not None:
+        # Doc comments (/** ... */) play the role of docstrings; typed signatures say nothing about style
+        for function in analyze_code(code, language)["functions"]:
+            functions += 1
+            documented += bool(function["docstring"])
+            templated += bool(function["docstring"] and _DOCSTRING_SECTION_RE.search(function["docstring"]))
+
+    return {
+        "code_lines": code_lines,
+        "comment_ratio": len(comments) / code_lines,
+        "narrating_ratio": sum(bool(_NARRATION_RE.match(c)) for c in comments) / len(comments) if comments else 0.0,
+        "functions": functions,
+        "docstring_ratio": documented / functions if functions else 0.0,
+        "templated_docstring_ratio": templated / functions if functions else 0.0,
+        "annotated_ratio": annotated / functions if functions else 0.0,
+        "mean_identifier_length": sum(map(len, distinct)) / len(distinct) if distinct else 0.0,
+        "formatting_regularity": _formatting_regularity(lines),
+        "conversational_phrases": [p for p in CONVERSATIONAL_PHRASES if p in lowered],
+        "textbook_phrases": [p for p in TEXTBOOK_PHRASES if p in lowered],
+    }
+
+
+def score_ai_likelihood(code: str, language: str = "Python",
+                        features: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Returns the detect_ai_signals result shape ({is_suspicious, confidence, signals})
+    plus the per-feature `components` and `source: "heuristic"`.
+    """
+    f = features or extract_style_features(code, language)
+    components = {
+        # Humans rarely comment more than one line in four
+        "comment_density": _clip((f["comment_ratio"] - 0.25) / 0.5),
+        "narrating_comments": f["narrating_ratio"] if f["comment_ratio"] >= 0.15 else 0.0,
+        "docstring_templates": f["templated_docstring_ratio"],
+        # Student names average 3-5 characters; LLM names are long and descriptive
+        "descriptive_identifiers": _clip((f["mean_identifier_length"] - 5.0) / 6.0),
+        "formatting_regularity": _clip((f["formatting_regularity"] - 0.6) / 0.4),
+        "type_annotations": f["annotated_ratio"],
+    }
+    score = sum(WEIGHTS[k] * v for k, v in components.items())
+    if f["code_lines"] < MIN_CODE_LINES:
+        score *= f["code_lines"] / MIN_CODE_LINES
+    score += CONVERSATIONAL_BOOST * len(f["conversational_phrases"])
+    if score >= 0.2:
+        score += TEXTBOOK_BOOST * len(f["textbook_phrases"])
+    confidence = round(_clip(score), 3)
+
+    signals = [f"Contains AI-phrase: '{p}'" for p in f["conversational_phrases"]]
+    if components["comment_density"] >= 0.5:
+        signals.append(f"High comment density ({f['comment_ratio']:.2f} comments per code line)")
+    if components["narrating_comments"] >= 0.5:
+        signals.append("Comments narrate each step of the code")
+    if components["docstring_templates"] >= 0.5:
+        signals.append("Templated docstrings (Args/Returns sections)")
+    if components["descriptive_identifiers"] >= 0.7:
+        signals.append(f"Long, generic descriptive identifiers (mean length {f['mean_identifier_length']:.1f})")
+    if components["type_annotations"] >= 1.0 and f["functions"] > 1:
+        signals.append("Every function fully type-annotated")
+    if f["textbook_phrases"] and score >= 0.2:
+        signals.append("Tutorial-style phrasing: " + ", ".join(f["textbook_phrases"]))
+
+    return {
+        "is_suspicious": confidence > 0.5,
+        "confidence": confidence,
+        "signals": signals,
+        "components": {k: round(v, 3) for k, v in components.items()},
+        "source": "heuristic",
+    }
+
+
+def is_conclusive(result: Dict[str, Any]) -> bool:
+    """True when the local score is clear enough to skip the LLM."""
+    return result["confidence"] < LOW_RISK_THRESHOLD or result["confidence"] >= HIGH_RISK_THRESHOLD
@@ -1,20 +1,15 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+import os
 import json
 import logging
-from codealign import client
+from codealign import get_client
+from codealign import metrics
+from codealign.prompt_budget import DEFAULT_AI_SIGNALS_BUDGET, collapse_whitespace, count_tokens, fit_code
+from .ai_heuristics import score_ai_likelihood, is_conclusive
 
 logger = logging.getLogger(__name__)
 
-def detect_ai_signals(code: str) -> Dict[str, Any]:
-    """
-    Detects potential AI-generated code patterns using LLM analysis.
-    Checks for:
-    - Text-book style comments
-    - Generic variable naming
-    - Over-explanation
-    - Specific AI phrasing
-    """
-    system_prompt = """You are an expert in detecting AI-generated code. 
+SYSTEM_PROMPT = """You are an expert in detecting AI-generated code. 
     Analyze the provided code for signs that it was generated by an LLM (like ChatGPT, Gemini, etc.).
     Look for:
     1. Overly verbose or textbook-style comments (e.g., "Field to store value").
@@ -29,28 +24,83 @@ def detect_ai_signals(code: str) -> Dict[str, Any]:
         "signals": ["signal 1", "signal 2", ...]
     }
     """
-    
-    user_prompt = f"Analyze this code:\n\n{code[:4000]}" # Truncate if too long
-    
+
+# Greedy decoding: identical code gets the same verdict, and the response can be cached
+TEMPERATURE = 0.0
+
+def build_ai_signals_prompt(code: str, budget: Optional[int] = None) -> str:
+    """
+    Builds the user prompt for AI-signal detection. Comments are kept (they are
+    the main signal); long code is trimmed to the token budget, head and tail.
+    """
+    budget = budget or DEFAULT_AI_SIGNALS_BUDGET
+    code = collapse_whitespace(code)
+    trimmed = fit_code(code, budget)
+    prompt = f"Analyze this code:\n\n{trimmed}"
+    metrics.PROMPT_TOKENS.observe(count_tokens(prompt), prompt="ai_signals",
+                                  compaction="none" if trimmed is code else "trimmed")
+    return prompt
+
+def parse_ai_signals_response(response_text: Optional[str], code: str) -> Dict[str, Any]:
+    """
+    Parses the LLM JSON response, falling back to phrase heuristics if the LLM failed.
+    """
     try:
-        response_text = client.generate_text(system_prompt, user_prompt, json_mode=True, temperature=0.1)
         if response_text:
             return json.loads(response_text)
     except Exception as e:
         logger.error(f"AI detection failed: {e}")
-        
-    # Fallback to simple heuristics if LLM fails
-    signals = []
-    confidence = 0.0
-    ai_phrases = ["here is the python code", "certainly", "sure, here is", "# driver code"]
-    code_lower = code.lower()
-    for phrase in ai_phrases:
-        if phrase in code_lower:
-            signals.append(f"Contains AI-phrase: '{phrase}'")
-            confidence += 0.3
-            
-    return {
-        "is_suspicious": confidence > 0.3,
-        "confidence": min(confidence, 0.8), # Cap heuristic confidence
-        "signals": signals
-    }
+    return heuristic_ai_signals(code)
+
+def local_ai_signals(code: str, language: str = "Python") -> Optional[Dict[str, Any]]:
+    """
+    The local heuristic result when it is conclusive (clearly human or clearly AI), else None.
+    Set CODEALIGN_AI_HEURISTIC_FIRST=0 to always ask the LLM.
+    """
+    if os.getenv("CODEALIGN_AI_HEURISTIC_FIRST", "1") == "0":
+        return None
+    result = score_ai_likelihood(code, language)
+    metrics.AI_SIGNALS_ROUTE.inc(route="local" if is_conclusive(result) else "llm")
+    return result if is_conclusive(result) else None
+
+def detect_ai_signals(code: str, language: str = "Python") -> Dict[str, Any]:
+    """
+    Detects potential AI-generated code patterns.
+    A local stylometric score decides clear cases; ambiguous ones go to the LLM, which checks for:
+    - Text-book style comments
+    - Generic variable naming
+    - Over-explanation
+    - Specific AI phrasing
+    """
+    local = local_ai_signals(code, language)
+    if local is not None:
+        return local
+    response_text = None
+    try:
+        response_text = get_client().generate_text(SYSTEM_PROMPT, build_ai_signals_prompt(code), json_mode=True, temperature=TEMPERATURE)
+    except Exception as e:
+        logger.error(f"AI detection failed: {e}")
+    return parse_ai_signals_response(response_text, code)
+
+async def detect_ai_signals_async(code: str, llm=None, language: str = "Python") -> Dict[str, Any]:
+    """
+    Async variant of detect_ai_signals using the pooled AsyncLLMClient.
+    """
+    from codealign.async_client import get_async_client
+
+    local = local_ai_signals(code, language)
+    if local is not None:
+        return local
+    llm = llm or get_async_client()
+    response_text = None
+    try:
+        response_text = await llm.generate_text(SYSTEM_PROMPT, build_ai_signals_prompt(code), json_mode=True, temperature=TEMPERATURE)
+    except Exception as e:
+        logger.error(f"AI detection failed: {e}")
+    return parse_ai_signals_response(response_text, code)
+
+def heuristic_ai_signals(code: str, language: str = "Python") -> Dict[str, Any]:
+    """
+    Fallback to the local stylometric scorer if the LLM fails.
+    """
+    return score_ai_likelihood(code, language)
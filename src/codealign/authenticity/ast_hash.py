@@ -0,0 +1,129 @@
+"""
+AST-structural fingerprints: normalized subtree hashes for Python submissions.
+
+Every node is hashed bottom-up from its type, a normalized label and its
+children's hashes, so one pass over the tree (linear in its size) yields the
+hash of every subtree. Normalization makes the hashes rename-resistant
+(variable, argument, function and class names collapse to one placeholder;
+literals keep only their type) and reorder-resistant (top-level and class-level
+definitions, and the operands of commutative operators, are hashed as sorted
+multisets).
+
+A submission is represented by the multiset of its subtree hashes and two
+submissions are compared by multiset overlap; no pairwise tree matching.
+"""
+import os
+import ast
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+from .features import hash32
+
+# Subtrees smaller than this (a bare name, a constant, `x + 1`) occur in every
+# program and would only inflate the overlap.
+MIN_SUBTREE_SIZE = int(os.getenv("CODEALIGN_AST_MIN_SUBTREE", "4"))
+
+_COMMUTATIVE_OPS = (ast.Add, ast.Mult, ast.BitAnd, ast.BitOr, ast.BitXor)
+# Name contexts, operators etc. are folded into their parent's label
+_SKIPPED = (ast.expr_context, ast.operator, ast.boolop, ast.unaryop, ast.cmpop, ast.type_ignore)
+
+
+def _label(node: ast.AST) -> str:
+    """Node type plus the parts of it that survive renaming."""
+    name = type(node).__name__
+    if isinstance(node, ast.Constant):
+        return f"{name}:{type(node.value).__name__}"
+    if isinstance(node, (ast.BinOp, ast.AugAssign)):
+        return f"{name}:{type(node.op).__name__}"
+    if isinstance(node, (ast.UnaryOp, ast.BoolOp)):
+        return f"{name}:{type(node.op).__name__}"
+    if isinstance(node, ast.Compare):
+        return f"{name}:" + ",".join(type(op).__name__ for op in node.ops)
+    if isinstance(node, ast.Attribute):
+        # Method and attribute names come from libraries (append, items), keep them
+        return f"{name}:{node.attr}"
+    if isinstance(node, (ast.Import, ast.ImportFrom)):
+        return f"{name}:" + ",".join(sorted(a.name for a in node.names))
+    return name
+
+
+def _is_unordered(node: ast.AST) -> bool:
+    """Children whose order does not change behaviour: definitions, commutative operands."""
+    if isinstance(node, (ast.Module, ast.ClassDef)):
+        return True
+    if isinstance(node, ast.BinOp):
+        return isinstance(node.op, _COMMUTATIVE_OPS)
+    if isinstance(node, ast.BoolOp):
+        return True
+    if isinstance(node, ast.Compare):
+        return len(node.ops) == 1 and isinstance(node.ops[0], (ast.Eq, ast.NotEq, ast.Is, ast.IsNot))
+    return False
+
+
+def _hash_tree(root: ast.AST, min_size: int) -> Counter:
+    """Post-order traversal with an explicit stack (deep nesting must not hit the recursion limit)."""
+    hashes: Counter = Counter()
+    results: Dict[int, tuple] = {}  # id(node) -> (hash, size)
+    stack: List[tuple] = [(root, False)]
+    while stack:
+        node, expanded = stack.pop()
+        children = [c for c in ast.iter_child_nodes(node) if not isinstance(c, _SKIPPED)]
+        if not expanded:
+            stack.append((node, True))
+            stack.extend((c, False) for c in children)
+            continue
+        child_results = [results.pop(id(c)) for c in children]
+        child_hashes = [h for h, _ in child_results]
+        if _is_unordered(node):
+            child_hashes.sort()
+        size = 1 + sum(s for _, s in child_results)
+        value = hash32(_label(node) + "(" + ",".join(map(str, child_hashes)) + ")")
+        results[id(node)] = (value, size)
+        if size >= min_size:
+            hashes[value] += 1
+    return hashes
+
+
+def parse_python(code: str) -> Optional[ast.AST]:
+    """The module AST, or None if the code is not valid Python."""
+    try:
+        return ast.parse(code)
+    except (SyntaxError, ValueError):
+        return None
+
+
+def subtree_hashes(code_or_tree: Union[str, ast.AST], min_size: int = MIN_SUBTREE_SIZE) -> Optional[Counter]:
+    """Multiset {subtree hash: count} of a Python program, or None if it does not parse."""
+    tree = parse_python(code_or_tree) if isinstance(code_or_tree, str) else code_or_tree
+    if tree is None:
+        return None
+    return _hash_tree(tree, min_size)
+
+
+def structural_similarity(h1: Optional[Dict[int, int]], h2: Optional[Dict[int, int]]) -> Optional[float]:
+    """
+    Multiset Dice coefficient 2*|A ∩ B| / (|A| + |B|) over subtree hashes.
+    None when either side has no AST (not Python), so callers can fall back.
+    """
+    if h1 is None or h2 is None:
+        return None
+    total = sum(h1.values()) + sum(h2.values())
+    if total == 0:
+        return 1.0
+    if len(h1) > len(h2):
+        h1, h2 = h2, h1
+    shared = sum(min(count, h2.get(h, 0)) for h, count in h1.items())
+    return 2 * shared / total
+
+
+def to_pairs(hashes: Optional[Counter]) -> Optional[List[List[int]]]:
+    """JSON-friendly [[hash, count], ...] form stored with the features."""
+    return None if hashes is None else sorted([h, c] for h, c in hashes.items())
+
+
+def features_subtree_hashes(features: Dict[str, Any]) -> Optional[Dict[int, int]]:
+    """Subtree-hash multiset from extracted features (None if the submission is not Python)."""
+    pairs: Optional[Iterable[Sequence[int]]] = features.get("ast_hashes")
+    if pairs is None:
+        return None
+    return {h: c for h, c in pairs}
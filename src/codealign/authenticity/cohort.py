@@ -0,0 +1,278 @@
+"""
+Cohort-wide all-pairs similarity job.
+
+Run once per problem after the deadline: every submission is compared with
+every other, but only pairs that share enough winnowing fingerprints are
+scored exactly (candidate pruning through an inverted index, skipping
+boilerplate hashes present in a large part of the cohort). Exact scoring and
+feature extraction run on a process pool across cores. The result is a sparse
+similarity matrix saved as a compact .npz (ids + int32 row/col + float32
+score per scored pair) and clusters of suspiciously similar submissions from
+different students.
+"""
+import os
+import time
+import logging
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .features import extract_features, get_features
+from .similarity import similarity_from_features
+from .winnowing import features_fingerprints
+from ..tracing import span
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COHORT_WORKERS = int(os.getenv("CODEALIGN_COHORT_WORKERS", "0")) or (os.cpu_count() or 1)
+# Pairs whose fingerprint Dice is below this are not scored. With the default
+# weights a pair under 0.3 cannot reach the default cluster threshold.
+DEFAULT_PRUNE_SIMILARITY = float(os.getenv("CODEALIGN_COHORT_PRUNE_SIMILARITY", "0.3"))
+DEFAULT_CLUSTER_THRESHOLD = float(os.getenv("CODEALIGN_COHORT_CLUSTER_THRESHOLD", "0.85"))
+# Fingerprints found in more than this fraction of the cohort are template/boilerplate
+STOP_FINGERPRINT_FRACTION = float(os.getenv("CODEALIGN_COHORT_STOP_FRACTION", "0.5"))
+# Below this many pairs the process pool costs more than it saves
+MIN_PARALLEL_PAIRS = 2000
+PAIR_CHUNK_SIZE = 2000
+
+
+class SimilarityMatrix:
+    """
+    Sparse symmetric similarity matrix over a cohort. Only scored (candidate)
+    pairs are stored, as upper-triangle (row < col) entries; every other pair
+    is below the pruning bound and reads as 0.0.
+    """
+
+    def __init__(self, ids: Sequence[str], rows: np.ndarray, cols: np.ndarray, scores: np.ndarray,
+                 students: Optional[Sequence[str]] = None):
+        self.ids = list(ids)
+        self.students = list(students) if students is not None else list(self.ids)
+        self.rows = np.asarray(rows, dtype=np.int32)
+        self.cols = np.asarray(cols, dtype=np.int32)
+        self.scores = np.asarray(scores, dtype=np.float32)
+        self._slots = {sid: i for i, sid in enumerate(self.ids)}
+        self._lookup: Optional[Dict[Tuple[int, int], float]] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def pairs(self) -> int:
+        return len(self.scores)
+
+    def get(self, a: str, b: str) -> float:
+        if a == b:
+            return 1.0
+        if self._lookup is None:
+            self._lookup = {(int(r), int(c)): float(s) for r, c, s in zip(self.rows, self.cols, self.scores)}
+        i, j = sorted((self._slots[a], self._slots[b]))
+        return self._lookup.get((i, j), 0.0)
+
+    def to_dense(self) -> np.ndarray:
+        """n x n float32 matrix (only sensible for small cohorts)."""
+        dense = np.eye(len(self.ids), dtype=np.float32)
+        dense[self.rows, self.cols] = self.scores
+        dense[self.cols, self.rows] = self.scores
+        return dense
+
+    def save(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez_compressed(f, ids=np.asarray(self.ids, dtype=str), students=np.asarray(self.students, dtype=str),
+                                rows=self.rows, cols=self.cols, scores=self.scores)
+
+    @classmethod
+    def load(cls, path: str) -> "SimilarityMatrix":
+        with np.load(path) as data:
+            return cls(data["ids"].tolist(), data["rows"], data["cols"], data["scores"], data["students"].tolist())
+
+
+# ----------------------------------------------------------------------
+# Process-pool workers (module level so they can be pickled)
+# ----------------------------------------------------------------------
+
+_worker_features: List[Dict[str, Any]] = []
+
+
+def _init_worker(features: List[Dict[str, Any]]) -> None:
+    global _worker_features
+    _worker_features = features
+
+
+def _score_chunk(pairs: List[Tuple[int, int]]) -> List[float]:
+    return [similarity_from_features(_worker_features[i], _worker_features[j]) for i, j in pairs]
+
+
+def _extract(code: str) -> Dict[str, Any]:
+    return extract_features(code)
+
+
+def _features_for(submissions: List[Dict[str, Any]], workers: int) -> List[Dict[str, Any]]:
+    """Stored features where available, the rest extracted on the pool."""
+    features: List[Optional[Dict[str, Any]]] = [s.get("features") for s in submissions]
+    missing = [i for i, f in enumerate(features) if not f]
+    if missing and workers > 1 and len(missing) > 50:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunksize = max(1, len(missing) // (workers * 4))
+            for i, f in zip(missing, pool.map(_extract, [submissions[i].get("code", "") for i in missing],
+                                              chunksize=chunksize)):
+                features[i] = f
+    else:
+        for i in missing:
+            features[i] = get_features(submissions[i])
+    return features
+
+
+def candidate_pairs(features: List[Dict[str, Any]], min_similarity: float = DEFAULT_PRUNE_SIMILARITY,
+                    stop_fraction: float = STOP_FINGERPRINT_FRACTION) -> List[Tuple[int, int]]:
+    """
+    (i, j) pairs, i < j, whose fingerprint Dice coefficient reaches min_similarity.
+    Shared-fingerprint counts come from the inverted index (one bincount over the
+    posting lists per submission); hashes present in more than stop_fraction of
+    the cohort are ignored, in the shared counts and in the set sizes alike, so
+    copies built on common starter code still reach the bound. Submissions with
+    identical fingerprint sets are always paired.
+    """
+    n = len(features)
+    hash_sets = [{f[0] for f in features_fingerprints(feat)} for feat in features]
+    postings: Dict[int, List[int]] = defaultdict(list)
+    for i, hashes in enumerate(hash_sets):
+        for h in hashes:
+            postings[h].append(i)
+    max_df = max(2, int(stop_fraction * n))
+    arrays = {h: np.asarray(slots, dtype=np.int32) for h, slots in postings.items() if 2 <= len(slots) <= max_df}
+    sizes = np.asarray([sum(1 for h in hashes if len(postings[h]) <= max_df) for hashes in hash_sets],
+                       dtype=np.float64)
+
+    pairs = set()
+    # Exact copies whose fingerprints are all boilerplate share nothing in the index
+    groups: Dict[frozenset, List[int]] = defaultdict(list)
+    for i, hashes in enumerate(hash_sets):
+        if hashes:
+            groups[frozenset(hashes)].append(i)
+    for slots in groups.values():
+        pairs.update((a, b) for k, a in enumerate(slots) for b in slots[k + 1:])
+    for i, hashes in enumerate(hash_sets):
+        lists = [arrays[h] for h in hashes if h in arrays]
+        if not lists:
+            continue
+        shared = np.bincount(np.concatenate(lists), minlength=n)[i + 1:]
+        dice = 2 * shared / np.maximum(sizes[i] + sizes[i + 1:], 1.0)
+        for j in np.flatnonzero((shared > 0) & (dice >= min_similarity)):
+            pairs.add((i, i + 1 + int(j)))
+    return sorted(pairs)
+
+
+def build_similarity_matrix(submissions: List[Dict[str, Any]], workers: Optional[int] = None,
+                            min_similarity: float = DEFAULT_PRUNE_SIMILARITY) -> SimilarityMatrix:
+    """
+    Scores every candidate pair of `submissions` (dicts with id, student_id and
+    code and/or precomputed features) with similarity_from_features.
+    """
+    workers = workers or DEFAULT_COHORT_WORKERS
+    ids = [s["id"] for s in submissions]
+    students = [s.get("student_id") or s["id"] for s in submissions]
+
+    with span("cohort.features", kind="similarity", submissions=len(submissions)):
+        features = _features_for(submissions, workers)
+    with span("cohort.prune", kind="similarity") as prune_span:
+        pairs = candidate_pairs(features, min_similarity)
+        total = len(submissions) * (len(submissions) - 1) // 2
+        prune_span.set(candidates=len(pairs), all_pairs=total)
+
+    with span("cohort.score", kind="similarity", pairs=len(pairs)):
+        if workers > 1 and len(pairs) >= MIN_PARALLEL_PAIRS:
+            chunks = [pairs[i:i + PAIR_CHUNK_SIZE] for i in range(0, len(pairs), PAIR_CHUNK_SIZE)]
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(features,)) as pool:
+                scores = [s for chunk in pool.map(_score_chunk, chunks) for s in chunk]
+        else:
+            scores = [similarity_from_features(features[i], features[j]) for i, j in pairs]
+
+    rows = np.fromiter((i for i, _ in pairs), dtype=np.int32, count=len(pairs))
+    cols = np.fromiter((j for _, j in pairs), dtype=np.int32, count=len(pairs))
+    logger.info(f"Scored {len(pairs)} of {total} pairs for {len(submissions)} submissions")
+    return SimilarityMatrix(ids, rows, cols, np.asarray(scores, dtype=np.float32), students)
+
+
+def find_clusters(matrix: SimilarityMatrix, threshold: float = DEFAULT_CLUSTER_THRESHOLD) -> List[Dict[str, Any]]:
+    """
+    Connected components of the graph of pairs at or above `threshold`, ignoring
+    pairs from the same student. Largest and most similar clusters first.
+    """
+    parent = list(range(len(matrix)))
+
+    def find(x: int) -> int:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    edges = [(int(i), int(j), float(s)) for i, j, s in zip(matrix.rows, matrix.cols, matrix.scores)
+             if s >= threshold and matrix.students[i] != matrix.students[j]]
+    for i, j, _ in edges:
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+
+    roots = {find(i) for i, _, _ in edges}
+    members: Dict[int, List[int]] = defaultdict(list)
+    for i in range(len(matrix)):
+        if find(i) in roots:
+            members[find(i)].append(i)
+    cluster_edges: Dict[int, List[Tuple[int, int, float]]] = defaultdict(list)
+    for edge in edges:
+        cluster_edges[find(edge[0])].append(edge)
+
+    clusters = []
+    for root, slots in members.items():
+        scores = [s for _, _, s in cluster_edges[root]]
+        clusters.append({
+            "submissions": [matrix.ids[i] for i in slots],
+            "students": sorted({matrix.students[i] for i in slots}),
+            "size": len(slots),
+            "max_similarity": round(max(scores), 4),
+            "mean_similarity": round(sum(scores) / len(scores), 4),
+            "pairs": [{"a": matrix.ids[i], "b": matrix.ids[j], "similarity": round(s, 4)}
+                      for i, j, s in sorted(cluster_edges[root], key=lambda e: -e[2])],
+        })
+    clusters.sort(key=lambda c: (-c["size"], -c["max_similarity"]))
+    return clusters
+
+
+def run_cohort_similarity(problem_id: Optional[str] = None,
+                          submissions: Optional[Iterable[Dict[str, Any]]] = None,
+                          matrix_path: Optional[str] = None,
+                          threshold: float = DEFAULT_CLUSTER_THRESHOLD,
+                          workers: Optional[int] = None,
+                          min_similarity: float = DEFAULT_PRUNE_SIMILARITY) -> Dict[str, Any]:
+    """
+    The full job: loads the cohort (explicit records, or every stored submission
+    of `problem_id`), builds and optionally saves the matrix, and returns the
+    cluster report.
+    """
+    if submissions is None:
+        from .ingest import get_store
+        submissions = get_store().iter_problem(problem_id or "default")
+    records = [s for s in submissions if s.get("id") is not None]
+
+    start = time.perf_counter()
+    matrix = build_similarity_matrix(records, workers=workers, min_similarity=min_similarity)
+    if matrix_path:
+        matrix.save(matrix_path)
+    clusters = find_clusters(matrix, threshold)
+    total = len(matrix) * (len(matrix) - 1) // 2
+    return {
+        "problem_id": problem_id,
+        "submissions": len(matrix),
+        "pairs_total": total,
+        "pairs_scored": matrix.pairs,
+        "threshold": threshold,
+        "matrix_path": matrix_path,
+        "seconds": round(time.perf_counter() - start, 3),
+        "clusters": clusters,
+    }
+
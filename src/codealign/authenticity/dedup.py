@@ -0,0 +1,166 @@
+"""
+Exact and near-duplicate detection at ingest.
+
+Every submission is stored with the SHA-256 of its normalized code
+(CODEALIGN_DEDUP_NORMALIZE, "comments" by default: whitespace, indentation
+style and comments are ignored, see embedding_cache.normalize_code). A
+per-problem hash index maps each digest to its canonical (first) submission
+and to the first submission of every student who sent that code, so a new
+submission is matched against the whole cohort with one dict lookup.
+
+Duplicates are still stored (every student needs their own row) but are
+linked to the canonical submission through `canonical_id` and reuse its
+embedding (byte-identical copies also its features and MinHash signature)
+instead of recomputing them. Similarity searches short-circuit to 1.0 when
+another student already submitted the same normalized code.
+
+Ingest looks up and inserts under key_lock(problem_id, digest), so two
+concurrent copies of new code cannot both become canonical. The lock is per
+process; API workers sharing one database can still race, and at worst link
+a copy to a different (equally valid) canonical row.
+"""
+import os
+import hashlib
+import logging
+import threading
+from typing import Dict, Iterable, Optional
+
+from ..embedding_cache import NORMALIZATION_MODES, normalize_code
+
+logger = logging.getLogger(__name__)
+
+# Set CODEALIGN_DEDUP=0 to process every submission from scratch
+DEDUP_ENABLED = os.getenv("CODEALIGN_DEDUP", "1") != "0"
+DEDUP_NORMALIZATION = os.getenv("CODEALIGN_DEDUP_NORMALIZE", "comments")
+if DEDUP_NORMALIZATION not in NORMALIZATION_MODES:
+    raise ValueError(f"CODEALIGN_DEDUP_NORMALIZE must be one of {NORMALIZATION_MODES}, got {DEDUP_NORMALIZATION!r}")
+
+
+def code_hash(code: str, mode: str = DEDUP_NORMALIZATION, language: str = "Python") -> str:
+    """Hex SHA-256 of the code normalized with the rules of its declared language."""
+    return hashlib.sha256(normalize_code(code, mode, language).encode("utf-8")).hexdigest()
+
+
+class DuplicateGroup:
+    """Submissions of one problem sharing a normalized code hash."""
+
+    __slots__ = ("canonical_id", "students", "ids")
+
+    def __init__(self, canonical_id: str, student_id: str):
+        self.canonical_id = canonical_id
+        # student_id -> that student's first submission with this code
+        self.students: Dict[str, str] = {student_id: canonical_id}
+        self.ids = {canonical_id}
+
+    @property
+    def size(self) -> int:
+        return len(self.ids)
+
+    def add(self, submission_id: str, student_id: str) -> None:
+        """Idempotent: a submission already in the group is ignored."""
+        if submission_id in self.ids:
+            return
+        self.ids.add(submission_id)
+        self.students.setdefault(student_id, submission_id)
+
+    def other_student(self, student_id: Optional[str], exclude_ids: Iterable[str] = ()) -> Optional[str]:
+        """A submission in the group from a student other than `student_id`."""
+        exclude = set(exclude_ids)
+        for other_student, submission_id in self.students.items():
+            if other_student != student_id and submission_id not in exclude:
+                return submission_id
+        return None
+
+
+class HashIndex:
+    """code_hash -> DuplicateGroup for one problem."""
+
+    def __init__(self):
+        self._groups: Dict[str, DuplicateGroup] = {}
+        self._lock = threading.RLock()
+
+    def add(self, digest: str, submission_id: str, student_id: str) -> Optional[str]:
+        """Records a submission; returns the canonical id it duplicates (None if it is new)."""
+        with self._lock:
+            group = self._groups.get(digest)
+            if group is None:
+                self._groups[digest] = DuplicateGroup(submission_id, student_id)
+                return None
+            group.add(submission_id, student_id)
+            return group.canonical_id if group.canonical_id != submission_id else None
+
+    def get(self, digest: str) -> Optional[DuplicateGroup]:
+        return self._groups.get(digest)
+
+    def __len__(self) -> int:
+        return len(self._groups)
+
+
+# ----------------------------------------------------------------------
+# Per-problem registry, kept in sync with the submission store
+# ----------------------------------------------------------------------
+
+_indexes: Dict[str, HashIndex] = {}
+_registry_lock = threading.Lock()
+# Striped locks serializing lookup + insert of one (problem, code hash)
+_key_locks = [threading.Lock() for _ in range(64)]
+
+
+def key_lock(problem_id: str, digest: str) -> threading.Lock:
+    return _key_locks[hash((problem_id, digest)) % len(_key_locks)]
+
+
+def _build_index(problem_id: str) -> HashIndex:
+    from .ingest import get_store
+
+    store = get_store()
+    index = HashIndex()
+    backfill = []
+    for sid, student_id, digest, code in store.code_hashes(problem_id):
+        if digest is None:
+            digest = code_hash(code or "")
+            backfill.append((sid, digest))
+        index.add(digest, sid, student_id)
+    if backfill:
+        store.set_code_hashes(backfill)
+    logger.info(f"Built duplicate index for problem '{problem_id}' ({len(index)} distinct submissions)")
+    return index
+
+
+def get_index(problem_id: str) -> HashIndex:
+    """Returns the problem's index, building it from the store on first use."""
+    index = _indexes.get(problem_id)
+    if index is None:
+        with _registry_lock:
+            index = _indexes.get(problem_id)
+            if index is None:
+                index = _build_index(problem_id)
+                _indexes[problem_id] = index
+    return index
+
+
+def find_canonical(problem_id: str, digest: str) -> Optional[str]:
+    group = get_index(problem_id).get(digest)
+    return group.canonical_id if group is not None else None
+
+
+def find_other_student(problem_id: str, digest: str, student_id: Optional[str],
+                       exclude_ids: Iterable[str] = ()) -> Optional[str]:
+    """Id of a stored submission with the same normalized code from another student."""
+    group = get_index(problem_id).get(digest)
+    return group.other_student(student_id, exclude_ids) if group is not None else None
+
+
+def index_submission(problem_id: str, submission_id: str, digest: str, student_id: str) -> None:
+    """
+    Incremental update on ingest, after the row is stored. If the index is being
+    (or was never) built, get_index waits for or runs the build; adding a row the
+    build already read is a no-op.
+    """
+    get_index(problem_id).add(digest, submission_id, student_id)
+
+
+def reset() -> None:
+    """Drops all in-memory indexes."""
+    with _registry_lock:
+        _indexes.clear()
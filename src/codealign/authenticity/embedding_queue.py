@@ -0,0 +1,246 @@
+"""
+Background embedding queue.
+
+ingest_submission stores a submission without waiting for its embedding and
+hands the code to this queue. A single worker thread drains it in batches (up
+to CODEALIGN_EMBEDDING_BATCH_SIZE inputs, waiting at most
+CODEALIGN_EMBEDDING_BATCH_WAIT_MS for a batch to fill), makes one
+get_embedding_many call per batch, and writes the vectors back to the
+submission store and the problem's embedding index. Failed inputs are retried
+with exponential backoff up to CODEALIGN_EMBEDDING_RETRIES times; when
+embeddings cannot work at all (no Gemini key, or the key was rejected) the
+batch is given up at once instead.
+
+The worker is a daemon thread, so short-lived processes (the batch CLI, the
+API on shutdown) call flush_embedding_queue() before exiting.
+
+A bulk import of thousands of submissions therefore costs a handful of
+embedding requests, and similarity searches pick the vectors up once written.
+"""
+import os
+import time
+import queue
+import logging
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+from codealign import get_client
+from .. import metrics
+
+logger = logging.getLogger(__name__)
+
+# Set CODEALIGN_EMBEDDING_QUEUE=0 to compute embeddings inline during ingest
+QUEUE_ENABLED = os.getenv("CODEALIGN_EMBEDDING_QUEUE", "1") != "0"
+DEFAULT_BATCH_SIZE = int(os.getenv("CODEALIGN_EMBEDDING_BATCH_SIZE", "100"))
+DEFAULT_BATCH_WAIT = float(os.getenv("CODEALIGN_EMBEDDING_BATCH_WAIT_MS", "50")) / 1000
+DEFAULT_MAX_RETRIES = int(os.getenv("CODEALIGN_EMBEDDING_RETRIES", "3"))
+DEFAULT_RETRY_BACKOFF = float(os.getenv("CODEALIGN_EMBEDDING_RETRY_BACKOFF", "0.5"))
+# How long flush_embedding_queue() waits for pending embeddings at shutdown
+DEFAULT_FLUSH_TIMEOUT = float(os.getenv("CODEALIGN_EMBEDDING_FLUSH_TIMEOUT", "60"))
+
+# (problem_id, submission_id, code, language, attempt)
+Job = Tuple[str, str, str, str, int]
+
+
+class EmbeddingQueue:
+    """Batches embedding requests for stored submissions on a daemon worker thread."""
+
+    def __init__(self,
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 batch_wait: float = DEFAULT_BATCH_WAIT,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 retry_backoff: float = DEFAULT_RETRY_BACKOFF):
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_wait
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._queue: "queue.Queue[Job]" = queue.Queue()
+        self._pending = 0
+        self._idle = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._timers: Set[threading.Timer] = set()
+        self._closed = False
+
+    @property
+    def pending(self) -> int:
+        """Submissions queued, in flight or waiting for a retry."""
+        with self._idle:
+            return self._pending
+
+    def submit(self, problem_id: str, submission_id: str, code: str, language: str = "Python") -> None:
+        if self._closed:
+            raise RuntimeError("Embedding queue is closed")
+        with self._idle:
+            self._pending += 1
+        self._queue.put((problem_id, submission_id, code, language, 0))
+        self._ensure_worker()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until every submitted embedding is written or given up on. False on timeout."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout=timeout)
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """
+        Stops the worker and cancels pending retries; queued work is dropped
+        (flush first to keep it). The queue cannot be reused afterwards.
+        """
+        with self._start_lock:
+            self._closed = True
+            timers, self._timers = self._timers, set()
+        for timer in timers:
+            timer.cancel()
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)  # wakes the worker up
+            self._thread.join(timeout)
+        with self._idle:
+            self._pending = 0
+            self._idle.notify_all()
+
+    def _ensure_worker(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="codealign-embeddings", daemon=True)
+                self._thread.start()
+
+    def _next_batch(self) -> List[Job]:
+        job = self._queue.get()
+        if job is None:
+            return []
+        batch = [job]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                job = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                break
+            batch.append(job)
+        return batch
+
+    def _run(self) -> None:
+        while not self._closed:
+            batch = self._next_batch()
+            if not batch or self._closed:
+                continue
+            try:
+                self._process(batch)
+            except Exception as e:
+                # Never let one bad batch kill the worker
+                logger.error(f"Embedding batch failed: {e}")
+                self._finish(len(batch))
+
+    def _process(self, batch: List[Job]) -> None:
+        from .ingest import get_store
+        from .embeddings import index_embedding
+
+        metrics.EMBEDDING_BATCH_SIZE.observe(len(batch))
+        client = get_client()
+        if not client.embeddings_available:
+            self._give_up(batch)
+            return
+        # Normalization for the embedding cache depends on the language: one call per language
+        by_language: Dict[str, List[int]] = {}
+        for i, (_, _, _, language, _) in enumerate(batch):
+            by_language.setdefault(language, []).append(i)
+        vectors: List[List[float]] = [[] for _ in batch]
+        for language, slots in by_language.items():
+            try:
+                found = client.get_embedding_many([batch[i][2] for i in slots], language)
+            except Exception as e:
+                logger.error(f"Embedding request failed: {e}")
+                continue
+            for i, vector in zip(slots, found):
+                vectors[i] = vector
+
+        done = [(job, vector) for job, vector in zip(batch, vectors) if vector]
+        failed = [job for job, vector in zip(batch, vectors) if not vector]
+        if done:
+            get_store().set_embeddings([(sid, vector) for (_, sid, _, _, _), vector in done])
+            for (problem_id, sid, _, _, _), vector in done:
+                index_embedding(problem_id, sid, vector)
+            metrics.EMBEDDING_QUEUE.inc(len(done), outcome="embedded")
+
+        if failed and not client.embeddings_available:
+            # The key was rejected during this batch: retries would fail the same way
+            self._finish(len(done))
+            self._give_up(failed)
+            return
+        given_up = 0
+        for problem_id, sid, code, language, attempt in failed:
+            if attempt < self.max_retries:
+                metrics.EMBEDDING_QUEUE.inc(outcome="retried")
+                self._retry_later((problem_id, sid, code, language, attempt + 1), self.retry_backoff * (2 ** attempt))
+            else:
+                logger.error(f"Giving up on embedding for submission {sid} after {attempt + 1} attempts")
+                metrics.EMBEDDING_QUEUE.inc(outcome="failed")
+                given_up += 1
+        self._finish(len(done) + given_up)
+
+    def _retry_later(self, job: Job, delay: float) -> None:
+        def requeue():
+            with self._start_lock:
+                self._timers.discard(timer)
+                if self._closed:
+                    return
+            self._queue.put(job)
+
+        timer = threading.Timer(delay, requeue)
+        timer.daemon = True
+        with self._start_lock:
+            if self._closed:
+                return
+            self._timers.add(timer)
+        timer.start()
+
+    def _give_up(self, batch: List[Job]) -> None:
+        """Permanent failure: one warning for the whole batch, no retries."""
+        logger.warning(f"Embeddings unavailable (no Gemini key, or it was rejected); "
+                       f"{len(batch)} submissions stored without embeddings")
+        metrics.EMBEDDING_QUEUE.inc(len(batch), outcome="unavailable")
+        self._finish(len(batch))
+
+    def _finish(self, count: int) -> None:
+        if not count:
+            return
+        with self._idle:
+            self._pending -= count
+            if self._pending <= 0:
+                self._pending = 0
+                self._idle.notify_all()
+
+
+_queue: Optional[EmbeddingQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_embedding_queue() -> EmbeddingQueue:
+    """The process-wide queue, created on first use."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = EmbeddingQueue()
+    return _queue
+
+
+def set_embedding_queue(embedding_queue: Optional[EmbeddingQueue]) -> Optional[EmbeddingQueue]:
+    """Swaps the process-wide queue (e.g. for tests); returns the previous one."""
+    global _queue
+    with _queue_lock:
+        previous, _queue = _queue, embedding_queue
+    return previous
+
+
+def flush_embedding_queue(timeout: Optional[float] = DEFAULT_FLUSH_TIMEOUT) -> bool:
+    """Waits for the process-wide queue (if it was ever used) to write everything. False on timeout."""
+    embedding_queue = _queue
+    if embedding_queue is None or embedding_queue.flush(timeout=timeout):
+        return True
+    logger.warning(f"{embedding_queue.pending} embeddings still pending after {timeout}s; they are dropped")
+    return False
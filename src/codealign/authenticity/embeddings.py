@@ -0,0 +1,229 @@
+"""
+Per-problem embedding matrix for semantic plagiarism search.
+
+Vectors are L2-normalized float32 rows appended to `<dir>/<problem>.f32` and
+memory-mapped for queries, so a cosine top-k over a whole cohort is a single
+matrix-vector product. Row ids live in a parallel `.ids` file (one per line).
+Set CODEALIGN_INDEX_DIR to an empty string to keep matrices in memory only.
+"""
+import os
+import json
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_DIR = ".codealign_index"
+
+
+def index_dir() -> Optional[str]:
+    directory = os.getenv("CODEALIGN_INDEX_DIR", DEFAULT_INDEX_DIR)
+    return directory or None
+
+
+def normalize(vector: Sequence[float]) -> np.ndarray:
+    """L2-normalized float32 copy (zero vectors stay zero)."""
+    arr = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(arr))
+    return arr / norm if norm > 0 else arr
+
+
+class EmbeddingIndex:
+    """
+    Append-only embedding matrix for one problem.
+    """
+
+    def __init__(self, problem_id: str, directory: Optional[str] = None):
+        self.problem_id = problem_id
+        self.directory = directory
+        self.dim: Optional[int] = None
+        self._ids: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self._pending: List[np.ndarray] = []
+        self._lock = threading.RLock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._load()
+
+    # ------------------------------------------------------------------
+    # Files
+    # ------------------------------------------------------------------
+    def _base_path(self) -> str:
+        digest = hashlib.sha1(self.problem_id.encode("utf-8")).hexdigest()[:16]
+        slug = "".join(c if c.isalnum() else "_" for c in self.problem_id)[:32]
+        return os.path.join(self.directory, f"{slug}-{digest}")
+
+    @property
+    def matrix_path(self) -> str:
+        return self._base_path() + ".f32"
+
+    @property
+    def ids_path(self) -> str:
+        return self._base_path() + ".ids"
+
+    @property
+    def meta_path(self) -> str:
+        return self._base_path() + ".meta.json"
+
+    def _load(self) -> None:
+        if not os.path.exists(self.meta_path):
+            return
+        with open(self.meta_path) as f:
+            self.dim = json.load(f)["dim"]
+        with open(self.ids_path) as f:
+            self._ids = [line.rstrip("\n") for line in f if line.strip()]
+        rows = os.path.getsize(self.matrix_path) // (4 * self.dim)
+        # A crash between the two appends can leave one side longer; trust the shorter
+        self._ids = self._ids[:rows]
+        self._positions = {sid: row for row, sid in enumerate(self._ids)}
+
+    def _mapped(self) -> np.ndarray:
+        n = len(self._ids)
+        if n == 0:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return np.memmap(self.matrix_path, dtype=np.float32, mode="r", shape=(n, self.dim))
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, submission_id: str) -> bool:
+        return submission_id in self._positions
+
+    @property
+    def ids(self) -> List[str]:
+        return list(self._ids)
+
+    def add(self, submission_id: str, embedding: Sequence[float]) -> bool:
+        """Appends one vector. Returns False for empty or wrong-dimension vectors."""
+        return self.add_many([(submission_id, embedding)]) == 1
+
+    def add_many(self, items: Sequence[Tuple[str, Sequence[float]]]) -> int:
+        rows, ids = [], []
+        with self._lock:
+            for submission_id, embedding in items:
+                if embedding is None or len(embedding) == 0:
+                    continue
+                if self.dim is None:
+                    self.dim = len(embedding)
+                if len(embedding) != self.dim:
+                    logger.warning(f"Skipping embedding for {submission_id}: dim {len(embedding)} != {self.dim}")
+                    continue
+                rows.append(normalize(embedding))
+                ids.append(submission_id)
+            if not rows:
+                return 0
+
+            if self.directory:
+                if not os.path.exists(self.meta_path):
+                    with open(self.meta_path, "w") as f:
+                        json.dump({"problem_id": self.problem_id, "dim": self.dim}, f)
+                with open(self.matrix_path, "ab") as f:
+                    f.write(np.vstack(rows).astype(np.float32).tobytes())
+                with open(self.ids_path, "a") as f:
+                    f.writelines(f"{i}\n" for i in ids)
+                # Re-map lazily on next query
+                self._matrix = None
+            else:
+                self._pending.extend(rows)
+            for sid in ids:
+                self._positions[sid] = len(self._ids)
+                self._ids.append(sid)
+            return len(rows)
+
+    def matrix(self) -> np.ndarray:
+        """The (n, dim) normalized matrix (memory-mapped when on disk)."""
+        with self._lock:
+            if self.directory:
+                if self._matrix is None:
+                    self._matrix = self._mapped()
+            elif self._matrix is None or self._pending:
+                parts = ([self._matrix] if self._matrix is not None else []) + self._pending
+                self._matrix = np.vstack(parts) if parts else np.zeros((0, self.dim or 0), dtype=np.float32)
+                self._pending = []
+            return self._matrix
+
+    def query(self, embedding: Sequence[float], k: int = 5,
+              exclude_ids: Optional[set] = None) -> List[Tuple[str, float]]:
+        """
+        Cosine top-k via one matrix-vector product. Returns [(submission_id, score)] best first.
+        """
+        if embedding is None or len(embedding) == 0 or not self._ids or len(embedding) != self.dim:
+            return []
+        matrix = self.matrix()
+        ids = self._ids[:len(matrix)]
+        scores = matrix @ normalize(embedding)
+        if exclude_ids:
+            rows = [self._positions[i] for i in exclude_ids if self._positions.get(i, len(ids)) < len(ids)]
+            scores[rows] = -np.inf
+        k = min(k, len(ids))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(ids[i], float(scores[i])) for i in top if np.isfinite(scores[i])]
+
+    def scores_for(self, embedding: Sequence[float], submission_ids: Sequence[str]) -> Dict[str, float]:
+        """Cosine similarity of the query to specific indexed submissions."""
+        if embedding is None or len(embedding) == 0 or len(embedding) != self.dim:
+            return {}
+        matrix = self.matrix()
+        present = [(sid, self._positions[sid]) for sid in submission_ids
+                   if self._positions.get(sid, len(matrix)) < len(matrix)]
+        if not present:
+            return {}
+        rows = np.fromiter((row for _, row in present), dtype=np.int64, count=len(present))
+        scores = matrix[rows] @ normalize(embedding)
+        return {sid: float(score) for (sid, _), score in zip(present, scores)}
+
+
+# ----------------------------------------------------------------------
+# Per-problem registry
+# ----------------------------------------------------------------------
+
+_indexes: Dict[str, EmbeddingIndex] = {}
+_registry_lock = threading.Lock()
+
+
+def get_embedding_index(problem_id: str) -> EmbeddingIndex:
+    """
+    Returns the problem's index, loading it from disk (or backfilling it from the
+    submission store) on first use.
+    """
+    index = _indexes.get(problem_id)
+    if index is None:
+        with _registry_lock:
+            index = _indexes.get(problem_id)
+            if index is None:
+                index = EmbeddingIndex(problem_id, index_dir())
+                if len(index) == 0:
+                    from .ingest import get_store
+                    added = index.add_many(
+                        [(s["id"], s.get("embedding")) for s in get_store().iter_problem(problem_id)]
+                    )
+                    if added:
+                        logger.info(f"Backfilled {added} embeddings for problem '{problem_id}'")
+                _indexes[problem_id] = index
+    return index
+
+
+def index_embedding(problem_id: str, submission_id: str, embedding: Sequence[float]) -> None:
+    """Adds a freshly ingested vector to the problem's index."""
+    if embedding is None or len(embedding) == 0:
+        return
+    index = get_embedding_index(problem_id)
+    if submission_id not in index:
+        index.add(submission_id, embedding)
+
+
+def reset() -> None:
+    """Drops in-memory handles (files on disk are kept)."""
+    with _registry_lock:
+        _indexes.clear()
@@ -1,15 +1,59 @@
+import os
+import re
+import json
+import hashlib
 import tokenize
 from io import BytesIO
-from typing import Set, Dict, Any
+from typing import Set, Dict, Any, List, Optional
 
-def extract_features(code: str) -> Dict[str, Any]:
+# Bump when the shape or meaning of extract_features() output changes;
+# stored features with another version are recomputed and written back on read.
+FEATURES_VERSION = 3
+
+DEFAULT_SHINGLE_SIZE = int(os.getenv("CODEALIGN_LSH_SHINGLE_SIZE", "5"))
+
+# Identifiers, numbers, string-quote runs and single punctuation characters.
+# Language-agnostic, so it also works for C/C++/Java/JavaScript submissions.
+_LEXICAL_TOKEN_RE = re.compile(r"[A-Za-z_]\w*|\d+(?:\.\d+)?|\S")
+
+def lexical_tokens(code: str) -> List[str]:
+    """
+    Splits code into a flat token list with a regex (no parsing, never fails).
+    """
+    return _LEXICAL_TOKEN_RE.findall(code)
+
+def hash32(value: str) -> int:
+    """Stable 32-bit hash (Python's hash() is salted per process)."""
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=4).digest(), "little")
+
+def shingle_hashes(tokens: List[str], k: int) -> Set[int]:
+    """32-bit hashes of every k-token window."""
+    if len(tokens) < k:
+        return {hash32(" ".join(tokens))} if tokens else set()
+    return {hash32(" ".join(tokens[i:i + k])) for i in range(len(tokens) - k + 1)}
+
+def extract_features(code: str, shingle_size: int = DEFAULT_SHINGLE_SIZE) -> Dict[str, Any]:
     """
     Extracts lexical features from code for similarity comparison.
+    Computed once per submission at ingest and persisted (see serialize_features).
+    `winnow` holds the normalized winnowing fingerprints as [hash, first_line, last_line];
+    `ast_hashes` the normalized subtree-hash multiset as [hash, count] (None if not Python).
     """
+    from .winnowing import fingerprint
+    from .ast_hash import parse_python, subtree_hashes, to_pairs
+
+    stream = lexical_tokens(code)
+    tree = parse_python(code)
     features = {
         "tokens": set(),
         "identifiers": set(),
         "lines_of_code": len(code.splitlines()),
+        "token_stream": stream,
+        "fingerprints": shingle_hashes(stream, shingle_size),
+        "winnow": [list(f) for f in fingerprint(code, language="Python" if tree is not None else "")],
+        "ast_hashes": to_pairs(subtree_hashes(tree)) if tree is not None else None,
+        "shingle_size": shingle_size,
+        "version": FEATURES_VERSION,
     }
     
     try:
@@ -20,7 +64,37 @@ def extract_features(code: str) -> Dict[str, Any]:
                 features["tokens"].add(token.string)
             elif token.type == tokenize.OP:
                  features["tokens"].add(token.string)
-    except tokenize.TokenError:
+    except (tokenize.TokenError, SyntaxError):
         pass
         
     return features
+
+def serialize_features(features: Dict[str, Any]) -> str:
+    """JSON encoding with sets stored as sorted lists."""
+    return json.dumps(
+        {k: sorted(v) if isinstance(v, set) else v for k, v in features.items()},
+        separators=(",", ":"),
+    )
+
+def deserialize_features(data: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Inverse of serialize_features. Returns None for missing or outdated features."""
+    if not data:
+        return None
+    try:
+        features = json.loads(data)
+    except ValueError:
+        return None
+    if features.get("version") != FEATURES_VERSION:
+        return None
+    for key in ("tokens", "identifiers", "fingerprints"):
+        features[key] = set(features.get(key, []))
+    return features
+
+def get_features(submission: Dict[str, Any], shingle_size: int = DEFAULT_SHINGLE_SIZE) -> Dict[str, Any]:
+    """
+    Precomputed features of a stored submission, falling back to extracting them from its code.
+    """
+    features = submission.get("features")
+    if features and features.get("shingle_size") == shingle_size:
+        return features
+    return extract_features(submission.get("code", ""), shingle_size=shingle_size)
@@ -1,66 +1,142 @@
 import uuid
-import json
 import os
+import time
 import logging
-from typing import Dict, Any, List
-from codealign import client
+import threading
+from contextlib import nullcontext
+from typing import Dict, Any, List, Optional, Tuple
+from codealign import get_client
+from .store import SubmissionStore
+from .features import extract_features
+from . import dedup, lsh, embeddings, winnowing
+from .embeddings import index_embedding
+from .embedding_queue import QUEUE_ENABLED, get_embedding_queue
+from ..tracing import span
 
 logger = logging.getLogger(__name__)
 
-# File to persist submissions
-DATA_FILE = "submissions.json"
-SUBMISSIONS_DB = {}
+# SQLite database that persists submissions
+DB_FILE = os.getenv("CODEALIGN_SUBMISSIONS_DB", "submissions.db")
+# Pre-SQLite whole-file store; imported once into DB_FILE if present
+LEGACY_DATA_FILE = "submissions.json"
 
-def load_submissions():
-    """Loads submissions from JSON file."""
-    global SUBMISSIONS_DB
-    if os.path.exists(DATA_FILE):
-        try:
-            with open(DATA_FILE, "r") as f:
-                SUBMISSIONS_DB = json.load(f)
-            logger.info(f"Loaded {len(SUBMISSIONS_DB)} submissions from {DATA_FILE}")
-        except Exception as e:
-            logger.error(f"Failed to load submissions: {e}")
-            SUBMISSIONS_DB = {}
-    else:
-        SUBMISSIONS_DB = {}
+_store: Optional[SubmissionStore] = None
+_store_lock = threading.Lock()
 
-def save_submissions():
-    """Saves submissions to JSON file."""
-    try:
-        with open(DATA_FILE, "w") as f:
-            json.dump(SUBMISSIONS_DB, f, indent=2)
-    except Exception as e:
-        logger.error(f"Failed to save submissions: {e}")
+def get_store() -> SubmissionStore:
+    """Opens the submission store on first use (nothing is loaded into memory)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store = SubmissionStore(DB_FILE)
+                if DB_FILE != ":memory:" and os.path.exists(LEGACY_DATA_FILE) and store.count() == 0:
+                    store.import_legacy_json(LEGACY_DATA_FILE)
+                _store = store
+    return _store
 
-# Load on module import
-load_submissions()
+def set_store(store: Optional[SubmissionStore]) -> Optional[SubmissionStore]:
+    """
+    Swaps the process-wide store (None reopens DB_FILE on next use) and drops the
+    in-memory indexes built from the old one. Returns the previous store.
+    """
+    global _store
+    with _store_lock:
+        previous, _store = _store, store
+    lsh.reset()
+    winnowing.reset()
+    embeddings.reset()
+    dedup.reset()
+    return previous
 
-def ingest_submission(code: str, student_id: str = "anonymous", problem_id: str = "default") -> Dict[str, Any]:
+def ingest_submission(code: str, student_id: str = "anonymous", problem_id: str = "default",
+                      embedding: Optional[List[float]] = None, language: str = "Python") -> Dict[str, Any]:
     """
     Stores a submission and returns its metadata.
-    Persists to local JSON file.
+    Persists as a single appended row in the SQLite store.
+    Pass a precomputed `embedding` to use it directly; otherwise the embedding is
+    computed in the background by the batching embedding queue and written back
+    to the store and index (inline if CODEALIGN_EMBEDDING_QUEUE=0).
+    A resubmission of code already stored for the problem (identical after
+    normalization, see dedup) is linked to the first copy via `canonical_id`
+    and reuses its embedding; byte-identical copies also reuse its features.
+    `language` selects the comment rules of that normalization.
     """
-    # Check for duplicate code to avoid spamming DB? 
-    # For now, just ingest everything.
-    
+    digest = dedup.code_hash(code, language=language) if dedup.DEDUP_ENABLED else None
+    # Lookup and insert under one lock, so concurrent copies cannot both become canonical
+    with (dedup.key_lock(problem_id, digest) if digest is not None else nullcontext()):
+        submission, deferred = _ingest(code, student_id, problem_id, embedding, digest, language)
+    if deferred:
+        get_embedding_queue().submit(problem_id, submission["id"], code, language)
+    return submission
+
+def _ingest(code: str, student_id: str, problem_id: str, embedding: Optional[List[float]],
+            digest: Optional[str], language: str) -> Tuple[Dict[str, Any], bool]:
     submission_id = str(uuid.uuid4())
-    
-    # Compute embedding
-    embedding = client.get_embedding(code)
-    
+    shingle_size = lsh.get_config().shingle_size
+
+    canonical = None
+    if digest is not None:
+        with span("ingest.dedup", kind="storage") as dedup_span:
+            canonical_id = dedup.find_canonical(problem_id, digest)
+            canonical = get_store().get(canonical_id) if canonical_id else None
+            dedup_span.set(duplicate=canonical is not None)
+        if canonical is not None and embedding is None and canonical["embedding"]:
+            embedding = canonical["embedding"]
+
+    # Compute embedding (deferred to the queue unless disabled)
+    deferred = embedding is None and QUEUE_ENABLED
+    if embedding is None and not deferred:
+        embedding = get_client().get_embedding(code, language)
+
+    # Token sets, token stream and fingerprints are computed once here and persisted,
+    # so similarity checks never re-tokenize stored code
+    reused = (canonical is not None and canonical["code"] == code and canonical["features"]
+              and canonical["features"].get("shingle_size") == shingle_size)
+    if reused:
+        features = canonical["features"]
+        signature = lsh.signature_from_features(features)
+    else:
+        with span("ingest.features", kind="storage"):
+            features = extract_features(code, shingle_size=shingle_size)
+
+            # MinHash signature for the plagiarism candidate index
+            signature = lsh.signature_from_features(features)
+
     submission = {
         "id": submission_id,
         "student_id": student_id,
         "problem_id": problem_id,
         "code": code,
-        "embedding": embedding
+        "embedding": embedding or [],
+        "created_at": time.time(),
+        "minhash": signature.tobytes(),
+        "minhash_config": lsh.get_config().key(),
+        "features": features,
+        "code_hash": digest,
+        "canonical_id": canonical["id"] if canonical is not None else None,
     }
-    
-    SUBMISSIONS_DB[submission_id] = submission
-    save_submissions()
-    
-    return submission
+
+    with span("ingest.store", kind="storage"):
+        get_store().add(submission)
+        lsh.index_submission(problem_id, submission_id, signature)
+        winnowing.index_submission(problem_id, submission_id, features["winnow"])
+        index_embedding(problem_id, submission_id, embedding)
+        if digest is not None:
+            dedup.index_submission(problem_id, submission_id, digest, student_id)
+    return submission, deferred
 
 def get_all_submissions(problem_id: str) -> list:
-    return [s for s in SUBMISSIONS_DB.values() if s.get('problem_id') == problem_id]
+    """Indexed lookup of every stored submission for a problem."""
+    return get_store().by_problem(problem_id)
+
+def get_candidate_submissions(problem_id: str, code: str, features: Optional[Dict[str, Any]] = None) -> list:
+    """
+    Submissions likely to be similar to `code`, found via the problem's MinHash/LSH index.
+    Sub-linear in the cohort size; callers still score candidates exactly.
+    """
+    signature = lsh.signature_from_features(features) if features else None
+    ids = lsh.candidate_ids(problem_id, code, signature=signature)
+    if not ids:
+        return []
+    return get_store().get_many(list(ids))
@@ -0,0 +1,196 @@
+"""
+MinHash + LSH candidate index for plagiarism search.
+
+Each submission is reduced to a MinHash signature over token shingles; the
+signature is split into `bands` bands of `rows` rows and each band is hashed
+into a bucket. Two submissions become candidates if they share any bucket,
+which happens with probability 1 - (1 - s^rows)^bands for Jaccard similarity s.
+Only candidates are scored with the exact (expensive) calculate_similarity.
+"""
+import os
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+
+from .features import lexical_tokens, shingle_hashes, get_features, DEFAULT_SHINGLE_SIZE
+
+logger = logging.getLogger(__name__)
+
+_PRIME = np.uint64((1 << 32) + 15)
+_MASK_32 = (1 << 32) - 1
+
+
+class LSHConfig:
+    """
+    Recall/latency knobs. More bands (or fewer rows) raises recall and candidate count.
+    """
+
+    def __init__(self, bands: Optional[int] = None, rows: Optional[int] = None,
+                 shingle_size: Optional[int] = None, seed: int = 1):
+        self.bands = bands or int(os.getenv("CODEALIGN_LSH_BANDS", "32"))
+        self.rows = rows or int(os.getenv("CODEALIGN_LSH_ROWS", "4"))
+        self.shingle_size = shingle_size or DEFAULT_SHINGLE_SIZE
+        self.seed = seed
+
+    @property
+    def num_perm(self) -> int:
+        return self.bands * self.rows
+
+    def key(self) -> str:
+        """Identifies signatures produced under this configuration."""
+        return f"b{self.bands}r{self.rows}k{self.shingle_size}s{self.seed}"
+
+    def candidate_probability(self, similarity: float) -> float:
+        """Probability that a pair with the given Jaccard similarity becomes a candidate."""
+        return 1.0 - (1.0 - similarity ** self.rows) ** self.bands
+
+
+def shingles(code: str, k: int) -> Set[int]:
+    """32-bit hashes of every k-token window in the code."""
+    return shingle_hashes(lexical_tokens(code), k)
+
+
+class MinHasher:
+    """Universal-hash permutations h(x) = (a*x + b) mod p, vectorized with NumPy."""
+
+    def __init__(self, config: LSHConfig):
+        self.config = config
+        rng = np.random.RandomState(config.seed)
+        self._a = rng.randint(1, 1 << 31, size=config.num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=config.num_perm, dtype=np.uint64)
+
+    def signature_from_shingles(self, shingle_hashes: Set[int]) -> np.ndarray:
+        if not shingle_hashes:
+            return np.full(self.config.num_perm, _PRIME, dtype=np.uint64)
+        values = np.fromiter((h & _MASK_32 for h in shingle_hashes), dtype=np.uint64, count=len(shingle_hashes))
+        permuted = (self._a[:, None] * values[None, :] + self._b[:, None]) % _PRIME
+        return permuted.min(axis=1)
+
+    def signature(self, code: str) -> np.ndarray:
+        return self.signature_from_shingles(shingles(code, self.config.shingle_size))
+
+
+def estimate_jaccard(sig1: np.ndarray, sig2: np.ndarray) -> float:
+    return float(np.mean(sig1 == sig2))
+
+
+class MinHashLSH:
+    """Banded LSH buckets for one problem."""
+
+    def __init__(self, config: LSHConfig):
+        self.config = config
+        self._buckets: List[Dict[bytes, Set[str]]] = [defaultdict(set) for _ in range(config.bands)]
+        self._ids: Set[str] = set()
+        self._lock = threading.RLock()
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        rows = self.config.rows
+        return [signature[i * rows:(i + 1) * rows].tobytes() for i in range(self.config.bands)]
+
+    def insert(self, submission_id: str, signature: np.ndarray) -> None:
+        with self._lock:
+            for band, key in zip(self._buckets, self._band_keys(signature)):
+                band[key].add(submission_id)
+            self._ids.add(submission_id)
+
+    def query(self, signature: np.ndarray) -> Set[str]:
+        """Ids sharing at least one band bucket with the signature."""
+        candidates: Set[str] = set()
+        with self._lock:
+            for band, key in zip(self._buckets, self._band_keys(signature)):
+                bucket = band.get(key)
+                if bucket:
+                    candidates |= bucket
+        return candidates
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, submission_id: str) -> bool:
+        return submission_id in self._ids
+
+
+# ----------------------------------------------------------------------
+# Per-problem registry, kept in sync with the submission store
+# ----------------------------------------------------------------------
+
+_config = LSHConfig()
+_hasher = MinHasher(_config)
+_indexes: Dict[str, MinHashLSH] = {}
+_registry_lock = threading.Lock()
+
+
+def configure(config: LSHConfig) -> None:
+    """Switches LSH parameters; indexes are rebuilt on next use."""
+    global _config, _hasher
+    with _registry_lock:
+        _config = config
+        _hasher = MinHasher(config)
+        _indexes.clear()
+
+
+def get_config() -> LSHConfig:
+    return _config
+
+
+def compute_signature(code: str) -> np.ndarray:
+    return _hasher.signature(code)
+
+
+def signature_from_features(features: Dict) -> np.ndarray:
+    """Reuses precomputed fingerprints when they were built with the configured shingle size."""
+    if features.get("shingle_size") == _config.shingle_size:
+        return _hasher.signature_from_shingles(features["fingerprints"])
+    return _hasher.signature(" ".join(features.get("token_stream", [])))
+
+
+def _build_index(problem_id: str) -> MinHashLSH:
+    from .ingest import get_store
+
+    store = get_store()
+    index = MinHashLSH(_config)
+    backfill = []
+    for sub in store.iter_problem(problem_id):
+        signature = store.load_minhash(sub, _config.key())
+        if signature is None:
+            signature = signature_from_features(get_features(sub, _config.shingle_size))
+            backfill.append((sub["id"], signature))
+        index.insert(sub["id"], signature)
+    if backfill:
+        store.save_minhashes(backfill, _config.key())
+    logger.info(f"Built LSH index for problem '{problem_id}' ({len(index)} submissions)")
+    return index
+
+
+def get_index(problem_id: str) -> MinHashLSH:
+    """Returns the problem's index, building it from the store on first use."""
+    index = _indexes.get(problem_id)
+    if index is None:
+        with _registry_lock:
+            index = _indexes.get(problem_id)
+            if index is None:
+                index = _build_index(problem_id)
+                _indexes[problem_id] = index
+    return index
+
+
+def index_submission(problem_id: str, submission_id: str, signature: np.ndarray) -> None:
+    """Incremental update on ingest (no-op until the problem's index is first used)."""
+    index = _indexes.get(problem_id)
+    if index is not None:
+        index.insert(submission_id, signature)
+
+
+def reset() -> None:
+    """Drops all in-memory indexes."""
+    with _registry_lock:
+        _indexes.clear()
+
+
+def candidate_ids(problem_id: str, code: str, signature: Optional[np.ndarray] = None) -> Set[str]:
+    if signature is None:
+        signature = compute_signature(code)
+    return get_index(problem_id).query(signature)
@@ -1,7 +1,13 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 
 class AuthenticityReport(BaseModel):
     risk_score: float
     verdict: str
     reasons: List[str]
+
+class AISignals(BaseModel):
+    # the LLM's AI-signal JSON as returned by detect_ai_signals
+    is_suspicious: bool
+    confidence: float = Field(ge=0.0, le=1.0)
+    signals: List[str] = []
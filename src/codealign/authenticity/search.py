@@ -0,0 +1,121 @@
+"""
+One-vs-cohort similarity search.
+
+Lexical candidates come from the MinHash/LSH index and the winnowing
+fingerprint index (which also catches renamed/reformatted copies and gives the
+matched line ranges) and are scored exactly with calculate_similarity (tokens,
+fingerprints and AST subtree hashes); semantic neighbours come from the
+per-problem embedding matrix. Both scores are blended into a single combined
+similarity. A stored copy of the same normalized code (dedup hash index)
+short-circuits the search with a 1.0 match.
+"""
+import os
+import logging
+from typing import Dict, Any, Optional
+
+from .features import get_features
+from .similarity import calculate_similarity
+from .embeddings import get_embedding_index
+from .ast_hash import features_subtree_hashes, structural_similarity
+from .winnowing import features_fingerprints, matched_line_ranges, get_index as get_fingerprint_index
+from .dedup import find_other_student
+from .ingest import get_candidate_submissions, get_store
+from ..tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Weight of embedding cosine similarity in the combined score
+EMBEDDING_WEIGHT = float(os.getenv("CODEALIGN_EMBEDDING_WEIGHT", "0.3"))
+SEMANTIC_TOP_K = int(os.getenv("CODEALIGN_SEMANTIC_TOP_K", "5"))
+# Fingerprint-index hits added to the LSH candidates
+FINGERPRINT_TOP_K = int(os.getenv("CODEALIGN_FINGERPRINT_TOP_K", "20"))
+
+def blend_similarity(lexical: float, semantic: Optional[float], weight: float = EMBEDDING_WEIGHT) -> float:
+    """Weighted blend; falls back to the lexical score when no embedding is available."""
+    if semantic is None:
+        return lexical
+    return (1 - weight) * lexical + weight * max(semantic, 0.0)
+
+def identical_match(submission: Dict[str, Any], other: Dict[str, Any]) -> Dict[str, Any]:
+    """search_similar result for a stored submission with the same normalized code."""
+    query_features, other_features = get_features(submission), get_features(other)
+    embedded = bool(submission.get("embedding")) and bool(other.get("embedding"))
+    return {
+        "max_similarity": 1.0,
+        "most_similar_submission_id": other["id"],
+        "semantic_similarity": 1.0 if embedded else 0.0,
+        "most_similar_semantic_id": other["id"] if embedded else None,
+        "combined_similarity": 1.0,
+        "matched_lines": matched_line_ranges(features_fingerprints(query_features),
+                                             features_fingerprints(other_features)),
+        "structural_similarity": structural_similarity(features_subtree_hashes(query_features),
+                                                       features_subtree_hashes(other_features)),
+        "duplicate_of": other["id"],
+    }
+
+def search_similar(submission: Dict[str, Any], problem_id: str,
+                   exclude_student_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Finds the closest stored submissions to an (already ingested) submission.
+    Submissions from `exclude_student_id` are ignored.
+    """
+    code = submission.get("code", "")
+    if submission.get("code_hash"):
+        duplicate_id = find_other_student(problem_id, submission["code_hash"], exclude_student_id,
+                                          exclude_ids={submission.get("id")})
+        duplicate = get_store().get(duplicate_id) if duplicate_id else None
+        if duplicate is not None:
+            return identical_match(submission, duplicate)
+
+    query_features = get_features(submission)
+    with span("similarity.candidates", kind="similarity") as candidates_span:
+        candidates = {c["id"]: c for c in get_candidate_submissions(problem_id, code, features=query_features)}
+        exclude = {submission.get("id")}
+        hits = get_fingerprint_index(problem_id).query(features_fingerprints(query_features), exclude_ids=exclude,
+                                                       limit=FINGERPRINT_TOP_K)
+        matches = {hit["id"]: hit["matches"] for hit in hits}
+        missing = [sid for sid in matches if sid not in candidates]
+        if missing:
+            candidates.update({s["id"]: s for s in get_store().get_many(missing)})
+        candidates_span.set(candidates=len(candidates), fingerprint_hits=len(hits))
+
+    semantic: Dict[str, float] = {}
+    embedding = submission.get("embedding")
+    if embedding:
+        with span("similarity.semantic", kind="similarity"):
+            index = get_embedding_index(problem_id)
+            semantic = dict(index.query(embedding, k=SEMANTIC_TOP_K, exclude_ids={submission["id"]}))
+            missing = [sid for sid in semantic if sid not in candidates]
+            if missing:
+                candidates.update({s["id"]: s for s in get_store().get_many(missing)})
+            semantic.update(index.scores_for(embedding, [sid for sid in candidates if sid not in semantic]))
+
+    result = {
+        "max_similarity": 0.0,
+        "most_similar_submission_id": None,
+        "semantic_similarity": 0.0,
+        "most_similar_semantic_id": None,
+        "combined_similarity": 0.0,
+        "matched_lines": [],
+        "structural_similarity": None,
+        "duplicate_of": None,
+    }
+    with span("similarity.scoring", kind="similarity", pairs=len(candidates)):
+        for sid, other in candidates.items():
+            if sid == submission.get("id"):
+                continue
+            if exclude_student_id and other.get("student_id") == exclude_student_id:
+                continue
+            lexical = calculate_similarity(code, other.get("code", ""), query_features, get_features(other))
+            sem = semantic.get(sid)
+            if lexical > result["max_similarity"]:
+                result["max_similarity"] = lexical
+                result["most_similar_submission_id"] = sid
+                result["matched_lines"] = matches.get(sid, [])
+                result["structural_similarity"] = structural_similarity(
+                    features_subtree_hashes(query_features), features_subtree_hashes(get_features(other)))
+            if sem is not None and sem > result["semantic_similarity"]:
+                result["semantic_similarity"] = sem
+                result["most_similar_semantic_id"] = sid
+            result["combined_similarity"] = max(result["combined_similarity"], blend_similarity(lexical, sem))
+    return result
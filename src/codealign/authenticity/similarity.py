@@ -1,15 +1,25 @@
-from typing import Dict, Any
-from .features import extract_features
+from typing import Dict, Any, Optional
+from .features import extract_features, get_features
+from .winnowing import features_fingerprints, fingerprint_similarity, matched_line_ranges
+from .ast_hash import features_subtree_hashes, structural_similarity
 
-def calculate_similarity(code1: str, code2: str) -> float:
+def calculate_similarity(code1: str, code2: str,
+                         features1: Optional[Dict[str, Any]] = None,
+                         features2: Optional[Dict[str, Any]] = None) -> float:
     """
     Calculates similarity between two code snippets.
     Returns a float between 0.0 and 1.0.
+    Pass precomputed features (from ingest) to skip tokenization entirely.
+    """
+    feat1 = features1 if features1 is not None else extract_features(code1)
+    feat2 = features2 if features2 is not None else extract_features(code2)
+    return similarity_from_features(feat1, feat2)
+
+def similarity_from_features(feat1: Dict[str, Any], feat2: Dict[str, Any]) -> float:
+    """
+    Pairwise score using only precomputed features (set operations, no parsing).
     """
     # 1. Structural similarity (Jaccard on tokens)
-    feat1 = extract_features(code1)
-    feat2 = extract_features(code2)
-    
     tokens1 = feat1.get("tokens", set())
     tokens2 = feat2.get("tokens", set())
     
@@ -23,56 +33,85 @@ def calculate_similarity(code1: str, code2: str) -> float:
     
     jaccard_sim = intersection / union if union > 0 else 0.0
     
-    # 2. Sequence matcher (approximating AST/structure via text)
-    from difflib import SequenceMatcher
-    seq_sim = SequenceMatcher(None, code1, code2).ratio()
+    # 2. Winnowing fingerprints over the normalized token stream: order-aware, linear,
+    #    and unaffected by renaming, literals, comments or formatting
+    winnow_sim = fingerprint_similarity(features_fingerprints(feat1), features_fingerprints(feat2))
     
-    # Weighted average (favoring sequence matcher for now as it captures order)
-    return (0.3 * jaccard_sim) + (0.7 * seq_sim)
+    # 3. AST structure: overlap of normalized subtree hashes (Python only);
+    #    rename- and reorder-resistant
+    ast_sim = structural_similarity(features_subtree_hashes(feat1), features_subtree_hashes(feat2))
+    if ast_sim is None:
+        # Weighted average (favoring fingerprints as they capture order)
+        return (0.3 * jaccard_sim) + (0.7 * winnow_sim)
+    return (0.2 * jaccard_sim) + (0.5 * winnow_sim) + (0.3 * ast_sim)
 
-def find_similar(embedding, submissions: list, threshold: float = 0.85, exclude_candidate_id: str = None) -> list:
+def find_similar(embedding, submissions: list, threshold: float = 0.85, exclude_candidate_id: str = None,
+                 problem_id: str = None) -> list:
     """
     Finds similar submissions from a list, excluding a specific candidate ID.
     
     Args:
-        embedding: The embedding of the current submission (unused in this version, kept for API compatibility).
+        embedding: Either the query code (str, text-based matching) or the query's
+            embedding vector (cosine similarity against each stored 'embedding').
         submissions: List of stored submission dictionaries.
         threshold: specific threshold for similarity.
         exclude_candidate_id: The ID of the candidate to exclude from checks.
+        problem_id: If given, only submissions that are MinHash/LSH candidates in this
+            problem's index are scored exactly (text mode only).
         
     Returns:
         List of similar submission dictionaries.
     """
+    # "Only flag if similar code comes from a DIFFERENT candidate"
+    if exclude_candidate_id:
+        submissions = [s for s in submissions if s.get('student_id', 'anonymous') != exclude_candidate_id]
+
+    if not isinstance(embedding, str):
+        return _find_similar_by_embedding(embedding, submissions, threshold)
+
     similar = []
-    # Note: 'embedding' arg is in the signature because the user requested it, 
-    # but our current 'calculate_similarity' uses code text, not embeddings.
-    # We will use the 'code' field from the submissions.
-    
-    
-    # We need the code text to compare against, so we assume 'embedding' argument is acting as a placeholder 
-    # for the query code in this context, or we adjust the usage.
-    # To support the user's specific request signature:
-    # `def find_similar(self, embedding, threshold=0.85, exclude_candidate_id=None):`
-    # We will assume `embedding` here is actually the code string in our current architecture 
-    # (since we don't have a Vector DB handy to do pure embedding similarity in this function easily without passing the model).
-    
-    # ADAPTATION: We will use 'embedding' as 'query_code' for our text-based matching.
     query_code = embedding 
+    query_features = extract_features(query_code)
 
-    for stored in submissions:
-        # User's requested logic:
-        # "Only flag if similar code comes from a DIFFERENT candidate"
-        stored_candidate_id = stored.get('student_id', 'anonymous')
-        
-        if exclude_candidate_id and stored_candidate_id == exclude_candidate_id:
-            continue  # Skip this candidate's own submissions
+    if problem_id is not None:
+        from .lsh import candidate_ids
+        candidates = candidate_ids(problem_id, query_code)
+        submissions = [s for s in submissions if s.get('id') in candidates]
 
+    for stored in submissions:
         # Calculate similarity (using our existing function)
         stored_code = stored.get('code', '')
-        similarity = calculate_similarity(query_code, stored_code)
+        stored_features = get_features(stored)
+        similarity = calculate_similarity(query_code, stored_code, query_features, stored_features)
 
         if similarity >= threshold:
             stored['similarity_score'] = similarity # Add score to result
+            stored['structural_similarity'] = structural_similarity(features_subtree_hashes(query_features),
+                                                                    features_subtree_hashes(stored_features))
+            stored['matched_lines'] = matched_line_ranges(features_fingerprints(query_features),
+                                                          features_fingerprints(stored_features))
             similar.append(stored)
 
     return similar
+
+def _find_similar_by_embedding(embedding, submissions: list, threshold: float) -> list:
+    """Batched cosine similarity: one matrix-vector product over the submissions' embeddings."""
+    import numpy as np
+    from .embeddings import normalize
+
+    if embedding is None or len(embedding) == 0:
+        return []
+    dim = len(embedding)
+    stored = [s for s in submissions if s.get('embedding') is not None and len(s['embedding']) == dim]
+    if not stored:
+        return []
+    matrix = np.asarray([s['embedding'] for s in stored], dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = matrix / np.where(norms > 0, norms, 1.0)
+    scores = matrix @ normalize(embedding)
+
+    similar = []
+    for idx in np.flatnonzero(scores >= threshold):
+        stored[idx]['similarity_score'] = float(scores[idx])
+        similar.append(stored[idx])
+    return similar
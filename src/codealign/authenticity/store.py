@@ -0,0 +1,291 @@
+"""
+SQLite-backed submission store.
+
+Append-only inserts (O(1) per ingest) with indexes on problem_id and
+student_id, WAL journaling so readers never block the writer, and nothing
+loaded into memory until it is queried.
+"""
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from array import array
+from typing import Dict, Any, List, Optional, Iterator
+
+from .features import extract_features, serialize_features, deserialize_features
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    student_id TEXT NOT NULL,
+    problem_id TEXT NOT NULL,
+    code TEXT NOT NULL,
+    embedding BLOB,
+    created_at REAL NOT NULL,
+    minhash BLOB,
+    minhash_config TEXT,
+    features TEXT,
+    code_hash TEXT,
+    canonical_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_submissions_problem ON submissions (problem_id);
+CREATE INDEX IF NOT EXISTS idx_submissions_student ON submissions (student_id);
+CREATE INDEX IF NOT EXISTS idx_submissions_problem_student ON submissions (problem_id, student_id);
+"""
+
+# Columns added after the first release: name -> SQL type. Older databases get them via ALTER TABLE.
+MIGRATED_COLUMNS = {
+    "minhash": "BLOB",
+    "minhash_config": "TEXT",
+    "features": "TEXT",
+    "code_hash": "TEXT",
+    "canonical_id": "TEXT",
+}
+
+# Indexes on migrated columns, created once the columns exist
+MIGRATED_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_submissions_problem_hash ON submissions (problem_id, code_hash);
+"""
+
+
+def pack_embedding(embedding: Optional[List[float]]) -> Optional[bytes]:
+    """Encodes an embedding as a compact float32 blob."""
+    if not embedding:
+        return None
+    return array("f", embedding).tobytes()
+
+
+def unpack_embedding(blob: Optional[bytes]) -> List[float]:
+    if not blob:
+        return []
+    values = array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+class SubmissionStore:
+    """
+    Thread-safe submission table. `path` may be ":memory:" for tests.
+    Outdated features are backfilled with `shingle_size`, by default the one the
+    LSH index is configured with (see lsh.configure).
+    """
+
+    COLUMNS = ("id", "student_id", "problem_id", "code", "embedding", "created_at", "minhash", "minhash_config", "features",
+               "code_hash", "canonical_id")
+
+    def __init__(self, path: str, shingle_size: Optional[int] = None):
+        self.path = path
+        self._shingle_size = shingle_size
+        self._lock = threading.RLock()
+        if path != ":memory:":
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        self._conn.commit()
+
+    def _migrate(self) -> None:
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(submissions)")}
+        for name, sql_type in MIGRATED_COLUMNS.items():
+            if name not in existing:
+                self._conn.execute(f"ALTER TABLE submissions ADD COLUMN {name} {sql_type}")
+        self._conn.executescript(MIGRATED_INDEXES)
+
+    def _row_to_dict(self, row) -> Dict[str, Any]:
+        submission = dict(zip(self.COLUMNS, row))
+        submission["embedding"] = unpack_embedding(submission["embedding"])
+        submission["features"] = deserialize_features(submission["features"])
+        return submission
+
+    @property
+    def shingle_size(self) -> int:
+        if self._shingle_size is not None:
+            return self._shingle_size
+        from .lsh import get_config
+        return get_config().shingle_size
+
+    def _load(self, rows) -> List[Dict[str, Any]]:
+        """
+        Decodes rows, recomputing features that are missing, from another
+        FEATURES_VERSION or built with another shingle size, and writing them back
+        so every reader compares the same features and each row is re-extracted once.
+        """
+        shingle_size = self.shingle_size
+        submissions = [self._row_to_dict(r) for r in rows]
+        stale = [s for s in submissions if s["features"] is None or s["features"].get("shingle_size") != shingle_size]
+        for submission in stale:
+            submission["features"] = extract_features(submission["code"], shingle_size=shingle_size)
+        if stale:
+            self.save_features([(s["id"], s["features"]) for s in stale])
+        return submissions
+
+    def _select(self, where: str = "", params: tuple = ()) -> List[Dict[str, Any]]:
+        sql = f"SELECT {', '.join(self.COLUMNS)} FROM submissions {where} ORDER BY seq"
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return self._load(rows)
+
+    def _insert_row(self, submission: Dict[str, Any], now: float) -> tuple:
+        return (
+            submission["id"],
+            submission.get("student_id", "anonymous"),
+            submission.get("problem_id", "default"),
+            submission.get("code", ""),
+            pack_embedding(submission.get("embedding")),
+            submission.get("created_at", now),
+            submission.get("minhash"),
+            submission.get("minhash_config"),
+            serialize_features(submission["features"]) if submission.get("features") else None,
+            submission.get("code_hash"),
+            submission.get("canonical_id"),
+        )
+
+    def add(self, submission: Dict[str, Any]) -> None:
+        """Appends a submission (single-row insert, no rewrite of existing data)."""
+        placeholders = ", ".join("?" for _ in self.COLUMNS)
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO submissions ({', '.join(self.COLUMNS)}) VALUES ({placeholders})",
+                self._insert_row(submission, time.time()),
+            )
+            self._conn.commit()
+
+    def add_many(self, submissions: List[Dict[str, Any]]) -> None:
+        """Bulk insert in a single transaction."""
+        now = time.time()
+        placeholders = ", ".join("?" for _ in self.COLUMNS)
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR IGNORE INTO submissions ({', '.join(self.COLUMNS)}) VALUES ({placeholders})",
+                [self._insert_row(s, now) for s in submissions],
+            )
+            self._conn.commit()
+
+    def get(self, submission_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._select("WHERE id = ?", (submission_id,))
+        return rows[0] if rows else None
+
+    def get_many(self, submission_ids: List[str]) -> List[Dict[str, Any]]:
+        """Fetches several submissions by id (primary-key lookups)."""
+        ids = list(submission_ids)
+        results = []
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            results.extend(self._select(f"WHERE id IN ({', '.join('?' for _ in chunk)})", tuple(chunk)))
+        return results
+
+    def by_problem(self, problem_id: str) -> List[Dict[str, Any]]:
+        """Indexed lookup of every submission for a problem."""
+        return self._select("WHERE problem_id = ?", (problem_id,))
+
+    def by_student(self, student_id: str, problem_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        if problem_id is None:
+            return self._select("WHERE student_id = ?", (student_id,))
+        return self._select("WHERE problem_id = ? AND student_id = ?", (problem_id, student_id))
+
+    def iter_problem(self, problem_id: str, batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """Streams a problem's submissions without materializing them all."""
+        last_seq = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT seq, {', '.join(self.COLUMNS)} FROM submissions WHERE problem_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+                    (problem_id, last_seq, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            last_seq = rows[-1][0]
+            yield from self._load([row[1:] for row in rows])
+
+    @staticmethod
+    def load_minhash(submission: Dict[str, Any], config_key: str):
+        """Returns the stored MinHash signature if it was built with `config_key`."""
+        import numpy as np
+
+        blob = submission.get("minhash")
+        if not blob or submission.get("minhash_config") != config_key:
+            return None
+        return np.frombuffer(blob, dtype=np.uint64)
+
+    def save_minhashes(self, signatures: List[tuple], config_key: str) -> None:
+        """Backfills (submission_id, signature) pairs."""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE submissions SET minhash = ?, minhash_config = ? WHERE id = ?",
+                [(sig.tobytes(), config_key, sid) for sid, sig in signatures],
+            )
+            self._conn.commit()
+
+    def save_features(self, features: List[tuple]) -> None:
+        """Backfills [(submission_id, features)] extracted after the insert."""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE submissions SET features = ? WHERE id = ?",
+                [(serialize_features(f), sid) for sid, f in features],
+            )
+            self._conn.commit()
+
+    def set_embeddings(self, embeddings: List[tuple]) -> None:
+        """Writes back [(submission_id, embedding)] computed after the insert, in one transaction."""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE submissions SET embedding = ? WHERE id = ?",
+                [(pack_embedding(embedding), sid) for sid, embedding in embeddings],
+            )
+            self._conn.commit()
+
+    def code_hashes(self, problem_id: str) -> List[tuple]:
+        """
+        (id, student_id, code_hash, code) of a problem's submissions in insertion
+        order. code is only loaded for rows stored before deduplication (code_hash
+        None), so they can be backfilled.
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, student_id, code_hash, CASE WHEN code_hash IS NULL THEN code END "
+                "FROM submissions WHERE problem_id = ? ORDER BY seq",
+                (problem_id,),
+            ).fetchall()
+
+    def set_code_hashes(self, hashes: List[tuple]) -> None:
+        """Backfills [(submission_id, code_hash)]."""
+        with self._lock:
+            self._conn.executemany("UPDATE submissions SET code_hash = ? WHERE id = ?",
+                                   [(code_hash, sid) for sid, code_hash in hashes])
+            self._conn.commit()
+
+    def count(self, problem_id: Optional[str] = None) -> int:
+        with self._lock:
+            if problem_id is None:
+                return self._conn.execute("SELECT COUNT(*) FROM submissions").fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM submissions WHERE problem_id = ?", (problem_id,)).fetchone()[0]
+
+    def import_legacy_json(self, json_path: str) -> int:
+        """
+        One-time migration from the old whole-file submissions.json format.
+        Returns the number of imported submissions.
+        """
+        try:
+            with open(json_path, "r") as f:
+                legacy = json.load(f)
+        except Exception as e:
+            logger.error(f"Failed to read legacy submissions from {json_path}: {e}")
+            return 0
+        submissions = list(legacy.values()) if isinstance(legacy, dict) else list(legacy)
+        self.add_many([s for s in submissions if "id" in s])
+        logger.info(f"Imported {len(submissions)} legacy submissions from {json_path}")
+        return len(submissions)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
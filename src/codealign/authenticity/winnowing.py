@@ -0,0 +1,287 @@
+"""
+MOSS-style winnowing fingerprints and a per-problem inverted index.
+
+Code is reduced to a normalized token stream (identifiers -> V, numbers -> N,
+strings -> S, comments and layout dropped), so renaming variables or
+reformatting does not change it. Every k-gram of that stream is hashed and a
+window of w consecutive hashes keeps only its minimum: any shared run of at
+least k + w - 1 tokens is guaranteed to produce a shared fingerprint.
+
+Fingerprints carry the source line range of their k-gram. The inverted index
+maps hash -> submissions, so matching one submission against a whole cohort is
+a single pass over its posting lists, and shared fingerprints give the matched
+line ranges on both sides.
+"""
+import io
+import os
+import re
+import keyword
+import builtins
+import logging
+import threading
+import tokenize
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .features import hash32
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_K = int(os.getenv("CODEALIGN_WINNOW_K", "5"))
+DEFAULT_WINDOW = int(os.getenv("CODEALIGN_WINNOW_WINDOW", "4"))
+
+# (hash, first line, last line) of one selected k-gram
+Fingerprint = Tuple[int, int, int]
+
+# Keywords of the languages we grade; kept verbatim because they carry structure
+_KEYWORDS = set(keyword.kwlist) | {
+    "auto", "bool", "boolean", "break", "case", "catch", "char", "class", "const", "continue", "default",
+    "delete", "do", "double", "else", "enum", "extends", "final", "float", "for", "function", "if",
+    "implements", "int", "interface", "let", "long", "new", "null", "private", "protected", "public",
+    "return", "short", "static", "struct", "switch", "this", "throw", "try", "typedef", "unsigned",
+    "var", "void", "while", "nullptr", "true", "false", "template", "typename", "namespace", "using",
+    "std", "vector", "map", "set", "string", "fn", "mut", "impl", "func", "package", "import",
+}
+# Library names are not renameable, so keep them too (len, range, bisect_left...)
+_KEPT_NAMES = _KEYWORDS | set(dir(builtins))
+
+_GENERIC_TOKEN_RE = re.compile(
+    r"""(?P<comment>//[^\n]*|/\*.*?\*/|\#[^\n]*)"""
+    r"""|(?P<string>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'|`[^`]*`)"""
+    r"""|(?P<number>\d+(?:\.\d+)?)"""
+    r"""|(?P<name>[A-Za-z_]\w*)"""
+    r"""|(?P<newline>\n)"""
+    r"""|(?P<op>[^\s\w])""",
+    re.S,
+)
+
+
+def _normalize_name(name: str) -> str:
+    return name if name in _KEPT_NAMES else "V"
+
+
+def _python_tokens(code: str) -> Optional[List[Tuple[str, int]]]:
+    try:
+        raw = list(tokenize.generate_tokens(io.StringIO(code).readline))
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        return None
+    tokens = []
+    for tok in raw:
+        if tok.type == tokenize.NAME:
+            tokens.append((_normalize_name(tok.string), tok.start[0]))
+        elif tok.type == tokenize.NUMBER:
+            tokens.append(("N", tok.start[0]))
+        elif tok.type == tokenize.STRING:
+            tokens.append(("S", tok.start[0]))
+        elif tok.type == tokenize.OP:
+            tokens.append((tok.string, tok.start[0]))
+    return tokens
+
+
+def _generic_tokens(code: str) -> List[Tuple[str, int]]:
+    tokens, line = [], 1
+    for match in _GENERIC_TOKEN_RE.finditer(code):
+        kind, text = match.lastgroup, match.group()
+        if kind == "name":
+            tokens.append((_normalize_name(text), line))
+        elif kind == "number":
+            tokens.append(("N", line))
+        elif kind == "string":
+            tokens.append(("S", line))
+        elif kind == "op":
+            tokens.append((text, line))
+        line += text.count("\n")
+    return tokens
+
+
+def normalized_tokens(code: str, language: str = "Python") -> List[Tuple[str, int]]:
+    """(normalized token, line number) pairs with comments and whitespace removed."""
+    tokens = _python_tokens(code) if language == "Python" else None
+    return tokens if tokens is not None else _generic_tokens(code)
+
+
+def kgram_hashes(tokens: Sequence[Tuple[str, int]], k: int = DEFAULT_K) -> List[Fingerprint]:
+    """Hash and line span of every k-token window (one window if the stream is shorter than k)."""
+    if not tokens:
+        return []
+    if len(tokens) < k:
+        return [(hash32(" ".join(t for t, _ in tokens)), tokens[0][1], tokens[-1][1])]
+    texts = [t for t, _ in tokens]
+    return [(hash32(" ".join(texts[i:i + k])), tokens[i][1], tokens[i + k - 1][1])
+            for i in range(len(tokens) - k + 1)]
+
+
+def winnow(hashes: Sequence[Fingerprint], window: int = DEFAULT_WINDOW) -> List[Fingerprint]:
+    """
+    Robust winnowing: the minimum hash of every window (rightmost on ties),
+    recorded once per position.
+    """
+    if len(hashes) <= window:
+        return [min(hashes, key=lambda h: h[0])] if hashes else []
+    selected, last = [], -1
+    for start in range(len(hashes) - window + 1):
+        best = start
+        for i in range(start + 1, start + window):
+            if hashes[i][0] <= hashes[best][0]:
+                best = i
+        if best != last:
+            selected.append(hashes[best])
+            last = best
+    return selected
+
+
+def fingerprint(code: str, language: str = "Python", k: int = DEFAULT_K, window: int = DEFAULT_WINDOW) -> List[Fingerprint]:
+    return winnow(kgram_hashes(normalized_tokens(code, language), k), window)
+
+
+def fingerprint_similarity(fp1: Iterable[Sequence[int]], fp2: Iterable[Sequence[int]]) -> float:
+    """Dice coefficient over distinct fingerprint hashes (1.0 for two empty inputs)."""
+    h1 = {f[0] for f in fp1}
+    h2 = {f[0] for f in fp2}
+    if not h1 and not h2:
+        return 1.0
+    if not h1 or not h2:
+        return 0.0
+    return 2 * len(h1 & h2) / (len(h1) + len(h2))
+
+
+def _merge_ranges(pairs: List[Tuple[int, int, int, int]]) -> List[Dict[str, List[int]]]:
+    """Merges (start, end, other_start, other_end) spans that overlap or touch on both sides."""
+    merged: List[List[int]] = []
+    for s, e, os_, oe in sorted(pairs):
+        if merged:
+            last = merged[-1]
+            if s <= last[1] + 1 and os_ <= last[3] + 1 and oe >= last[2] - 1:
+                last[1] = max(last[1], e)
+                last[2] = min(last[2], os_)
+                last[3] = max(last[3], oe)
+                continue
+        merged.append([s, e, os_, oe])
+    return [{"lines": [s, e], "other_lines": [os_, oe]} for s, e, os_, oe in merged]
+
+
+def matched_line_ranges(fp1: Iterable[Sequence[int]], fp2: Iterable[Sequence[int]]) -> List[Dict[str, List[int]]]:
+    """Line ranges of fp1 that share fingerprints with fp2, paired with the matching ranges in fp2."""
+    by_hash: Dict[int, List[Tuple[int, int]]] = defaultdict(list)
+    for h, s, e in fp2:
+        by_hash[h].append((s, e))
+    pairs = [(s, e, os_, oe) for h, s, e in fp1 for os_, oe in by_hash.get(h, ())]
+    return _merge_ranges(pairs)
+
+
+class FingerprintIndex:
+    """Inverted index hash -> submissions for one problem."""
+
+    def __init__(self):
+        self._postings: Dict[int, List[int]] = defaultdict(list)
+        self._ids: List[str] = []
+        self._slots: Dict[str, int] = {}
+        self._sizes: List[int] = []
+        self._fingerprints: List[List[Fingerprint]] = []
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, submission_id: str) -> bool:
+        return submission_id in self._slots
+
+    def add(self, submission_id: str, fingerprints: Iterable[Sequence[int]]) -> None:
+        fingerprints = [tuple(f) for f in fingerprints]
+        with self._lock:
+            if submission_id in self._slots:
+                return
+            slot = len(self._ids)
+            self._ids.append(submission_id)
+            self._slots[submission_id] = slot
+            hashes = {f[0] for f in fingerprints}
+            self._sizes.append(len(hashes))
+            self._fingerprints.append(fingerprints)
+            for h in hashes:
+                self._postings[h].append(slot)
+
+    def query(self, fingerprints: Iterable[Sequence[int]], exclude_ids: Optional[Set[str]] = None,
+              min_similarity: float = 0.0, limit: Optional[int] = None) -> List[Dict[str, object]]:
+        """
+        Every indexed submission sharing a fingerprint with the query, best first:
+        [{"id", "similarity" (Dice), "shared", "matches": [{"lines", "other_lines"}]}].
+        One pass over the query's posting lists; no pairwise comparisons.
+        """
+        query = [tuple(f) for f in fingerprints]
+        hashes = {f[0] for f in query}
+        if not hashes:
+            return []
+        shared: Dict[int, int] = defaultdict(int)
+        with self._lock:
+            for h in hashes:
+                for slot in self._postings.get(h, ()):
+                    shared[slot] += 1
+            scored = []
+            for slot, count in shared.items():
+                sid = self._ids[slot]
+                if exclude_ids and sid in exclude_ids:
+                    continue
+                similarity = 2 * count / (len(hashes) + self._sizes[slot])
+                if similarity >= min_similarity:
+                    scored.append((similarity, count, slot))
+            scored.sort(key=lambda x: (-x[0], self._ids[x[2]]))
+            if limit is not None:
+                scored = scored[:limit]
+            return [{
+                "id": self._ids[slot],
+                "similarity": similarity,
+                "shared": count,
+                "matches": matched_line_ranges(query, self._fingerprints[slot]),
+            } for similarity, count, slot in scored]
+
+
+# ----------------------------------------------------------------------
+# Per-problem registry, kept in sync with the submission store
+# ----------------------------------------------------------------------
+
+_indexes: Dict[str, FingerprintIndex] = {}
+_registry_lock = threading.Lock()
+
+
+def features_fingerprints(features: Dict) -> List[Fingerprint]:
+    """Winnowing fingerprints from extracted features (computed on the fly for old features)."""
+    stored = features.get("winnow")
+    if stored is not None:
+        return [tuple(f) for f in stored]
+    return fingerprint(" ".join(features.get("token_stream", [])), language="")
+
+
+def _build_index(problem_id: str) -> FingerprintIndex:
+    from .ingest import get_store
+    from .features import get_features
+
+    index = FingerprintIndex()
+    for sub in get_store().iter_problem(problem_id):
+        index.add(sub["id"], features_fingerprints(get_features(sub)))
+    logger.info(f"Built fingerprint index for problem '{problem_id}' ({len(index)} submissions)")
+    return index
+
+
+def get_index(problem_id: str) -> FingerprintIndex:
+    """Returns the problem's index, building it from the store on first use."""
+    index = _indexes.get(problem_id)
+    if index is None:
+        with _registry_lock:
+            index = _indexes.get(problem_id)
+            if index is None:
+                index = _build_index(problem_id)
+                _indexes[problem_id] = index
+    return index
+
+
+def index_submission(problem_id: str, submission_id: str, fingerprints: Iterable[Sequence[int]]) -> None:
+    """Incremental update on ingest (no-op until the problem's index is first used)."""
+    index = _indexes.get(problem_id)
+    if index is not None:
+        index.add(submission_id, fingerprints)
+
+
+def reset() -> None:
+    """Drops all in-memory indexes."""
+    with _registry_lock:
+        _indexes.clear()
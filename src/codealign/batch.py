@@ -0,0 +1,186 @@
+"""
+Cohort (batch) evaluation.
+
+Requirements are extracted once per problem; every submission then runs the
+rest of the pipeline on a bounded worker pool, and results are yielded as
+soon as each one completes (suitable for streaming as JSONL). Submissions
+whose code is identical after normalization (see evaluation_cache) are
+evaluated once per batch; only their similarity check runs per student.
+"""
+import os
+import copy
+import json
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .alignment.behaviour_extract import extract_requirements
+from .alignment.problems import get_registry
+from .pipeline import evaluate_submission, AnalysisError, apply_similarity, _max_similarity
+from .authenticity.dedup import DEDUP_ENABLED, code_hash
+from .evaluation_cache import EVALUATION_NORMALIZATION
+from .cohort_analytics import record_result
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_WORKERS = int(os.getenv("CODEALIGN_BATCH_WORKERS", "8"))
+# Stages per submission run in parallel too, but keep the total thread count modest
+STAGE_WORKERS_PER_SUBMISSION = 3
+
+LANGUAGE_BY_EXTENSION = {
+    ".py": "Python",
+    ".cpp": "C++",
+    ".cc": "C++",
+    ".c": "C",
+    ".java": "Java",
+    ".js": "JavaScript",
+}
+
+
+def load_submissions(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Reads submissions from a directory of source files, a JSONL file, or a JSON array
+    (e.g. examples/sample_submissions.json). Each yielded record has at least 'id' and 'code'.
+    """
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            file_path = os.path.join(path, name)
+            stem, ext = os.path.splitext(name)
+            if not os.path.isfile(file_path) or ext.lower() not in LANGUAGE_BY_EXTENSION:
+                continue
+            with open(file_path, encoding="utf-8") as f:
+                yield {"id": stem, "student_id": stem, "code": f.read(), "language": LANGUAGE_BY_EXTENSION[ext.lower()]}
+        return
+
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".json"):
+            records = json.load(f)
+            for record in records if isinstance(records, list) else records.values():
+                yield record
+            return
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                logger.error(f"Skipping malformed JSONL line {line_no} in {path}: {e}")
+
+
+class SharedEvaluations:
+    """
+    Evaluation payloads of one batch keyed by language + normalized code hash.
+    The first submission of a key evaluates it; duplicates wait for that result.
+    """
+
+    def __init__(self):
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def claim(self, key: str) -> Tuple[Future, bool]:
+        """The key's future and whether the caller owns (must produce) its result."""
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                return future, False
+            future = self._futures[key] = Future()
+            return future, True
+
+
+def _reuse_payload(payload: Dict[str, Any], code: str, language: str, student_id: str, problem_id: str,
+                   check_authenticity: bool) -> Dict[str, Any]:
+    """Copy of a duplicate's evaluation with this student's own similarity check."""
+    payload = copy.deepcopy(payload)
+    if check_authenticity:
+        apply_similarity(payload, _max_similarity(code, student_id, problem_id, language))
+    return payload
+
+
+def _evaluate_one(record: Dict[str, Any],
+                  problem_text: str,
+                  requirements: List[Dict[str, str]],
+                  problem_id: str,
+                  default_language: str,
+                  check_authenticity: bool,
+                  mode: Optional[str] = None,
+                  shared: Optional[SharedEvaluations] = None) -> Dict[str, Any]:
+    submission_id = record.get("id")
+    student_id = record.get("student_id") or submission_id or "anonymous"
+    language = record.get("language") or default_language
+    result = {"id": submission_id, "student_id": student_id}
+    try:
+        future, owner = (shared.claim(f"{language}:{code_hash(record['code'], EVALUATION_NORMALIZATION, language)}") if shared is not None
+                         else (None, True))
+        if not owner:
+            payload = _reuse_payload(future.result(), record["code"], language, student_id, problem_id, check_authenticity)
+        else:
+            try:
+                payload = evaluate_submission(
+                    problem_text,
+                    record["code"],
+                    language=language,
+                    student_id=student_id,
+                    problem_id=problem_id,
+                    include_similarity=check_authenticity,
+                    max_workers=STAGE_WORKERS_PER_SUBMISSION,
+                    requirements=requirements,
+                    mode=mode,
+                )
+            except Exception as e:
+                if future is not None:
+                    future.set_exception(e)
+                raise
+            if future is not None:
+                future.set_result(payload)
+        result.update(payload)
+        record_result(problem_id, result)
+    except AnalysisError as e:
+        result["error"] = str(e)
+    except Exception as e:
+        logger.error(f"Batch evaluation failed for {submission_id}: {e}")
+        result["error"] = f"Evaluation failed: {e}"
+    return result
+
+
+def evaluate_batch(problem_text: str,
+                   submissions: Iterable[Dict[str, Any]],
+                   problem_id: str = "default",
+                   language: str = "Python",
+                   max_workers: int = DEFAULT_BATCH_WORKERS,
+                   check_authenticity: bool = True,
+                   requirements: Optional[List[Dict[str, str]]] = None,
+                   mode: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Evaluates a cohort against one problem, yielding one result dict per submission
+    in completion order. Requirements come from the problem registry, so they are
+    extracted at most once per problem. At most `max_workers` submissions run at once and only a
+    small window beyond that is queued, so the input iterable is consumed lazily.
+    """
+    if requirements is None:
+        requirements = get_registry().register(problem_text, extract=extract_requirements)["requirements"]
+    records = iter(submissions)
+    window = max_workers * 2
+    shared = SharedEvaluations() if DEDUP_ENABLED else None
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="codealign-batch") as pool:
+        running = set()
+
+        def fill() -> None:
+            while len(running) < window:
+                record = next(records, None)
+                if record is None:
+                    return
+                running.add(pool.submit(
+                    _evaluate_one, record, problem_text, requirements, problem_id, language, check_authenticity, mode,
+                    shared
+                ))
+
+        fill()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                running.discard(future)
+                yield future.result()
+            fill()
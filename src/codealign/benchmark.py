@@ -0,0 +1,347 @@
+"""
+Offline benchmark suite.
+
+Runs the evaluation pipeline, the HTTP endpoints, batch grading and the
+similarity/storage paths against a FakeProvider (no API keys, configurable
+latency and error rate) over the examples/ corpus plus a synthetic cohort,
+and reports p50/p95/p99 latency, throughput and peak memory per stage.
+Everything is written to a temporary directory; the real submission store
+and problem registry are untouched.
+
+    codealign bench --cohort-size 10000 --latency-ms 200 --jitter-ms 50 --error-rate 0.02
+"""
+import os
+import re
+import glob
+import time
+import random
+import tempfile
+import threading
+import tracemalloc
+import contextlib
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .fake_llm import FakeProvider, fake_embedding, use_fake_llm
+
+DEFAULT_EXAMPLES_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "examples"))
+BENCH_PROBLEM_ID = "bench"
+SCENARIOS = ("pipeline", "ingest", "search", "api", "batch")
+
+_KEYWORDS = {
+    "def", "return", "for", "in", "if", "else", "elif", "while", "and", "or", "not", "None", "True",
+    "False", "class", "import", "from", "as", "with", "len", "range", "max", "min", "self", "int",
+    "list", "print", "break", "continue", "pass", "lambda", "is", "try", "except", "enumerate",
+}
+
+
+# ----------------------------------------------------------------------
+# Measurements
+# ----------------------------------------------------------------------
+
+def summarize(samples: Sequence[float], span_seconds: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Latency percentiles in milliseconds. Throughput is count / `span_seconds`
+    (first start to last finish), defaulting to the summed sample time.
+    """
+    if not samples:
+        return {"count": 0}
+    ms = np.asarray(samples, dtype=np.float64) * 1000.0
+    span = span_seconds if span_seconds is not None else float(ms.sum()) / 1000.0
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "count": int(ms.size),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(ms.max()), 3),
+        "throughput_per_s": round(ms.size / span, 2) if span > 0 else None,
+    }
+
+
+class LatencyRecorder:
+    """Thread-safe per-stage duration samples, with start times for throughput."""
+
+    def __init__(self):
+        self._samples: Dict[str, List[Tuple[float, float]]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float, end: Optional[float] = None) -> None:
+        start = (end if end is not None else time.perf_counter()) - seconds
+        with self._lock:
+            self._samples.setdefault(stage, []).append((start, seconds))
+
+    @contextlib.contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.record(stage, end - start, end)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            samples = {stage: list(values) for stage, values in self._samples.items()}
+        result = {}
+        for stage, values in samples.items():
+            span = max(s + d for s, d in values) - min(s for s, _ in values)
+            result[stage] = summarize([d for _, d in values], span)
+        return result
+
+
+@contextlib.contextmanager
+def _peak_memory(enabled: bool) -> Iterator[Dict[str, Optional[float]]]:
+    """Python-heap peak via tracemalloc (slows execution, hence opt-in)."""
+    result: Dict[str, Optional[float]] = {"peak_mb": None}
+    if not enabled or tracemalloc.is_tracing():
+        yield result
+        return
+    tracemalloc.start()
+    try:
+        yield result
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result["peak_mb"] = round(peak / (1024 * 1024), 2)
+
+
+def _max_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+# ----------------------------------------------------------------------
+# Corpus
+# ----------------------------------------------------------------------
+
+def load_example_corpus(examples_dir: str = DEFAULT_EXAMPLES_DIR) -> Tuple[str, List[str]]:
+    """Problem statement and solutions for the LIS example set."""
+    with open(os.path.join(examples_dir, "problem_lis.md"), encoding="utf-8") as f:
+        problem_text = f.read()
+    codes = []
+    for path in sorted(glob.glob(os.path.join(examples_dir, "*lis*.py"))):
+        with open(path, encoding="utf-8") as f:
+            codes.append(f.read())
+    return problem_text, codes
+
+
+def _mutate(code: str, rng: random.Random) -> str:
+    """Renames identifiers, tweaks literals and inserts comments/blank lines."""
+    names = sorted({n for n in re.findall(r"\b[a-z_][a-z0-9_]*\b", code) if n not in _KEYWORDS})
+    renames = {n: f"{n}_{rng.randint(0, 999)}" for n in names if rng.random() < 0.5}
+    if renames:
+        code = re.sub(r"\b[a-z_][a-z0-9_]*\b", lambda m: renames.get(m.group(0), m.group(0)), code)
+    code = re.sub(r"\b\d+\b", lambda m: str(int(m.group(0)) + rng.choice((0, 0, 0, 1))), code)
+    lines = code.splitlines()
+    for _ in range(rng.randint(0, 3)):
+        at = rng.randint(0, len(lines))
+        indent = re.match(r"\s*", lines[at - 1]).group(0) if at and lines else ""
+        lines.insert(at, rng.choice(("", f"{indent}# step {rng.randint(1, 99)}")))
+    return "\n".join(lines) + "\n"
+
+
+def synthetic_cohort(size: int, base_codes: Sequence[str], seed: int = 0,
+                     copy_rate: float = 0.05) -> List[Dict[str, str]]:
+    """
+    `size` submissions derived from `base_codes`. About `copy_rate` of them copy an
+    earlier student's submission verbatim or with cosmetic edits (plagiarism pairs).
+    """
+    rng = random.Random(seed)
+    cohort: List[Dict[str, str]] = []
+    for i in range(size):
+        if cohort and rng.random() < copy_rate:
+            source = rng.choice(cohort)["code"]
+            code = source if rng.random() < 0.5 else source.replace("\n", "\n\n", 1)
+        else:
+            code = _mutate(rng.choice(base_codes), rng)
+        cohort.append({"id": f"syn-{i}", "student_id": f"student-{i}", "code": code})
+    return cohort
+
+
+# ----------------------------------------------------------------------
+# Isolation
+# ----------------------------------------------------------------------
+
+@contextlib.contextmanager
+def isolated_storage(directory: Optional[str] = None) -> Iterator[str]:
+    """Points the submission store, embedding index and problem registry at a scratch directory."""
+    from .authenticity import ingest
+    from .authenticity.store import SubmissionStore
+    from .alignment import problems
+
+    with contextlib.ExitStack() as stack:
+        if directory is None:
+            directory = stack.enter_context(tempfile.TemporaryDirectory(prefix="codealign-bench-"))
+        store = SubmissionStore(os.path.join(directory, "submissions.db"))
+        registry = problems.ProblemRegistry(os.path.join(directory, "problems.db"))
+        previous_index_dir = os.environ.get("CODEALIGN_INDEX_DIR")
+        os.environ["CODEALIGN_INDEX_DIR"] = os.path.join(directory, "index")
+        previous_store = ingest.set_store(store)
+        previous_registry = problems.set_registry(registry)
+        try:
+            yield directory
+        finally:
+            ingest.set_store(previous_store)
+            problems.set_registry(previous_registry)
+            if previous_index_dir is None:
+                os.environ.pop("CODEALIGN_INDEX_DIR", None)
+            else:
+                os.environ["CODEALIGN_INDEX_DIR"] = previous_index_dir
+            store.close()
+            registry.close()
+
+
+# ----------------------------------------------------------------------
+# Scenarios
+# ----------------------------------------------------------------------
+
+def bench_pipeline(problem_text: str, codes: Sequence[str], recorder: LatencyRecorder) -> None:
+    """Sync stage graph per submission, timing each stage and the whole evaluation."""
+    from .pipeline import Stage, build_evaluation_stages, run_stages, build_evaluation_payload
+
+    def timed(stage: Stage) -> Stage:
+        def run(**deps):
+            with recorder.time(stage.name):
+                return stage.func(**deps)
+        return Stage(stage.name, run, stage.deps, stage.label)
+
+    for code in codes:
+        with recorder.time("total"):
+            stages = [timed(s) for s in build_evaluation_stages(problem_text, code, problem_id=BENCH_PROBLEM_ID)]
+            build_evaluation_payload(run_stages(stages))
+
+
+def bench_ingest(cohort: Sequence[Dict[str, str]], recorder: LatencyRecorder, embedding_dim: int) -> List[Dict[str, Any]]:
+    """Storage path only: features, MinHash, SQLite append and index updates (embeddings precomputed)."""
+    from .authenticity.ingest import ingest_submission
+
+    stored = []
+    for sub in cohort:
+        embedding = fake_embedding(sub["code"], embedding_dim)
+        with recorder.time("ingest"):
+            stored.append(ingest_submission(sub["code"], sub["student_id"], BENCH_PROBLEM_ID, embedding))
+    return stored
+
+
+def bench_search(stored: Sequence[Dict[str, Any]], queries: int, recorder: LatencyRecorder, seed: int = 0) -> None:
+    """One-vs-cohort similarity (LSH candidates + exact scoring + embedding top-k)."""
+    from .authenticity.search import search_similar
+
+    rng = random.Random(seed)
+    for sub in rng.sample(list(stored), min(queries, len(stored))):
+        with recorder.time("search"):
+            search_similar(sub, BENCH_PROBLEM_ID, exclude_student_id=sub["student_id"])
+
+
+def bench_api(problem_text: str, codes: Sequence[str], cohort: Sequence[Dict[str, str]],
+              queries: int, recorder: LatencyRecorder) -> None:
+    """End-to-end /evaluate and /check_authenticity through the ASGI app."""
+    from fastapi.testclient import TestClient
+    from .api import app
+
+    with TestClient(app) as http:
+        for code in codes:
+            with recorder.time("evaluate"):
+                http.post("/evaluate", json={"problem_text": problem_text, "code": code}).raise_for_status()
+        for sub in list(cohort)[:queries]:
+            with recorder.time("check_authenticity"):
+                http.post("/check_authenticity", json={
+                    "code": sub["code"], "student_id": sub["student_id"] + "-api", "problem_id": BENCH_PROBLEM_ID,
+                }).raise_for_status()
+
+
+def bench_batch(problem_text: str, cohort: Sequence[Dict[str, str]], workers: int,
+                recorder: LatencyRecorder) -> float:
+    """Batch grading; per-submission latency is time from batch start to that result."""
+    from .batch import evaluate_batch
+
+    start = time.perf_counter()
+    for _ in evaluate_batch(problem_text, cohort, problem_id=BENCH_PROBLEM_ID + "-batch", max_workers=workers):
+        recorder.record("completion", time.perf_counter() - start)
+    return time.perf_counter() - start
+
+
+def run_benchmarks(cohort_size: int = 1000,
+                   queries: int = 100,
+                   batch_size: int = 100,
+                   workers: int = 8,
+                   latency_ms: float = 0.0,
+                   jitter_ms: float = 0.0,
+                   error_rate: float = 0.0,
+                   seed: int = 0,
+                   scenarios: Sequence[str] = SCENARIOS,
+                   track_memory: bool = False,
+                   examples_dir: str = DEFAULT_EXAMPLES_DIR,
+                   directory: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Runs the selected scenarios and returns a JSON-serializable report:
+    {"config": ..., "scenarios": {name: {"wall_s", "peak_mb", "stages": {stage: summary}}}, "llm_calls": ...}.
+    """
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise ValueError(f"Unknown scenarios: {sorted(unknown)} (choose from {SCENARIOS})")
+
+    problem_text, codes = load_example_corpus(examples_dir)
+    cohort = synthetic_cohort(cohort_size, codes, seed=seed)
+    provider = FakeProvider(latency_ms=latency_ms, jitter_ms=jitter_ms, error_rate=error_rate, seed=seed)
+    report: Dict[str, Any] = {
+        "config": {
+            "cohort_size": cohort_size, "queries": queries, "batch_size": batch_size, "workers": workers,
+            "latency_ms": latency_ms, "jitter_ms": jitter_ms, "error_rate": error_rate, "seed": seed,
+        },
+        "scenarios": {},
+    }
+
+    def run(name: str, func, *args) -> Any:
+        recorder = LatencyRecorder()
+        with _peak_memory(track_memory) as memory:
+            start = time.perf_counter()
+            result = func(*args, recorder)
+            wall = time.perf_counter() - start
+        report["scenarios"][name] = {
+            "wall_s": round(wall, 3),
+            "peak_mb": memory["peak_mb"],
+            "stages": recorder.summary(),
+        }
+        return result
+
+    with isolated_storage(directory), use_fake_llm(provider):
+        stored: List[Dict[str, Any]] = []
+        if "pipeline" in scenarios:
+            run("pipeline", bench_pipeline, problem_text, codes)
+        if "ingest" in scenarios or "search" in scenarios:
+            stored = run("ingest", lambda c, r: bench_ingest(c, r, provider.embedding_dim), cohort)
+        if "search" in scenarios:
+            run("search", lambda s, r: bench_search(s, queries, r, seed), stored)
+        if "api" in scenarios:
+            run("api", lambda r: bench_api(problem_text, codes, cohort, queries, r))
+        if "batch" in scenarios:
+            run("batch", lambda r: bench_batch(problem_text, cohort[:batch_size], workers, r))
+
+    report["llm_calls"] = dict(provider.calls)
+    report["max_rss_mb"] = _max_rss_mb()
+    return report
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Fixed-width table of every scenario/stage summary."""
+    header = f"{'scenario':<10} {'stage':<20} {'count':>7} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'ops/s':>10} {'peak MB':>8}"
+    lines = [header, "-" * len(header)]
+    for name, scenario in report["scenarios"].items():
+        peak = "-" if scenario["peak_mb"] is None else f"{scenario['peak_mb']:.1f}"
+        for stage, s in sorted(scenario["stages"].items()):
+            if not s.get("count"):
+                continue
+            lines.append(
+                f"{name:<10} {stage:<20} {s['count']:>7} {s['p50_ms']:>10.2f} {s['p95_ms']:>10.2f} "
+                f"{s['p99_ms']:>10.2f} {s['throughput_per_s'] or 0:>10.1f} {peak:>8}"
+            )
+    lines.append(f"LLM calls: {report['llm_calls']}  max RSS: {report['max_rss_mb']} MB")
+    return "\n".join(lines)
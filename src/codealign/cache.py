@@ -0,0 +1,257 @@
+"""
+Content-addressed response cache.
+
+Two tiers: an in-process LRU (OrderedDict) in front of an optional persistent
+SQLite table. Keys are SHA-256 hashes of the request content, values are the
+raw response strings.
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = ".codealign_cache"
+
+
+def make_key(*parts: Any) -> str:
+    """
+    Hashes arbitrary JSON-serializable parts into a stable cache key.
+    """
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def is_cacheable_request(temperature: float) -> bool:
+    """
+    Only greedy (temperature 0) generations are cached: callers that sample
+    expect a fresh response on every call, not the first one served forever.
+    """
+    return temperature == 0
+
+
+def is_cacheable_response(response: str, json_mode: bool) -> bool:
+    """
+    Never persist malformed JSON; callers would fail on it forever.
+    """
+    if not json_mode:
+        return True
+    try:
+        json.loads(response)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def default_cache_path(filename: str) -> Optional[str]:
+    """
+    Resolves the on-disk location for a cache file.
+    Returns None (memory-only) when CODEALIGN_CACHE_DIR is set to an empty string.
+    """
+    cache_dir = os.getenv("CODEALIGN_CACHE_DIR", DEFAULT_CACHE_DIR)
+    if not cache_dir:
+        return None
+    return os.path.join(cache_dir, filename)
+
+
+class ResponseCache:
+    """
+    LRU memory tier + SQLite disk tier with TTL and size-based eviction.
+    Safe to share between threads.
+    """
+
+    PRUNE_EVERY = 64
+
+    def __init__(self,
+                 path: Optional[str] = None,
+                 namespace: str = "default",
+                 max_memory_entries: int = 512,
+                 max_disk_entries: int = 10000,
+                 ttl_seconds: Optional[float] = 7 * 24 * 3600,
+                 enabled: bool = True):
+        self.path = path
+        self.namespace = namespace
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._disk_failed = False
+        self._sets_since_prune = 0
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "sets": 0, "evictions": 0, "expired": 0}
+
+    # ------------------------------------------------------------------
+    # Disk tier
+    # ------------------------------------------------------------------
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """Opens the SQLite tier on first use. Disk errors degrade to memory-only."""
+        if self._conn is not None or not self.path or self._disk_failed:
+            return self._conn
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS cache_entries (
+                       namespace TEXT NOT NULL,
+                       key TEXT NOT NULL,
+                       value TEXT NOT NULL,
+                       created_at REAL NOT NULL,
+                       accessed_at REAL NOT NULL,
+                       PRIMARY KEY (namespace, key)
+                   )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache_entries (namespace, accessed_at)")
+            conn.commit()
+            self._conn = conn
+        except Exception as e:
+            logger.error(f"Failed to open cache at {self.path}: {e}")
+            self._disk_failed = True
+        return self._conn
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def _prune_disk(self, conn: sqlite3.Connection) -> None:
+        now = time.time()
+        if self.ttl_seconds is not None:
+            cur = conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND created_at < ?",
+                (self.namespace, now - self.ttl_seconds),
+            )
+            self._stats["expired"] += max(cur.rowcount, 0)
+        count = conn.execute("SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)).fetchone()[0]
+        overflow = count - self.max_disk_entries
+        if overflow > 0:
+            conn.execute(
+                """DELETE FROM cache_entries WHERE namespace = ? AND key IN (
+                       SELECT key FROM cache_entries WHERE namespace = ?
+                       ORDER BY accessed_at ASC LIMIT ?
+                   )""",
+                (self.namespace, self.namespace, overflow),
+            )
+            self._stats["evictions"] += overflow
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached value or None. Expired entries count as misses."""
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if not self._expired(created_at, now):
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+                self._stats["expired"] += 1
+
+            conn = self._connect()
+            if conn is not None:
+                try:
+                    row = conn.execute(
+                        "SELECT value, created_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                        (self.namespace, key),
+                    ).fetchone()
+                    if row is not None:
+                        value, created_at = row
+                        if not self._expired(created_at, now):
+                            conn.execute(
+                                "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                                (now, self.namespace, key),
+                            )
+                            conn.commit()
+                            self._remember(key, value, created_at)
+                            self._stats["disk_hits"] += 1
+                            return value
+                        conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+                        conn.commit()
+                        self._stats["expired"] += 1
+                except sqlite3.Error as e:
+                    logger.warning(f"Cache read failed: {e}")
+
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, key: str, value: str) -> None:
+        """Stores a value in both tiers."""
+        if not self.enabled or value is None:
+            return
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            self._stats["sets"] += 1
+            conn = self._connect()
+            if conn is None:
+                return
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache_entries (namespace, key, value, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                    (self.namespace, key, value, now, now),
+                )
+                self._sets_since_prune += 1
+                if self._sets_since_prune >= self.PRUNE_EVERY:
+                    self._prune_disk(conn)
+                    self._sets_since_prune = 0
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Cache write failed: {e}")
+
+    def _remember(self, key: str, value: str, created_at: float) -> None:
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def invalidate(self, key: str) -> None:
+        """Drops a single entry from both tiers."""
+        with self._lock:
+            self._memory.pop(key, None)
+            conn = self._connect()
+            if conn is not None:
+                conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+                conn.commit()
+
+    def clear(self) -> None:
+        """Drops every entry in this namespace."""
+        with self._lock:
+            self._memory.clear()
+            conn = self._connect()
+            if conn is not None:
+                conn.execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+                conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this cache instance."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["hits"] = stats["memory_hits"] + stats["disk_hits"]
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+            stats["memory_entries"] = len(self._memory)
+            stats["enabled"] = self.enabled
+            return stats
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,168 @@
+"""
+Command-line entry point.
+
+    codealign batch --problem examples/problem_lis.md --submissions examples/sample_submissions.json
+    codealign bench --cohort-size 10000 --latency-ms 200 --error-rate 0.02
+    codealign stats --results results.jsonl
+    codealign cohort-similarity --problem-id lis --matrix lis_matrix.npz --out lis_clusters.json
+"""
+import sys
+import json
+import argparse
+from typing import List, Optional
+
+from .batch import evaluate_batch, load_submissions, DEFAULT_BATCH_WORKERS
+from .authenticity.embedding_queue import flush_embedding_queue
+from .pipeline import EVALUATION_MODES
+
+
+def _read_problem(path: str) -> str:
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def run_batch(args: argparse.Namespace) -> int:
+    problem_text = _read_problem(args.problem)
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    failures = 0
+    try:
+        for result in evaluate_batch(
+            problem_text,
+            load_submissions(args.submissions),
+            problem_id=args.problem_id,
+            language=args.language,
+            max_workers=args.workers,
+            check_authenticity=not args.no_authenticity,
+            mode=args.mode,
+        ):
+            failures += "error" in result
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        # The embedding worker is a daemon thread: write what it still holds before exiting
+        flush_embedding_queue()
+    return 1 if failures else 0
+
+
+def run_bench(args: argparse.Namespace) -> int:
+    from .benchmark import run_benchmarks, format_report
+
+    report = run_benchmarks(
+        cohort_size=args.cohort_size,
+        queries=args.queries,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        seed=args.seed,
+        scenarios=args.scenarios.split(","),
+        track_memory=args.memory,
+        examples_dir=args.examples_dir,
+    )
+    print(format_report(report))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+def run_cohort_similarity(args: argparse.Namespace) -> int:
+    from .authenticity.cohort import run_cohort_similarity as run_job
+
+    submissions = load_submissions(args.submissions) if args.submissions else None
+    report = run_job(
+        problem_id=args.problem_id,
+        submissions=submissions,
+        matrix_path=args.matrix,
+        threshold=args.threshold,
+        workers=args.workers,
+        min_similarity=args.prune,
+    )
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    return 0
+
+
+def run_stats(args: argparse.Namespace) -> int:
+    from .cohort_analytics import CohortStats
+
+    summary = CohortStats.from_results(load_submissions(args.results)).summary(outlier_threshold=args.outlier_z)
+    json.dump(summary, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="codealign", description="CodeAlign command-line tools.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    batch = subparsers.add_parser("batch", help="Evaluate a cohort of submissions against one problem (JSONL output).")
+    batch.add_argument("--problem", required=True, help="Path to the problem statement (text/markdown).")
+    batch.add_argument("--submissions", required=True,
+                       help="Directory of source files, a JSONL file, or a JSON array of {id, code} records.")
+    batch.add_argument("--out", help="Write JSONL results here instead of stdout.")
+    batch.add_argument("--workers", type=int, default=DEFAULT_BATCH_WORKERS, help="Submissions evaluated concurrently.")
+    batch.add_argument("--language", default="Python", help="Default language when a record does not specify one.")
+    batch.add_argument("--problem-id", default="default", help="Cohort id used for plagiarism comparison.")
+    batch.add_argument("--no-authenticity", action="store_true", help="Skip the similarity stage.")
+    batch.add_argument("--mode", choices=EVALUATION_MODES, default=None,
+                       help="two_call (separate alignment and AI-signal calls) or fused (one call); "
+                            "defaults to CODEALIGN_EVALUATION_MODE.")
+    batch.set_defaults(handler=run_batch)
+
+    from .benchmark import SCENARIOS, DEFAULT_EXAMPLES_DIR
+
+    bench = subparsers.add_parser("bench", help="Offline benchmarks against a fake LLM (no API keys needed).")
+    bench.add_argument("--cohort-size", type=int, default=1000, help="Synthetic submissions to ingest.")
+    bench.add_argument("--queries", type=int, default=100, help="Similarity searches / authenticity requests.")
+    bench.add_argument("--batch-size", type=int, default=100, help="Submissions graded in the batch scenario.")
+    bench.add_argument("--workers", type=int, default=DEFAULT_BATCH_WORKERS, help="Batch worker pool size.")
+    bench.add_argument("--latency-ms", type=float, default=0.0, help="Mean fake LLM latency per call.")
+    bench.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform +/- jitter on the fake latency.")
+    bench.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake LLM calls that fail.")
+    bench.add_argument("--seed", type=int, default=0)
+    bench.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"Comma-separated subset of {','.join(SCENARIOS)}.")
+    bench.add_argument("--memory", action="store_true", help="Track peak Python heap per scenario (slower).")
+    bench.add_argument("--examples-dir", default=DEFAULT_EXAMPLES_DIR)
+    bench.add_argument("--json", help="Also write the full report as JSON.")
+    bench.set_defaults(handler=run_bench)
+
+    from .cohort_analytics import OUTLIER_Z
+
+    stats = subparsers.add_parser("stats", help="Score distributions, fulfillment rates and outliers of batch results.")
+    stats.add_argument("--results", required=True, help="JSONL output of `codealign batch` (or a JSON array of results).")
+    stats.add_argument("--outlier-z", type=float, default=OUTLIER_Z, help="|z| at or above this marks an outlier.")
+    stats.set_defaults(handler=run_stats)
+
+    from .authenticity.cohort import (DEFAULT_CLUSTER_THRESHOLD, DEFAULT_COHORT_WORKERS,
+                                      DEFAULT_PRUNE_SIMILARITY)
+
+    cohort = subparsers.add_parser("cohort-similarity",
+                                   help="All-pairs similarity matrix and clusters of similar submissions for a problem.")
+    cohort.add_argument("--problem-id", default="default", help="Stored cohort to compare.")
+    cohort.add_argument("--submissions", help="Compare these records (file/directory as for batch) instead of the store.")
+    cohort.add_argument("--matrix", help="Save the sparse similarity matrix here (.npz).")
+    cohort.add_argument("--out", help="Write the JSON cluster report here instead of stdout.")
+    cohort.add_argument("--threshold", type=float, default=DEFAULT_CLUSTER_THRESHOLD,
+                        help="Pairs at or above this similarity link submissions into a cluster.")
+    cohort.add_argument("--prune", type=float, default=DEFAULT_PRUNE_SIMILARITY,
+                        help="Skip pairs whose fingerprint overlap is below this.")
+    cohort.add_argument("--workers", type=int, default=DEFAULT_COHORT_WORKERS, help="Worker processes.")
+    cohort.set_defaults(handler=run_cohort_similarity)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
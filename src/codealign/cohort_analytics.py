@@ -0,0 +1,271 @@
+"""
+Columnar cohort analytics over evaluation results.
+
+Each result becomes one row of a float64 score matrix (the four dimensions,
+the overall score and the authenticity risk) and one row of a requirement
+fulfillment matrix (1.0 fulfilled, 0.5 partial, 0.0 missing, NaN not
+assessed). Distributions, percentiles, z-scores and outliers are computed on
+whole columns at once. Rows are appended into pre-allocated arrays and the
+running sums behind mean/std and fulfillment rates are updated per result, so
+a new submission costs O(columns) rather than a recomputation of the cohort.
+"""
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .cohort_stats import DIMENSIONS, SCORE_WEIGHTS
+
+COLUMNS = DIMENSIONS + ("overall_score", "authenticity_risk")
+PERCENTILES = (10, 25, 50, 75, 90)
+HISTOGRAM_BINS = np.linspace(0, 100, 11)
+OUTLIER_Z = float(os.getenv("CODEALIGN_OUTLIER_Z", "2.5"))
+# Too few results for a meaningful standard deviation
+MIN_OUTLIER_COHORT = 5
+
+# Alignment statuses (see ALIGNMENT_TEMPLATE); anything else counts as not assessed
+STATUS_VALUES = {"fulfilled": 1.0, "partial": 0.5, "missing": 0.0}
+
+
+def score_matrix(alignments: Iterable[Dict[str, Any]]) -> np.ndarray:
+    """(n, 4) matrix of dimension scores from alignment results ({"scores": {...}})."""
+    rows = [[(a.get("scores", {}).get(dim) or {}).get("score", 0) for dim in DIMENSIONS] for a in alignments]
+    return np.asarray(rows, dtype=np.float64).reshape(-1, len(DIMENSIONS))
+
+
+def calculate_scores(alignments: Iterable[Dict[str, Any]]) -> np.ndarray:
+    """Vectorized calculate_score: final weighted score of every alignment result."""
+    return np.round(score_matrix(alignments) @ np.asarray(SCORE_WEIGHTS), 1)
+
+
+def _score_row(result: Dict[str, Any]) -> np.ndarray:
+    breakdown = result.get("breakdown") or {}
+    detailed = result.get("detailed_scores") or {}
+    row = np.empty(len(COLUMNS), dtype=np.float64)
+    for i, dim in enumerate(DIMENSIONS):
+        value = breakdown.get(dim)
+        if value is None:
+            value = (detailed.get(dim) or {}).get("score", 0)
+        row[i] = float(value)
+    overall = result.get("overall_score")
+    row[len(DIMENSIONS)] = float(overall) if overall is not None else float(row[:len(DIMENSIONS)] @ SCORE_WEIGHTS)
+    row[len(DIMENSIONS) + 1] = float(result.get("authenticity_risk") or 0.0)
+    return row
+
+
+def _status_value(status: Any) -> float:
+    return STATUS_VALUES.get(str(status or "").strip().lower(), np.nan)
+
+
+class CohortStats:
+    """
+    Evaluation results of one problem, stored column-wise. Results are keyed by
+    submission id (or student id), so a resubmission replaces the earlier row.
+    """
+
+    def __init__(self, capacity: int = 64):
+        self._scores = np.zeros((capacity, len(COLUMNS)), dtype=np.float64)
+        self._requirements: List[str] = []
+        self._req_index: Dict[str, int] = {}
+        self._fulfillment = np.full((capacity, 0), np.nan, dtype=np.float32)
+        self._keys: List[str] = []
+        self._rows: Dict[str, int] = {}
+        # Running sums, updated on every add
+        self._sum = np.zeros(len(COLUMNS))
+        self._sumsq = np.zeros(len(COLUMNS))
+        self._req_sum = np.zeros(0)
+        self._req_count = np.zeros(0)
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_results(cls, results: Iterable[Dict[str, Any]]) -> "CohortStats":
+        stats = cls()
+        for result in results:
+            stats.add(result)
+        return stats
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @property
+    def ids(self) -> List[str]:
+        return list(self._keys)
+
+    @property
+    def requirements(self) -> List[str]:
+        return list(self._requirements)
+
+    @property
+    def scores(self) -> np.ndarray:
+        """(n, len(COLUMNS)) view of the score columns."""
+        return self._scores[:len(self._keys)]
+
+    @property
+    def fulfillment(self) -> np.ndarray:
+        """(n, requirements) view of the fulfillment matrix."""
+        return self._fulfillment[:len(self._keys)]
+
+    # ------------------------------------------------------------------
+    # Incremental updates
+    # ------------------------------------------------------------------
+    def _grow(self, rows: int, requirements: int) -> None:
+        capacity, width = self._fulfillment.shape
+        if rows > capacity:
+            new_capacity = max(rows, capacity * 2)
+            self._scores = np.vstack([self._scores, np.zeros((new_capacity - capacity, len(COLUMNS)))])
+            self._fulfillment = np.vstack([self._fulfillment,
+                                           np.full((new_capacity - capacity, width), np.nan, dtype=np.float32)])
+        if requirements > width:
+            extra = requirements - width
+            self._fulfillment = np.hstack([self._fulfillment,
+                                           np.full((self._fulfillment.shape[0], extra), np.nan, dtype=np.float32)])
+            self._req_sum = np.concatenate([self._req_sum, np.zeros(extra)])
+            self._req_count = np.concatenate([self._req_count, np.zeros(extra)])
+
+    def _fulfillment_row(self, result: Dict[str, Any]) -> np.ndarray:
+        for item in result.get("alignment_details") or []:
+            name = item.get("requirement")
+            if name and name not in self._req_index:
+                self._req_index[name] = len(self._requirements)
+                self._requirements.append(name)
+        self._grow(len(self._keys) + 1, len(self._requirements))
+        row = np.full(len(self._requirements), np.nan, dtype=np.float32)
+        for item in result.get("alignment_details") or []:
+            if item.get("requirement") in self._req_index:
+                row[self._req_index[item["requirement"]]] = _status_value(item.get("status"))
+        return row
+
+    def _apply(self, slot: int, sign: float) -> None:
+        scores = self._scores[slot]
+        self._sum += sign * scores
+        self._sumsq += sign * scores * scores
+        row = self._fulfillment[slot, :len(self._requirements)]
+        assessed = ~np.isnan(row)
+        self._req_sum[assessed] += sign * row[assessed]
+        self._req_count[assessed] += sign
+
+    def add(self, result: Dict[str, Any], key: Optional[str] = None) -> bool:
+        """
+        Adds (or replaces) one evaluation result. Results with an "error" are
+        skipped; returns whether the result was recorded.
+        """
+        if result.get("error"):
+            return False
+        key = key or result.get("id") or result.get("student_id") or f"#{len(self._keys)}"
+        with self._lock:
+            fulfillment = self._fulfillment_row(result)
+            slot = self._rows.get(key)
+            if slot is None:
+                slot = len(self._keys)
+                self._keys.append(key)
+                self._rows[key] = slot
+            else:
+                self._apply(slot, -1.0)
+            self._scores[slot] = _score_row(result)
+            self._fulfillment[slot, :len(fulfillment)] = fulfillment
+            self._apply(slot, 1.0)
+        return True
+
+    # ------------------------------------------------------------------
+    # Vectorized analytics
+    # ------------------------------------------------------------------
+    def mean(self) -> np.ndarray:
+        n = len(self._keys)
+        return self._sum / n if n else np.zeros(len(COLUMNS))
+
+    def std(self) -> np.ndarray:
+        """Population standard deviation per column, from the running sums."""
+        n = len(self._keys)
+        if not n:
+            return np.zeros(len(COLUMNS))
+        variance = self._sumsq / n - (self._sum / n) ** 2
+        return np.sqrt(np.maximum(variance, 0.0))
+
+    def z_scores(self) -> np.ndarray:
+        """(n, len(COLUMNS)) z-scores; 0 for columns without spread."""
+        std = self.std()
+        return np.divide(self.scores - self.mean(), std, out=np.zeros_like(self.scores), where=std > 0)
+
+    def percentile_ranks(self, result: Dict[str, Any]) -> Dict[str, float]:
+        """Share of the cohort (0..100) scoring strictly below `result` in each column."""
+        with self._lock:
+            if not self._keys:
+                return {c: 0.0 for c in COLUMNS}
+            ranks = (self.scores < _score_row(result)).mean(axis=0) * 100
+            return {c: round(float(r), 1) for c, r in zip(COLUMNS, ranks)}
+
+    def fulfillment_rates(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            rates = np.divide(self._req_sum, self._req_count, out=np.zeros_like(self._req_sum), where=self._req_count > 0)
+            return {name: {"rate": round(float(rates[i]), 4), "assessed": int(self._req_count[i])}
+                    for i, name in enumerate(self._requirements)}
+
+    def outliers(self, threshold: float = OUTLIER_Z) -> List[Dict[str, Any]]:
+        """Every (submission, column) with |z| >= threshold, most extreme first."""
+        with self._lock:
+            if len(self._keys) < MIN_OUTLIER_COHORT:
+                return []
+            z = self.z_scores()
+            rows, cols = np.nonzero(np.abs(z) >= threshold)
+            order = np.argsort(-np.abs(z[rows, cols]), kind="stable")
+            return [{
+                "id": self._keys[rows[k]],
+                "dimension": COLUMNS[cols[k]],
+                "score": float(self.scores[rows[k], cols[k]]),
+                "z": round(float(z[rows[k], cols[k]]), 3),
+            } for k in order]
+
+    def summary(self, outlier_threshold: float = OUTLIER_Z) -> Dict[str, Any]:
+        """Distributions, fulfillment rates and outliers, computed on one consistent snapshot."""
+        # add() may run concurrently (e.g. /evaluate while /cohort_stats reads)
+        with self._lock:
+            n = len(self._keys)
+            distributions = {}
+            if n:
+                scores = self.scores
+                percentiles = np.percentile(scores, PERCENTILES, axis=0)
+                minimum, maximum = scores.min(axis=0), scores.max(axis=0)
+                mean, std = self.mean(), self.std()
+                for i, column in enumerate(COLUMNS):
+                    counts, _ = np.histogram(np.clip(scores[:, i], 0, 100), bins=HISTOGRAM_BINS)
+                    distributions[column] = {
+                        "mean": round(float(mean[i]), 2),
+                        "std": round(float(std[i]), 2),
+                        "min": float(minimum[i]),
+                        "max": float(maximum[i]),
+                        "percentiles": {f"p{p}": round(float(v), 2) for p, v in zip(PERCENTILES, percentiles[:, i])},
+                        "histogram": counts.tolist(),
+                    }
+            return {
+                "count": n,
+                "distributions": distributions,
+                "requirements": self.fulfillment_rates(),
+                "outliers": self.outliers(outlier_threshold),
+            }
+
+
+# ----------------------------------------------------------------------
+# Per-problem registry, updated as results land
+# ----------------------------------------------------------------------
+
+_cohorts: Dict[str, CohortStats] = {}
+_registry_lock = threading.Lock()
+
+
+def get_cohort(problem_id: str) -> CohortStats:
+    with _registry_lock:
+        cohort = _cohorts.get(problem_id)
+        if cohort is None:
+            cohort = _cohorts[problem_id] = CohortStats()
+        return cohort
+
+
+def record_result(problem_id: str, result: Dict[str, Any], key: Optional[str] = None) -> bool:
+    """Incremental update of the problem's cohort with one new evaluation result."""
+    return get_cohort(problem_id).add(result, key=key)
+
+
+def reset() -> None:
+    with _registry_lock:
+        _cohorts.clear()
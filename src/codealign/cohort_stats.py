@@ -1,10 +1,18 @@
-from typing import List, Dict, Any
+from typing import Iterable, List, Dict, Any
 
-def calculate_cohort_stats(submissions):
+# Scored dimensions and their weight in the final score
+DIMENSIONS = ("correctness", "time_efficiency", "space_efficiency", "readability")
+SCORE_WEIGHTS = (0.4, 0.2, 0.2, 0.2)
+
+def calculate_cohort_stats(submissions: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
     """
-    Placeholder for cohort stats aggregation.
+    Cohort analytics over evaluation results (the /evaluate or batch result dicts):
+    per-dimension distributions and percentiles, requirement fulfillment rates and
+    z-score outliers. See codealign.cohort_analytics (NumPy, imported on demand).
     """
-    pass
+    from .cohort_analytics import CohortStats
+
+    return CohortStats.from_results(submissions).summary()
 
 def calculate_score(alignment_data: Dict[str, Any], risk_score: float = 0.0) -> Dict[str, Any]:
     """
@@ -12,14 +20,11 @@ def calculate_score(alignment_data: Dict[str, Any], risk_score: float = 0.0) ->
     """
     scores = alignment_data.get("scores", {})
     
-    s_corr = scores.get("correctness", {}).get("score", 0)
-    s_time = scores.get("time_efficiency", {}).get("score", 0)
-    s_space = scores.get("space_efficiency", {}).get("score", 0)
-    s_read = scores.get("readability", {}).get("score", 0)
+    s_corr, s_time, s_space, s_read = (scores.get(dim, {}).get("score", 0) for dim in DIMENSIONS)
     
     # Weighted Average
     # Correctness: 40%, Time: 20%, Space: 20%, Readability: 20%
-    base_score = (s_corr * 0.4) + (s_time * 0.2) + (s_space * 0.2) + (s_read * 0.2)
+    base_score = sum(s * w for s, w in zip((s_corr, s_time, s_space, s_read), SCORE_WEIGHTS))
     
     # Authenticity is now reported separately, NOT as a penalty.
     # We return risk_score for the UI to display as a flag.
@@ -0,0 +1,445 @@
+"""
+Provider dispatch policy for the LLM clients.
+
+Instead of trying the backup provider only after the primary has fully failed,
+a Dispatcher bounds tail latency with:
+
+- a per-call deadline (the caller gets None, as if every provider failed);
+- hedging: the backup fires once the primary has been running longer than its
+  recent latency percentile (or immediately if the primary fails);
+- racing: every provider starts at once;
+- first valid response wins (non-empty, and parseable JSON in json_mode);
+- a circuit breaker per provider that skips it while its recent error rate is high.
+
+Modes: "sequential" (default, the original behaviour), "hedge" and "race".
+Sync provider calls cannot be cancelled once started, so a losing or timed-out
+call keeps its executor thread until it returns. Hedging and racing are
+therefore opt-in, and they stop overlapping calls while
+CODEALIGN_LLM_HEDGE_MAX_INFLIGHT sync calls are in flight; the next provider
+then starts only when the previous one fails.
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+from . import metrics
+from .cache import is_cacheable_response
+
+logger = logging.getLogger(__name__)
+
+MODES = ("sequential", "hedge", "race")
+# Sync calls in flight (abandoned ones included) above which no call is overlapped
+HEDGE_MAX_INFLIGHT = int(os.getenv("CODEALIGN_LLM_HEDGE_MAX_INFLIGHT", "16"))
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+class DispatchPolicy:
+    """
+    Dispatch knobs; every field can be set through CODEALIGN_LLM_* environment variables.
+    A deadline of 0 disables it.
+    """
+
+    def __init__(self,
+                 mode: Optional[str] = None,
+                 deadline_seconds: Optional[float] = None,
+                 hedge_percentile: Optional[float] = None,
+                 hedge_delay_seconds: Optional[float] = None,
+                 hedge_min_samples: int = 20,
+                 breaker_error_rate: Optional[float] = None,
+                 breaker_min_calls: int = 5,
+                 breaker_window: int = 20,
+                 breaker_cooldown_seconds: Optional[float] = None):
+        self.mode = mode or os.getenv("CODEALIGN_LLM_DISPATCH", "sequential")
+        if self.mode not in MODES:
+            raise ValueError(f"Unknown dispatch mode '{self.mode}' (choose from {MODES})")
+        deadline = deadline_seconds if deadline_seconds is not None else _env_float("CODEALIGN_LLM_DEADLINE", 60.0)
+        self.deadline_seconds = deadline if deadline > 0 else None
+        self.hedge_percentile = hedge_percentile or _env_float("CODEALIGN_LLM_HEDGE_PERCENTILE", 0.95)
+        # Used until the primary has `hedge_min_samples` successful calls to learn from
+        self.hedge_delay_seconds = hedge_delay_seconds if hedge_delay_seconds is not None else _env_float("CODEALIGN_LLM_HEDGE_DELAY", 5.0)
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker_error_rate = breaker_error_rate or _env_float("CODEALIGN_LLM_BREAKER_ERROR_RATE", 0.5)
+        self.breaker_min_calls = breaker_min_calls
+        self.breaker_window = breaker_window
+        self.breaker_cooldown_seconds = breaker_cooldown_seconds if breaker_cooldown_seconds is not None else _env_float("CODEALIGN_LLM_BREAKER_COOLDOWN", 30.0)
+
+
+class CircuitBreaker:
+    """
+    Rolling-window breaker. Opens when the error rate over the last `window` calls
+    reaches `error_rate` (after `min_calls`); after `cooldown` one trial call is let
+    through (half-open) and its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, error_rate: float, min_calls: int, window: int, cooldown: float,
+                 clock: Callable[[], float] = time.monotonic):
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self._clock = clock
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._opened_at: Optional[float] = None
+        self._trial_started_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half_open" if self._clock() - self._opened_at >= self.cooldown else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = self._clock()
+            if now - self._opened_at < self.cooldown:
+                return False
+            # One trial at a time; a trial that never reported (e.g. cancelled) expires after a cooldown
+            if self._trial_started_at is not None and now - self._trial_started_at < self.cooldown:
+                return False
+            self._trial_started_at = now
+            return True
+
+    def record(self, success: bool) -> None:
+        with self._lock:
+            if self._opened_at is not None:
+                if self._trial_started_at is None:
+                    # A call started before the breaker opened; don't let it decide the trial
+                    return
+                self._trial_started_at = None
+                if success:
+                    self._opened_at = None
+                    self._outcomes.clear()
+                else:
+                    self._opened_at = self._clock()
+                return
+            self._outcomes.append(success)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.error_rate:
+                self._opened_at = self._clock()
+
+
+class ProviderState:
+    """Latency samples, breaker and counters for one provider."""
+
+    COUNTERS = ("calls", "successes", "errors", "invalid", "wins", "hedged", "breaker_skips", "abandoned")
+
+    def __init__(self, name: str, policy: DispatchPolicy):
+        self.name = name
+        self.breaker = CircuitBreaker(policy.breaker_error_rate, policy.breaker_min_calls,
+                                      policy.breaker_window, policy.breaker_cooldown_seconds)
+        self.latencies: Deque[float] = deque(maxlen=256)
+        self.counts = {k: 0 for k in self.COUNTERS}
+        self._lock = threading.Lock()
+
+    def bump(self, counter: str) -> None:
+        with self._lock:
+            self.counts[counter] += 1
+
+    def observe(self, latency: float, outcome: str) -> None:
+        with self._lock:
+            self.counts["calls"] += 1
+            self.counts["successes" if outcome == "success" else outcome] += 1
+            if outcome == "success":
+                self.latencies.append(latency)
+        self.breaker.record(outcome == "success")
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self.latencies)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def snapshot(self) -> Dict[str, Any]:
+        p50, p95 = self.percentile(0.5), self.percentile(0.95)
+        with self._lock:
+            data = dict(self.counts)
+        data.update({
+            "breaker": self.breaker.state,
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        })
+        return data
+
+
+def is_valid_response(response: Optional[str], json_mode: bool) -> bool:
+    return bool(response) and is_cacheable_response(response, json_mode)
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_inflight = 0
+
+
+def _call_done(_future: Future) -> None:
+    global _inflight
+    with _executor_lock:
+        _inflight -= 1
+
+
+def _submit(fn: Callable[..., Any], *args: Any) -> Future:
+    """Runs fn on the shared pool, counting it as in flight until it returns (or is cancelled)."""
+    global _inflight
+    with _executor_lock:
+        _inflight += 1
+    future = _get_executor().submit(fn, *args)
+    future.add_done_callback(_call_done)
+    return future
+
+
+def _may_overlap() -> bool:
+    return _inflight < HEDGE_MAX_INFLIGHT
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Shared pool for sync provider calls; abandoned (timed-out/losing) calls finish here."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv("CODEALIGN_LLM_DISPATCH_WORKERS", "32")),
+                    thread_name_prefix="codealign-llm",
+                )
+    return _executor
+
+
+class Dispatcher:
+    """
+    Runs one generation across providers according to a DispatchPolicy.
+    `calls` is an ordered list of (provider_name, zero-arg callable); the first is the primary.
+    Sync callables return the text or raise; async callables return awaitables.
+    """
+
+    def __init__(self, policy: Optional[DispatchPolicy] = None):
+        self.policy = policy or DispatchPolicy()
+        self._providers: Dict[str, ProviderState] = {}
+        self._lock = threading.Lock()
+        self.counts = {"requests": 0, "deadline_exceeded": 0, "all_failed": 0, "fallback_wins": 0,
+                       "hedges_suppressed": 0}
+
+    def provider(self, name: str) -> ProviderState:
+        with self._lock:
+            state = self._providers.get(name)
+            if state is None:
+                state = self._providers[name] = ProviderState(name, self.policy)
+            return state
+
+    def _bump(self, counter: str) -> None:
+        with self._lock:
+            self.counts[counter] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            data = dict(self.counts)
+            providers = list(self._providers.values())
+        data["mode"] = self.policy.mode
+        data["deadline_seconds"] = self.policy.deadline_seconds
+        data["providers"] = {p.name: p.snapshot() for p in providers}
+        return data
+
+    # ------------------------------------------------------------------
+    # Scheduling (shared by the sync and async loops)
+    # ------------------------------------------------------------------
+    def _admit(self, calls: Sequence[Tuple[str, Any]]) -> List[Tuple[str, Any]]:
+        """Drops providers whose breaker is open; keeps the last resort if all are open."""
+        admitted = []
+        for name, call in calls:
+            state = self.provider(name)
+            if state.breaker.allow():
+                admitted.append((name, call))
+            else:
+                state.bump("breaker_skips")
+                metrics.LLM_BREAKER_SKIPS.inc(provider=name)
+        if not admitted and calls:
+            admitted = [calls[-1]]
+        return admitted
+
+    def _hedge_delay(self, primary: str) -> float:
+        state = self.provider(primary)
+        if len(state.latencies) >= self.policy.hedge_min_samples:
+            return state.percentile(self.policy.hedge_percentile) or self.policy.hedge_delay_seconds
+        return self.policy.hedge_delay_seconds
+
+    def _next_launch_at(self, start: float, launched: int, running: int, queued: int, primary: str) -> Optional[float]:
+        """When the next queued provider should start, None if only on failure."""
+        if not queued:
+            return None
+        if self.policy.mode == "race" or running == 0:
+            return start
+        if self.policy.mode == "hedge" and launched == 1:
+            return start + self._hedge_delay(primary)
+        return None
+
+    def _finish(self, name: str, index: int) -> None:
+        self.provider(name).bump("wins")
+        if index > 0:
+            self._bump("fallback_wins")
+            metrics.LLM_FALLBACKS.inc(provider=name)
+
+    def _give_up(self, timed_out: bool) -> None:
+        self._bump("deadline_exceeded" if timed_out else "all_failed")
+        if timed_out:
+            metrics.LLM_DEADLINE_EXCEEDED.inc()
+
+    # ------------------------------------------------------------------
+    # Sync
+    # ------------------------------------------------------------------
+    def run(self, calls: Sequence[Tuple[str, Callable[[], Optional[str]]]], json_mode: bool = False) -> Optional[str]:
+        self._bump("requests")
+        queue = list(enumerate(self._admit(calls)))
+        if not queue:
+            return None
+        primary = queue[0][1][0]
+        start = time.monotonic()
+        deadline = start + self.policy.deadline_seconds if self.policy.deadline_seconds else None
+        running: Dict[Any, Tuple[int, str]] = {}
+        launched = 0
+
+        def launch() -> None:
+            nonlocal launched
+            index, (name, call) = queue.pop(0)
+            if launched:
+                self.provider(name).bump("hedged")
+                metrics.LLM_HEDGES.inc(provider=name)
+            launched += 1
+            future = _submit(contextvars.copy_context().run, self._timed_sync, name, call, json_mode)
+            running[future] = (index, name)
+
+        launch()
+        suppressed = False
+        while running or queue:
+            now = time.monotonic()
+            launch_at = self._next_launch_at(start, launched, len(running), len(queue), primary)
+            if launch_at is not None and running and not _may_overlap():
+                # The pool is busy (e.g. with abandoned calls): only start the next provider on failure
+                launch_at = None
+                if not suppressed:
+                    suppressed = True
+                    self._bump("hedges_suppressed")
+            if launch_at is not None and launch_at <= now:
+                launch()
+                continue
+            waits = [t - now for t in (launch_at, deadline) if t is not None]
+            done, _ = wait(list(running), timeout=max(0.0, min(waits)) if waits else None, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, name = running.pop(future)
+                response = future.result()
+                if response is not None:
+                    self._abandon(running)
+                    self._finish(name, index)
+                    return response
+            if deadline is not None and time.monotonic() >= deadline:
+                self._abandon(running)
+                self._give_up(timed_out=True)
+                return None
+        self._give_up(timed_out=False)
+        return None
+
+    def _timed_sync(self, name: str, call: Callable[[], Optional[str]], json_mode: bool) -> Optional[str]:
+        started = time.monotonic()
+        try:
+            response = call()
+        except Exception as e:
+            logger.warning(f"{name} generation failed: {e}")
+            self.provider(name).observe(time.monotonic() - started, "errors")
+            return None
+        return self._judge(name, response, json_mode, time.monotonic() - started)
+
+    def _judge(self, name: str, response: Optional[str], json_mode: bool, latency: float) -> Optional[str]:
+        if is_valid_response(response, json_mode):
+            self.provider(name).observe(latency, "success")
+            return response
+        self.provider(name).observe(latency, "invalid" if response else "errors")
+        return None
+
+    def _abandon(self, running) -> None:
+        """Losing/timed-out calls: cancelled if still queued in the pool, else left to finish."""
+        for key, (_, name) in running.items():
+            if isinstance(key, Future):
+                key.cancel()
+            self.provider(name).bump("abandoned")
+
+    # ------------------------------------------------------------------
+    # Async
+    # ------------------------------------------------------------------
+    async def run_async(self, calls: Sequence[Tuple[str, Callable[[], Awaitable[Optional[str]]]]],
+                        json_mode: bool = False) -> Optional[str]:
+        self._bump("requests")
+        queue = list(enumerate(self._admit(calls)))
+        if not queue:
+            return None
+        primary = queue[0][1][0]
+        start = time.monotonic()
+        deadline = start + self.policy.deadline_seconds if self.policy.deadline_seconds else None
+        running: Dict[asyncio.Task, Tuple[int, str]] = {}
+        launched = 0
+
+        def launch() -> None:
+            nonlocal launched
+            index, (name, call) = queue.pop(0)
+            if launched:
+                self.provider(name).bump("hedged")
+                metrics.LLM_HEDGES.inc(provider=name)
+            launched += 1
+            running[asyncio.ensure_future(self._timed_async(name, call, json_mode))] = (index, name)
+
+        def cancel_running() -> None:
+            self._abandon(running)
+            for task in running:
+                task.cancel()
+
+        launch()
+        try:
+            while running or queue:
+                now = time.monotonic()
+                launch_at = self._next_launch_at(start, launched, len(running), len(queue), primary)
+                if launch_at is not None and launch_at <= now:
+                    launch()
+                    continue
+                waits = [t - now for t in (launch_at, deadline) if t is not None]
+                done, _ = await asyncio.wait(list(running), timeout=max(0.0, min(waits)) if waits else None,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index, name = running.pop(task)
+                    response = task.result()
+                    if response is not None:
+                        cancel_running()
+                        self._finish(name, index)
+                        return response
+                if deadline is not None and time.monotonic() >= deadline:
+                    cancel_running()
+                    self._give_up(timed_out=True)
+                    return None
+        except asyncio.CancelledError:
+            cancel_running()
+            raise
+        self._give_up(timed_out=False)
+        return None
+
+    async def _timed_async(self, name: str, call: Callable[[], Awaitable[Optional[str]]], json_mode: bool) -> Optional[str]:
+        started = time.monotonic()
+        try:
+            response = await call()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"{name} generation failed: {e}")
+            self.provider(name).observe(time.monotonic() - started, "errors")
+            return None
+        return self._judge(name, response, json_mode, time.monotonic() - started)
@@ -0,0 +1,271 @@
+"""
+Embedding cache keyed by a hash of normalized code.
+
+Students resubmit unchanged code and share boilerplate, so many embedding
+requests repeat up to whitespace and comments. Keys are SHA-256 hashes of the
+embedding model plus the code after normalization (CODEALIGN_EMBEDDING_CACHE_NORMALIZE:
+"exact", "whitespace" or "comments", the default). Vectors are stored as float32
+blobs: an in-process LRU in front of a SQLite table evicted by last access.
+LLMClient and AsyncLLMClient share one process-wide instance, so every
+embedding consumer (ingest, the embedding queue, /check_authenticity) hits the
+same entries.
+"""
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .cache import default_cache_path
+
+logger = logging.getLogger(__name__)
+
+NORMALIZATION_MODES = ("exact", "whitespace", "comments")
+DEFAULT_NORMALIZATION = os.getenv("CODEALIGN_EMBEDDING_CACHE_NORMALIZE", "comments")
+
+_SPACE_RE = re.compile(r"[ \t]+")
+
+
+def normalize_code(code: str, mode: str = DEFAULT_NORMALIZATION, language: str = "Python") -> str:
+    """
+    "whitespace": blank lines and trailing whitespace go, runs of spaces/tabs
+    inside a line collapse to one, and indentation is rewritten as nesting
+    levels (2-space and 4-space styles match). "comments": additionally strips
+    comments, with the rules of the submission's declared language (never
+    guessed: "//" is floor division in Python).
+    """
+    if mode == "exact":
+        return code
+    if mode == "comments":
+        from .prompt_budget import strip_comments
+        code, _ = strip_comments(code, language)
+    out, indents = [], [0]
+    for line in code.split("\n"):
+        text = line.strip()
+        if not text:
+            continue
+        width = len(line.expandtabs(4)) - len(line.expandtabs(4).lstrip())
+        while width < indents[-1]:
+            indents.pop()
+        if width > indents[-1]:
+            indents.append(width)
+        out.append("\t" * (len(indents) - 1) + _SPACE_RE.sub(" ", text))
+    return "\n".join(out)
+
+
+def pack_vector(vector: Sequence[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def unpack_vector(blob: bytes) -> List[float]:
+    values = array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+class EmbeddingCache:
+    """
+    LRU memory tier + SQLite disk tier of float32 vectors. Safe to share between threads.
+    """
+
+    def __init__(self,
+                 path: Optional[str] = None,
+                 max_memory_entries: int = 2048,
+                 max_disk_entries: int = 50000,
+                 normalization: str = DEFAULT_NORMALIZATION,
+                 enabled: bool = True):
+        if normalization not in NORMALIZATION_MODES:
+            raise ValueError(f"normalization must be one of {NORMALIZATION_MODES}, got {normalization!r}")
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.normalization = normalization
+        self.enabled = enabled
+
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._disk_failed = False
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "sets": 0, "evictions": 0}
+
+    def key(self, text: str, model: str, language: str = "Python") -> str:
+        normalized = normalize_code(text, self.normalization, language)
+        return hashlib.sha256(f"{model}\0{self.normalization}\0{normalized}".encode("utf-8")).hexdigest()
+
+    # ------------------------------------------------------------------
+    # Disk tier
+    # ------------------------------------------------------------------
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """Opens the SQLite tier on first use. Disk errors degrade to memory-only."""
+        if self._conn is not None or not self.path or self._disk_failed:
+            return self._conn
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS embeddings (
+                       key TEXT PRIMARY KEY,
+                       vector BLOB NOT NULL,
+                       accessed_at REAL NOT NULL
+                   )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_accessed ON embeddings (accessed_at)")
+            conn.commit()
+            self._conn = conn
+        except Exception as e:
+            logger.error(f"Failed to open embedding cache at {self.path}: {e}")
+            self._disk_failed = True
+        return self._conn
+
+    def _evict_disk(self, conn: sqlite3.Connection) -> None:
+        overflow = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.max_disk_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,),
+            )
+            self._stats["evictions"] += overflow
+
+    def _remember(self, key: str, blob: bytes) -> None:
+        self._memory[key] = blob
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def get_many(self, keys: Sequence[str]) -> List[Optional[List[float]]]:
+        """Cached vector per key, None for misses."""
+        results: List[Optional[List[float]]] = [None] * len(keys)
+        if not self.enabled:
+            return results
+        with self._lock:
+            disk_lookups: Dict[str, List[int]] = {}
+            touched = set()
+            for i, key in enumerate(keys):
+                blob = self._memory.get(key)
+                if blob is not None:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    results[i] = unpack_vector(blob)
+                    touched.add(key)
+                else:
+                    disk_lookups.setdefault(key, []).append(i)
+
+            conn = self._connect() if keys else None
+            if conn is not None:
+                try:
+                    found: Dict[str, bytes] = {}
+                    pending = list(disk_lookups)
+                    for start in range(0, len(pending), 500):
+                        chunk = pending[start:start + 500]
+                        rows = conn.execute(
+                            f"SELECT key, vector FROM embeddings WHERE key IN ({', '.join('?' for _ in chunk)})", chunk
+                        ).fetchall()
+                        found.update(rows)
+                    # Memory hits refresh the disk recency too, so hot entries are not evicted
+                    touched.update(found)
+                    if touched:
+                        now = time.time()
+                        conn.executemany("UPDATE embeddings SET accessed_at = ? WHERE key = ?",
+                                         [(now, key) for key in touched])
+                        conn.commit()
+                    for key, blob in found.items():
+                        self._remember(key, blob)
+                        vector = unpack_vector(blob)
+                        for i in disk_lookups[key]:
+                            results[i] = vector
+                        self._stats["disk_hits"] += len(disk_lookups[key])
+                except sqlite3.Error as e:
+                    logger.warning(f"Embedding cache read failed: {e}")
+            self._stats["misses"] += sum(1 for r in results if r is None)
+        return results
+
+    def set_many(self, items: Sequence[Tuple[str, Sequence[float]]]) -> None:
+        """Stores (key, vector) pairs; empty vectors (failed embeddings) are skipped."""
+        items = [(key, pack_vector(vector)) for key, vector in items if vector]
+        if not self.enabled or not items:
+            return
+        with self._lock:
+            for key, blob in items:
+                self._remember(key, blob)
+            self._stats["sets"] += len(items)
+            conn = self._connect()
+            if conn is None:
+                return
+            try:
+                now = time.time()
+                conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector, accessed_at) VALUES (?, ?, ?)",
+                                 [(key, blob, now) for key, blob in items])
+                self._evict_disk(conn)
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding cache write failed: {e}")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            conn = self._connect()
+            if conn is not None:
+                conn.execute("DELETE FROM embeddings")
+                conn.commit()
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["hits"] = stats["memory_hits"] + stats["disk_hits"]
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+            stats["memory_entries"] = len(self._memory)
+            stats["enabled"] = self.enabled
+            return stats
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def lookup(cache: "EmbeddingCache", texts: Sequence[str], model: str,
+           language: str = "Python") -> Tuple[List[str], List[Optional[List[float]]], Dict[str, str]]:
+    """
+    (keys, cached vectors or None, {key: text} of distinct misses). Identical
+    normalized texts within one call share a key, so they are embedded once.
+    """
+    keys = [cache.key(text, model, language) for text in texts]
+    found = cache.get_many(keys)
+    missing: Dict[str, str] = {}
+    for key, text, vector in zip(keys, texts, found):
+        if vector is None and key not in missing:
+            missing[key] = text
+    return keys, found, missing
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """The process-wide embedding cache (CODEALIGN_EMBEDDING_CACHE=0 disables it)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache(
+                    path=default_cache_path("embeddings.sqlite"),
+                    max_memory_entries=int(os.getenv("CODEALIGN_EMBEDDING_CACHE_MEMORY_ENTRIES", "2048")),
+                    max_disk_entries=int(os.getenv("CODEALIGN_EMBEDDING_CACHE_MAX_ENTRIES", "50000")),
+                    enabled=os.getenv("CODEALIGN_EMBEDDING_CACHE", "1") != "0",
+                )
+    return _cache
@@ -0,0 +1,142 @@
+"""
+Whole-evaluation result cache.
+
+Regrades, UI reruns and instructor spot-checks evaluate the same code against
+the same problem again. The final evaluation payload is cached under a key
+hashing the problem's requirements, the code (normalized with
+CODEALIGN_EVALUATION_CACHE_NORMALIZE, "whitespace" by default; comments are
+graded, so they stay part of the key), the language, the evaluation mode, the
+prompt version and the LLM model identity. A hit is served without any LLM
+call; only the per-student similarity check (and the authenticity risk
+derived from it) still runs.
+
+The prompt version hashes the prompt templates themselves, so editing a
+template invalidates every entry built with the old one; bump PROMPT_VERSION
+for changes the templates do not show (response parsing, scoring). Entries
+expire after CODEALIGN_EVALUATION_CACHE_TTL seconds, and evaluations where an
+LLM call failed are never stored.
+"""
+import os
+import json
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+from codealign import LLMClient
+from .cache import ResponseCache, default_cache_path, make_key
+from .embedding_cache import normalize_code
+from .alignment import align_reasoner, behaviour_extract
+from .authenticity import ai_signals
+from . import fused
+
+logger = logging.getLogger(__name__)
+
+# Bump when evaluation output changes without a prompt template change
+PROMPT_VERSION = 1
+EVALUATION_NORMALIZATION = os.getenv("CODEALIGN_EVALUATION_CACHE_NORMALIZE", "whitespace")
+DEFAULT_TTL = float(os.getenv("CODEALIGN_EVALUATION_CACHE_TTL", str(7 * 24 * 3600)))
+
+# Fields that depend on the cohort at evaluation time rather than on the code;
+# they are recomputed on every hit
+SIMILARITY_FIELDS = ("max_similarity", "authenticity_risk")
+
+
+def prompt_version() -> str:
+    """PROMPT_VERSION plus a digest of every prompt an evaluation can send."""
+    return make_key(
+        PROMPT_VERSION,
+        align_reasoner.SYSTEM_PROMPT, align_reasoner.ALIGNMENT_TEMPLATE,
+        ai_signals.SYSTEM_PROMPT, ai_signals.TEMPERATURE,
+        fused.SYSTEM_PROMPT, fused.FUSED_TEMPLATE,
+    )[:16]
+
+
+def model_identity() -> Dict[str, str]:
+    return {"groq": LLMClient.GROQ_MODEL, "gemini": LLMClient.GEMINI_MODEL}
+
+
+def evaluation_key(requirements: List[Dict[str, str]], code: str, language: str, mode: str) -> str:
+    return make_key(
+        "evaluation",
+        requirements,
+        make_key(normalize_code(code, EVALUATION_NORMALIZATION, language)),
+        language,
+        mode,
+        prompt_version(),
+        model_identity(),
+    )
+
+
+def is_cacheable(payload: Dict[str, Any], requirements: List[Dict[str, str]]) -> bool:
+    """False when the LLM was unavailable (fallback requirements, missing or failed scores)."""
+    if requirements == behaviour_extract.FALLBACK_REQUIREMENTS:
+        return False
+    scores = payload.get("detailed_scores") or {}
+    if not scores:
+        return False
+    return not any((s or {}).get("reasoning") == "LLM Failed" for s in scores.values())
+
+
+class EvaluationCache:
+    """JSON evaluation payloads in a ResponseCache namespace."""
+
+    def __init__(self, cache: ResponseCache):
+        self.cache = cache
+
+    @property
+    def enabled(self) -> bool:
+        return self.cache.enabled
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self.cache.get(key)
+        if value is None:
+            return None
+        try:
+            return json.loads(value)
+        except ValueError:
+            self.cache.invalidate(key)
+            return None
+
+    def set(self, key: str, payload: Dict[str, Any]) -> None:
+        """Stores the payload without its cohort-dependent similarity fields."""
+        payload = {k: v for k, v in payload.items() if k not in SIMILARITY_FIELDS}
+        self.cache.set(key, json.dumps(payload))
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        """Drops one entry, or every cached evaluation."""
+        if key is None:
+            self.cache.clear()
+        else:
+            self.cache.invalidate(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
+
+
+_cache: Optional[EvaluationCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_evaluation_cache() -> EvaluationCache:
+    """The process-wide evaluation cache (CODEALIGN_EVALUATION_CACHE=0 disables it)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EvaluationCache(ResponseCache(
+                    path=default_cache_path("evaluations.sqlite"),
+                    namespace="evaluations",
+                    max_memory_entries=int(os.getenv("CODEALIGN_EVALUATION_CACHE_MEMORY_ENTRIES", "256")),
+                    max_disk_entries=int(os.getenv("CODEALIGN_EVALUATION_CACHE_MAX_ENTRIES", "20000")),
+                    ttl_seconds=DEFAULT_TTL or None,
+                    enabled=os.getenv("CODEALIGN_EVALUATION_CACHE", "1") != "0",
+                ))
+    return _cache
+
+
+def set_evaluation_cache(cache: Optional[EvaluationCache]) -> Optional[EvaluationCache]:
+    """Swaps the process-wide cache (e.g. for tests); returns the previous one."""
+    global _cache
+    with _cache_lock:
+        previous, _cache = _cache, cache
+    return previous
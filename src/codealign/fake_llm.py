@@ -0,0 +1,233 @@
+"""
+Deterministic, offline stand-in for the Groq/Gemini providers.
+
+Recognizes the repo's prompts (requirements, alignment, AI signals) and returns
+well-formed JSON for each, with configurable latency and error rate, plus
+bag-of-tokens embeddings so near-copies land close together. Used by the
+benchmark suite and tests; never contacts the network.
+"""
+import re
+import json
+import time
+import random
+import asyncio
+import hashlib
+import threading
+import contextlib
+from typing import Any, Dict, Iterator, List, Optional
+
+from . import LLMClient
+from .cache import ResponseCache
+from .embedding_cache import EmbeddingCache
+from .dispatch import Dispatcher, DispatchPolicy
+from .tracing import span, record_llm_call
+
+_TOKEN_RE = re.compile(r"[A-Za-z_]\w*|\d+|\S")
+
+SCORE_DIMENSIONS = ("correctness", "time_efficiency", "space_efficiency", "readability")
+
+
+def fake_embedding(text: str, dim: int = 64) -> List[float]:
+    """Hashed bag-of-tokens vector (unnormalized)."""
+    vector = [0.0] * dim
+    for token in _TOKEN_RE.findall(text):
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], "little") % dim
+        vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+    return vector
+
+
+class FakeProvider:
+    """
+    Shared response logic for the sync and async fakes.
+    `latency_ms` +/- `jitter_ms` is slept per call; `error_rate` of calls fail
+    (returning None, like an exhausted provider chain) and exercise the fallbacks.
+    """
+
+    def __init__(self,
+                 latency_ms: float = 0.0,
+                 jitter_ms: float = 0.0,
+                 error_rate: float = 0.0,
+                 embedding_dim: int = 64,
+                 seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.embedding_dim = embedding_dim
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls: Dict[str, int] = {"requirements": 0, "alignment": 0, "ai_signals": 0, "fused": 0, "other": 0,
+                                      "embedding": 0, "errors": 0}
+
+    def _draw(self) -> tuple:
+        with self._lock:
+            delay = max(0.0, self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000.0
+            failed = self._rng.random() < self.error_rate
+        return delay, failed
+
+    def _count(self, kind: str) -> None:
+        with self._lock:
+            self.calls[kind] += 1
+
+    def classify(self, system_prompt: str) -> str:
+        from .alignment import behaviour_extract, align_reasoner
+        from .authenticity import ai_signals
+        from . import fused
+
+        if system_prompt == behaviour_extract.SYSTEM_PROMPT:
+            return "requirements"
+        if system_prompt == align_reasoner.SYSTEM_PROMPT:
+            return "alignment"
+        if system_prompt == ai_signals.SYSTEM_PROMPT:
+            return "ai_signals"
+        if system_prompt == fused.SYSTEM_PROMPT:
+            return "fused"
+        return "other"
+
+    def respond(self, kind: str, user_prompt: str) -> str:
+        # Scores derive from the prompt hash so repeated runs are reproducible
+        seed = int(hashlib.sha1(user_prompt.encode("utf-8")).hexdigest()[:8], 16)
+        if kind == "requirements":
+            return json.dumps({"requirements": [
+                {"description": "Implement the described function", "type": "functional"},
+                {"description": "Handle empty input", "type": "edge_case"},
+                {"description": "Run in O(n log n) time or better", "type": "constraint"},
+            ]})
+        if kind == "alignment":
+            scores = {dim: {"score": 60 + (seed >> (i * 4)) % 41, "reasoning": "Synthetic score."}
+                      for i, dim in enumerate(SCORE_DIMENSIONS)}
+            return json.dumps({
+                "alignment": [{"requirement": "Implement the described function", "status": "fulfilled",
+                               "evidence": "Synthetic evidence."}],
+                "scores": scores,
+                "feedback": {"strengths": ["Synthetic strength."], "weaknesses": [],
+                             "improvement_suggestions": [], "better_approach": ""},
+            })
+        if kind == "ai_signals":
+            confidence = (seed % 100) / 100.0
+            return json.dumps({"is_suspicious": confidence > 0.7, "confidence": confidence, "signals": []})
+        if kind == "fused":
+            data = json.loads(self.respond("alignment", user_prompt))
+            data["ai_signals"] = json.loads(self.respond("ai_signals", user_prompt))
+            return json.dumps(data)
+        return "OK"
+
+    def generate(self, system_prompt: str, user_prompt: str) -> tuple:
+        """Returns (delay_seconds, response or None)."""
+        delay, failed = self._draw()
+        kind = self.classify(system_prompt)
+        self._count(kind)
+        if failed:
+            self._count("errors")
+            return delay, None
+        return delay, self.respond(kind, user_prompt)
+
+    def embed(self, text: str) -> tuple:
+        delay, failed = self._draw()
+        self._count("embedding")
+        if failed:
+            self._count("errors")
+            return delay, []
+        return delay, fake_embedding(text, self.embedding_dim)
+
+    def embed_many(self, texts: List[str]) -> tuple:
+        """One batched embedding request: a single latency draw and call count for all texts."""
+        delay, failed = self._draw()
+        self._count("embedding")
+        if failed:
+            self._count("errors")
+            return delay, [[] for _ in texts]
+        return delay, [fake_embedding(text, self.embedding_dim) for text in texts]
+
+
+class FakeLLMClient(LLMClient):
+    """Drop-in LLMClient; the response and embedding caches are off by default so every call pays the latency."""
+
+    def __init__(self, provider: Optional[FakeProvider] = None, cache: Optional[ResponseCache] = None,
+                 policy: Optional[DispatchPolicy] = None, embedding_cache: Optional[EmbeddingCache] = None, **kwargs):
+        self.provider = provider or FakeProvider(**kwargs)
+        self.groq_key = self.gemini_key = None
+        self.cache = cache or ResponseCache(path=None, enabled=False)
+        self.embedding_cache = embedding_cache or EmbeddingCache(path=None, enabled=False)
+        self.dispatcher = Dispatcher(policy)
+
+    @property
+    def groq_client(self):
+        return None
+
+    @property
+    def genai(self):
+        return None
+
+    @property
+    def embeddings_available(self) -> bool:
+        return True
+
+    def _provider_calls(self, system_prompt, user_prompt, json_mode, temperature):
+        # A single fake provider, still routed through the dispatcher (deadline, breaker, stats)
+        return [("fake", lambda: self._call_fake(system_prompt, user_prompt))]
+
+    def _call_fake(self, system_prompt: str, user_prompt: str) -> Optional[str]:
+        with span("llm.fake", kind="llm_call") as call:
+            delay, response = self.provider.generate(system_prompt, user_prompt)
+            time.sleep(delay)
+            record_llm_call(call, "fake", "fake", "generate", "success" if response else "error")
+            return response
+
+    def _embed_uncached(self, texts: List[str]) -> List[List[float]]:
+        with span("llm.embedding", kind="llm_call", inputs=len(texts)) as call:
+            delay, embeddings = self.provider.embed_many(texts)
+            time.sleep(delay)
+            record_llm_call(call, "fake", "fake", "embed", "success" if all(embeddings) else "error")
+            return embeddings
+
+
+class FakeAsyncLLMClient:
+    """Drop-in AsyncLLMClient sharing a FakeProvider with the sync fake."""
+
+    def __init__(self, provider: Optional[FakeProvider] = None, **kwargs):
+        self.provider = provider or FakeProvider(**kwargs)
+
+    async def generate_text(self, system_prompt: str, user_prompt: str, json_mode: bool = False,
+                            temperature: float = 0.0, use_cache: bool = True) -> Optional[str]:
+        with span("llm.fake", kind="llm_call") as call:
+            delay, response = self.provider.generate(system_prompt, user_prompt)
+            await asyncio.sleep(delay)
+            record_llm_call(call, "fake", "fake", "generate", "success" if response else "error")
+            return response
+
+    async def get_embedding(self, text: str, language: str = "Python") -> List[float]:
+        with span("llm.embedding", kind="llm_call") as call:
+            delay, embedding = self.provider.embed(text)
+            await asyncio.sleep(delay)
+            record_llm_call(call, "fake", "fake", "embed", "success" if embedding else "error")
+            return embedding
+
+    async def get_embedding_many(self, texts: List[str], language: str = "Python") -> List[List[float]]:
+        with span("llm.embedding", kind="llm_call", inputs=len(texts)) as call:
+            delay, embeddings = self.provider.embed_many(texts)
+            await asyncio.sleep(delay)
+            record_llm_call(call, "fake", "fake", "embed", "success" if all(embeddings) else "error")
+            return embeddings
+
+    async def aclose(self) -> None:
+        pass
+
+
+@contextlib.contextmanager
+def use_fake_llm(provider: Optional[FakeProvider] = None, **kwargs: Any) -> Iterator[FakeProvider]:
+    """
+    Routes codealign.client and the shared async client to a FakeProvider for the
+    duration of the block. Yields the provider (its `calls` counters are live).
+    """
+    import codealign
+    from . import async_client
+
+    provider = provider or FakeProvider(**kwargs)
+    previous = (codealign._client, async_client._async_client)
+    codealign._client = FakeLLMClient(provider)
+    async_client._async_client = FakeAsyncLLMClient(provider)
+    try:
+        yield provider
+    finally:
+        codealign._client, async_client._async_client = previous
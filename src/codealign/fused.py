@@ -0,0 +1,150 @@
+"""
+Fused evaluation: alignment, scores, feedback and AI-signal detection from one LLM call.
+
+The two-call mode (align_spec_code + detect_ai_signals) sends the code twice;
+here a single prompt asks for both and the JSON is validated against the
+pydantic models. Anything that cannot be fused (code too long to send with its
+comments, or a response that fails validation) falls back to the two calls.
+"""
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from codealign import get_client
+from . import metrics
+from .alignment import align_reasoner
+from .alignment.align_reasoner import align_spec_code, align_spec_code_async
+from .alignment.models import AlignmentResult
+from .authenticity.ai_signals import detect_ai_signals, detect_ai_signals_async
+from .authenticity.models import AISignals
+from .prompt_budget import DEFAULT_TOKEN_BUDGET, collapse_whitespace, compact_analysis, compact_json, count_tokens
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT = ("You are a senior technical interviewer evaluating code quality and correctness, "
+                 "and an expert in detecting AI-generated code.")
+
+AI_SIGNALS_SECTION = """
+5. AI-Authorship Signals (not part of the score):
+   - Look for signs the code was generated by an LLM (like ChatGPT, Gemini, etc.):
+     overly verbose or textbook-style comments, generic variable names where context
+     suggests better ones, traces of AI conversation ("Here is the code", "Sure"),
+     perfect, unnatural formatting.
+   - Report is_suspicious, a confidence between 0.0 and 1.0 and the signals found.
+"""
+
+AI_SIGNALS_OUTPUT = """\
+    "ai_signals": {{ "is_suspicious": false, "confidence": 0.1, "signals": ["..."] }},
+"""
+
+
+def _fuse_template(template: str) -> str:
+    # Built from the alignment template so the two modes grade with the same instructions
+    anchors = ("{part_note}", '    "feedback": {{')
+    for anchor in anchors:
+        if anchor not in template:
+            raise RuntimeError(f"Alignment template changed; cannot find {anchor!r}")
+    template = template.replace(anchors[0], AI_SIGNALS_SECTION + anchors[0], 1)
+    return template.replace(anchors[1], AI_SIGNALS_OUTPUT + anchors[1], 1)
+
+
+FUSED_TEMPLATE = _fuse_template(align_reasoner.ALIGNMENT_TEMPLATE)
+
+
+class FusedEvaluation(AlignmentResult):
+    ai_signals: AISignals
+
+
+def build_fused_prompt(requirements: List[Dict[str, str]], code: str, analysis: Dict[str, Any],
+                       language: str = "Python", budget: Optional[int] = None) -> Optional[str]:
+    """
+    The fused user prompt, or None if it does not fit the token budget. Comments are
+    AI signals, so fused prompts are never comment-stripped or chunked.
+    """
+    prompt = FUSED_TEMPLATE.format(language=language, part_note="", requirements=compact_json(requirements),
+                                   analysis=compact_json(compact_analysis(analysis)), code=collapse_whitespace(code))
+    tokens = count_tokens(prompt)
+    if tokens > (budget or DEFAULT_TOKEN_BUDGET):
+        return None
+    metrics.PROMPT_TOKENS.observe(tokens, prompt="fused", compaction="json")
+    return prompt
+
+
+def parse_fused_response(response_text: Optional[str]) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """
+    Validates the fused JSON; returns (alignment_data, ai_signals) shaped like the
+    two-call results, or None if the response is missing or invalid.
+    """
+    if not response_text:
+        return None
+    try:
+        model = FusedEvaluation.model_validate(json.loads(response_text))
+    except (ValueError, ValidationError) as e:
+        logger.warning(f"Fused evaluation response rejected: {e}")
+        return None
+    # The validated values, so lax-mode coercions ("90" -> 90) reach the scorer
+    data = model.model_dump(exclude_unset=True)
+    alignment = {k: data[k] for k in ("alignment", "scores", "feedback") if k in data}
+    return alignment, data["ai_signals"]
+
+
+def _fused(alignment: Dict[str, Any], ai_signals: Dict[str, Any]) -> Dict[str, Any]:
+    return {"alignment": alignment, "ai_signals": ai_signals}
+
+
+def evaluate_fused(requirements: List[Dict[str, str]], code: str, analysis: Dict[str, Any],
+                   language: str = "Python") -> Dict[str, Any]:
+    """
+    Returns {"alignment": ..., "ai_signals": ...} from one LLM call, falling back
+    to align_spec_code + detect_ai_signals when the fused call cannot be used.
+    """
+    prompt = build_fused_prompt(requirements, code, analysis, language)
+    if prompt is None:
+        metrics.FUSED_EVALUATIONS.inc(outcome="over_budget")
+    else:
+        response_text = None
+        try:
+            response_text = get_client().generate_text(SYSTEM_PROMPT, prompt, json_mode=True)
+        except Exception as e:
+            logger.error(f"Fused evaluation failed: {e}")
+        parsed = parse_fused_response(response_text)
+        if parsed is not None:
+            metrics.FUSED_EVALUATIONS.inc(outcome="fused")
+            return _fused(*parsed)
+        metrics.FUSED_EVALUATIONS.inc(outcome="invalid")
+
+    return _fused(align_spec_code(requirements, code, analysis, language=language),
+                  detect_ai_signals(code, language=language))
+
+
+async def evaluate_fused_async(requirements: List[Dict[str, str]], code: str, analysis: Dict[str, Any],
+                               language: str = "Python", llm=None) -> Dict[str, Any]:
+    """
+    Async variant of evaluate_fused using the pooled AsyncLLMClient.
+    """
+    import asyncio
+    from codealign.async_client import get_async_client
+
+    llm = llm or get_async_client()
+    prompt = build_fused_prompt(requirements, code, analysis, language)
+    if prompt is None:
+        metrics.FUSED_EVALUATIONS.inc(outcome="over_budget")
+    else:
+        response_text = None
+        try:
+            response_text = await llm.generate_text(SYSTEM_PROMPT, prompt, json_mode=True)
+        except Exception as e:
+            logger.error(f"Fused evaluation failed: {e}")
+        parsed = parse_fused_response(response_text)
+        if parsed is not None:
+            metrics.FUSED_EVALUATIONS.inc(outcome="fused")
+            return _fused(*parsed)
+        metrics.FUSED_EVALUATIONS.inc(outcome="invalid")
+
+    alignment, ai_signals = await asyncio.gather(
+        align_spec_code_async(requirements, code, analysis, language=language, llm=llm),
+        detect_ai_signals_async(code, llm=llm, language=language),
+    )
+    return _fused(alignment, ai_signals)
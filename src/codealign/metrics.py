@@ -0,0 +1,196 @@
+"""
+Minimal in-process Prometheus metrics (counters and histograms with labels).
+
+Rendered in the Prometheus text exposition format by the /metrics endpoint.
+No client library is required; everything here is thread-safe and cheap to import.
+"""
+import math
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets (seconds) spanning sub-millisecond local work to slow LLM calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """Monotonic counter, one series per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    """Cumulative-bucket histogram, one series per label combination."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series: Dict[LabelValues, List[float]] = {}  # bucket counts..., sum, count
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, **labels: str) -> int:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            return int(series[-1]) if series else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        lines = []
+        for key, series in items:
+            for bound, count in zip(self.buckets, series):
+                le = "+Inf" if math.isinf(bound) else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', le))} {_format_value(count)}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {_format_value(series[-1])}")
+        return lines
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+class Registry:
+    """Named collection of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        """Clears all recorded values (metric definitions are kept)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+
+REGISTRY = Registry()
+
+SPAN_DURATION = REGISTRY.histogram(
+    "codealign_span_duration_seconds", "Duration of traced operations.", ("kind", "name"))
+SPAN_ERRORS = REGISTRY.counter(
+    "codealign_span_errors_total", "Traced operations that raised.", ("kind", "name"))
+LLM_REQUESTS = REGISTRY.counter(
+    "codealign_llm_requests_total", "LLM provider calls by outcome (success, error, empty).", ("provider", "model", "operation", "outcome"))
+LLM_LATENCY = REGISTRY.histogram(
+    "codealign_llm_request_duration_seconds", "LLM provider call latency.", ("provider", "model", "operation"))
+LLM_TOKENS = REGISTRY.counter(
+    "codealign_llm_tokens_total", "Tokens reported by LLM providers.", ("provider", "model", "type"))
+LLM_CACHE = REGISTRY.counter(
+    "codealign_llm_cache_requests_total", "LLM response cache lookups.", ("result",))
+LLM_FALLBACKS = REGISTRY.counter(
+    "codealign_llm_fallbacks_total", "Generations won by a provider other than the primary.", ("provider",))
+LLM_HEDGES = REGISTRY.counter(
+    "codealign_llm_hedges_total", "Backup provider calls started while an earlier provider was still running or after it failed.", ("provider",))
+LLM_BREAKER_SKIPS = REGISTRY.counter(
+    "codealign_llm_breaker_skips_total", "Provider calls skipped because the provider's circuit breaker was open.", ("provider",))
+LLM_DEADLINE_EXCEEDED = REGISTRY.counter(
+    "codealign_llm_deadline_exceeded_total", "Generations abandoned at the per-call deadline.")
+PROMPT_TOKENS = REGISTRY.histogram(
+    "codealign_prompt_tokens", "Estimated user-prompt tokens per LLM call, by compaction level.", ("prompt", "compaction"),
+    buckets=(250, 500, 1000, 2000, 4000, 8000, 16000, 32000))
+FUSED_EVALUATIONS = REGISTRY.counter(
+    "codealign_fused_evaluations_total", "Fused-mode evaluations by outcome (fused, over_budget, invalid).", ("outcome",))
+AI_SIGNALS_ROUTE = REGISTRY.counter(
+    "codealign_ai_signals_route_total", "AI-signal checks decided locally vs. escalated to the LLM.", ("route",))
+
+EVALUATION_CACHE = REGISTRY.counter(
+    "codealign_evaluation_cache_requests_total", "Whole-evaluation result cache lookups.", ("result",))
+
+EMBEDDING_QUEUE = REGISTRY.counter(
+    "codealign_embedding_queue_total", "Queued embeddings by outcome (embedded, retried, failed, unavailable).", ("outcome",))
+EMBEDDING_BATCH_SIZE = REGISTRY.histogram(
+    "codealign_embedding_batch_size", "Inputs per batched embedding request from the queue.",
+    buckets=(1, 2, 5, 10, 25, 50, 100))
+
+
+def render() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,423 @@
+"""
+Stage-graph executor for the evaluation pipeline.
+
+Independent stages (requirement extraction, code analysis, AI-signal detection,
+similarity) run concurrently on a thread pool (or as asyncio tasks); a stage
+starts as soon as the stages it depends on have finished. Finished evaluations
+are kept in the evaluation cache, so re-evaluating the same code against the
+same requirements only re-runs the similarity check.
+"""
+import os
+import asyncio
+import inspect
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from .alignment.behaviour_extract import extract_requirements, extract_requirements_async
+from .alignment.problems import get_registry
+from .alignment.code_analysis import analyze_code
+from .alignment.align_reasoner import align_spec_code, align_spec_code_async
+from .authenticity.ai_signals import detect_ai_signals, detect_ai_signals_async
+from .fused import evaluate_fused, evaluate_fused_async
+from .cohort_stats import calculate_score
+from .evaluation_cache import evaluation_key, get_evaluation_cache, is_cacheable
+from .tracing import span
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = int(os.getenv("CODEALIGN_PIPELINE_WORKERS", "4"))
+
+# "two_call": alignment and AI signals as separate LLM calls; "fused": one call for both
+EVALUATION_MODES = ("two_call", "fused")
+DEFAULT_EVALUATION_MODE = os.getenv("CODEALIGN_EVALUATION_MODE", "two_call")
+
+
+class Stage:
+    """
+    A named unit of work. `func` is called with the results of `deps` as keyword arguments.
+    """
+
+    def __init__(self, name: str, func: Callable[..., Any], deps: Sequence[str] = (), label: Optional[str] = None):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.label = label or name
+
+    def __repr__(self) -> str:
+        return f"Stage({self.name!r}, deps={self.deps!r})"
+
+
+class StageError(Exception):
+    """Raised when a stage fails; wraps the original exception."""
+
+    def __init__(self, stage: str, error: Exception):
+        super().__init__(f"Stage '{stage}' failed: {error}")
+        self.stage = stage
+        self.error = error
+
+
+class AnalysisError(Exception):
+    """Raised when static analysis rejects the submission (e.g. SyntaxError)."""
+
+
+def _validate(stages: List[Stage]) -> List[Stage]:
+    """Checks names and dependencies; returns the stages in a topological order."""
+    names = [s.name for s in stages]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate stage names: {names}")
+    known = set(names)
+    for stage in stages:
+        missing = [d for d in stage.deps if d not in known]
+        if missing:
+            raise ValueError(f"Stage '{stage.name}' depends on unknown stages: {missing}")
+
+    ordered, placed = [], set()
+    remaining = list(stages)
+    while remaining:
+        ready = [s for s in remaining if all(d in placed for d in s.deps)]
+        if not ready:
+            raise ValueError(f"Stage graph has a cycle: {sorted(s.name for s in remaining)}")
+        for stage in ready:
+            ordered.append(stage)
+            placed.add(stage.name)
+        remaining = [s for s in remaining if s.name not in placed]
+    return ordered
+
+
+def _call_stage(stage: Stage, kwargs: Dict[str, Any]) -> Any:
+    with span(f"stage.{stage.name}", kind="stage"):
+        return stage.func(**kwargs)
+
+
+def run_stages(stages: List[Stage],
+               max_workers: int = DEFAULT_MAX_WORKERS,
+               on_complete: Optional[Callable[[Stage, Any], None]] = None) -> Dict[str, Any]:
+    """
+    Runs a stage graph and returns {stage_name: result}.
+
+    `on_complete` is invoked from the calling thread (safe for Streamlit) as each stage finishes.
+    The first failing stage aborts the run with a StageError: stages not yet started are cancelled
+    and stages still running are left to finish in the background, their results discarded.
+    """
+    _validate(stages)
+    results: Dict[str, Any] = {}
+    pending = {s.name: s for s in stages}
+    running = {}
+
+    pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="codealign-stage")
+    try:
+        while pending or running:
+            ready = [s for s in pending.values() if all(d in results for d in s.deps)]
+            for stage in ready:
+                del pending[stage.name]
+                kwargs = {d: results[d] for d in stage.deps}
+                # Copy the context so stage threads record spans on the caller's trace
+                context = contextvars.copy_context()
+                running[pool.submit(context.run, _call_stage, stage, kwargs)] = stage
+
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                try:
+                    results[stage.name] = future.result()
+                except AnalysisError:
+                    raise
+                except Exception as e:
+                    raise StageError(stage.name, e) from e
+                if on_complete:
+                    on_complete(stage, results[stage.name])
+    except BaseException:
+        # Do not block on the slower stages (typically LLM calls) once the run has failed
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+    return results
+
+
+async def run_stages_async(stages: List[Stage],
+                           on_complete: Optional[Callable[[Stage, Any], None]] = None) -> Dict[str, Any]:
+    """
+    Async variant of run_stages. Coroutine functions are awaited on the event loop;
+    plain functions (local CPU work) are offloaded with asyncio.to_thread.
+    """
+    ordered = _validate(stages)
+    tasks: Dict[str, asyncio.Task] = {}
+
+    async def run(stage: Stage) -> Any:
+        kwargs = {d: await tasks[d] for d in stage.deps}
+        try:
+            with span(f"stage.{stage.name}", kind="stage"):
+                if inspect.iscoroutinefunction(stage.func):
+                    result = await stage.func(**kwargs)
+                else:
+                    result = await asyncio.to_thread(stage.func, **kwargs)
+        except AnalysisError:
+            raise
+        except Exception as e:
+            raise StageError(stage.name, e) from e
+        if on_complete:
+            on_complete(stage, result)
+        return result
+
+    for stage in ordered:
+        tasks[stage.name] = asyncio.ensure_future(run(stage))
+    try:
+        await asyncio.gather(*tasks.values())
+    except BaseException:
+        for task in tasks.values():
+            task.cancel()
+        raise
+    return {name: task.result() for name, task in tasks.items()}
+
+
+# ----------------------------------------------------------------------
+# Evaluation pipeline
+# ----------------------------------------------------------------------
+
+def _checked_analysis(code: str, language: str) -> Dict[str, Any]:
+    analysis = analyze_code(code, language=language)
+    if analysis.get("error"):
+        raise AnalysisError(analysis["error"])
+    return analysis
+
+
+def _max_similarity(code: str, student_id: str, problem_id: str, language: str = "Python") -> float:
+    from .authenticity.ingest import ingest_submission
+    from .authenticity.search import search_similar
+
+    try:
+        submission = ingest_submission(code, student_id=student_id, problem_id=problem_id, language=language)
+        # Check against everyone EXCEPT the current student
+        result = search_similar(submission, problem_id, exclude_student_id=student_id)
+        return result["combined_similarity"]
+    except Exception as e:
+        logger.error(f"Auth check failed: {e}")
+        return 0.0
+
+
+def build_evaluation_stages(problem_text: str,
+                            code: str,
+                            language: str = "Python",
+                            student_id: str = "anonymous",
+                            problem_id: str = "default",
+                            include_similarity: bool = False,
+                            use_async: bool = False,
+                            requirements: Optional[List[Dict[str, str]]] = None,
+                            mode: Optional[str] = None) -> List[Stage]:
+    """
+    Dependency graph of a single evaluation. Only alignment waits on other stages.
+    With use_async=True the LLM stages are coroutines for run_stages_async.
+    Requirements are memoized per problem text in the problem registry; pass
+    already-resolved `requirements` to skip the lookup entirely.
+    In "fused" mode a single `evaluation` stage replaces ai_signals and alignment.
+    """
+    mode = mode or DEFAULT_EVALUATION_MODE
+    if mode not in EVALUATION_MODES:
+        raise ValueError(f"Unknown evaluation mode '{mode}' (choose from {EVALUATION_MODES})")
+
+    if use_async:
+        async def requirements_stage():
+            registry = get_registry()
+            cached = registry.cached_requirements(problem_text)
+            if cached is not None:
+                return cached
+            extracted = await extract_requirements_async(problem_text)
+            return registry.remember(problem_text, extracted)["requirements"]
+
+        async def ai_signals_stage():
+            return await detect_ai_signals_async(code, language=language)
+
+        async def alignment_stage(requirements, analysis):
+            return await align_spec_code_async(requirements, code, analysis, language=language)
+
+        async def fused_stage(requirements, analysis):
+            return await evaluate_fused_async(requirements, code, analysis, language=language)
+    else:
+        def requirements_stage():
+            return get_registry().register(problem_text, extract=extract_requirements)["requirements"]
+
+        def ai_signals_stage():
+            return detect_ai_signals(code, language=language)
+
+        def alignment_stage(requirements, analysis):
+            return align_spec_code(requirements, code, analysis, language=language)
+
+        def fused_stage(requirements, analysis):
+            return evaluate_fused(requirements, code, analysis, language=language)
+
+    if requirements is not None:
+        extracted = requirements
+
+        def requirements_stage():
+            return extracted
+
+    stages = [
+        Stage("requirements", requirements_stage, label="Extracting requirements"),
+        Stage("analysis", lambda: _checked_analysis(code, language), label=f"Analyzing {language} code structure"),
+    ]
+    if mode == "fused":
+        stages.append(Stage(
+            "evaluation",
+            fused_stage,
+            deps=("requirements", "analysis"),
+            label="Evaluating alignment, correctness & AI signals",
+        ))
+    else:
+        stages += [
+            Stage("ai_signals", ai_signals_stage, label="Checking AI signals"),
+            Stage(
+                "alignment",
+                alignment_stage,
+                deps=("requirements", "analysis"),
+                label="Evaluating alignment & correctness",
+            ),
+        ]
+    if include_similarity:
+        stages.append(Stage(
+            "similarity",
+            lambda: _max_similarity(code, student_id, problem_id, language),
+            label="Comparing against other submissions",
+        ))
+    return stages
+
+
+def authenticity_risk(ai_signals: Dict[str, Any], similarity: float = 0.0) -> float:
+    return max(similarity * 100, (ai_signals or {}).get('confidence', 0.0) * 100)
+
+
+def apply_similarity(payload: Dict[str, Any], similarity: float) -> Dict[str, Any]:
+    """Adds a (fresh) similarity check to an evaluation payload, e.g. one served from the cache."""
+    payload["max_similarity"] = similarity
+    payload["authenticity_risk"] = authenticity_risk(payload.get("authenticity_signals"), similarity)
+    return payload
+
+
+def stage_results(results: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Raw stage results with a fused `evaluation` stage expanded into its `alignment`
+    and `ai_signals` parts, so callers read both modes the same way.
+    """
+    if "evaluation" in results:
+        return dict(results, **results["evaluation"])
+    return results
+
+
+def build_evaluation_payload(results: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Turns raw stage results into the /evaluate response shape.
+    """
+    results = stage_results(results)
+    alignment_data = results["alignment"]
+    ai_signals = results["ai_signals"]
+    max_sim = results.get("similarity", 0.0)
+
+    risk_score = authenticity_risk(ai_signals, max_sim)
+    score_data = calculate_score(alignment_data, risk_score=risk_score)
+
+    payload = {
+        "overall_score": score_data["final_score"],
+        "breakdown": score_data["breakdown"],
+        "detailed_scores": alignment_data.get("scores", {}),
+        "alignment_details": alignment_data.get("alignment", []),
+        "authenticity_risk": risk_score,
+        "authenticity_signals": ai_signals,
+        "feedback": alignment_data.get("feedback", {})
+    }
+    if "similarity" in results:
+        payload["max_similarity"] = max_sim
+    return payload
+
+
+def _cache_key(requirements: List[Dict[str, str]], code: str, language: str, mode: Optional[str]) -> str:
+    return evaluation_key(requirements, code, language, mode or DEFAULT_EVALUATION_MODE)
+
+
+def _serve_cached(key: str, code: str, language: str, student_id: str, problem_id: str,
+                  include_similarity: bool) -> Optional[Dict[str, Any]]:
+    payload = get_evaluation_cache().get(key)
+    metrics.EVALUATION_CACHE.inc(result="hit" if payload is not None else "miss")
+    if payload is None:
+        return None
+    # The risk depends on who submitted where, so it is recomputed for this student
+    if include_similarity:
+        apply_similarity(payload, _max_similarity(code, student_id, problem_id, language))
+    else:
+        payload["authenticity_risk"] = authenticity_risk(payload.get("authenticity_signals"))
+    return payload
+
+
+def _lookup_key(problem_text: str, requirements: Optional[List[Dict[str, str]]], code: str, language: str,
+                mode: Optional[str]) -> Optional[str]:
+    """
+    Cache key of an evaluation whose requirements are already known. A lookup never
+    extracts them: on a miss extraction runs as a stage, in parallel with the others.
+    """
+    if not get_evaluation_cache().enabled:
+        return None
+    if requirements is None:
+        requirements = get_registry().cached_requirements(problem_text)
+    return _cache_key(requirements, code, language, mode) if requirements is not None else None
+
+
+def _store(payload: Dict[str, Any], requirements: List[Dict[str, str]], code: str, language: str,
+           mode: Optional[str]) -> None:
+    cache = get_evaluation_cache()
+    if cache.enabled and is_cacheable(payload, requirements):
+        cache.set(_cache_key(requirements, code, language, mode), payload)
+
+
+def evaluate_submission(problem_text: str,
+                        code: str,
+                        language: str = "Python",
+                        student_id: str = "anonymous",
+                        problem_id: str = "default",
+                        include_similarity: bool = False,
+                        max_workers: int = DEFAULT_MAX_WORKERS,
+                        on_complete: Optional[Callable[[Stage, Any], None]] = None,
+                        requirements: Optional[List[Dict[str, str]]] = None,
+                        mode: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Runs the full evaluation with independent stages in parallel.
+    Raises AnalysisError if the code cannot be analyzed.
+    """
+    key = _lookup_key(problem_text, requirements, code, language, mode)
+    if key is not None:
+        cached = _serve_cached(key, code, language, student_id, problem_id, include_similarity)
+        if cached is not None:
+            return cached
+
+    stages = build_evaluation_stages(problem_text, code, language, student_id, problem_id, include_similarity,
+                                     requirements=requirements, mode=mode)
+    results = run_stages(stages, max_workers=max_workers, on_complete=on_complete)
+    payload = build_evaluation_payload(results)
+    _store(payload, results["requirements"], code, language, mode)
+    return payload
+
+
+async def evaluate_submission_async(problem_text: str,
+                                    code: str,
+                                    language: str = "Python",
+                                    student_id: str = "anonymous",
+                                    problem_id: str = "default",
+                                    include_similarity: bool = False,
+                                    on_complete: Optional[Callable[[Stage, Any], None]] = None,
+                                    requirements: Optional[List[Dict[str, str]]] = None,
+                                    mode: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Async variant of evaluate_submission; LLM calls go through the pooled AsyncLLMClient.
+    """
+    key = _lookup_key(problem_text, requirements, code, language, mode)
+    if key is not None:
+        cached = await asyncio.to_thread(_serve_cached, key, code, language, student_id, problem_id, include_similarity)
+        if cached is not None:
+            return cached
+
+    stages = build_evaluation_stages(problem_text, code, language, student_id, problem_id, include_similarity,
+                                     use_async=True, requirements=requirements, mode=mode)
+    results = await run_stages_async(stages, on_complete=on_complete)
+    payload = build_evaluation_payload(results)
+    _store(payload, results["requirements"], code, language, mode)
+    return payload
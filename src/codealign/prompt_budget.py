@@ -0,0 +1,281 @@
+"""
+Token-aware prompt compaction.
+
+Prompts are measured with a cheap, dependency-free token estimate and shrunk in
+steps until they fit a per-call budget:
+
+1. always: compact JSON (no indentation), drop empty analysis fields (negative
+   facts such as "has_recursion": false are kept),
+   collapse blank lines and trailing whitespace;
+2. over budget: strip comments (their count is kept in the analysis so
+   readability can still be judged);
+3. still over budget: split the code per function/class into chunks that each
+   fit, to be evaluated separately and merged by the caller.
+"""
+import io
+import os
+import re
+import ast
+import json
+import math
+import tokenize
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import metrics
+from .alignment.language_analysis import get_spec, strip_comments as strip_brace_comments
+
+# Budget for the whole user prompt of one call (CODEALIGN_PROMPT_TOKEN_BUDGET)
+DEFAULT_TOKEN_BUDGET = int(os.getenv("CODEALIGN_PROMPT_TOKEN_BUDGET", "6000"))
+# Budget for the code shown to the AI-signal detector (CODEALIGN_AI_SIGNALS_TOKEN_BUDGET)
+DEFAULT_AI_SIGNALS_BUDGET = int(os.getenv("CODEALIGN_AI_SIGNALS_TOKEN_BUDGET", "1200"))
+
+# Analysis fields that never help the grader (language is already in the prompt,
+# docstrings are already in the code)
+IRRELEVANT_ANALYSIS_FIELDS = ("language",)
+IRRELEVANT_FUNCTION_FIELDS = ("docstring",)
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+# Whole-line comment markers for the non-Python languages we grade ('#' would hit C preprocessor lines)
+_LINE_COMMENT_PREFIXES = {"Python": ("#",), "Ruby": ("#",), "R": ("#",), "Shell": ("#",)}
+
+
+def count_tokens(text: str) -> int:
+    """
+    Estimates BPE tokens: one per punctuation mark, and one per ~4 characters of
+    each word. Within ~15% of tiktoken on code, which is enough for budgeting.
+    """
+    return sum(math.ceil(len(t) / 4) if t[0].isalnum() or t[0] == "_" else 1
+               for t in _TOKEN_RE.findall(text))
+
+
+def compact_json(data: Any) -> str:
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+def _is_empty(value: Any) -> bool:
+    # False is a fact ("has_recursion": false), not an absence
+    return value is None or (not isinstance(value, bool) and value in ("", [], {}))
+
+
+def _prune(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _prune(v) for k, v in value.items() if not _is_empty(v)}
+    if isinstance(value, list):
+        return [_prune(v) for v in value if not _is_empty(v)]
+    return value
+
+
+def compact_analysis(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """Drops empty values (None, "", [], {}) and irrelevant fields; zero counts and False are kept."""
+    compact = {k: v for k, v in (analysis or {}).items() if k not in IRRELEVANT_ANALYSIS_FIELDS}
+    if isinstance(compact.get("functions"), list):
+        compact["functions"] = [{k: v for k, v in f.items() if k not in IRRELEVANT_FUNCTION_FIELDS}
+                                if isinstance(f, dict) else f for f in compact["functions"]]
+    return _prune(compact)
+
+
+def collapse_whitespace(code: str) -> str:
+    """Strips trailing whitespace and collapses runs of blank lines into one."""
+    lines = [line.rstrip() for line in code.strip("\n").split("\n")]
+    out = []
+    for line in lines:
+        if line or (out and out[-1]):
+            out.append(line)
+    return "\n".join(out)
+
+
+def strip_comments(code: str, language: str = "Python") -> Tuple[str, int]:
+    """
+    Removes comments and blank lines. Returns (code, comment_count).
+    Python uses the tokenizer (docstrings are kept: they are graded), C, C++,
+    Java and JavaScript the lexer of language_analysis (doc comments are kept
+    likewise); other languages only lose whole-line comments, which is always safe.
+    """
+    if language == "Python":
+        try:
+            tokens = list(tokenize.generate_tokens(io.StringIO(code).readline))
+        except (tokenize.TokenError, IndentationError, SyntaxError):
+            tokens = None
+        if tokens is not None:
+            comments = [t for t in tokens if t.type == tokenize.COMMENT]
+            lines = code.split("\n")
+            # Remove right to left so earlier columns stay valid
+            for tok in reversed(comments):
+                row, col = tok.start
+                lines[row - 1] = lines[row - 1][:col].rstrip()
+            return "\n".join(l for l in lines if l.strip()), len(comments)
+
+    elif get_spec(language) is not None:
+        return strip_brace_comments(code, language)
+
+    prefixes = _LINE_COMMENT_PREFIXES.get(language, ("//",))
+    kept, removed = [], 0
+    for line in code.split("\n"):
+        if line.lstrip().startswith(prefixes):
+            removed += 1
+        elif line.strip():
+            kept.append(line.rstrip())
+    return "\n".join(kept), removed
+
+
+def _python_units(code: str) -> Optional[List[str]]:
+    """Top-level statements grouped so each function/class is its own unit."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+    lines = code.split("\n")
+    units, pending = [], []
+    for node in tree.body:
+        start = min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])]) - 1
+        segment = "\n".join(lines[start:node.end_lineno])
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            if pending:
+                units.append("\n".join(pending))
+                pending = []
+            units.append(segment)
+        else:
+            pending.append(segment)
+    if pending:
+        units.append("\n".join(pending))
+    return units
+
+
+def _brace_units(code: str) -> List[str]:
+    """Splits brace languages where the nesting depth returns to zero."""
+    units, current, depth = [], [], 0
+    for line in code.split("\n"):
+        current.append(line)
+        depth += line.count("{") - line.count("}")
+        if depth <= 0 and ("}" in line or not line.strip()):
+            units.append("\n".join(current))
+            current, depth = [], 0
+    if current:
+        units.append("\n".join(current))
+    return [u for u in units if u.strip()]
+
+
+def _split_lines(unit: str, budget: int) -> List[str]:
+    pieces, current, used = [], [], 0
+    for line in unit.split("\n"):
+        cost = count_tokens(line) + 1
+        if current and used + cost > budget:
+            pieces.append("\n".join(current))
+            current, used = [], 0
+        current.append(line)
+        used += cost
+    if current:
+        pieces.append("\n".join(current))
+    return pieces
+
+
+def chunk_code(code: str, budget: int, language: str = "Python") -> List[str]:
+    """
+    Packs per-function units into chunks of at most `budget` tokens.
+    A single unit larger than the budget is split on line boundaries.
+    """
+    units = (_python_units(code) if language == "Python" else None) or _brace_units(code)
+    chunks, current, used = [], [], 0
+    for unit in units:
+        cost = count_tokens(unit) + 1
+        if cost > budget:
+            if current:
+                chunks.append("\n\n".join(current))
+                current, used = [], 0
+            chunks.extend(_split_lines(unit, budget))
+            continue
+        if current and used + cost > budget:
+            chunks.append("\n\n".join(current))
+            current, used = [], 0
+        current.append(unit)
+        used += cost
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks or [code]
+
+
+def fit_code(code: str, budget: int) -> str:
+    """
+    Trims code to `budget` tokens on line boundaries, keeping the head and the
+    tail (where drivers and sample usage usually live) around an omission marker.
+    """
+    if count_tokens(code) <= budget:
+        return code
+    lines = code.split("\n")
+    head, tail, used = [], [], 0
+    i, j = 0, len(lines) - 1
+    while i <= j:
+        take_head = len(head) <= 2 * len(tail)
+        line = lines[i] if take_head else lines[j]
+        cost = count_tokens(line) + 1
+        if used + cost > budget:
+            break
+        used += cost
+        if take_head:
+            head.append(line)
+            i += 1
+        else:
+            tail.insert(0, line)
+            j -= 1
+    omitted = len(lines) - len(head) - len(tail)
+    return "\n".join(head + [f"... [{omitted} lines omitted] ..."] + tail)
+
+
+def analysis_for_chunk(analysis: Dict[str, Any], chunk: str) -> Dict[str, Any]:
+    """Restricts the per-function analysis entries to the functions defined in `chunk`."""
+    functions = analysis.get("functions")
+    if not functions:
+        return analysis
+    names = set(re.findall(r"\b(\w+)\s*\(", chunk))
+    return dict(analysis, functions=[f for f in functions if f.get("name") in names])
+
+
+def compact_prompt(render, code: str, analysis: Dict[str, Any], language: str = "Python",
+                   budget: Optional[int] = None, name: str = "prompt") -> List[str]:
+    """
+    Renders `render(code, analysis_json, part)` at increasing compaction until it
+    fits `budget` tokens. Returns one prompt, or one per chunk when the code had
+    to be split (`part` is then (index, total); otherwise None).
+    """
+    budget = budget or DEFAULT_TOKEN_BUDGET
+    analysis = compact_analysis(analysis)
+    code = collapse_whitespace(code)
+
+    prompt = render(code, compact_json(analysis), None)
+    tokens = count_tokens(prompt)
+    if tokens <= budget:
+        metrics.PROMPT_TOKENS.observe(tokens, prompt=name, compaction="json")
+        return [prompt]
+
+    stripped, comment_count = strip_comments(code, language)
+    if comment_count:
+        analysis = dict(analysis, comment_lines=comment_count)
+    prompt = render(stripped, compact_json(analysis), None)
+    tokens = count_tokens(prompt)
+    if tokens <= budget:
+        metrics.PROMPT_TOKENS.observe(tokens, prompt=name, compaction="comments")
+        return [prompt]
+
+    # Each chunk carries only its own functions' analysis; everything else is repeated per chunk
+    shared = {k: v for k, v in analysis.items() if k != "functions"}
+    overhead = count_tokens(render("", compact_json(shared), (1, 1)))
+    code_budget = max(budget - overhead, budget // 4)
+    floor = budget // 8
+    while True:
+        chunks = chunk_code(stripped, code_budget, language)
+        if len(chunks) > 1:
+            prompts = [render(chunk, compact_json(analysis_for_chunk(analysis, chunk)), (i + 1, len(chunks)))
+                       for i, chunk in enumerate(chunks)]
+            largest = max(count_tokens(p) for p in prompts)
+        else:
+            prompts, largest = [prompt], tokens
+        # Shrink the chunks while the per-chunk analysis still pushes them over, within reason
+        if largest <= budget or code_budget <= floor:
+            break
+        code_budget = max(min(code_budget, count_tokens(stripped)) * budget // largest - 1, floor)
+    if len(prompts) == 1:
+        metrics.PROMPT_TOKENS.observe(tokens, prompt=name, compaction="comments")
+        return prompts
+    for p in prompts:
+        metrics.PROMPT_TOKENS.observe(count_tokens(p), prompt=name, compaction="chunked")
+    return prompts
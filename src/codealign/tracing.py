@@ -0,0 +1,132 @@
+"""
+Lightweight tracing for evaluations.
+
+`span(name, kind)` times a block. Every span feeds the Prometheus histograms
+in codealign.metrics; when a trace is active (`start_trace()`), spans are also
+collected so they can be returned to the caller (e.g. /evaluate `timings`).
+The active trace lives in a ContextVar, so it follows asyncio tasks,
+asyncio.to_thread and pipeline stage threads (run_stages copies the context).
+"""
+import time
+import threading
+import contextlib
+import contextvars
+from typing import Any, Dict, Iterator, List, Optional
+
+from . import metrics
+
+
+class Span:
+    """One timed operation. Attributes can be added while the span is open via set()."""
+
+    __slots__ = ("name", "kind", "attrs", "start", "duration", "error")
+
+    def __init__(self, name: str, kind: str, attrs: Dict[str, Any]):
+        self.name = name
+        self.kind = kind
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update({k: v for k, v in attrs.items() if v is not None})
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        data = {
+            "name": self.name,
+            "kind": self.kind,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round((self.duration or 0.0) * 1000, 3),
+        }
+        if self.attrs:
+            data["attributes"] = dict(self.attrs)
+        if self.error:
+            data["error"] = self.error
+        return data
+
+
+class Trace:
+    """Spans collected for one request; safe to append from several threads."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def summary(self) -> Dict[str, Any]:
+        """The `timings` payload: total wall time, per-stage durations and every span."""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        stages = {s.name[len("stage."):]: round((s.duration or 0.0) * 1000, 3)
+                  for s in spans if s.kind == "stage"}
+        return {
+            "total_ms": round((time.perf_counter() - self.start) * 1000, 3),
+            "stages": stages,
+            "spans": [s.to_dict(self.start) for s in spans],
+        }
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("codealign_trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextlib.contextmanager
+def start_trace() -> Iterator[Trace]:
+    """Collects spans recorded in this context (and tasks/threads spawned from it)."""
+    trace = Trace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+@contextlib.contextmanager
+def span(name: str, kind: str = "internal", **attrs: Any) -> Iterator[Span]:
+    """Times the block, records it on the active trace (if any) and in the metrics registry."""
+    current = Span(name, kind, {k: v for k, v in attrs.items() if v is not None})
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        metrics.SPAN_ERRORS.inc(kind=kind, name=name)
+        raise
+    finally:
+        current.duration = time.perf_counter() - current.start
+        metrics.SPAN_DURATION.observe(current.duration, kind=kind, name=name)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(current)
+
+
+def record_llm_call(llm_span: Span,
+                    provider: str,
+                    model: str,
+                    operation: str,
+                    outcome: str,
+                    prompt_tokens: Optional[int] = None,
+                    completion_tokens: Optional[int] = None) -> None:
+    """
+    Annotates a provider-call span and updates the LLM counters.
+    Call with the span still open; its latency is taken from the elapsed time so far.
+    """
+    llm_span.set(provider=provider, model=model, operation=operation, outcome=outcome,
+                 prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+    metrics.LLM_REQUESTS.inc(provider=provider, model=model, operation=operation, outcome=outcome)
+    metrics.LLM_LATENCY.observe(time.perf_counter() - llm_span.start, provider=provider, model=model, operation=operation)
+    if prompt_tokens:
+        metrics.LLM_TOKENS.inc(prompt_tokens, provider=provider, model=model, type="prompt")
+    if completion_tokens:
+        metrics.LLM_TOKENS.inc(completion_tokens, provider=provider, model=model, type="completion")
+
+
+def record_cache_lookup(hit: bool) -> None:
+    metrics.LLM_CACHE.inc(result="hit" if hit else "miss")
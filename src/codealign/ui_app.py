@@ -11,13 +11,7 @@ src_dir = os.path.dirname(current_dir) # .../src
 sys.path.insert(0, src_dir)
 
 # Import logic
-from codealign.alignment.behaviour_extract import extract_requirements
-from codealign.alignment.code_analysis import analyze_code
-from codealign.alignment.align_reasoner import align_spec_code
-from codealign.cohort_stats import calculate_score
-from codealign.authenticity.ingest import ingest_submission, get_all_submissions
-from codealign.authenticity.similarity import calculate_similarity
-from codealign.authenticity.ai_signals import detect_ai_signals
+from codealign.pipeline import build_evaluation_stages, build_evaluation_payload, run_stages, stage_results, AnalysisError
 
 # -----------------------------------------------------------------------------
 # Configuration & Styling
@@ -417,46 +411,25 @@ if analyze_btn:
         status_container = st.container()
         
         with st.status(f"🔍 Analyzing {detected_lang} Code...", expanded=True) as status:
-            st.write("Extracting requirements...")
-            reqs = extract_requirements(problem_text)
-            
-            st.write(f"Analyzing {detected_lang} code structure...")
-            # Pass language to analyzer
-            analysis = analyze_code(final_code, language=detected_lang)
-            
-            if analysis.get("error"):
-                st.error(analysis["error"])
-                st.stop()
-            
-            st.write("Evaluating alignment & correctness...")
-            # Pass language to reasoner
-            alignment_data = align_spec_code(reqs, final_code, analysis, language=detected_lang)
-            
-            st.write("Checking authenticity...")
-            max_sim = 0.0
+            st.write("Running evaluation stages in parallel...")
+            stages = build_evaluation_stages(
+                problem_text, final_code, language=detected_lang,
+                student_id=student_id, include_similarity=True
+            )
             try:
-                # Ingest as the current simulated student
-                current_id = ingest_submission(final_code, student_id=student_id)['id']
-                
-                others = get_all_submissions("default")
-                
-                # Use the new function for plagiarism check
-                from codealign.authenticity.similarity import find_similar
-                
-                # Check against everyone EXCEPT the current simulated student
-                similar_matches = find_similar(final_code, others, threshold=0.01, exclude_candidate_id=student_id)
-                
-                if similar_matches:
-                    max_sim = max(s['similarity_score'] for s in similar_matches)
-                else:
-                    max_sim = 0.0
-            except Exception as e:
-                print(f"Auth check failed: {e}")
-
-            ai_signals = detect_ai_signals(final_code)
-            risk_score = max(max_sim * 100, ai_signals['confidence'] * 100)
-            
-            score_data = calculate_score(alignment_data, risk_score)
+                results = run_stages(stages, on_complete=lambda stage, _: st.write(f"✔️ {stage.label}"))
+            except AnalysisError as e:
+                st.error(str(e))
+                st.stop()
+
+            # In fused mode alignment and AI signals come from the single "evaluation" stage
+            results = stage_results(results)
+            alignment_data = results["alignment"]
+            ai_signals = results["ai_signals"]
+            max_sim = results["similarity"]
+            payload = build_evaluation_payload(results)
+            risk_score = payload["authenticity_risk"]
+            score_data = {"final_score": payload["overall_score"], "breakdown": payload["breakdown"]}
             status.update(label="✅ Analysis Complete!", state="complete", expanded=False)
 
         # --- RESULTS DISPLAY ---
@@ -0,0 +1,37 @@
+import os
+import sys
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+# Keep tests hermetic: memory-only caches, no stray files in the working tree.
+os.environ.setdefault("CODEALIGN_CACHE_DIR", "")
+os.environ.setdefault("CODEALIGN_SUBMISSIONS_DB", ":memory:")
+os.environ.setdefault("CODEALIGN_INDEX_DIR", "")
+os.environ.setdefault("CODEALIGN_PROBLEMS_DB", ":memory:")
+# Tests stub the LLM stages differently for the same code; cache tests opt in explicitly
+os.environ.setdefault("CODEALIGN_EVALUATION_CACHE", "0")
+
+
+@pytest.fixture(autouse=True)
+def fresh_problem_registry():
+    """Memoized requirements must not leak between tests that stub the LLM differently."""
+    from codealign.alignment import problems
+
+    problems.reset()
+    yield
+    problems.reset()
+
+
+@pytest.fixture(autouse=True)
+def fresh_embedding_queue():
+    """Each test gets its own embedding worker; leftover batches and retries die with it."""
+    from codealign.authenticity.embedding_queue import EmbeddingQueue, set_embedding_queue
+
+    queue = EmbeddingQueue()
+    previous = set_embedding_queue(queue)
+    yield queue
+    set_embedding_queue(previous)
+    queue.close(timeout=5)
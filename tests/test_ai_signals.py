@@ -1,3 +1,130 @@
+from codealign.authenticity import ai_signals
+from codealign.authenticity.ai_heuristics import extract_style_features, score_ai_likelihood
+from codealign.benchmark import load_example_corpus
+from codealign.fake_llm import use_fake_llm
+
+AI_STYLE = '''
+from typing import List
+
+
+def length_of_longest_increasing_subsequence(input_numbers: List[int]) -> int:
+    """
+    Calculate the length of the longest strictly increasing subsequence.
+
+    Args:
+        input_numbers: A list of integers.
+
+    Returns:
+        The length of the longest increasing subsequence.
+    """
+    # Check if the input list is empty
+    if not input_numbers:
+        return 0
+
+    # Initialize the list of smallest tail values
+    tail_values: List[int] = []
+
+    # Iterate through each number in the input list
+    for current_number in input_numbers:
+        # Calculate the insertion position using binary search
+        insertion_position = binary_search_position(tail_values, current_number)
+        # Update the tail values accordingly
+        if insertion_position == len(tail_values):
+            tail_values.append(current_number)
+        else:
+            tail_values[insertion_position] = current_number
+
+    # Return the length of the tail values list
+    return len(tail_values)
+
+
+def binary_search_position(sorted_values: List[int], target_value: int) -> int:
+    """
+    Find the leftmost insertion position for the target value.
+
+    Args:
+        sorted_values: A sorted list of integers.
+        target_value: The value to insert.
+
+    Returns:
+        The insertion index.
+    """
+    left_index, right_index = 0, len(sorted_values)
+    while left_index < right_index:
+        middle_index = (left_index + right_index) // 2
+        if sorted_values[middle_index] < target_value:
+            left_index = middle_index + 1
+        else:
+            right_index = middle_index
+    return left_index
+'''
+
+CHATTY = "Sure, here is the Python code you asked for:\n\n" + AI_STYLE + "\n# I hope this helps! Feel free to ask.\n"
+
 
 def test_detect_ai_signals():
     pass
+
+
+def test_style_features():
+    features = extract_style_features(AI_STYLE)
+    assert features["functions"] == 2
+    assert features["templated_docstring_ratio"] == 1.0
+    assert features["annotated_ratio"] == 1.0
+    assert features["narrating_ratio"] == 1.0
+    assert features["mean_identifier_length"] > 8
+
+
+def test_c_pointer_and_preprocessor_lines_are_not_comments():
+    code = ("#include <stdio.h>\n#define N 10\n\nvoid swap(int *a, int *b) {\n    int t = *a;\n"
+            "    *a = *b; // swap\n    *b = t;\n}\n/* multi\n * line */\n")
+    features = extract_style_features(code, "C")
+    # "swap", "multi", "line" out of 7 code lines; the #include/#define and *a lines are code
+    assert features["code_lines"] == 7
+    assert features["comment_ratio"] == 3 / 7
+
+
+def test_student_code_scores_low_and_ai_style_higher():
+    _, codes = load_example_corpus()
+    scores = [score_ai_likelihood(code)["confidence"] for code in codes]
+    # Heavily commented human code may be escalated, but never flagged
+    assert all(s < 0.5 for s in scores)
+    assert sum(s < 0.3 for s in scores) >= len(scores) - 1
+
+    ai = score_ai_likelihood(AI_STYLE)
+    assert ai["confidence"] > 0.5
+    assert "Templated docstrings (Args/Returns sections)" in ai["signals"]
+    assert score_ai_likelihood(CHATTY)["confidence"] >= 0.85
+
+
+def test_clear_cases_skip_the_llm():
+    _, codes = load_example_corpus()
+    with use_fake_llm() as provider:
+        human = ai_signals.detect_ai_signals(codes[0])
+        chatty = ai_signals.detect_ai_signals(CHATTY)
+    assert provider.calls["ai_signals"] == 0
+    assert human["source"] == "heuristic" and not human["is_suspicious"]
+    assert chatty["is_suspicious"]
+
+
+def test_ambiguous_cases_go_to_the_llm(monkeypatch):
+    with use_fake_llm() as provider:
+        result = ai_signals.detect_ai_signals(AI_STYLE)
+        monkeypatch.setenv("CODEALIGN_AI_HEURISTIC_FIRST", "0")
+        _, codes = load_example_corpus()
+        ai_signals.detect_ai_signals(codes[0])
+    assert provider.calls["ai_signals"] == 2
+    assert "source" not in result
+
+
+def test_repeated_llm_detection_hits_the_response_cache(monkeypatch):
+    import codealign
+    from codealign.cache import ResponseCache
+    from codealign.fake_llm import FakeLLMClient, FakeProvider
+
+    provider = FakeProvider()
+    monkeypatch.setattr(codealign, "_client", FakeLLMClient(provider, cache=ResponseCache(path=None)))
+    first = ai_signals.detect_ai_signals(AI_STYLE)
+    again = ai_signals.detect_ai_signals(AI_STYLE)
+    assert provider.calls["ai_signals"] == 1
+    assert again == first
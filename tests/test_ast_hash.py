@@ -0,0 +1,80 @@
+from codealign.authenticity import ast_hash
+from codealign.authenticity.features import extract_features
+from codealign.authenticity.similarity import calculate_similarity
+
+ORIGINAL = """
+import bisect
+
+def length_of_lis(nums):
+    tails = []
+    for num in nums:
+        i = bisect.bisect_left(tails, num)
+        if i == len(tails):
+            tails.append(num)
+        else:
+            tails[i] = num
+    return len(tails)
+
+def is_sorted(values):
+    return all(a <= b for a, b in zip(values, values[1:]))
+"""
+
+# Renamed, helper moved first, operands of == swapped
+REORDERED = """
+import bisect
+
+def check(xs):
+    return all(p <= q for p, q in zip(xs, xs[1:]))
+
+def solve(arr):
+    piles = []
+    for x in arr:
+        pos = bisect.bisect_left(piles, x)
+        if len(piles) == pos:
+            piles.append(x)
+        else:
+            piles[pos] = x
+    return len(piles)
+"""
+
+UNRELATED = """
+class Stack:
+    def __init__(self):
+        self.items = {}
+
+    def push(self, key, value):
+        self.items[key] = value
+        print("pushed", key)
+"""
+
+
+def test_renamed_and_reordered_copy_has_same_subtree_hashes():
+    h1 = ast_hash.subtree_hashes(ORIGINAL)
+    h2 = ast_hash.subtree_hashes(REORDERED)
+    assert h1 == h2
+    assert ast_hash.structural_similarity(h1, h2) == 1.0
+    assert ast_hash.structural_similarity(h1, ast_hash.subtree_hashes(UNRELATED)) < 0.2
+
+
+def test_structure_changes_lower_similarity():
+    changed = ORIGINAL.replace("tails[i] = num", "tails.insert(i, num)")
+    sim = ast_hash.structural_similarity(ast_hash.subtree_hashes(ORIGINAL), ast_hash.subtree_hashes(changed))
+    assert 0.5 < sim < 1.0
+
+
+def test_non_python_has_no_structure():
+    assert ast_hash.subtree_hashes("int main() { return 0; }") is None
+    assert ast_hash.structural_similarity(None, {1: 1}) is None
+    assert extract_features("int main() { return 0; }")["ast_hashes"] is None
+
+
+def test_deep_nesting_does_not_recurse():
+    code = "x = " + "(" * 150 + "1" + ")" * 150 + " + y" * 2000
+    assert ast_hash.subtree_hashes(code)
+
+
+def test_features_carry_hashes_into_similarity():
+    features = extract_features(ORIGINAL)
+    assert ast_hash.features_subtree_hashes(features) == dict(ast_hash.subtree_hashes(ORIGINAL))
+    assert calculate_similarity(ORIGINAL, REORDERED) > 0.8
+    assert calculate_similarity(ORIGINAL, UNRELATED) < 0.3
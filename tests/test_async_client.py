@@ -0,0 +1,103 @@
+import asyncio
+import json
+
+import httpx
+
+from codealign.async_client import AsyncLLMClient, GROQ_CHAT_URL
+from codealign.cache import ResponseCache
+
+
+def make_client(handler, **kwargs):
+    return AsyncLLMClient(
+        groq_key="groq-test",
+        gemini_key="gemini-test",
+        cache=ResponseCache(path=None),
+        transport=httpx.MockTransport(handler),
+        **kwargs,
+    )
+
+
+def test_generate_text_uses_groq_and_caches():
+    calls = []
+
+    def handler(request):
+        calls.append(str(request.url))
+        body = json.loads(request.content)
+        assert body["response_format"] == {"type": "json_object"}
+        assert request.headers["Authorization"] == "Bearer groq-test"
+        return httpx.Response(200, json={"choices": [{"message": {"content": '{"ok": 1}'}}]})
+
+    async def run():
+        llm = make_client(handler)
+        first = await llm.generate_text("sys", "user", json_mode=True)
+        second = await llm.generate_text("sys", "user", json_mode=True)
+        await llm.aclose()
+        return first, second
+
+    assert asyncio.run(run()) == ('{"ok": 1}', '{"ok": 1}')
+    assert calls == [GROQ_CHAT_URL]
+
+
+def test_generate_text_falls_back_to_gemini():
+    def handler(request):
+        if "groq" in request.url.host:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"candidates": [{"content": {"parts": [{"text": "backup"}]}}]})
+
+    async def run():
+        llm = make_client(handler)
+        try:
+            return await llm.generate_text("sys", "user", use_cache=False)
+        finally:
+            await llm.aclose()
+
+    assert asyncio.run(run()) == "backup"
+
+
+def test_concurrency_limit_is_enforced():
+    in_flight = {"now": 0, "peak": 0}
+
+    async def handler(request):
+        in_flight["now"] += 1
+        in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+        await asyncio.sleep(0.01)
+        in_flight["now"] -= 1
+        return httpx.Response(200, json={"embedding": {"values": [0.1, 0.2]}})
+
+    async def run():
+        llm = make_client(handler, max_concurrency=3)
+        results = await asyncio.gather(*(llm.get_embedding(f"code {i}") for i in range(12)))
+        await llm.aclose()
+        return results
+
+    results = asyncio.run(run())
+    assert all(r == [0.1, 0.2] for r in results)
+    assert in_flight["peak"] <= 3
+
+
+def test_keys_and_cache_are_reused_from_the_sync_client(monkeypatch):
+    import types
+    import codealign
+
+    sync_client = types.SimpleNamespace(groq_key="groq-sync", gemini_key="gemini-sync", cache=ResponseCache(path=None))
+    monkeypatch.setattr(codealign, "get_client", lambda: sync_client)
+
+    llm = AsyncLLMClient()
+    assert (llm.groq_key, llm.gemini_key) == ("groq-sync", "gemini-sync")
+    assert llm.cache is sync_client.cache
+
+
+def test_client_is_reusable_across_event_loops():
+    async def handler(request):
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})
+
+    llm = make_client(handler, max_concurrency=1)
+
+    async def run():
+        # Two calls contend for the semaphore, so it has to wait on the running loop
+        return await asyncio.gather(*(llm.generate_text("sys", f"user {i}", use_cache=False) for i in range(2)))
+
+    # e.g. successive asyncio.run calls of the batch CLI sharing the process-wide client
+    assert asyncio.run(run()) == ["ok", "ok"]
+    assert asyncio.run(run()) == ["ok", "ok"]
@@ -1,3 +1,26 @@
 
 def test_calculate_similarity():
     pass
+
+from codealign.authenticity.features import extract_features, serialize_features, deserialize_features
+from codealign.authenticity.similarity import calculate_similarity, find_similar
+
+def test_features_round_trip():
+    features = extract_features("def f(a):\n    return a + 1\n")
+    restored = deserialize_features(serialize_features(features))
+    assert restored["tokens"] == features["tokens"]
+    assert restored["fingerprints"] == features["fingerprints"]
+    assert restored["token_stream"] == features["token_stream"]
+
+def test_precomputed_features_match_raw_similarity():
+    a = "def f(a):\n    return a + 1\n"
+    b = "def g(b):\n    return b * 2\n"
+    direct = calculate_similarity(a, b)
+    assert calculate_similarity(a, b, extract_features(a), extract_features(b)) == direct
+    assert calculate_similarity(a, a) == 1.0
+
+def test_find_similar_uses_stored_features(monkeypatch):
+    code = "x = [i for i in range(10)]\n"
+    stored = {"id": "1", "student_id": "other", "code": "", "features": extract_features(code)}
+    matches = find_similar(code, [stored], threshold=0.99)
+    assert matches and matches[0]["similarity_score"] == 1.0
@@ -0,0 +1,102 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from codealign import pipeline, batch
+from codealign.api import app
+from codealign.batch import evaluate_batch, load_submissions
+from codealign.cli import main
+
+SCORES = {k: {"score": 80} for k in ("correctness", "time_efficiency", "space_efficiency", "readability")}
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    calls = {"requirements": 0, "alignment": 0}
+
+    def extract(text):
+        calls["requirements"] += 1
+        return [{"description": "solve it", "type": "functional"}]
+
+    def align(reqs, code, analysis, language="Python"):
+        calls["alignment"] += 1
+        return {"alignment": [{"requirement": reqs[0]["description"], "status": "fulfilled"}],
+                "scores": SCORES, "feedback": "ok"}
+
+    monkeypatch.setattr(batch, "extract_requirements", extract)
+    monkeypatch.setattr(pipeline, "extract_requirements", extract)
+    monkeypatch.setattr(pipeline, "align_spec_code", align)
+    monkeypatch.setattr(pipeline, "detect_ai_signals", lambda code, language="Python": {"is_suspicious": False, "confidence": 0.1, "signals": []})
+    return calls
+
+
+def test_requirements_extracted_once_per_batch(fake_llm):
+    subs = [{"id": f"s{i}", "code": f"def f():\n    return {i}\n"} for i in range(6)]
+    results = list(evaluate_batch("problem", subs, max_workers=3, check_authenticity=False))
+
+    assert sorted(r["id"] for r in results) == [f"s{i}" for i in range(6)]
+    assert all(r["overall_score"] == 80 for r in results)
+    assert fake_llm == {"requirements": 1, "alignment": 6}
+
+
+def test_bad_submission_does_not_abort_batch(fake_llm):
+    subs = [{"id": "good", "code": "x = 1\n"}, {"id": "bad", "code": "def broken(:\n"}]
+    results = {r["id"]: r for r in evaluate_batch("problem", subs, check_authenticity=False)}
+
+    assert "error" in results["bad"]
+    assert "error" not in results["good"]
+
+
+def test_load_submissions_formats(tmp_path):
+    array_file = tmp_path / "subs.json"
+    array_file.write_text(json.dumps([{"id": "a", "code": "x = 1"}]))
+    jsonl_file = tmp_path / "subs.jsonl"
+    jsonl_file.write_text('{"id": "b", "code": "y = 2"}\n\nnot json\n')
+    source_dir = tmp_path / "src"
+    source_dir.mkdir()
+    (source_dir / "alice.py").write_text("z = 3")
+    (source_dir / "notes.txt").write_text("ignored")
+
+    assert [s["id"] for s in load_submissions(str(array_file))] == ["a"]
+    assert [s["id"] for s in load_submissions(str(jsonl_file))] == ["b"]
+    assert list(load_submissions(str(source_dir))) == [
+        {"id": "alice", "student_id": "alice", "code": "z = 3", "language": "Python"}
+    ]
+
+
+def test_cli_writes_jsonl(fake_llm, tmp_path):
+    problem = tmp_path / "problem.md"
+    problem.write_text("Return one.")
+    subs = tmp_path / "subs.json"
+    subs.write_text(json.dumps([{"id": "a", "code": "x = 1"}, {"id": "b", "code": "y = 2"}]))
+    out = tmp_path / "results.jsonl"
+
+    assert main(["batch", "--problem", str(problem), "--submissions", str(subs),
+                 "--out", str(out), "--no-authenticity"]) == 0
+    lines = [json.loads(line) for line in out.read_text().splitlines()]
+    assert sorted(r["id"] for r in lines) == ["a", "b"]
+
+
+def test_evaluate_batch_endpoint_streams_ndjson(fake_llm):
+    response = TestClient(app).post("/evaluate_batch", json={
+        "problem_text": "Return one.",
+        "submissions": [{"id": "a", "code": "x = 1"}, {"id": "b", "code": "y = 2"}],
+        "check_authenticity": False,
+    })
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert sorted(json.loads(line)["id"] for line in response.text.splitlines()) == ["a", "b"]
+
+
+def test_duplicate_submissions_are_evaluated_once(fake_llm):
+    code = "def f(x):\n    return x * 2\n"
+    subs = [{"id": "a", "code": code}, {"id": "b", "code": "def f(x):\n  return x  *  2\n\n"},
+            {"id": "c", "code": "def g():\n    return 1\n"},
+            {"id": "bad1", "code": "def broken(:\n"}, {"id": "bad2", "code": "def broken(:\n"}]
+    results = {r["id"]: r for r in evaluate_batch("problem", subs, max_workers=3, check_authenticity=False)}
+
+    assert fake_llm["alignment"] == 2
+    assert results["a"]["overall_score"] == results["b"]["overall_score"] == 80
+    assert results["a"]["detailed_scores"] is not results["b"]["detailed_scores"]
+    assert "error" in results["bad1"] and "error" in results["bad2"]
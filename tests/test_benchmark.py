@@ -0,0 +1,51 @@
+import json
+
+from codealign import get_client
+from codealign.benchmark import run_benchmarks, synthetic_cohort, summarize, format_report
+from codealign.cli import main
+from codealign.fake_llm import FakeLLMClient, use_fake_llm
+from codealign.alignment.behaviour_extract import extract_requirements, FALLBACK_REQUIREMENTS
+
+
+def test_summarize_percentiles():
+    stats = summarize([0.001 * i for i in range(1, 101)], span_seconds=2.0)
+    assert stats["count"] == 100
+    assert 49 <= stats["p50_ms"] <= 51
+    assert 98 <= stats["p99_ms"] <= 100
+    assert stats["throughput_per_s"] == 50.0
+
+
+def test_synthetic_cohort_is_deterministic_and_contains_copies():
+    base = ["def f(xs):\n    return len(xs)\n", "def g(a, b):\n    return a + b\n"]
+    first = synthetic_cohort(200, base, seed=3, copy_rate=0.2)
+    assert first == synthetic_cohort(200, base, seed=3, copy_rate=0.2)
+    codes = [s["code"] for s in first]
+    assert len(set(codes)) < len(codes)
+
+
+def test_fake_provider_errors_fall_back():
+    with use_fake_llm(error_rate=1.0) as provider:
+        assert isinstance(get_client(), FakeLLMClient)
+        assert extract_requirements("anything") == FALLBACK_REQUIREMENTS
+    assert provider.calls["errors"] == 1
+    assert not isinstance(get_client(), FakeLLMClient)
+
+
+def test_run_benchmarks_small_cohort(tmp_path):
+    report = run_benchmarks(cohort_size=40, queries=5, batch_size=6, workers=2, error_rate=0.2, track_memory=True)
+
+    assert set(report["scenarios"]) == {"pipeline", "ingest", "search", "api", "batch"}
+    assert report["scenarios"]["ingest"]["stages"]["ingest"]["count"] == 40
+    assert report["scenarios"]["search"]["stages"]["search"]["count"] == 5
+    assert report["scenarios"]["batch"]["stages"]["completion"]["count"] == 6
+    assert report["scenarios"]["pipeline"]["peak_mb"] is not None
+    assert "p99" in format_report(report)
+
+
+def test_cli_bench_writes_json(tmp_path, capsys):
+    out = tmp_path / "report.json"
+    assert main(["bench", "--cohort-size", "10", "--queries", "3", "--scenarios", "ingest,search",
+                 "--json", str(out)]) == 0
+    report = json.loads(out.read_text())
+    assert set(report["scenarios"]) == {"ingest", "search"}
+    assert "search" in capsys.readouterr().out
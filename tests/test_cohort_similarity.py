@@ -0,0 +1,128 @@
+import json
+
+import numpy as np
+import pytest
+
+from codealign.authenticity import cohort, ingest, lsh
+from codealign.authenticity.similarity import calculate_similarity
+from codealign.authenticity.store import SubmissionStore
+from codealign.cli import main
+
+LIS = """
+def length_of_lis(nums):
+    tails = []
+    for num in nums:
+        lo, hi = 0, len(tails)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if tails[mid] < num:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == len(tails):
+            tails.append(num)
+        else:
+            tails[lo] = num
+    return len(tails)
+"""
+
+STACK = """
+class Stack:
+    def __init__(self):
+        self.items = []
+
+    def push(self, value):
+        self.items.append(value)
+
+    def pop(self):
+        return self.items.pop() if self.items else None
+"""
+
+
+def renamed(code, i):
+    return code.replace("tails", f"piles{i}").replace("num", f"x{i}")
+
+
+def make_cohort():
+    records = [{"id": f"lis{i}", "student_id": f"u{i}", "code": renamed(LIS, i)} for i in range(3)]
+    records += [{"id": f"stack{i}", "student_id": f"v{i}", "code": STACK} for i in range(2)]
+    # Same student twice: never a cluster on its own
+    records += [{"id": "own1", "student_id": "w", "code": "def f(a):\n    return sorted(a)[::-1][:3]\n"},
+                {"id": "own2", "student_id": "w", "code": "def f(a):\n    return sorted(a)[::-1][:3]\n"}]
+    return records
+
+
+@pytest.fixture
+def fresh_store():
+    ingest.set_store(SubmissionStore(":memory:"))
+    yield ingest.get_store()
+    ingest.set_store(None)
+    lsh.reset()
+
+
+def test_pruning_keeps_similar_pairs_only():
+    records = make_cohort()
+    matrix = cohort.build_similarity_matrix(records, workers=1)
+    assert matrix.pairs < len(records) * (len(records) - 1) // 2
+    assert matrix.get("lis0", "lis2") == pytest.approx(calculate_similarity(records[0]["code"], records[2]["code"]))
+    assert matrix.get("lis0", "stack0") == 0.0
+    dense = matrix.to_dense()
+    assert np.allclose(dense, dense.T) and dense[0, 0] == 1.0
+
+
+def test_clusters_group_copies_from_different_students():
+    clusters = cohort.find_clusters(cohort.build_similarity_matrix(make_cohort(), workers=1), threshold=0.85)
+    assert [c["submissions"] for c in clusters] == [["lis0", "lis1", "lis2"], ["stack0", "stack1"]]
+    assert clusters[0]["students"] == ["u0", "u1", "u2"]
+    assert len(clusters[0]["pairs"]) == 3
+
+
+def test_process_pool_matches_serial_scores(monkeypatch):
+    records = make_cohort()
+    serial = cohort.build_similarity_matrix(records, workers=1)
+    monkeypatch.setattr(cohort, "MIN_PARALLEL_PAIRS", 1)
+    monkeypatch.setattr(cohort, "PAIR_CHUNK_SIZE", 2)
+    parallel = cohort.build_similarity_matrix(records, workers=2)
+    assert np.array_equal(serial.rows, parallel.rows)
+    assert np.allclose(serial.scores, parallel.scores)
+
+
+def test_matrix_round_trips_through_npz(tmp_path):
+    matrix = cohort.build_similarity_matrix(make_cohort(), workers=1)
+    path = str(tmp_path / "m" / "matrix.npz")
+    matrix.save(path)
+    loaded = cohort.SimilarityMatrix.load(path)
+    assert loaded.ids == matrix.ids and loaded.students == matrix.students
+    assert loaded.get("lis1", "lis2") == matrix.get("lis1", "lis2")
+
+
+def test_job_reads_stored_cohort_and_cli(fresh_store, tmp_path, capsys):
+    for record in make_cohort():
+        ingest.ingest_submission(record["code"], record["student_id"], "p", embedding=[])
+
+    report = cohort.run_cohort_similarity("p", workers=1)
+    assert report["submissions"] == 7
+    assert [c["size"] for c in report["clusters"]] == [3, 2]
+
+    submissions = tmp_path / "subs.json"
+    submissions.write_text(json.dumps(make_cohort()))
+    out = tmp_path / "clusters.json"
+    assert main(["cohort-similarity", "--submissions", str(submissions), "--matrix", str(tmp_path / "m.npz"),
+                 "--out", str(out), "--workers", "1"]) == 0
+    assert json.loads(out.read_text())["clusters"][0]["submissions"] == ["lis0", "lis1", "lis2"]
+    assert (tmp_path / "m.npz").exists()
+
+
+def test_copies_built_on_shared_starter_code_are_found():
+    template = "\n".join(f"def helper_{k}(values):\n    total = {k}\n    for v in values:\n        total += v * {k}\n"
+                         f"    return total\n" for k in range(15))
+    records = [{"id": f"s{i}", "student_id": f"u{i}",
+                "code": template + f"\ndef solve_{i}(items):\n    return sorted(items)[{i}:] + [{i}] * {i}\n"}
+               for i in range(10)]
+    records.append({"id": "copy", "student_id": "cheater", "code": records[0]["code"]})
+
+    matrix = cohort.build_similarity_matrix(records, workers=1)
+    assert matrix.get("s0", "copy") == pytest.approx(calculate_similarity(records[0]["code"], records[-1]["code"])) == 1.0
+    report = cohort.run_cohort_similarity(submissions=records, workers=1)
+    assert report["pairs_scored"] >= 1
+    assert any({"s0", "copy"} <= set(c["submissions"]) for c in report["clusters"])
@@ -0,0 +1,119 @@
+import json
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from codealign import cohort_analytics
+from codealign.api import app
+from codealign.cli import main
+from codealign.cohort_analytics import COLUMNS, CohortStats, calculate_scores
+from codealign.cohort_stats import calculate_cohort_stats, calculate_score
+from codealign.fake_llm import use_fake_llm
+
+DIMS = ("correctness", "time_efficiency", "space_efficiency", "readability")
+
+
+def result(sid, score, statuses=("fulfilled", "fulfilled"), risk=10.0):
+    breakdown = {d: score for d in DIMS}
+    return {
+        "id": sid,
+        "overall_score": float(score),
+        "breakdown": breakdown,
+        "authenticity_risk": risk,
+        "alignment_details": [{"requirement": f"req {i}", "status": s} for i, s in enumerate(statuses)],
+    }
+
+
+def cohort():
+    results = [result(f"s{i}", 70 + i, ("fulfilled", "missing" if i % 2 else "partial")) for i in range(10)]
+    results.append(result("low", 5, ("missing", "missing")))
+    results.append({"id": "broken", "error": "SyntaxError"})
+    return results
+
+
+def test_summary_distributions_and_fulfillment():
+    summary = calculate_cohort_stats(cohort())
+    assert summary["count"] == 11
+    scores = np.array([70 + i for i in range(10)] + [5], dtype=float)
+    correctness = summary["distributions"]["correctness"]
+    assert correctness["mean"] == pytest.approx(scores.mean(), abs=0.01)
+    assert correctness["std"] == pytest.approx(scores.std(), abs=0.01)
+    assert correctness["percentiles"]["p50"] == pytest.approx(np.percentile(scores, 50))
+    assert sum(correctness["histogram"]) == 11
+
+    assert summary["requirements"]["req 0"] == {"rate": round(10 / 11, 4), "assessed": 11}
+    assert summary["requirements"]["req 1"]["rate"] == pytest.approx(2.5 / 11, abs=1e-4)
+
+
+def test_outliers_are_flagged_by_z_score():
+    stats = CohortStats.from_results(cohort())
+    z = stats.z_scores()
+    assert z.shape == (11, len(COLUMNS))
+    outliers = stats.outliers(threshold=2.5)
+    assert {o["id"] for o in outliers} == {"low"}
+    assert all(o["z"] < -2.5 for o in outliers)
+    assert CohortStats.from_results(cohort()[:3]).outliers(threshold=0.1) == []
+
+
+def test_incremental_updates_match_recomputation():
+    results = cohort()
+    stats = CohortStats(capacity=2)
+    for r in results:
+        stats.add(r)
+    # A resubmission replaces the earlier row
+    stats.add(result("s0", 90, ("fulfilled", "fulfilled"), risk=50.0))
+    results[0] = result("s0", 90, ("fulfilled", "fulfilled"), risk=50.0)
+    stats.add(result("new", 60, ("fulfilled", "fulfilled", "partial")))
+    results.append(result("new", 60, ("fulfilled", "fulfilled", "partial")))
+
+    fresh = CohortStats.from_results(results)
+    assert len(stats) == len(fresh) == 12
+    assert np.allclose(stats.mean(), fresh.scores.mean(axis=0))
+    assert np.allclose(stats.std(), fresh.scores.std(axis=0))
+    assert stats.fulfillment_rates() == fresh.fulfillment_rates()
+    assert stats.fulfillment_rates()["req 2"] == {"rate": 0.5, "assessed": 1}
+    assert stats.percentile_ranks(result("q", 75))["correctness"] == 50.0
+
+
+def test_summary_waits_for_a_concurrent_add():
+    import threading
+
+    stats = CohortStats.from_results(cohort())
+    summaries = []
+    with stats._lock:  # an add() in progress on another thread
+        reader = threading.Thread(target=lambda: summaries.append(stats.summary()))
+        reader.start()
+        reader.join(0.1)
+        assert reader.is_alive()
+        stats.add(result("late", 50))
+    reader.join(1)
+    assert summaries[0]["count"] == 12
+
+
+def test_vectorized_scores_match_calculate_score():
+    alignments = [{"scores": {d: {"score": s + i} for i, d in enumerate(DIMS)}} for s in (0, 33, 71, 100)]
+    alignments.append({"scores": {}})
+    expected = [calculate_score(a)["final_score"] for a in alignments]
+    assert calculate_scores(alignments).tolist() == expected
+
+
+def test_evaluate_updates_cohort_endpoint():
+    cohort_analytics.reset()
+    code = "def add(a, b):\n    return a + b\n"
+    with use_fake_llm(), TestClient(app) as http:
+        for student in ("alice", "bob", "alice"):
+            http.post("/evaluate", json={"problem_text": "Add two numbers", "code": code, "student_id": student})
+        summary = http.get("/cohort_stats/default").json()
+    cohort_analytics.reset()
+
+    assert summary["count"] == 2
+    assert set(summary["distributions"]) == set(COLUMNS)
+
+
+def test_stats_cli(tmp_path, capsys):
+    path = tmp_path / "results.jsonl"
+    path.write_text("\n".join(json.dumps(r) for r in cohort()))
+    assert main(["stats", "--results", str(path)]) == 0
+    summary = json.loads(capsys.readouterr().out)
+    assert summary["count"] == 11 and summary["outliers"][0]["id"] == "low"
@@ -0,0 +1,142 @@
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from codealign.api import app
+from codealign.authenticity import dedup, ingest
+from codealign.authenticity.store import SubmissionStore
+from codealign.fake_llm import use_fake_llm
+
+CODE = """
+def two_sum(nums, target):
+    seen = {}
+    for i, n in enumerate(nums):
+        if target - n in seen:
+            return [seen[target - n], i]
+        seen[n] = i
+    return []
+"""
+
+REFORMATTED = """
+# Hash map solution
+def two_sum(nums,  target):
+  seen = {}
+
+  for i, n in enumerate(nums):   # single pass
+    if target - n in seen:
+      return [seen[target - n], i]
+    seen[n] = i
+  return []
+"""
+
+
+@pytest.fixture
+def fresh_store():
+    ingest.set_store(SubmissionStore(":memory:"))
+    yield ingest.get_store()
+    ingest.set_store(None)
+
+
+def test_hash_ignores_whitespace_and_comments():
+    assert dedup.code_hash(CODE) == dedup.code_hash(REFORMATTED)
+    assert dedup.code_hash(CODE) != dedup.code_hash(CODE.replace("return []", "return None"))
+    assert dedup.code_hash(CODE, "exact") != dedup.code_hash(REFORMATTED, "exact")
+
+
+def test_duplicates_link_to_canonical_and_reuse_work(fresh_store, monkeypatch):
+    extracted = []
+    extract = ingest.extract_features
+    monkeypatch.setattr(ingest, "extract_features", lambda code, **kw: extracted.append(code) or extract(code, **kw))
+
+    first = ingest.ingest_submission(CODE, "s1", "p", embedding=[0.1, 0.2])
+    exact = ingest.ingest_submission(CODE, "s2", "p")
+    near = ingest.ingest_submission(REFORMATTED, "s3", "p")
+    other = ingest.ingest_submission("print('hi')\n", "s4", "p", embedding=[1.0, 0.0])
+
+    assert first["canonical_id"] is None and other["canonical_id"] is None
+    assert exact["canonical_id"] == near["canonical_id"] == first["id"]
+    assert exact["embedding"] == near["embedding"] == pytest.approx([0.1, 0.2])
+    # Byte-identical copies reuse the stored features; near duplicates keep
+    # their own line numbers for matched_lines
+    assert extracted == [CODE, REFORMATTED, "print('hi')\n"]
+    assert exact["minhash"] == first["minhash"]
+    assert fresh_store.get(near["id"])["canonical_id"] == first["id"]
+
+
+def test_index_is_rebuilt_and_backfilled_from_store(fresh_store):
+    fresh_store.add({"id": "old", "student_id": "s1", "problem_id": "p", "code": CODE})
+    assert fresh_store.code_hashes("p")[0][2] is None
+
+    sub = ingest.ingest_submission(REFORMATTED, "s2", "p", embedding=[0.5])
+    assert sub["canonical_id"] == "old"
+    assert fresh_store.code_hashes("p")[0][2] == dedup.code_hash(CODE)
+    assert dedup.find_other_student("p", sub["code_hash"], "s2") == "old"
+    assert dedup.find_other_student("p", sub["code_hash"], "s1") == sub["id"]
+
+
+def test_check_authenticity_short_circuits_identical_code(fresh_store):
+    with use_fake_llm() as provider, TestClient(app) as http:
+        first = http.post("/check_authenticity", json={"code": CODE, "student_id": "s1", "problem_id": "p"}).json()
+        assert first["duplicate_of"] is None
+        calls = dict(provider.calls)
+
+        response = http.post("/check_authenticity", json={"code": REFORMATTED, "student_id": "s2", "problem_id": "p"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["combined_similarity"] == body["max_similarity"] == 1.0
+    assert body["risk_score"] == 100.0
+    assert body["duplicate_of"] == body["most_similar_submission_id"]
+    assert body["structural_similarity"] == 1.0
+    assert body["matched_lines"]
+    # No embedding request or AI-signal LLM call for the duplicate
+    assert provider.calls == calls
+
+
+def test_check_authenticity_scores_ai_signals_in_the_declared_language(fresh_store, monkeypatch):
+    from codealign import api
+
+    languages = []
+    heuristic, detect = api.heuristic_ai_signals, api.detect_ai_signals_async
+
+    def record_heuristic(code, language="Python"):
+        languages.append(("heuristic", language))
+        return heuristic(code, language=language)
+
+    async def record_detect(code, llm=None, language="Python"):
+        languages.append(("detect", language))
+        return await detect(code, llm=llm, language=language)
+
+    monkeypatch.setattr(api, "heuristic_ai_signals", record_heuristic)
+    monkeypatch.setattr(api, "detect_ai_signals_async", record_detect)
+    c_code = "int add(int a, int b) {\n    return a + b;\n}\n"
+    with use_fake_llm(), TestClient(app) as http:
+        for student in ("s1", "s2"):
+            http.post("/check_authenticity", json={"code": c_code, "student_id": student, "problem_id": "p",
+                                                   "language": "C"})
+    assert languages == [("detect", "C"), ("heuristic", "C")]
+
+
+def test_concurrent_copies_have_one_canonical(fresh_store, monkeypatch):
+    # Widen the window between the duplicate lookup and the insert
+    get = fresh_store.get
+    monkeypatch.setattr(fresh_store, "get", lambda sid: (time.sleep(0.01), get(sid))[1])
+    barrier = threading.Barrier(8)
+    subs = []
+
+    def submit(i):
+        barrier.wait()
+        subs.append(ingest.ingest_submission(CODE, f"s{i}", "race", embedding=[0.1]))
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    canonical = [s for s in subs if s["canonical_id"] is None]
+    assert len(canonical) == 1
+    assert {s["canonical_id"] for s in subs if s["canonical_id"]} == {canonical[0]["id"]}
+    assert dedup.get_index("race").get(dedup.code_hash(CODE)).size == 8
@@ -0,0 +1,174 @@
+import asyncio
+import json
+import time
+
+import httpx
+
+from codealign.async_client import AsyncLLMClient
+from codealign.cache import ResponseCache
+from codealign import dispatch
+from codealign.dispatch import CircuitBreaker, Dispatcher, DispatchPolicy
+from codealign.fake_llm import FakeLLMClient, FakeProvider
+
+
+def policy(**kwargs):
+    kwargs.setdefault("mode", "hedge")
+    kwargs.setdefault("deadline_seconds", 5.0)
+    kwargs.setdefault("hedge_delay_seconds", 0.05)
+    return DispatchPolicy(**kwargs)
+
+
+def slow(value, delay):
+    def call():
+        time.sleep(delay)
+        return value
+    return call
+
+
+def failing():
+    raise RuntimeError("provider down")
+
+
+def test_hedge_fires_backup_when_primary_is_slow():
+    dispatcher = Dispatcher(policy())
+    started = time.monotonic()
+    result = dispatcher.run([("groq", slow("primary", 1.0)), ("gemini", slow("backup", 0.01))])
+
+    assert result == "backup"
+    assert time.monotonic() - started < 0.5
+    stats = dispatcher.stats()
+    assert stats["fallback_wins"] == 1
+    assert stats["providers"]["gemini"]["hedged"] == 1
+    assert stats["providers"]["gemini"]["wins"] == 1
+    assert stats["providers"]["groq"]["abandoned"] == 1
+
+
+def test_hedge_keeps_fast_primary_and_skips_backup():
+    dispatcher = Dispatcher(policy())
+    backup_calls = []
+
+    result = dispatcher.run([("groq", slow("primary", 0.0)), ("gemini", lambda: backup_calls.append(1) or "backup")])
+
+    assert result == "primary"
+    assert backup_calls == []
+
+
+def test_failed_primary_starts_backup_immediately():
+    dispatcher = Dispatcher(policy(hedge_delay_seconds=10.0))
+    started = time.monotonic()
+
+    assert dispatcher.run([("groq", failing), ("gemini", slow("backup", 0.0))]) == "backup"
+    assert time.monotonic() - started < 1.0
+    assert dispatcher.stats()["providers"]["groq"]["errors"] == 1
+
+
+def test_race_returns_first_valid_json():
+    dispatcher = Dispatcher(policy(mode="race"))
+    result = dispatcher.run([
+        ("groq", slow("not json", 0.0)),
+        ("gemini", slow('{"ok": true}', 0.05)),
+    ], json_mode=True)
+
+    assert json.loads(result) == {"ok": True}
+    assert dispatcher.stats()["providers"]["groq"]["invalid"] == 1
+
+
+def test_sequential_mode_waits_for_primary():
+    dispatcher = Dispatcher(policy(mode="sequential"))
+    assert dispatcher.run([("groq", slow("primary", 0.1)), ("gemini", slow("backup", 0.0))]) == "primary"
+    assert dispatcher.stats()["providers"].get("gemini", {}).get("calls", 0) == 0
+
+
+def test_deadline_returns_none():
+    dispatcher = Dispatcher(policy(deadline_seconds=0.05, hedge_delay_seconds=10.0))
+    started = time.monotonic()
+
+    assert dispatcher.run([("groq", slow("late", 1.0))]) is None
+    assert time.monotonic() - started < 0.5
+    assert dispatcher.stats()["deadline_exceeded"] == 1
+
+
+def test_breaker_opens_and_recovers():
+    now = [0.0]
+    breaker = CircuitBreaker(error_rate=0.5, min_calls=4, window=10, cooldown=30.0, clock=lambda: now[0])
+    for _ in range(4):
+        assert breaker.allow()
+        breaker.record(False)
+
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    now[0] = 31.0
+    assert breaker.allow()          # half-open trial
+    assert not breaker.allow()      # only one at a time
+    breaker.record(True)
+    assert breaker.state == "closed"
+
+
+def test_dispatcher_skips_provider_with_open_breaker():
+    dispatcher = Dispatcher(policy(breaker_min_calls=3))
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        raise RuntimeError("500")
+
+    for _ in range(3):
+        dispatcher.run([("groq", flaky), ("gemini", slow("backup", 0.0))])
+    assert dispatcher.run([("groq", flaky), ("gemini", slow("backup", 0.0))]) == "backup"
+
+    assert len(calls) == 3
+    groq = dispatcher.stats()["providers"]["groq"]
+    assert groq["breaker"] == "open"
+    assert groq["breaker_skips"] == 1
+
+
+def test_async_client_hedges_to_gemini():
+    async def handler(request):
+        if "groq" in request.url.host:
+            await asyncio.sleep(1.0)
+            return httpx.Response(200, json={"choices": [{"message": {"content": "primary"}}]})
+        return httpx.Response(200, json={"candidates": [{"content": {"parts": [{"text": "backup"}]}}]})
+
+    async def run():
+        llm = AsyncLLMClient(groq_key="groq-test", gemini_key="gemini-test", cache=ResponseCache(path=None),
+                             transport=httpx.MockTransport(handler), policy=policy())
+        try:
+            started = time.monotonic()
+            return await llm.generate_text("sys", "user", use_cache=False), time.monotonic() - started, llm.stats()
+        finally:
+            await llm.aclose()
+
+    result, elapsed, stats = asyncio.run(run())
+    assert result == "backup"
+    assert elapsed < 0.5
+    assert stats["dispatch"]["providers"]["groq"]["abandoned"] == 1
+
+
+def test_client_stats_include_dispatch():
+    llm = FakeLLMClient(FakeProvider(), policy=policy())
+    assert llm.generate_text("sys", "user") == "OK"
+
+    stats = llm.stats()
+    assert stats["dispatch"]["mode"] == "hedge"
+    assert stats["dispatch"]["providers"]["fake"]["wins"] == 1
+    assert stats["cache"]["enabled"] is False
+
+
+def test_default_mode_is_sequential(monkeypatch):
+    monkeypatch.delenv("CODEALIGN_LLM_DISPATCH", raising=False)
+    assert DispatchPolicy().mode == "sequential"
+
+
+def test_hedging_is_suppressed_while_the_pool_is_busy(monkeypatch):
+    monkeypatch.setattr(dispatch, "HEDGE_MAX_INFLIGHT", 1)
+    dispatcher = Dispatcher(policy())
+    backup_calls = []
+
+    result = dispatcher.run([("groq", slow("primary", 0.2)), ("gemini", lambda: backup_calls.append(1) or "backup")])
+
+    assert result == "primary"
+    assert backup_calls == []
+    assert dispatcher.stats()["hedges_suppressed"] == 1
+    # The backup still runs once the primary fails
+    assert dispatcher.run([("groq", failing), ("gemini", slow("backup", 0.0))]) == "backup"
@@ -0,0 +1,97 @@
+import asyncio
+
+import httpx
+import pytest
+
+from codealign import LLMClient
+from codealign.async_client import AsyncLLMClient
+from codealign.cache import ResponseCache
+from codealign.embedding_cache import EmbeddingCache, normalize_code
+
+CODE = "def add(a, b):\n    return a + b\n"
+REFORMATTED = "# my solution\ndef add(a,  b):\n\n  return a + b   # sum\n"
+
+
+class FakeGenai:
+    def __init__(self):
+        self.inputs = []
+
+    def embed_content(self, model, content, task_type, title):
+        self.inputs.extend(content)
+        return {"embedding": [[float(len(text)), 0.5] for text in content]}
+
+
+def make_client(cache):
+    client = LLMClient.__new__(LLMClient)
+    client._genai, client._genai_ready = FakeGenai(), True
+    client.embedding_cache = cache
+    return client
+
+
+def test_normalization_ignores_whitespace_and_comments():
+    assert normalize_code(CODE) == normalize_code(REFORMATTED)
+    assert normalize_code(CODE, "whitespace") != normalize_code(REFORMATTED, "whitespace")
+    assert normalize_code(CODE, "whitespace") == normalize_code(CODE.replace("    ", "  "), "whitespace")
+    assert normalize_code(CODE) != normalize_code(CODE.replace("a + b", "a - b"))
+    assert (normalize_code("int f() {\n  // note\n  return 1;\n}", language="C")
+            == normalize_code("int f() {\n    return 1;\n}", language="C"))
+    # Comment rules follow the declared language, even for Python that does not parse
+    broken = "def f(a, b):\n    return (a\n    // b\n"
+    assert normalize_code(broken) != normalize_code(broken.replace("// b", "// c"))
+    with pytest.raises(ValueError):
+        EmbeddingCache(normalization="tokens")
+
+
+def test_duplicate_code_is_embedded_once():
+    client = make_client(EmbeddingCache(path=None))
+    vectors = client.get_embedding_many([CODE, REFORMATTED, CODE + "\n\n"])
+    assert client._genai.inputs == [CODE]
+    assert vectors[0] == vectors[1] == vectors[2]
+
+    assert client.get_embedding(REFORMATTED) == vectors[0]
+    assert client.get_embedding("def sub(a, b):\n    return a - b\n")
+    assert len(client._genai.inputs) == 2
+    assert client.embedding_cache.stats()["hits"] == 1
+
+
+def test_cache_persists_float32_blobs_with_lru_eviction(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    cache = EmbeddingCache(path=path, max_disk_entries=2)
+    keys = [cache.key(f"x = {i}", "m") for i in range(3)]
+    cache.set_many([(keys[0], [0.1, 0.2]), (keys[1], [1.0, 2.0])])
+    cache.get_many([keys[0]])  # keys[0] is now more recent than keys[1]
+    cache.set_many([(keys[2], [3.0])])
+    cache.close()
+
+    reopened = EmbeddingCache(path=path)
+    found = reopened.get_many(keys)
+    assert found[0] == pytest.approx([0.1, 0.2])
+    assert found[1] is None
+    assert found[2] == [3.0]
+    assert reopened.stats()["disk_hits"] == 2
+
+
+def test_async_client_shares_the_cache():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json={"embedding": {"values": [0.1, 0.2]}})
+
+    cache = EmbeddingCache(path=None)
+
+    async def run():
+        llm = AsyncLLMClient(groq_key="g", gemini_key="k", cache=ResponseCache(path=None),
+                             transport=httpx.MockTransport(handler), embedding_cache=cache)
+        first = await llm.get_embedding(CODE)
+        second = await llm.get_embedding(REFORMATTED)
+        await llm.aclose()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == pytest.approx(second)
+    assert len(requests) == 1
+    # The sync client reuses the vector the async path stored
+    client = make_client(cache)
+    assert client.get_embedding(CODE) == pytest.approx([0.1, 0.2])
+    assert client._genai.inputs == []
@@ -0,0 +1,108 @@
+import pytest
+
+from codealign import LLMClient
+from codealign.authenticity import embedding_queue, embeddings, ingest, lsh
+from codealign.authenticity.embedding_queue import EmbeddingQueue, set_embedding_queue
+from codealign.authenticity.store import SubmissionStore
+from codealign.embedding_cache import EmbeddingCache
+from codealign.fake_llm import FakeProvider, use_fake_llm
+
+
+class FlakyProvider(FakeProvider):
+    """Fails the first `failures` embedding requests."""
+
+    def __init__(self, failures, **kwargs):
+        super().__init__(**kwargs)
+        self.failures = failures
+
+    def embed_many(self, texts):
+        if self.failures:
+            self.failures -= 1
+            self._count("embedding")
+            return 0.0, [[] for _ in texts]
+        return super().embed_many(texts)
+
+
+@pytest.fixture
+def fresh_queue():
+    ingest.set_store(SubmissionStore(":memory:"))
+    queue = EmbeddingQueue(batch_size=100, batch_wait=0.2, retry_backoff=0.01, max_retries=2)
+    previous = set_embedding_queue(queue)
+    yield queue
+    set_embedding_queue(previous)
+    queue.close(timeout=5)
+    ingest.set_store(None)
+    lsh.reset()
+
+
+def test_ingest_returns_before_embedding_and_batches_writes(fresh_queue):
+    with use_fake_llm() as provider:
+        subs = [ingest.ingest_submission(f"def f{i}(x):\n    return x + {i}\n", f"u{i}", "p") for i in range(250)]
+        assert all(s["embedding"] == [] for s in subs)
+        assert fresh_queue.flush(timeout=10)
+
+    assert provider.calls["embedding"] == 3
+    stored = ingest.get_store().get_many([s["id"] for s in subs])
+    assert all(len(s["embedding"]) == provider.embedding_dim for s in stored)
+    assert len(embeddings.get_embedding_index("p")) == 250
+
+
+def test_failed_batches_are_retried(fresh_queue):
+    with use_fake_llm(FlakyProvider(failures=1)) as provider:
+        sub = ingest.ingest_submission("def f(x):\n    return x\n", "u", "p")
+        assert fresh_queue.flush(timeout=5)
+
+    assert provider.calls["embedding"] == 2
+    assert ingest.get_store().get(sub["id"])["embedding"]
+
+
+def test_queue_gives_up_after_max_retries(fresh_queue):
+    with use_fake_llm(FlakyProvider(failures=10)) as provider:
+        sub = ingest.ingest_submission("def f(x):\n    return x\n", "u", "p")
+        assert fresh_queue.flush(timeout=5)
+
+    assert provider.calls["embedding"] == 3
+    assert fresh_queue.pending == 0
+    assert ingest.get_store().get(sub["id"])["embedding"] == []
+
+
+def test_permanent_failures_are_not_retried(fresh_queue, monkeypatch):
+    with use_fake_llm(FlakyProvider(failures=10)) as provider:
+        monkeypatch.setattr(type(embedding_queue.get_client()), "embeddings_available", False)
+        subs = [ingest.ingest_submission(f"def f{i}(x):\n    return {i}\n", f"u{i}", "p") for i in range(3)]
+        assert fresh_queue.flush(timeout=5)
+
+    assert provider.calls["embedding"] == 0
+    assert all(s["embedding"] == [] for s in ingest.get_store().get_many([s["id"] for s in subs]))
+
+
+def test_flush_and_close(fresh_queue):
+    with use_fake_llm():
+        sub = ingest.ingest_submission("def f(x):\n    return x\n", "u", "p")
+        assert embedding_queue.flush_embedding_queue(timeout=5)
+    assert ingest.get_store().get(sub["id"])["embedding"]
+
+    fresh_queue.close(timeout=5)
+    assert fresh_queue.pending == 0
+    with pytest.raises(RuntimeError):
+        fresh_queue.submit("p", "x", "code")
+
+
+def test_get_embedding_many_batches_requests():
+    class FakeGenai:
+        def __init__(self):
+            self.requests = []
+
+        def embed_content(self, model, content, task_type, title):
+            self.requests.append(len(content))
+            return {"embedding": [[float(len(text))] for text in content]}
+
+    client = LLMClient.__new__(LLMClient)
+    client._genai, client._genai_ready = FakeGenai(), True
+    client.embedding_cache = EmbeddingCache(path=None, enabled=False)
+    texts = ["x" * i for i in range(1, 251)]
+
+    vectors = client.get_embedding_many(texts)
+    assert client._genai.requests == [100, 100, 50]
+    assert vectors[0] == [1.0] and vectors[-1] == [250.0]
+    assert client.get_embedding("abc") == [3.0]
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from codealign.authenticity import embeddings, ingest, lsh, winnowing
+from codealign.authenticity.embeddings import EmbeddingIndex
+from codealign.authenticity.search import search_similar, blend_similarity
+from codealign.authenticity.similarity import find_similar
+from codealign.authenticity.store import SubmissionStore
+
+
+@pytest.fixture
+def fresh_store(monkeypatch):
+    monkeypatch.setattr(ingest, "_store", SubmissionStore(":memory:"))
+    lsh.reset()
+    winnowing.reset()
+    embeddings.reset()
+    yield
+    lsh.reset()
+    winnowing.reset()
+    embeddings.reset()
+
+
+def test_top_k_cosine_in_memory():
+    index = EmbeddingIndex("p")
+    index.add_many([("a", [1, 0, 0]), ("b", [0.9, 0.1, 0]), ("c", [0, 0, 1])])
+    hits = index.query([1, 0, 0], k=2)
+    assert [sid for sid, _ in hits] == ["a", "b"]
+    assert hits[0][1] == pytest.approx(1.0)
+    assert [sid for sid, _ in index.query([1, 0, 0], k=1, exclude_ids={"a"})] == ["b"]
+
+
+def test_memory_mapped_index_persists(tmp_path):
+    index = EmbeddingIndex("problem/1", str(tmp_path))
+    index.add("a", [3, 4])
+    index.add("b", [0, 1])
+    reopened = EmbeddingIndex("problem/1", str(tmp_path))
+    assert reopened.ids == ["a", "b"]
+    assert isinstance(reopened.matrix(), np.memmap)
+    np.testing.assert_allclose(reopened.matrix()[0], [0.6, 0.8], rtol=1e-6)
+    assert reopened.scores_for([0, 1], ["b"])["b"] == pytest.approx(1.0)
+
+
+def test_search_blends_embedding_score(fresh_store):
+    other = ingest.ingest_submission("def f(a):\n    return sorted(a)\n", "s1", "p", embedding=[1.0, 0.0])
+    mine = ingest.ingest_submission("def g(items):\n    items.sort()\n    return items\n", "s2", "p", embedding=[0.99, 0.1])
+    result = search_similar(mine, "p")
+    assert result["most_similar_semantic_id"] == other["id"]
+    assert result["semantic_similarity"] > 0.99
+    assert result["combined_similarity"] == pytest.approx(
+        blend_similarity(result["max_similarity"], result["semantic_similarity"])
+    )
+
+
+def test_find_similar_accepts_embedding_vector():
+    subs = [{"id": "1", "student_id": "x", "embedding": [1.0, 0.0]},
+            {"id": "2", "student_id": "y", "embedding": [0.0, 1.0]}]
+    matches = find_similar([1.0, 0.05], subs, threshold=0.9)
+    assert [m["id"] for m in matches] == ["1"]
@@ -1,4 +1,52 @@
+from fastapi.testclient import TestClient
+
+from codealign import pipeline
 from codealign.api import app
+from codealign.benchmark import load_example_corpus
+from codealign.fake_llm import use_fake_llm
 
 def test_end_to_end():
-    pass
+    problem_text, codes = load_example_corpus()
+    with use_fake_llm() as provider, TestClient(app) as http:
+        for code in codes:
+            response = http.post("/evaluate", json={"problem_text": problem_text, "code": code})
+            assert response.status_code == 200
+            assert 60 <= response.json()["overall_score"] <= 100
+        auth = http.post("/check_authenticity", json={"code": codes[0], "student_id": "s1", "problem_id": "e2e"})
+        assert auth.status_code == 200
+    # Requirements are memoized per problem; alignment runs once per submission
+    assert provider.calls["requirements"] == 1
+    assert provider.calls["alignment"] == len(codes)
+
+def _stub_llm_stages(monkeypatch):
+    async def fake_requirements(problem_text):
+        return [{"description": "Return the sum", "type": "functional"}]
+
+    async def fake_ai_signals(code, language="Python"):
+        return {"is_suspicious": False, "confidence": 0.1, "signals": []}
+
+    async def fake_alignment(requirements, code, analysis, language="Python"):
+        return {
+            "alignment": [{"requirement": r["description"], "status": "fulfilled"} for r in requirements],
+            "scores": {k: {"score": 90} for k in ("correctness", "time_efficiency", "space_efficiency", "readability")},
+            "feedback": {"strengths": ["ok"]},
+        }
+
+    monkeypatch.setattr(pipeline, "extract_requirements_async", fake_requirements)
+    monkeypatch.setattr(pipeline, "detect_ai_signals_async", fake_ai_signals)
+    monkeypatch.setattr(pipeline, "align_spec_code_async", fake_alignment)
+
+def test_evaluate_endpoint_async(monkeypatch):
+    _stub_llm_stages(monkeypatch)
+    with TestClient(app) as http:
+        response = http.post("/evaluate", json={"problem_text": "Add two numbers", "code": "def add(a, b):\n    return a + b\n"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["overall_score"] == 90.0
+    assert body["alignment_details"][0]["requirement"] == "Return the sum"
+
+def test_evaluate_endpoint_rejects_syntax_errors(monkeypatch):
+    _stub_llm_stages(monkeypatch)
+    with TestClient(app) as http:
+        response = http.post("/evaluate", json={"problem_text": "p", "code": "def broken(:"})
+    assert response.status_code == 400
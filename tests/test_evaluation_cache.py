@@ -0,0 +1,140 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from codealign import LLMClient, evaluation_cache
+from codealign.api import app
+from codealign.authenticity import ingest
+from codealign.authenticity.store import SubmissionStore
+from codealign.cache import ResponseCache
+from codealign.evaluation_cache import EvaluationCache, set_evaluation_cache
+from codealign.fake_llm import FakeProvider, use_fake_llm
+from codealign.pipeline import evaluate_submission
+
+PROBLEM = "Return the sum of a list of integers."
+CODE = "def total(nums):\n    # running sum\n    result = 0\n    for n in nums:\n        result += n\n    return result\n"
+REINDENTED = CODE.replace("    ", "  ") + "\n\n"
+
+
+@pytest.fixture
+def cache():
+    cache = EvaluationCache(ResponseCache(path=None, namespace="evaluations"))
+    previous = set_evaluation_cache(cache)
+    yield cache
+    set_evaluation_cache(previous)
+
+
+def llm_calls(provider):
+    return provider.calls["alignment"] + provider.calls["ai_signals"] + provider.calls["fused"]
+
+
+def test_repeat_evaluation_makes_no_llm_calls(cache):
+    with use_fake_llm() as provider:
+        first = evaluate_submission(PROBLEM, CODE)
+        calls = dict(provider.calls)
+        again = evaluate_submission(PROBLEM, REINDENTED)
+        assert provider.calls == calls
+
+        # Comments are graded, so they are part of the key
+        evaluate_submission(PROBLEM, CODE.replace("# running sum", "# add up"))
+        assert provider.calls["alignment"] == calls["alignment"] + 1
+
+    assert again == first
+    assert cache.stats()["hits"] == 1
+
+
+def test_key_covers_prompt_version_model_and_mode(cache, monkeypatch):
+    with use_fake_llm() as provider:
+        evaluate_submission(PROBLEM, CODE)
+        before = llm_calls(provider)
+        monkeypatch.setattr(evaluation_cache, "PROMPT_VERSION", evaluation_cache.PROMPT_VERSION + 1)
+        evaluate_submission(PROBLEM, CODE)
+        monkeypatch.setattr(LLMClient, "GROQ_MODEL", "another-model")
+        evaluate_submission(PROBLEM, CODE)
+        evaluate_submission(PROBLEM, CODE, mode="fused")
+        evaluate_submission(PROBLEM, CODE, language="Python 3")
+
+    assert llm_calls(provider) - before >= 4
+    assert cache.stats()["hits"] == 0
+
+
+def test_expired_and_failed_evaluations_are_not_served(monkeypatch):
+    previous = set_evaluation_cache(EvaluationCache(ResponseCache(path=None, ttl_seconds=1e-9)))
+    try:
+        with use_fake_llm() as provider:
+            evaluate_submission(PROBLEM, CODE)
+            before = llm_calls(provider)
+            evaluate_submission(PROBLEM, CODE)
+            assert llm_calls(provider) > before
+    finally:
+        set_evaluation_cache(previous)
+
+    cache = EvaluationCache(ResponseCache(path=None))
+    previous = set_evaluation_cache(cache)
+    try:
+        with use_fake_llm(FakeProvider(error_rate=1.0)):
+            evaluate_submission("Another problem.", CODE)
+    finally:
+        set_evaluation_cache(previous)
+    assert cache.stats()["sets"] == 0
+
+
+def test_cached_evaluation_still_checks_similarity(cache):
+    ingest.set_store(SubmissionStore(":memory:"))
+    try:
+        with use_fake_llm():
+            first = evaluate_submission(PROBLEM, CODE, student_id="s1", problem_id="sum", include_similarity=True)
+            copied = evaluate_submission(PROBLEM, CODE, student_id="s2", problem_id="sum", include_similarity=True)
+    finally:
+        ingest.set_store(None)
+
+    assert cache.stats()["hits"] == 1
+    assert first["max_similarity"] == 0.0
+    assert copied["max_similarity"] == 1.0 and copied["authenticity_risk"] == 100.0
+    assert copied["overall_score"] == first["overall_score"]
+
+
+def test_evaluate_endpoint_serves_cache_and_can_be_cleared(cache):
+    with use_fake_llm() as provider, TestClient(app) as http:
+        body = {"problem_text": PROBLEM, "code": CODE}
+        first = http.post("/evaluate", json=body).json()
+        calls = dict(provider.calls)
+        assert http.post("/evaluate", json=body).json() == first
+        assert provider.calls == calls
+
+        assert http.delete("/evaluation_cache").json()["cleared"]
+        http.post("/evaluate", json=body)
+        assert provider.calls != calls
+
+
+def test_authenticity_risk_is_recomputed_for_each_student(cache):
+    ingest.set_store(SubmissionStore(":memory:"))
+    try:
+        with use_fake_llm():
+            # bob's evaluation is computed (and cached) while alice's copy is on record
+            ingest.ingest_submission(CODE, student_id="alice", problem_id="sum")
+            bob = evaluate_submission(PROBLEM, CODE, student_id="bob", problem_id="sum", include_similarity=True)
+            carol = evaluate_submission(PROBLEM, CODE, student_id="carol", problem_id="other")
+    finally:
+        ingest.set_store(None)
+
+    assert cache.stats()["hits"] == 1
+    assert bob["authenticity_risk"] == 100.0
+    assert "max_similarity" not in carol
+    assert carol["authenticity_risk"] == carol["authenticity_signals"]["confidence"] * 100 < 100.0
+
+
+def test_unknown_problem_does_not_extract_before_the_stages(cache):
+    import time
+    from codealign.pipeline import AnalysisError
+
+    with use_fake_llm(latency_ms=300) as provider:
+        start = time.perf_counter()
+        with pytest.raises(AnalysisError):
+            evaluate_submission(PROBLEM, "def broken(:\n")
+        # The syntax error surfaces without waiting for requirement extraction
+        assert time.perf_counter() - start < 0.25
+        assert cache.stats()["misses"] == 0
+
+        evaluate_submission(PROBLEM, CODE)
+        evaluate_submission(PROBLEM, CODE)
+    assert cache.stats()["hits"] == 1
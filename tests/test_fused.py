@@ -0,0 +1,101 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from codealign import fused, pipeline
+from codealign.api import app
+from codealign.benchmark import load_example_corpus
+from codealign.fake_llm import FakeProvider, use_fake_llm
+
+CODE = "def add(a, b):\n    # Sure, here is the code\n    return a + b\n"
+REQUIREMENTS = [{"description": "Return the sum", "type": "functional"}]
+
+
+def fused_response(**overrides):
+    data = {
+        "alignment": [{"requirement": "Return the sum", "status": "fulfilled", "type": "Functional", "evidence": "a + b"}],
+        "scores": {k: {"score": 90, "reasoning": "ok"} for k in ("correctness", "time_efficiency", "space_efficiency", "readability")},
+        "feedback": {"strengths": ["short"]},
+        "ai_signals": {"is_suspicious": True, "confidence": 0.8, "signals": ["AI phrasing"]},
+    }
+    data.update(overrides)
+    return json.dumps(data)
+
+
+def test_parse_fused_response_splits_and_validates():
+    alignment, ai_signals = fused.parse_fused_response(fused_response())
+    assert set(alignment) == {"alignment", "scores", "feedback"}
+    assert ai_signals["confidence"] == 0.8
+
+    assert fused.parse_fused_response(None) is None
+    assert fused.parse_fused_response("not json") is None
+    assert fused.parse_fused_response(fused_response(ai_signals={"is_suspicious": True, "confidence": 1.5})) is None
+    assert fused.parse_fused_response(fused_response(scores={"correctness": {"score": "high"}})) is None
+
+
+def test_parse_fused_response_returns_coerced_numbers():
+    scores = {k: {"score": "90", "reasoning": "ok"} for k in ("correctness", "time_efficiency", "space_efficiency", "readability")}
+    alignment, ai_signals = fused.parse_fused_response(fused_response(
+        scores=scores, ai_signals={"is_suspicious": "false", "confidence": "0.2", "signals": []}))
+    assert ai_signals == {"is_suspicious": False, "confidence": 0.2, "signals": []}
+    assert alignment["scores"]["correctness"] == {"score": 90, "reasoning": "ok"}
+    assert pipeline.authenticity_risk(ai_signals) == 20.0
+
+
+def test_fused_prompt_keeps_comments_and_both_schemas():
+    prompt = fused.build_fused_prompt(REQUIREMENTS, CODE, {"loops": 0})
+    assert "# Sure, here is the code" in prompt
+    assert '"ai_signals"' in prompt and '"scores"' in prompt
+    assert fused.build_fused_prompt(REQUIREMENTS, CODE * 50, {}, budget=200) is None
+
+
+def test_fused_mode_makes_one_call_per_submission():
+    problem_text, codes = load_example_corpus()
+    with use_fake_llm() as provider:
+        payload = pipeline.evaluate_submission(problem_text, codes[0], mode="fused")
+
+    assert provider.calls["fused"] == 1
+    assert provider.calls["alignment"] == provider.calls["ai_signals"] == 0
+    assert payload["detailed_scores"]["correctness"]["score"] >= 60
+    assert "confidence" in payload["authenticity_signals"]
+
+
+def test_ui_result_unpacking_in_fused_mode(monkeypatch):
+    # Mirrors ui_app: stages built with the configured default mode, then unpacked by stage name
+    monkeypatch.setattr(pipeline, "DEFAULT_EVALUATION_MODE", "fused")
+    problem_text, codes = load_example_corpus()
+    with use_fake_llm():
+        stages = pipeline.build_evaluation_stages(problem_text, codes[0], student_id="ui", include_similarity=True)
+        results = pipeline.run_stages(stages)
+
+    assert "alignment" not in results
+    unpacked = pipeline.stage_results(results)
+    assert unpacked["alignment"]["scores"]["correctness"]["score"] >= 60
+    assert "confidence" in unpacked["ai_signals"]
+    assert unpacked["similarity"] == results["similarity"]
+    assert pipeline.build_evaluation_payload(results)["feedback"] == unpacked["alignment"]["feedback"]
+
+
+def test_fused_mode_falls_back_to_two_calls_on_invalid_response():
+    class Broken(FakeProvider):
+        def respond(self, kind, user_prompt):
+            return '{"alignment": []}' if kind == "fused" else super().respond(kind, user_prompt)
+
+    with use_fake_llm(Broken()) as provider:
+        result = fused.evaluate_fused(REQUIREMENTS, CODE, {})
+
+    assert provider.calls["fused"] == 1
+    assert provider.calls["alignment"] == 1
+    assert result["alignment"]["scores"]
+    assert "confidence" in result["ai_signals"]
+
+
+def test_evaluate_endpoint_fused_mode():
+    with use_fake_llm() as provider, TestClient(app) as http:
+        response = http.post("/evaluate", json={"problem_text": "Add two numbers", "code": CODE, "mode": "fused"})
+        invalid = http.post("/evaluate", json={"problem_text": "Add two numbers", "code": CODE, "mode": "three_call"})
+
+    assert response.status_code == 200
+    assert invalid.status_code == 422
+    assert provider.calls["fused"] == 1 and provider.calls["alignment"] == 0
+    assert response.json()["alignment_details"]
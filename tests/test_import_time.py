@@ -0,0 +1,43 @@
+"""
+Import-time budget: lightweight modules must not drag in provider SDKs or build the LLM client.
+Each check runs in a fresh interpreter so earlier imports in the test session don't hide regressions.
+"""
+import os
+import sys
+import json
+import subprocess
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), "../src"))
+HEAVY_MODULES = ("groq", "google.generativeai", "streamlit", "dotenv")
+BUDGET_MS = float(os.getenv("CODEALIGN_IMPORT_BUDGET_MS", "150"))
+
+
+def _probe(module: str) -> dict:
+    script = f"""
+import sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = (time.perf_counter() - start) * 1000
+import codealign
+print(json.dumps({{
+    "elapsed_ms": elapsed,
+    "loaded": [m for m in {HEAVY_MODULES!r} if m in sys.modules],
+    "client_built": codealign._client is not None,
+}}))
+"""
+    env = dict(os.environ, PYTHONPATH=SRC)
+    out = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def test_cohort_stats_import_is_cheap():
+    probe = _probe("codealign.cohort_stats")
+    assert probe["loaded"] == []
+    assert not probe["client_built"]
+    assert probe["elapsed_ms"] < BUDGET_MS, f"import took {probe['elapsed_ms']:.0f} ms (budget {BUDGET_MS:.0f} ms)"
+
+
+def test_pipeline_import_defers_providers():
+    probe = _probe("codealign.pipeline")
+    assert probe["loaded"] == []
+    assert not probe["client_built"]
@@ -0,0 +1,138 @@
+from codealign.alignment.code_analysis import analyze_code, get_analyzer
+from codealign.authenticity.ai_heuristics import extract_style_features
+from codealign.prompt_budget import strip_comments
+
+CPP = r'''
+#include <iostream>
+#include "stack.h"
+
+/** Computes n! recursively.
+ * @param n the argument */
+long long fact(int n) {
+    // if (n) for (;;) { is a comment
+    if (n <= 1) return 1;
+    const char* s = "while (true) {";
+    return n * fact(n - 1);
+}
+
+class Stack {
+public:
+    Stack(int cap) : cap_(cap), size_{0} {}
+    bool operator<(const Stack& other) const { return cap_ < other.cap_; }
+    void drain() noexcept { do { size_--; } while (size_ > 0); }
+private:
+    int cap_, size_;
+};
+
+int peek(int* xs);
+
+int main() {
+    for (int i = 0; i < 3; i++) { std::cout << fact(i); }
+    return 0;
+}
+'''
+
+JAVA = '''
+import java.util.*;
+import static java.lang.Math.max;
+
+public class Solution {
+    /** Fibonacci number. */
+    public static int fib(int n) throws IllegalArgumentException {
+        if (n < 2) return n;
+        return fib(n - 1) + fib(n - 2);
+    }
+
+    private List<Integer> positive(List<Integer> xs, Map<String, List<Integer>> seen) {
+        List<Integer> out = new ArrayList<>();
+        for (int x : xs) { if (x > 0) out.add(x); }
+        return out;
+    }
+}
+'''
+
+JS = r'''
+import fs from 'fs';
+const path = require("path");
+
+/** Sums a list. */
+function sum(xs, start = 0) {
+  const re = /\/\/ not a comment {/g;
+  return xs.reduce((a, b) => a + b, start);
+}
+
+const fact = (n) => n <= 1 ? 1 : n * fact(n - 1);
+
+class Loader {
+  constructor(root) { this.root = root; }
+  async load(name) {
+    while (!this.ready) { await this.wait(); }
+    return `${this.root}/${name} }`;
+  }
+}
+'''
+
+
+def test_cpp_schema():
+    analysis = analyze_code(CPP, "C++")
+    assert analysis["error"] is None
+    assert analysis["imports"] == ["iostream", "stack.h"]
+    functions = {f["name"]: f for f in analysis["functions"]}
+    # Declarations without a body and constructor initializers are not functions
+    assert list(functions) == ["fact", "Stack", "operator<", "drain", "main"]
+    assert functions["fact"]["args"] == ["n"]
+    assert functions["fact"]["docstring"] == "Computes n! recursively.\n@param n the argument"
+    assert functions["operator<"]["args"] == ["other"]
+    # Comments and strings do not count; the while of a do-while is one loop with its do
+    assert analysis["loops"] == 2
+    assert analysis["conditionals"] == 1
+    assert analysis["returns"] == 4
+    assert analysis["has_recursion"] is True
+
+
+def test_java_schema():
+    analysis = analyze_code(JAVA, "Java")
+    assert analysis["imports"] == ["java.util.*", "java.lang.Math.max"]
+    assert [(f["name"], f["args"]) for f in analysis["functions"]] == [("fib", ["n"]), ("positive", ["xs", "seen"])]
+    assert analysis["functions"][0]["docstring"] == "Fibonacci number."
+    assert (analysis["loops"], analysis["conditionals"], analysis["returns"]) == (1, 2, 3)
+    assert analysis["has_recursion"] is True
+
+
+def test_javascript_schema():
+    analysis = analyze_code(JS, "javascript")
+    assert analysis["imports"] == ["fs", "path"]
+    assert [(f["name"], f["args"]) for f in analysis["functions"]] == [
+        ("sum", ["xs", "start"]), ("fact", ["n"]), ("constructor", ["root"]), ("load", ["name"]),
+    ]
+    assert analysis["functions"][0]["docstring"] == "Sums a list."
+    assert (analysis["loops"], analysis["conditionals"], analysis["returns"]) == (1, 0, 2)
+    assert analysis["has_recursion"] is True
+
+
+def test_no_recursion_and_unknown_languages():
+    analysis = analyze_code("#include <stdio.h>\nint add(int a, int b) { return a + b; }\n"
+                            "int main(void) { printf(\"%d\", add(1, 2)); return 0; }\n", "C")
+    assert [f["name"] for f in analysis["functions"]] == ["add", "main"]
+    assert analysis["functions"][1]["args"] == []
+    assert analysis["has_recursion"] is False
+
+    assert analyze_code("def f(n):\n    return f(n - 1) if n else 0\n")["has_recursion"] is True
+    # Malformed code degrades to partial counts instead of an error
+    assert analyze_code("int main() { if (x) { return", "C")["error"] is None
+    assert get_analyzer("Ruby") is None
+    assert analyze_code("puts 1", "Ruby")["functions"] == []
+
+
+def test_strip_comments_brace_languages():
+    code = ("/** Adds. */\nint add(int a, int b) { /* inline */ return a + b; } // trailing\n"
+            "/* block\n   comment */\nconst char* s = \"// kept\";\n")
+    stripped, removed = strip_comments(code, language="C++")
+    assert removed == 3
+    assert stripped == "/** Adds. */\nint add(int a, int b) {  return a + b; }\nconst char* s = \"// kept\";"
+
+
+def test_style_features_count_doc_comments():
+    features = extract_style_features(JAVA, "Java")
+    assert features["functions"] == 2
+    assert features["docstring_ratio"] == 0.5
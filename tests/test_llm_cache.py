@@ -0,0 +1,73 @@
+import time
+
+from codealign import LLMClient
+from codealign.cache import ResponseCache, make_key
+
+
+class CountingClient(LLMClient):
+    """LLMClient whose providers are replaced by a call counter."""
+
+    def __init__(self, cache, response='{"ok": true}'):
+        super().__init__(cache=cache)
+        self.calls = 0
+        self.response = response
+
+    def _generate_uncached(self, system_prompt, user_prompt, json_mode, temperature):
+        self.calls += 1
+        return self.response
+
+
+def test_make_key_is_content_addressed():
+    assert make_key("a", "b", True, 0.0) == make_key("a", "b", True, 0.0)
+    assert make_key("a", "b", True, 0.0) != make_key("a", "b", False, 0.0)
+
+
+def test_generate_text_hits_cache_on_repeat():
+    client = CountingClient(ResponseCache(path=None))
+    first = client.generate_text("sys", "user", json_mode=True)
+    second = client.generate_text("sys", "user", json_mode=True)
+    assert first == second
+    assert client.calls == 1
+    stats = client.cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+
+
+def test_generate_text_bypass_flag():
+    client = CountingClient(ResponseCache(path=None))
+    client.generate_text("sys", "user", use_cache=False)
+    client.generate_text("sys", "user", use_cache=False)
+    assert client.calls == 2
+
+
+def test_invalid_json_is_not_cached():
+    client = CountingClient(ResponseCache(path=None), response="not json")
+    client.generate_text("sys", "user", json_mode=True)
+    client.generate_text("sys", "user", json_mode=True)
+    assert client.calls == 2
+
+
+def test_disk_tier_survives_new_instance(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    ResponseCache(path=path).set("k", "v")
+    fresh = ResponseCache(path=path)
+    assert fresh.get("k") == "v"
+    assert fresh.stats()["disk_hits"] == 1
+
+
+def test_ttl_and_lru_eviction():
+    cache = ResponseCache(path=None, max_memory_entries=2, ttl_seconds=0.05)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.set("c", "3")
+    assert cache.get("a") is None
+    assert cache.get("c") == "3"
+    time.sleep(0.1)
+    assert cache.get("c") is None
+
+
+def test_sampled_generations_are_not_cached():
+    client = CountingClient(ResponseCache(path=None))
+    client.generate_text("sys", "user", json_mode=True, temperature=0.1)
+    client.generate_text("sys", "user", json_mode=True, temperature=0.1)
+    assert client.calls == 2
+    assert client.cache.stats()["misses"] == 0
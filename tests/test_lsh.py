@@ -0,0 +1,80 @@
+import pytest
+
+from codealign.authenticity import ingest, lsh, winnowing
+from codealign.authenticity.store import SubmissionStore
+
+ORIGINAL = """
+def length_of_lis(nums):
+    if not nums:
+        return 0
+    tails = []
+    for num in nums:
+        lo, hi = 0, len(tails)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if tails[mid] < num:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == len(tails):
+            tails.append(num)
+        else:
+            tails[lo] = num
+    return len(tails)
+"""
+
+UNRELATED = """
+class Stack:
+    def __init__(self):
+        self.items = {}
+    def push(self, key, value):
+        self.items[key] = value
+        print("pushed", key)
+"""
+
+
+@pytest.fixture
+def fresh_store(monkeypatch):
+    monkeypatch.setattr(ingest, "_store", SubmissionStore(":memory:"))
+    lsh.reset()
+    winnowing.reset()
+    yield ingest.get_store()
+    lsh.reset()
+    winnowing.reset()
+
+
+def test_minhash_estimates_jaccard():
+    hasher = lsh.MinHasher(lsh.LSHConfig(bands=32, rows=4, shingle_size=3))
+    a = hasher.signature(ORIGINAL)
+    assert lsh.estimate_jaccard(a, hasher.signature(ORIGINAL)) == 1.0
+    assert lsh.estimate_jaccard(a, hasher.signature(UNRELATED)) < 0.2
+
+
+def test_candidate_probability_curve():
+    config = lsh.LSHConfig(bands=32, rows=4)
+    assert config.candidate_probability(0.9) > 0.99
+    assert config.candidate_probability(0.1) < 0.01
+
+
+def test_candidates_include_near_copies_only(fresh_store):
+    copy = ingest.ingest_submission("# my own solution\n" + ORIGINAL.replace("mid = ", "mid  = "), "s1", "p", embedding=[])
+    ingest.ingest_submission(UNRELATED, "s2", "p", embedding=[])
+
+    ids = {s["id"] for s in ingest.get_candidate_submissions("p", ORIGINAL)}
+    assert copy["id"] in ids
+    assert len(ids) == 1
+
+
+def test_index_is_updated_incrementally(fresh_store):
+    ingest.ingest_submission(UNRELATED, "s1", "p", embedding=[])
+    assert lsh.candidate_ids("p", ORIGINAL) == set()  # builds the index
+    late = ingest.ingest_submission(ORIGINAL, "s2", "p", embedding=[])
+    assert late["id"] in lsh.candidate_ids("p", ORIGINAL)
+
+
+def test_index_rebuild_reuses_stored_signatures(fresh_store, monkeypatch):
+    ingest.ingest_submission(ORIGINAL, "s1", "p", embedding=[])
+    lsh.reset()
+    winnowing.reset()
+    monkeypatch.setattr(lsh, "compute_signature", lambda code: pytest.fail("signature recomputed"))
+    assert len(lsh.get_index("p")) == 1
@@ -0,0 +1,98 @@
+import time
+import threading
+
+import pytest
+
+from codealign import pipeline
+from codealign.pipeline import Stage, StageError, AnalysisError, run_stages
+
+
+def test_independent_stages_run_in_parallel():
+    def slow(value):
+        def run():
+            time.sleep(0.2)
+            return value
+        return run
+
+    stages = [Stage("a", slow(1)), Stage("b", slow(2)), Stage("c", slow(3))]
+    start = time.perf_counter()
+    results = run_stages(stages, max_workers=3)
+    assert results == {"a": 1, "b": 2, "c": 3}
+    assert time.perf_counter() - start < 0.5
+
+
+def test_dependencies_receive_results():
+    order = []
+
+    def record(name, value):
+        order.append(name)
+        return value
+
+    stages = [
+        Stage("sum", lambda x, y: record("sum", x + y), deps=("x", "y")),
+        Stage("x", lambda: record("x", 2)),
+        Stage("y", lambda: record("y", 3)),
+    ]
+    assert run_stages(stages)["sum"] == 5
+    assert order[-1] == "sum"
+
+
+def test_cycle_and_unknown_dependency_rejected():
+    with pytest.raises(ValueError):
+        run_stages([Stage("a", lambda b: b, deps=("b",)), Stage("b", lambda a: a, deps=("a",))])
+    with pytest.raises(ValueError):
+        run_stages([Stage("a", lambda missing: missing, deps=("missing",))])
+
+
+def test_stage_failure_is_wrapped():
+    def boom():
+        raise RuntimeError("nope")
+
+    with pytest.raises(StageError) as exc:
+        run_stages([Stage("boom", boom)])
+    assert exc.value.stage == "boom"
+
+
+def test_stage_failure_does_not_wait_for_running_stages():
+    running, release = threading.Event(), threading.Event()
+    started = []
+
+    def boom():
+        running.wait(5)
+        raise RuntimeError("nope")
+
+    def slow():
+        running.set()
+        release.wait(5)
+        return 1
+
+    stages = [Stage("boom", boom), Stage("slow", slow),
+              Stage("after", lambda slow: started.append("after"), deps=("slow",))]
+    start = time.perf_counter()
+    try:
+        with pytest.raises(StageError):
+            run_stages(stages, max_workers=2)
+        assert time.perf_counter() - start < 1
+    finally:
+        release.set()
+    assert started == []
+
+
+def test_evaluate_submission_wires_stages(monkeypatch):
+    monkeypatch.setattr(pipeline, "extract_requirements", lambda text: [{"description": "d", "type": "functional"}])
+    monkeypatch.setattr(pipeline, "detect_ai_signals", lambda code, language="Python": {"is_suspicious": False, "confidence": 0.2, "signals": []})
+    monkeypatch.setattr(pipeline, "align_spec_code", lambda reqs, code, analysis, language="Python": {
+        "alignment": [{"requirement": reqs[0]["description"], "status": "fulfilled"}],
+        "scores": {k: {"score": 100} for k in ("correctness", "time_efficiency", "space_efficiency", "readability")},
+    })
+    payload = pipeline.evaluate_submission("problem", "def f():\n    return 1\n")
+    assert payload["overall_score"] == 100.0
+    assert payload["authenticity_risk"] == pytest.approx(20.0)
+    assert payload["alignment_details"][0]["requirement"] == "d"
+
+
+def test_evaluate_submission_raises_on_syntax_error(monkeypatch):
+    monkeypatch.setattr(pipeline, "extract_requirements", lambda text: [])
+    monkeypatch.setattr(pipeline, "detect_ai_signals", lambda code, language="Python": {"confidence": 0.0})
+    with pytest.raises(AnalysisError):
+        pipeline.evaluate_submission("problem", "def broken(:")
@@ -0,0 +1,122 @@
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from codealign import pipeline
+from codealign.api import app
+from codealign.alignment.behaviour_extract import FALLBACK_REQUIREMENTS
+from codealign.alignment.problems import (
+    ProblemRegistry, ProblemNotFound, get_registry, normalize_problem_text, problem_hash,
+)
+
+REQS = [{"description": "Return the sum", "type": "functional"}]
+
+
+class CountingExtractor:
+    def __init__(self, result=REQS, delay=0.0):
+        self.calls = 0
+        self.result = result
+        self.delay = delay
+
+    def __call__(self, text):
+        self.calls += 1
+        time.sleep(self.delay)
+        return self.result
+
+
+@pytest.fixture
+def registry():
+    reg = ProblemRegistry(":memory:")
+    yield reg
+    reg.close()
+
+
+def test_normalization_ignores_cosmetic_whitespace():
+    a = "Sum two numbers.  \r\n\r\n\r\n\r\nReturn the result.\n"
+    b = "  Sum two numbers.\n\nReturn the result."
+    assert normalize_problem_text(a) == "Sum two numbers.\n\nReturn the result."
+    assert problem_hash(a) == problem_hash(b.strip())
+    assert problem_hash("Sum two numbers.") != problem_hash("Sum three numbers.")
+
+
+def test_requirements_extracted_once_per_text(registry):
+    extract = CountingExtractor()
+    first = registry.register("Add a and b.", extract=extract)
+    again = registry.register("Add a and b.  \n", extract=extract)
+    aliased = registry.register("Add a and b.", problem_id="hw1", extract=extract)
+
+    assert extract.calls == 1
+    assert first["requirements"] == again["requirements"] == aliased["requirements"] == REQS
+    assert registry.requirements_for(problem_id="hw1") == REQS
+
+
+def test_changed_text_version_bump_and_invalidation_reextract(registry):
+    extract = CountingExtractor()
+    registry.register("Add a and b.", problem_id="hw1", extract=extract)
+    registry.register("Add a, b and c.", problem_id="hw1", extract=extract)
+    assert extract.calls == 2
+
+    registry.invalidate("hw1")
+    registry.requirements_for(problem_id="hw1", extract=extract)
+    assert extract.calls == 3
+
+    registry.version += 1
+    registry.requirements_for(problem_id="hw1", extract=extract)
+    assert extract.calls == 4
+
+
+def test_unknown_problem_and_fallback_not_memoized(registry):
+    with pytest.raises(ProblemNotFound):
+        registry.requirements_for(problem_id="missing")
+
+    failing = CountingExtractor(result=[dict(r) for r in FALLBACK_REQUIREMENTS])
+    registry.register("Add a and b.", extract=failing)
+    registry.register("Add a and b.", extract=failing)
+    assert failing.calls == 2
+    assert registry.cached_requirements("Add a and b.") is None
+
+
+def test_concurrent_first_requests_share_one_extraction(registry):
+    extract = CountingExtractor(delay=0.1)
+    threads = [threading.Thread(target=registry.register, args=("Add a and b.",), kwargs={"extract": extract})
+               for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert extract.calls == 1
+    # The per-text extraction locks do not outlive the extraction
+    assert registry._inflight == {}
+    registry.register("Add a and c.", extract=CountingExtractor(result=FALLBACK_REQUIREMENTS))
+    assert registry._inflight == {}
+
+
+def test_evaluate_by_problem_id_skips_extraction(monkeypatch):
+    extract = CountingExtractor()
+    get_registry().register("Add a and b.", problem_id="hw1", extract=extract)
+
+    async def fail_extract(text, llm=None):
+        raise AssertionError("requirements should come from the registry")
+
+    async def fake_ai(code, llm=None, language="Python"):
+        return {"is_suspicious": False, "confidence": 0.0, "signals": []}
+
+    async def fake_align(reqs, code, analysis, language="Python", llm=None):
+        assert reqs == REQS
+        scores = {k: {"score": 90} for k in ("correctness", "time_efficiency", "space_efficiency", "readability")}
+        return {"alignment": [], "scores": scores, "feedback": "ok"}
+
+    monkeypatch.setattr(pipeline, "extract_requirements_async", fail_extract)
+    monkeypatch.setattr(pipeline, "detect_ai_signals_async", fake_ai)
+    monkeypatch.setattr(pipeline, "align_spec_code_async", fake_align)
+
+    api = TestClient(app)
+    response = api.post("/evaluate", json={"problem_id": "hw1", "code": "def add(a, b):\n    return a + b\n"})
+    assert response.status_code == 200
+    assert response.json()["overall_score"] == 90
+
+    assert api.post("/evaluate", json={"problem_id": "nope", "code": "x = 1"}).status_code == 404
+    assert api.post("/evaluate", json={"code": "x = 1"}).status_code == 422
+    assert api.get("/problems/hw1").json()["requirements"] == REQS
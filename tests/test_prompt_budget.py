@@ -0,0 +1,130 @@
+import json
+
+from codealign.alignment import align_reasoner
+from codealign.alignment.code_analysis import analyze_code
+from codealign.authenticity.ai_signals import build_ai_signals_prompt
+from codealign.fake_llm import use_fake_llm
+from codealign.prompt_budget import (chunk_code, compact_analysis, count_tokens, fit_code,
+                                     strip_comments)
+
+REQUIREMENTS = [{"description": "Return the length of the LIS", "type": "functional"}]
+
+CODE = '''
+def lis(nums):
+    """Length of the longest increasing subsequence."""
+    tails = []   # smallest tail of each length
+
+
+    for n in nums:
+        # binary search for the slot
+        i = bisect_left(tails, n)
+        if i == len(tails):
+            tails.append(n)
+        else:
+            tails[i] = n
+    return len(tails)
+'''
+
+
+def big_submission(n=200):
+    return "\n\n".join(f"def helper_{i}(x):\n    # step {i}\n    return x + {i}\n" for i in range(n))
+
+
+def test_count_tokens_is_roughly_proportional():
+    assert count_tokens("") == 0
+    assert count_tokens("a = b + 1") == 5
+    assert count_tokens(CODE * 2) == 2 * count_tokens(CODE)
+
+
+def test_compact_analysis_drops_empty_and_irrelevant_fields():
+    analysis = compact_analysis(analyze_code(CODE))
+    assert "language" not in analysis
+    assert "error" not in analysis
+    assert analysis["has_recursion"] is False
+    assert "docstring" not in analysis["functions"][0]
+    assert analysis["loops"] == 1
+
+
+def test_strip_comments_keeps_docstrings_and_strings():
+    code = CODE + 'label = "# not a comment"\n'
+    stripped, removed = strip_comments(code)
+    assert removed == 2
+    assert "search for the slot" not in stripped
+    assert '"""Length of the longest increasing subsequence."""' in stripped
+    assert '"# not a comment"' in stripped
+    assert "" not in stripped.split("\n")
+
+    c_code, removed = strip_comments("#include <stdio.h>\n// helper\nint main() {}\n", language="C")
+    assert removed == 1 and c_code.startswith("#include")
+
+
+def test_small_submission_is_one_compact_prompt():
+    prompts = align_reasoner.build_alignment_prompts(REQUIREMENTS, CODE, analyze_code(CODE))
+    assert len(prompts) == 1
+    assert json.dumps(REQUIREMENTS, separators=(",", ":")) in prompts[0]
+    assert "# binary search for the slot" in prompts[0]
+
+
+def test_comments_are_stripped_before_chunking():
+    full = align_reasoner.build_alignment_prompts(REQUIREMENTS, CODE, analyze_code(CODE), budget=100000)[0]
+    prompts = align_reasoner.build_alignment_prompts(REQUIREMENTS, CODE, analyze_code(CODE),
+                                                     budget=count_tokens(full) - 5)
+    assert len(prompts) == 1
+    assert "search for the slot" not in prompts[0]
+    assert '"comment_lines":2' in prompts[0]
+
+
+def test_large_submission_is_chunked_per_function_within_budget():
+    code = big_submission()
+    prompts = align_reasoner.build_alignment_prompts(REQUIREMENTS, code, analyze_code(code), budget=2000)
+    assert len(prompts) > 1
+    assert all(count_tokens(p) <= 2000 for p in prompts)
+    assert f"part 1 of {len(prompts)}" in prompts[0]
+    # Every function lands whole in exactly one chunk
+    for i in (0, 57, 199):
+        assert sum(f"def helper_{i}(x):\n    return x + {i}" in p for p in prompts) == 1
+
+
+def test_chunk_code_splits_oversized_function_on_lines():
+    body = "\n".join(f"    total += {i}" for i in range(300))
+    chunks = chunk_code(f"def big():\n    total = 0\n{body}\n    return total", budget=200)
+    assert len(chunks) > 1
+    assert all(count_tokens(c) <= 200 for c in chunks)
+
+
+def test_merge_alignment_results():
+    def result(status, correctness, time_score, strengths):
+        return {
+            "alignment": [{"requirement": "Return the length of the LIS", "status": status, "evidence": status}],
+            "scores": {"correctness": {"score": correctness, "reasoning": "r"},
+                       "time_efficiency": {"score": time_score, "reasoning": "t"}},
+            "feedback": {"strengths": strengths, "better_approach": ""},
+        }
+
+    merged = align_reasoner.merge_alignment_results(
+        [result("missing", 40, 90, ["a"]), result("fulfilled", 100, 50, ["a", "b"]), {"alignment": [], "scores": {}}],
+        weights=[1, 3, 1])
+
+    assert merged["alignment"][0]["status"] == "fulfilled"
+    assert merged["scores"]["correctness"]["score"] == 85
+    assert merged["scores"]["time_efficiency"]["score"] == 50
+    assert merged["feedback"]["strengths"] == ["a", "b"]
+
+
+def test_align_spec_code_merges_chunks(monkeypatch):
+    monkeypatch.setattr("codealign.prompt_budget.DEFAULT_TOKEN_BUDGET", 2000)
+    code = big_submission()
+    with use_fake_llm() as provider:
+        result = align_reasoner.align_spec_code(REQUIREMENTS, code, analyze_code(code))
+
+    assert provider.calls["alignment"] > 1
+    assert set(result["scores"]) == {"correctness", "time_efficiency", "space_efficiency", "readability"}
+
+
+def test_ai_signals_prompt_keeps_head_and_tail_within_budget():
+    code = big_submission(500) + "\n# Driver code\nprint(helper_0(1))"
+    prompt = build_ai_signals_prompt(code, budget=500)
+    assert count_tokens(prompt) <= 520
+    assert "def helper_0" in prompt and "# Driver code" in prompt
+    assert "lines omitted" in prompt
+    assert fit_code(CODE, 500) == CODE
@@ -0,0 +1,74 @@
+import json
+
+from codealign.authenticity import ingest
+from codealign.authenticity.store import SubmissionStore
+
+
+def test_add_and_indexed_lookups(tmp_path):
+    store = SubmissionStore(str(tmp_path / "subs.db"))
+    store.add({"id": "a", "student_id": "s1", "problem_id": "p1", "code": "x = 1", "embedding": [0.5, 0.25]})
+    store.add({"id": "b", "student_id": "s2", "problem_id": "p1", "code": "y = 2"})
+    store.add({"id": "c", "student_id": "s1", "problem_id": "p2", "code": "z = 3"})
+
+    assert [s["id"] for s in store.by_problem("p1")] == ["a", "b"]
+    assert [s["id"] for s in store.by_student("s1")] == ["a", "c"]
+    assert [s["id"] for s in store.by_student("s1", problem_id="p2")] == ["c"]
+    assert store.get("a")["embedding"] == [0.5, 0.25]
+    assert store.count("p1") == 2
+    assert [s["id"] for s in store.iter_problem("p1", batch_size=1)] == ["a", "b"]
+
+    reopened = SubmissionStore(str(tmp_path / "subs.db"))
+    assert reopened.count() == 3
+
+
+def test_legacy_json_is_imported(tmp_path, monkeypatch):
+    legacy = tmp_path / "submissions.json"
+    legacy.write_text(json.dumps({
+        "old": {"id": "old", "student_id": "s", "problem_id": "default", "code": "pass", "embedding": []}
+    }))
+    monkeypatch.setattr(ingest, "DB_FILE", str(tmp_path / "subs.db"))
+    monkeypatch.setattr(ingest, "LEGACY_DATA_FILE", str(legacy))
+    monkeypatch.setattr(ingest, "_store", None)
+
+    assert [s["id"] for s in ingest.get_all_submissions("default")] == ["old"]
+
+
+def test_ingest_submission_appends(monkeypatch):
+    monkeypatch.setattr(ingest, "_store", SubmissionStore(":memory:"))
+    sub = ingest.ingest_submission("print(1)", student_id="s1", problem_id="p", embedding=[])
+    assert ingest.get_all_submissions("p")[0]["id"] == sub["id"]
+
+
+def test_outdated_features_are_backfilled_on_read(tmp_path, monkeypatch):
+    from codealign.authenticity import features as features_module
+
+    path = str(tmp_path / "subs.db")
+    outdated = features_module.extract_features("x = 1")
+    outdated["version"] = features_module.FEATURES_VERSION - 1
+    SubmissionStore(path).add({"id": "a", "student_id": "s1", "problem_id": "p1", "code": "x = 1",
+                               "features": outdated})
+
+    store = SubmissionStore(path)
+    assert store.get("a")["features"]["version"] == features_module.FEATURES_VERSION
+    assert [s["features"]["version"] for s in store.iter_problem("p1")] == [features_module.FEATURES_VERSION]
+
+    # The recomputed features were persisted: later reads do not extract again
+    monkeypatch.setattr("codealign.authenticity.store.extract_features", None)
+    assert SubmissionStore(path).by_problem("p1")[0]["features"]["version"] == features_module.FEATURES_VERSION
+
+
+def test_backfill_uses_the_configured_shingle_size(tmp_path):
+    from codealign.authenticity import lsh
+    from codealign.authenticity.features import extract_features
+
+    path = str(tmp_path / "subs.db")
+    SubmissionStore(path).add({"id": "a", "student_id": "s1", "problem_id": "p1", "code": "x = 1 + 2 * 3",
+                               "features": extract_features("x = 1 + 2 * 3", shingle_size=5)})
+    assert SubmissionStore(path, shingle_size=3).get("a")["features"]["shingle_size"] == 3
+
+    previous = lsh.get_config()
+    lsh.configure(lsh.LSHConfig(shingle_size=4))
+    try:
+        assert SubmissionStore(path).by_problem("p1")[0]["features"]["shingle_size"] == 4
+    finally:
+        lsh.configure(previous)
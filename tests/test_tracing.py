@@ -0,0 +1,76 @@
+from fastapi.testclient import TestClient
+
+from codealign import metrics
+from codealign.api import app
+from codealign.benchmark import load_example_corpus
+from codealign.fake_llm import FakeLLMClient, FakeProvider, use_fake_llm
+from codealign.cache import ResponseCache
+from codealign.pipeline import Stage, run_stages
+from codealign.tracing import span, start_trace, current_trace
+
+
+def test_histogram_and_counter_render_prometheus_text():
+    registry = metrics.Registry()
+    hist = registry.histogram("demo_seconds", "Demo.", ("stage",), buckets=(0.1, 1.0))
+    hist.observe(0.05, stage="a")
+    hist.observe(0.5, stage="a")
+    registry.counter("demo_total", "Demo count.", ("outcome",)).inc(outcome='ok "quoted"')
+
+    text = registry.render()
+    assert '# TYPE demo_seconds histogram' in text
+    assert 'demo_seconds_bucket{stage="a",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{stage="a",le="+Inf"} 2' in text
+    assert 'demo_seconds_count{stage="a"} 2' in text
+    assert 'demo_total{outcome="ok \\"quoted\\""} 1' in text
+
+
+def test_spans_follow_stage_threads_and_record_errors():
+    def work():
+        with span("inner", kind="test"):
+            return current_trace() is not None
+
+    with start_trace() as trace:
+        results = run_stages([Stage("a", work), Stage("b", work)])
+        try:
+            with span("broken", kind="test"):
+                raise ValueError("boom")
+        except ValueError:
+            pass
+
+    assert results == {"a": True, "b": True}
+    summary = trace.summary()
+    assert set(summary["stages"]) == {"a", "b"}
+    names = [s["name"] for s in summary["spans"]]
+    assert names.count("inner") == 2
+    assert next(s for s in summary["spans"] if s["name"] == "broken")["error"].startswith("ValueError")
+    assert current_trace() is None
+
+
+def test_llm_calls_record_cache_hits_and_tokens():
+    client = FakeLLMClient(FakeProvider(), cache=ResponseCache(path=None))
+    hits = metrics.LLM_CACHE.value(result="hit")
+    with start_trace() as trace:
+        client.generate_text("sys", "user")
+        client.generate_text("sys", "user")
+    assert metrics.LLM_CACHE.value(result="hit") == hits + 1
+    generate_spans = [s for s in trace.summary()["spans"] if s["name"] == "llm.generate"]
+    assert [s["attributes"]["cache_hit"] for s in generate_spans] == [False, True]
+    provider_calls = [s for s in trace.summary()["spans"] if s["name"] == "llm.fake"]
+    assert len(provider_calls) == 1
+    assert provider_calls[0]["attributes"]["provider"] == "fake"
+
+
+def test_evaluate_timings_opt_in_and_metrics_endpoint():
+    problem_text, codes = load_example_corpus()
+    with use_fake_llm(), TestClient(app) as http:
+        plain = http.post("/evaluate", json={"problem_text": problem_text, "code": codes[0]}).json()
+        timed = http.post("/evaluate", json={"problem_text": problem_text, "code": codes[0],
+                                             "include_timings": True}).json()
+        exposition = http.get("/metrics")
+
+    assert "timings" not in plain
+    assert set(timed["timings"]["stages"]) == {"requirements", "analysis", "ai_signals", "alignment"}
+    assert any(s["kind"] == "llm_call" for s in timed["timings"]["spans"])
+    assert exposition.headers["content-type"].startswith("text/plain")
+    assert 'codealign_span_duration_seconds_count{kind="stage",name="stage.alignment"}' in exposition.text
+    assert 'codealign_llm_requests_total{provider="fake"' in exposition.text
@@ -0,0 +1,118 @@
+import pytest
+
+from codealign.authenticity import ingest, lsh, winnowing
+from codealign.authenticity.search import search_similar
+from codealign.authenticity.similarity import calculate_similarity
+from codealign.authenticity.store import SubmissionStore
+
+ORIGINAL = """
+def length_of_lis(nums):
+    if not nums:
+        return 0
+    tails = []
+    for num in nums:
+        lo, hi = 0, len(tails)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if tails[mid] < num:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == len(tails):
+            tails.append(num)
+        else:
+            tails[lo] = num
+    return len(tails)
+"""
+
+# Same program: every identifier renamed, comments added, layout changed
+DISGUISED = """
+# My solution for the LIS problem
+def longest(arr):
+    if not arr:
+        return 0
+
+    piles = []  # smallest tail of each length
+    for x in arr:
+        left, right = 0, len(piles)
+        while left < right:
+            m = (left + right) // 2
+            if piles[m] < x:   left = m + 1
+            else:
+                right = m
+        if left == len(piles):
+            piles.append(x)
+        else:
+            piles[left] = x
+    return len(piles)
+"""
+
+UNRELATED = """
+class Stack:
+    def __init__(self):
+        self.items = {}
+    def push(self, key, value):
+        self.items[key] = value
+        print("pushed", key)
+"""
+
+
+@pytest.fixture
+def fresh_store():
+    ingest.set_store(SubmissionStore(":memory:"))
+    lsh.reset()
+    yield ingest.get_store()
+    ingest.set_store(None)
+    lsh.reset()
+
+
+def test_renamed_and_reformatted_copy_has_same_fingerprints():
+    fp = winnowing.fingerprint(ORIGINAL)
+    assert fp
+    assert winnowing.fingerprint_similarity(fp, winnowing.fingerprint(DISGUISED)) == 1.0
+    assert winnowing.fingerprint_similarity(fp, winnowing.fingerprint(UNRELATED)) < 0.2
+
+
+def test_winnowing_guarantees_a_fingerprint_per_shared_run():
+    k, w = 5, 4
+    tokens = [(t, i) for i, t in enumerate("a b c d e f g h i j k l m n o p q r s t".split())]
+    hashes = winnowing.kgram_hashes(tokens, k)
+    selected = {h for h, _, _ in winnowing.winnow(hashes, w)}
+    # Any window of w consecutive k-grams (a run of k + w - 1 tokens) contributes a fingerprint
+    for start in range(len(hashes) - w + 1):
+        assert selected & {h for h, _, _ in hashes[start:start + w]}
+
+
+def test_generic_tokenizer_drops_comments():
+    c1 = "int plus(int a, int b) {\n  // add them\n  return a + b; /* done */\n}\n"
+    c2 = "int total(int x, int y) { return x + y; }\n"
+    assert [t for t, _ in winnowing.normalized_tokens(c1, "C")] == [t for t, _ in winnowing.normalized_tokens(c2, "C")]
+
+
+def test_index_ranks_copy_first_with_line_ranges():
+    index = winnowing.FingerprintIndex()
+    index.add("unrelated", winnowing.fingerprint(UNRELATED))
+    index.add("copy", winnowing.fingerprint(DISGUISED))
+
+    hits = index.query(winnowing.fingerprint(ORIGINAL))
+    assert hits[0]["id"] == "copy"
+    assert hits[0]["similarity"] == 1.0
+    first = hits[0]["matches"][0]
+    assert first["lines"][0] <= 3 and first["other_lines"][0] <= 4
+    assert index.query(winnowing.fingerprint(ORIGINAL), exclude_ids={"copy"}, min_similarity=0.5) == []
+
+
+def test_calculate_similarity_sees_through_renaming():
+    assert calculate_similarity(ORIGINAL, DISGUISED) > 0.85
+    assert calculate_similarity(ORIGINAL, UNRELATED) < 0.3
+
+
+def test_search_finds_disguised_copy_with_matched_lines(fresh_store):
+    ingest.ingest_submission(UNRELATED, "s1", "p", embedding=[])
+    copy = ingest.ingest_submission(DISGUISED, "s2", "p", embedding=[])
+    query = ingest.ingest_submission(ORIGINAL, "s3", "p", embedding=[])
+
+    result = search_similar(query, "p")
+    assert result["most_similar_submission_id"] == copy["id"]
+    assert result["max_similarity"] > 0.85
+    assert result["matched_lines"]